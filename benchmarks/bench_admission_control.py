@@ -0,0 +1,142 @@
+"""
+Benchmark: webhook_receiver latency under overload, with and without admission control.
+
+Offers requests open-loop at a fixed rate (arrivals do not wait for earlier
+responses, like a Terminal49 backlog flush) against a publisher stub with a
+fixed number of workers, so Pub/Sub capacity is workers / latency. Latency
+is measured from each request's scheduled arrival. Without admission control
+the publish queue, and every request's latency, grows for as long as the
+overload lasts; with it, excess requests get a fast 429 and admitted ones
+stay close to the unloaded latency.
+
+Usage:
+    python benchmarks/bench_admission_control.py --offered-rps 1500 --seconds 3 \\
+        --publisher-workers 8 --latency-ms 20
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from common import (
+    WEBHOOK_RECEIVER_DIR,
+    MockRequest,
+    StubPublisher,
+    add_function_path,
+    percentile,
+)
+
+add_function_path(WEBHOOK_RECEIVER_DIR)
+
+import pubsub_publisher  # noqa: E402
+from admission_control import AdmissionController, set_admission_controller  # noqa: E402
+from main import webhook_receiver  # noqa: E402
+from webhook_validator import compute_signature  # noqa: E402
+
+SECRET = 'bench-secret'
+
+
+def _build_request(index: int) -> MockRequest:
+    payload = {
+        "data": {
+            "id": f"notif-{index}",
+            "type": "notification",
+            "attributes": {"event": "container.transport.vessel_arrived"}
+        },
+        "included": [
+            {"id": f"cont-{index}", "type": "container", "attributes": {"number": "ABCU1234567"}}
+        ]
+    }
+    body = json.dumps(payload)
+    return MockRequest(body, headers={'X-T49-Webhook-Signature': compute_signature(body, SECRET)})
+
+
+def run(name: str, controller, offered_rps: float, seconds: float,
+        publisher_workers: int, latency_ms: float) -> dict:
+    """Offer load for `seconds` and return latency statistics in milliseconds."""
+    stub = StubPublisher(latency_ms=latency_ms, workers=publisher_workers)
+    env = {
+        'TERMINAL49_WEBHOOK_SECRET': SECRET,
+        'GCP_PROJECT_ID': 'bench-project',
+        'PUBSUB_TOPIC': 'bench-topic',
+        'PUBSUB_PUBLISH_MODE': 'blocking',
+        'DEDUP_CACHE_SIZE': '0',
+    }
+    total = int(offered_rps * seconds)
+    prepared = [_build_request(i) for i in range(total)]
+    results = []
+    results_lock = threading.Lock()
+
+    def _one(request, arrival):
+        response = webhook_receiver(request)
+        latency_ms_ = (time.perf_counter() - arrival) * 1000
+        with results_lock:
+            results.append((response[1], latency_ms_))
+
+    set_admission_controller(controller)
+    with patch.dict(os.environ, env), \
+            patch.object(pubsub_publisher, '_publisher_client', stub):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=512) as pool:
+            for i, request in enumerate(prepared):
+                arrival = start + i / offered_rps
+                delay = arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(_one, request, arrival)
+        wall_s = time.perf_counter() - start
+    set_admission_controller(None, reload=True)
+    stub.shutdown()
+
+    accepted = [latency for status, latency in results if status == 200]
+    rejected = [latency for status, latency in results if status == 429]
+    return {
+        'run': name,
+        'offered_rps': offered_rps,
+        'capacity_rps': round(publisher_workers / (latency_ms / 1000.0)),
+        'requests': total,
+        'accepted': len(accepted),
+        'rejected_429': len(rejected),
+        'errors': len(results) - len(accepted) - len(rejected),
+        'accepted_p50_ms': round(percentile(accepted, 50), 1),
+        'accepted_p99_ms': round(percentile(accepted, 99), 1),
+        'accepted_max_ms': round(max(accepted, default=0.0), 1),
+        'rejected_p99_ms': round(percentile(rejected, 99), 1),
+        'goodput_rps': round(len(accepted) / wall_s, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--offered-rps', type=float, default=1500)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--publisher-workers', type=int, default=8)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--max-in-flight', type=int, default=16)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    capacity = args.publisher_workers / (args.latency_ms / 1000.0)
+    runs = [
+        ('no_admission_control', None),
+        ('token_bucket', AdmissionController(rate_per_second=capacity * 0.9, burst=capacity * 0.1)),
+        ('in_flight_limit', AdmissionController(max_in_flight=args.max_in_flight)),
+        ('both', AdmissionController(
+            rate_per_second=capacity * 0.9, burst=capacity * 0.1, max_in_flight=args.max_in_flight
+        )),
+    ]
+    for name, controller in runs:
+        print(json.dumps(run(
+            name, controller, args.offered_rps, args.seconds,
+            args.publisher_workers, args.latency_ms
+        )))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Benchmark: Flask (thread per request) vs ASGI (asyncio) webhook receiver.
+
+Closed-loop clients send signed webhooks back to back for a fixed time
+against a publisher stub that acks every message after a fixed simulated
+Pub/Sub round trip. The Flask handler runs twice: with as many server
+threads as functions-framework's gunicorn starts (4 per CPU, --flask-threads)
+and with one thread per client, the best case for a threaded server. The
+ASGI app serves every client from one event loop. Reports requests/sec and
+p50/p99 latency (including time queued for a server thread) at each
+concurrency level.
+
+Usage:
+    python benchmarks/bench_asgi_receiver.py --concurrency 1 50 500 --seconds 3 --latency-ms 30
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from unittest.mock import patch
+
+from common import (
+    WEBHOOK_RECEIVER_DIR,
+    DelayedPublisher,
+    MockRequest,
+    add_function_path,
+    build_payload,
+    percentile,
+)
+
+add_function_path(WEBHOOK_RECEIVER_DIR)
+
+import pubsub_publisher  # noqa: E402
+from asgi_app import app  # noqa: E402
+from main import webhook_receiver  # noqa: E402
+from webhook_validator import compute_signature  # noqa: E402
+
+SECRET = 'bench-secret'
+
+ENV = {
+    'TERMINAL49_WEBHOOK_SECRET': SECRET,
+    'GCP_PROJECT_ID': 'bench-project',
+    'PUBSUB_TOPIC': 'bench-topic',
+    'PUBSUB_PUBLISH_MODE': 'blocking',
+    'DEDUP_CACHE_SIZE': '0',
+}
+
+
+def _bodies(count: int = 64):
+    bodies = []
+    for i in range(count):
+        body = json.dumps(build_payload(notification_index=i)).encode('utf-8')
+        bodies.append((body, compute_signature(body, SECRET)))
+    return bodies
+
+
+def run_flask(concurrency: int, seconds: float, bodies, server_threads: int) -> list:
+    latencies = []
+    lock = threading.Lock()
+    server = threading.BoundedSemaphore(server_threads)
+    deadline = time.perf_counter() + seconds
+
+    def client(offset):
+        local = []
+        for body, signature in itertools.islice(itertools.cycle(bodies), offset, None):
+            if time.perf_counter() >= deadline:
+                break
+            request = MockRequest(
+                body.decode('utf-8'), headers={'X-T49-Webhook-Signature': signature}
+            )
+            start = time.perf_counter()
+            with server:
+                _, status = webhook_receiver(request)
+            assert status == 200
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def run_asgi(concurrency: int, seconds: float, bodies) -> list:
+    async def request(body, signature):
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        sent = []
+
+        async def receive():
+            return messages.pop()
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            'type': 'http',
+            'method': 'POST',
+            'path': '/',
+            'headers': [(b'x-t49-webhook-signature', signature.encode('latin-1'))]
+        }
+        await app(scope, receive, send)
+        return sent[0]['status']
+
+    async def client(offset, deadline, latencies):
+        for body, signature in itertools.islice(itertools.cycle(bodies), offset, None):
+            if time.perf_counter() >= deadline:
+                return
+            start = time.perf_counter()
+            status = await request(body, signature)
+            assert status == 200
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    async def main():
+        latencies = []
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(client(i, deadline, latencies) for i in range(concurrency)))
+        return latencies
+
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 50, 500])
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--latency-ms', type=float, default=30.0)
+    parser.add_argument('--flask-threads', type=int, default=(os.cpu_count() or 1) * 4,
+                        help='Server threads for the gunicorn-sized Flask run')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    bodies = _bodies()
+
+    for concurrency in args.concurrency:
+        runners = [
+            (f'flask_{args.flask_threads}_threads',
+             lambda c, s, b: run_flask(c, s, b, args.flask_threads)),
+            ('flask_thread_per_client', lambda c, s, b: run_flask(c, s, b, c)),
+            ('asgi', run_asgi),
+        ]
+        for name, runner in runners:
+            stub = DelayedPublisher(latency_ms=args.latency_ms)
+            with patch.dict(os.environ, ENV), \
+                    patch.object(pubsub_publisher, '_publisher_client', stub):
+                start = time.perf_counter()
+                latencies = runner(concurrency, args.seconds, bodies)
+                wall_s = time.perf_counter() - start
+            stub.shutdown()
+            print(json.dumps({
+                'server': name,
+                'concurrency': concurrency,
+                'requests': len(latencies),
+                'rps': round(len(latencies) / wall_s, 1),
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p99_ms': round(percentile(latencies, 99), 2),
+            }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark: peak memory and time per request, buffered vs streaming body read.
+
+Builds real werkzeug requests (the objects functions-framework hands to the
+receiver) and measures the peak memory allocated (tracemalloc) and the time
+(measured separately, untraced) per request: `request.get_data()` followed
+by the signature check (the previous path) versus `read_signed_body` on
+`request.stream`, which enforces the size cap and feeds the HMAC chunk by
+chunk. read_peak_kib covers reading and authenticating the body; peak_kib
+also includes payload inspection (sniffing and ordering key), which is the
+same for both paths. Covers valid bodies of several sizes, a body larger
+than the cap, and a large body with a malformed signature.
+
+Usage:
+    python benchmarks/bench_body_streaming.py --sizes-kib 2 100 1024 4096 --iterations 20
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import time
+import tracemalloc
+from unittest.mock import patch
+
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+from common import WEBHOOK_RECEIVER_DIR, add_function_path, build_payload_of_size
+
+add_function_path(WEBHOOK_RECEIVER_DIR)
+
+from webhook_handler import (  # noqa: E402
+    WebhookRejected,
+    inspect_signed_body,
+    read_signed_body,
+)
+from webhook_validator import compute_signature, match_signature  # noqa: E402
+
+SECRET = 'bench-secret'
+MAX_BODY_BYTES = 5 * 1024 * 1024
+
+
+def _request(body: bytes, signature: str) -> Request:
+    environ = EnvironBuilder(
+        method='POST',
+        headers={'X-T49-Webhook-Signature': signature},
+        content_type='application/json',
+        content_length=len(body),
+    ).get_environ()
+    environ['wsgi.input'] = io.BytesIO(body)
+    return Request(environ)
+
+
+def buffered(request: Request, inspect: bool = True) -> int:
+    body = request.get_data()
+    signature_key = match_signature(body, request.headers.get('X-T49-Webhook-Signature'))
+    if signature_key is None:
+        return 401
+    if inspect:
+        inspect_signed_body(body, signature_key, 'bench')
+    return 200
+
+
+def streaming(request: Request, inspect: bool = True) -> int:
+    try:
+        body, signature_key = read_signed_body(
+            request.stream,
+            request.headers.get('X-T49-Webhook-Signature'),
+            request.content_length,
+            'bench'
+        )
+    except WebhookRejected as e:
+        return e.status_code
+    if inspect:
+        inspect_signed_body(body, signature_key, 'bench')
+    return 200
+
+
+def _traced_peak(handler, body: bytes, signature: str, inspect: bool) -> int:
+    request = _request(body, signature)
+    tracemalloc.start()
+    handler(request, inspect=inspect)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def measure(handler, body: bytes, signature: str, iterations: int) -> dict:
+    """Peak traced allocation and mean (untraced) time of handler over fresh requests."""
+    read_peaks = []
+    peaks = []
+    durations = []
+    status = None
+    for _ in range(iterations):
+        request = _request(body, signature)
+        start = time.perf_counter()
+        status = handler(request)
+        durations.append(time.perf_counter() - start)
+
+        read_peaks.append(_traced_peak(handler, body, signature, inspect=False))
+        peaks.append(_traced_peak(handler, body, signature, inspect=True))
+    return {
+        'status': status,
+        'read_peak_kib': round(max(read_peaks) / 1024, 1),
+        'peak_kib': round(max(peaks) / 1024, 1),
+        'mean_ms': round(sum(durations) / len(durations) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes-kib', type=int, nargs='+', default=[2, 100, 1024, 4096])
+    parser.add_argument('--oversize-kib', type=int, default=16 * 1024)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    cases = []
+    for size_kib in args.sizes_kib:
+        body = json.dumps(build_payload_of_size(size_kib * 1024)).encode('utf-8')
+        cases.append((f'valid_{size_kib}kib', body, compute_signature(body, SECRET)))
+
+    oversized = json.dumps(build_payload_of_size(args.oversize_kib * 1024)).encode('utf-8')
+    cases.append(('over_limit', oversized, compute_signature(oversized, SECRET)))
+
+    unsigned = json.dumps(build_payload_of_size(max(args.sizes_kib) * 1024)).encode('utf-8')
+    cases.append(('malformed_signature', unsigned, 'not-a-signature'))
+
+    env = {
+        'TERMINAL49_WEBHOOK_SECRET': SECRET,
+        'WEBHOOK_MAX_BODY_BYTES': str(MAX_BODY_BYTES),
+        'DEDUP_CACHE_SIZE': '0',
+    }
+    with patch.dict(os.environ, env):
+        for name, body, signature in cases:
+            for path, handler in (('buffered', buffered), ('streaming', streaming)):
+                iterations = 3 if len(body) > MAX_BODY_BYTES else args.iterations
+                result = measure(handler, body, signature, iterations)
+                case = {'case': name, 'path': path, 'body_kib': len(body) // 1024}
+                print(json.dumps(dict(case, **result)))
+
+
+if __name__ == '__main__':
+    main()
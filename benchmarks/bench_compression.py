@@ -0,0 +1,85 @@
+"""
+Benchmark: Pub/Sub message compression ratio and CPU cost.
+
+Compresses a synthetic corpus of container.transport.*, container.updated
+and tracking_request.* payloads with each supported encoding and level, and
+reports compression ratio plus compress/decompress CPU microseconds per
+message.
+
+Usage:
+    python benchmarks/bench_compression.py --iterations 200
+"""
+
+import argparse
+import gzip
+import json
+import time
+
+from common import build_payload, build_tracking_request_payload
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+CORPUS = {
+    'tracking_request.succeeded': lambda i: build_tracking_request_payload(
+        'tracking_request.succeeded', i),
+    'tracking_request.failed': lambda i: build_tracking_request_payload(
+        'tracking_request.failed', i),
+    'container.updated': lambda i: build_payload('container.updated', 1 + i % 4, 0, i),
+    'container.transport (small)': lambda i: build_payload(
+        'container.transport.vessel_arrived', 1, 3 + i % 5, i),
+    'container.transport (large)': lambda i: build_payload(
+        'container.transport.vessel_discharged', 20 + i % 20, 100 + i % 100, i),
+}
+
+
+def _codecs():
+    codecs = []
+    for level in (1, 6, 9):
+        codecs.append((
+            f'gzip-{level}',
+            lambda body, level=level: gzip.compress(body, compresslevel=level, mtime=0),
+            gzip.decompress
+        ))
+    if zstandard is not None:
+        decompressor = zstandard.ZstdDecompressor()
+        for level in (1, 3, 9):
+            compressor = zstandard.ZstdCompressor(level=level)
+            codecs.append((f'zstd-{level}', compressor.compress, decompressor.decompress))
+    return codecs
+
+
+def cpu_us(func, bodies, iterations):
+    start = time.process_time()
+    for _ in range(iterations):
+        for body in bodies:
+            func(body)
+    return (time.process_time() - start) / (iterations * len(bodies)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--messages', type=int, default=20, help='Messages per corpus class')
+    args = parser.parse_args()
+    
+    for name, factory in CORPUS.items():
+        bodies = [json.dumps(factory(i)).encode('utf-8') for i in range(args.messages)]
+        raw_bytes = sum(len(b) for b in bodies)
+        iterations = max(3, args.iterations * 5_000 // max(raw_bytes // len(bodies), 5_000))
+        for codec_name, compress, decompress in _codecs():
+            compressed = [compress(b) for b in bodies]
+            print(json.dumps({
+                'corpus': name,
+                'codec': codec_name,
+                'avg_message_bytes': raw_bytes // len(bodies),
+                'ratio': round(raw_bytes / sum(len(c) for c in compressed), 2),
+                'compress_us': round(cpu_us(compress, bodies, iterations), 1),
+                'decompress_us': round(cpu_us(decompress, compressed, iterations), 1),
+            }))
+
+
+if __name__ == '__main__':
+    main()
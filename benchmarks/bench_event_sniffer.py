@@ -0,0 +1,67 @@
+"""
+Benchmark: event metadata sniffer vs full json.loads in the receiver.
+
+Runs both extraction paths over a corpus of Terminal49-shaped payloads
+(tracking requests, container updates, transport events with growing
+included arrays) and reports CPU microseconds per request.
+
+Usage:
+    python benchmarks/bench_event_sniffer.py --iterations 500
+"""
+
+import argparse
+import json
+import time
+
+from common import WEBHOOK_RECEIVER_DIR, add_function_path, build_payload
+
+add_function_path(WEBHOOK_RECEIVER_DIR)
+
+from main import extract_event_type  # noqa: E402
+from payload_sniffer import sniff_event_metadata  # noqa: E402
+
+CORPUS = [
+    ('tracking_request.succeeded', 0, 0),
+    ('container.updated', 1, 0),
+    ('container.pickup_lfd.changed', 4, 0),
+    ('container.transport.vessel_arrived', 1, 5),
+    ('container.transport.vessel_discharged', 10, 60),
+    ('container.transport.vessel_departed', 40, 200),
+    ('container.transport.full_out', 100, 1000),
+]
+
+
+def full_parse(body: bytes):
+    payload = json.loads(body)
+    return extract_event_type(payload), payload.get('data', {}).get('id')
+
+
+def cpu_us(func, body: bytes, iterations: int) -> float:
+    start = time.process_time()
+    for _ in range(iterations):
+        func(body)
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+    
+    for event_type, containers, events in CORPUS:
+        body = json.dumps(build_payload(event_type, containers, events)).encode('utf-8')
+        assert sniff_event_metadata(body)[0] == full_parse(body)[0]
+        iterations = max(10, args.iterations * 20_000 // max(len(body), 20_000))
+        full = cpu_us(full_parse, body, iterations)
+        sniffed = cpu_us(sniff_event_metadata, body, iterations)
+        print(json.dumps({
+            'event_type': event_type,
+            'payload_bytes': len(body),
+            'full_parse_us': round(full, 1),
+            'sniffer_us': round(sniffed, 1),
+            'speedup': round(full / sniffed, 1) if sniffed else None,
+        }))
+
+
+if __name__ == '__main__':
+    main()
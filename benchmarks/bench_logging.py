@@ -0,0 +1,160 @@
+"""
+Benchmark: per-request logging overhead of the webhook receiver.
+
+Drives webhook_receiver sequentially with signed webhooks against a
+publisher stub that acks immediately, so the request cost is dominated by
+the handler itself, and compares log configurations writing to an
+in-memory sink:
+
+- disabled: logging.disable, the request cost without any logging
+- text: the previous logging.basicConfig format (drops the `extra` fields)
+- json: the structured JSON handler, every request logged
+- json_sampled: the JSON handler with LOG_SAMPLE_RATE (--sample-rate)
+
+Reports the best mean time per request over --repeats passes, the overhead
+against `disabled`, and the bytes logged per request. A second section
+times a DEBUG call (disabled at INFO) whose field is built eagerly versus
+with lazy().
+
+Usage:
+    python benchmarks/bench_logging.py --requests 2000 --repeats 5 --sample-rate 0.1
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from unittest.mock import patch
+
+from common import (
+    WEBHOOK_RECEIVER_DIR,
+    DelayedPublisher,
+    MockRequest,
+    add_function_path,
+    build_payload,
+)
+
+add_function_path(WEBHOOK_RECEIVER_DIR)
+
+import pubsub_publisher  # noqa: E402
+from main import webhook_receiver  # noqa: E402
+from structured_logging import configure_logging, lazy  # noqa: E402
+from webhook_handler import _payload_keys  # noqa: E402
+from webhook_validator import compute_signature  # noqa: E402
+
+SECRET = 'bench-secret'
+
+ENV = {
+    'TERMINAL49_WEBHOOK_SECRET': SECRET,
+    'GCP_PROJECT_ID': 'bench-project',
+    'PUBSUB_TOPIC': 'bench-topic',
+    'PUBSUB_PUBLISH_MODE': 'blocking',
+    'DEDUP_CACHE_SIZE': '0',
+}
+
+
+class CountingSink:
+    """Write-only stream that counts the bytes written to it."""
+
+    def __init__(self):
+        self.bytes_written = 0
+
+    def write(self, data: str) -> int:
+        self.bytes_written += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+
+def _requests(count: int):
+    requests = []
+    for i in range(count):
+        body = json.dumps(build_payload(notification_index=i))
+        requests.append(MockRequest(body, headers={
+            'X-T49-Webhook-Signature': compute_signature(body, SECRET),
+            'X-Request-ID': f'bench-{i}',
+        }))
+    return requests
+
+
+def _configure(config: str, sink: CountingSink, sample_rate: float) -> None:
+    logging.disable(logging.CRITICAL if config == 'disabled' else logging.NOTSET)
+    env = {
+        'LOG_FORMAT': 'text' if config == 'text' else 'json',
+        'LOG_SAMPLE_RATE': str(sample_rate) if config == 'json_sampled' else '1.0',
+        'LOG_LEVEL': 'INFO',
+    }
+    with patch.dict(os.environ, env):
+        configure_logging(sink, force=True)
+
+
+def measure_requests(config: str, requests, repeats: int, sample_rate: float) -> dict:
+    """Best mean time per request and bytes logged per request for one configuration."""
+    best = None
+    bytes_per_request = 0.0
+    for _ in range(repeats):
+        sink = CountingSink()
+        _configure(config, sink, sample_rate)
+        start = time.perf_counter()
+        for request in requests:
+            webhook_receiver(request)
+        mean = (time.perf_counter() - start) / len(requests)
+        best = mean if best is None else min(best, mean)
+        bytes_per_request = sink.bytes_written / len(requests)
+    return {'mean_us': best * 1e6, 'log_bytes_per_request': round(bytes_per_request, 1)}
+
+
+def measure_debug_field(body: bytes, iterations: int) -> dict:
+    """Time a disabled DEBUG call whose field is built eagerly vs lazily."""
+    logging.disable(logging.NOTSET)
+    configure_logging(CountingSink(), force=True)
+    logger = logging.getLogger('bench_logging')
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        logger.debug("Payload", extra={'payload_keys': _payload_keys(body)})
+    eager = (time.perf_counter() - start) / iterations
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        logger.debug("Payload", extra={'payload_keys': lazy(_payload_keys, body)})
+    deferred = (time.perf_counter() - start) / iterations
+
+    return {'eager_us': round(eager * 1e6, 3), 'lazy_us': round(deferred * 1e6, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--sample-rate', type=float, default=0.1)
+    args = parser.parse_args()
+
+    requests = _requests(args.requests)
+    publisher = DelayedPublisher(latency_ms=0)
+    with patch.dict(os.environ, ENV), \
+            patch.object(pubsub_publisher, '_publisher_client', publisher):
+        results = {
+            config: measure_requests(config, requests, args.repeats, args.sample_rate)
+            for config in ('disabled', 'text', 'json', 'json_sampled')
+        }
+    publisher.shutdown()
+
+    baseline = results['disabled']['mean_us']
+    for config, result in results.items():
+        print(json.dumps({
+            'config': config,
+            'mean_us': round(result['mean_us'], 1),
+            'logging_overhead_us': round(result['mean_us'] - baseline, 1),
+            'log_bytes_per_request': result['log_bytes_per_request'],
+        }))
+
+    body = requests[0].get_data()
+    result = measure_debug_field(body, args.requests)
+    print(json.dumps(dict({'case': 'disabled_debug_field'}, **result)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: cost of recording metrics on the request hot path.
+
+Times Histogram observations (through labels(), as the receiver records
+them, and on a series kept by the caller) and Counter increments, from one
+thread and from several threads sharing the same series. Also reports the
+memory still allocated after --iterations observations (tracemalloc), which
+should stay flat: a series preallocates its buckets, so recording creates no
+containers.
+
+Usage:
+    python benchmarks/bench_metrics.py --iterations 200000 --threads 1 8
+"""
+
+import argparse
+import json
+import threading
+import time
+import tracemalloc
+
+from common import WEBHOOK_RECEIVER_DIR, add_function_path
+
+add_function_path(WEBHOOK_RECEIVER_DIR)
+
+from metrics import MetricsRegistry  # noqa: E402
+
+EVENT_TYPE = 'container.transport.vessel_arrived'
+
+
+def _cases(registry: MetricsRegistry) -> dict:
+    histogram = registry.histogram(
+        'bench_stage_duration_ms', 'Stage latency', ('stage', 'event_type')
+    )
+    counter = registry.counter('bench_requests_total', 'Requests', ('status', 'event_type'))
+    series = histogram.labels('publish', EVENT_TYPE)
+    return {
+        'histogram_labels_observe': (
+            lambda value: histogram.labels('publish', EVENT_TYPE).observe(value)
+        ),
+        'histogram_series_observe': series.observe,
+        'counter_labels_inc': lambda value: counter.labels('200', EVENT_TYPE).inc(),
+    }
+
+
+def measure(record, iterations: int, threads: int) -> dict:
+    """Mean nanoseconds per call with threads recording concurrently."""
+    values = [(i % 5000) / 100 + 0.01 for i in range(1000)]
+    per_thread = iterations // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        barrier.wait()
+        for i in range(per_thread):
+            record(values[i % 1000])
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {'ns_per_call': round(elapsed / (per_thread * threads) * 1e9, 1)}
+
+
+def retained_bytes(record, iterations: int) -> int:
+    """Bytes still allocated after recording iterations values into a warm series."""
+    record(1.0)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(iterations):
+        record((i % 5000) / 100 + 0.01)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--iterations', type=int, default=200000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 8])
+    args = parser.parse_args()
+
+    for name in _cases(MetricsRegistry()):
+        for threads in args.threads:
+            record = _cases(MetricsRegistry())[name]
+            result = measure(record, args.iterations, threads)
+            print(json.dumps(dict({'case': name, 'threads': threads}, **result)))
+        record = _cases(MetricsRegistry())[name]
+        print(json.dumps({'case': name, 'retained_bytes': retained_bytes(record, args.iterations)}))
+
+
+if __name__ == '__main__':
+    main()
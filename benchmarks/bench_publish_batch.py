@@ -0,0 +1,104 @@
+"""
+Benchmark: publish_batch throughput, concurrent vs sequential.
+
+Publishes replay batches of several sizes through publish_batch against a
+publisher stand-in that batches like the real client (each batch costs one
+simulated Pub/Sub round trip), and compares messages per second with the
+previous implementation, which published events one at a time and waited
+for each ack. The sequential path is measured on at most --sequential-max
+events per size, since its throughput does not depend on batch size.
+
+Usage:
+    python benchmarks/bench_publish_batch.py --sizes 10 100 1000 10000 --latency-ms 30
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from unittest.mock import patch
+
+from common import (
+    WEBHOOK_RECEIVER_DIR,
+    BatchingPublisher,
+    StubPublisher,
+    add_function_path,
+    build_payload,
+)
+
+add_function_path(WEBHOOK_RECEIVER_DIR)
+
+import pubsub_publisher  # noqa: E402
+
+EVENT_TYPE = 'container.transport.vessel_arrived'
+
+
+def _events(count: int) -> list:
+    return [
+        (build_payload(EVENT_TYPE, notification_index=index), EVENT_TYPE) for index in range(count)
+    ]
+
+
+def sequential(events: list, latency_ms: float) -> dict:
+    """The previous publish_batch: publish_event per event, waiting for each ack."""
+    stub = StubPublisher(latency_ms=latency_ms)
+    with patch.object(pubsub_publisher, '_publisher_client', stub):
+        start = time.perf_counter()
+        message_ids = [pubsub_publisher.publish_event(payload, event_type, 'bench')
+                       for payload, event_type in events]
+        duration_s = time.perf_counter() - start
+    stub.shutdown()
+    return {'succeeded': len(message_ids), 'duration_s': duration_s}
+
+
+def batched(events: list, latency_ms: float, max_in_flight: int) -> dict:
+    stub = StubPublisher(latency_ms=latency_ms)
+    batch_client = BatchingPublisher(latency_ms=latency_ms)
+    with patch.object(pubsub_publisher, '_publisher_client', stub), \
+            patch.object(pubsub_publisher, '_batch_publisher_client', batch_client):
+        start = time.perf_counter()
+        results = pubsub_publisher.publish_batch(events, 'bench', max_in_flight=max_in_flight)
+        duration_s = time.perf_counter() - start
+    batch_client.shutdown()
+    stub.shutdown()
+    return {
+        'succeeded': sum(1 for result in results if result.succeeded),
+        'duration_s': duration_s,
+        'batches': batch_client.batches_sent,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--latency-ms', type=float, default=30.0)
+    parser.add_argument('--max-in-flight', type=int, default=5000)
+    parser.add_argument('--sequential-max', type=int, default=100)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    env = {
+        'GCP_PROJECT_ID': 'bench-project',
+        'PUBSUB_TOPIC': 'bench-topic',
+    }
+    with patch.dict(os.environ, env):
+        for size in args.sizes:
+            events = _events(size)
+            runs = (
+                ('sequential', sequential(events[:args.sequential_max], args.latency_ms)),
+                ('batched', batched(events, args.latency_ms, args.max_in_flight)),
+            )
+            for path, result in runs:
+                duration_s = result.pop('duration_s')
+                print(json.dumps(dict({
+                    'events': size,
+                    'path': path,
+                    'duration_ms': round(duration_s * 1000, 1),
+                    'messages_per_second': round(result['succeeded'] / duration_s, 1),
+                }, **result)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: blocking vs non-blocking Pub/Sub publish in webhook_receiver.
+
+Drives webhook_receiver from concurrent client threads against a local
+publisher stub with a simulated Pub/Sub round trip, and reports p50/p99
+request latency for each publish mode.
+
+Usage:
+    python benchmarks/bench_publish_modes.py --requests 2000 --concurrency 32 --latency-ms 30
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from common import (
+    WEBHOOK_RECEIVER_DIR,
+    MockRequest,
+    StubPublisher,
+    add_function_path,
+    percentile,
+)
+
+add_function_path(WEBHOOK_RECEIVER_DIR)
+
+import pubsub_publisher  # noqa: E402
+from main import webhook_receiver  # noqa: E402
+from webhook_validator import compute_signature  # noqa: E402
+
+SECRET = 'bench-secret'
+
+
+def _build_request(index: int) -> MockRequest:
+    payload = {
+        "data": {
+            "id": f"notif-{index}",
+            "type": "notification",
+            "attributes": {"event": "container.transport.vessel_arrived"}
+        },
+        "included": [
+            {"id": f"cont-{index}", "type": "container", "attributes": {"number": "ABCU1234567"}}
+        ]
+    }
+    body = json.dumps(payload)
+    return MockRequest(body, headers={'X-T49-Webhook-Signature': compute_signature(body, SECRET)})
+
+
+def run_mode(mode: str, requests: int, concurrency: int, latency_ms: float) -> dict:
+    """Run one benchmark pass and return latency statistics in milliseconds."""
+    stub = StubPublisher(latency_ms=latency_ms)
+    env = {
+        'TERMINAL49_WEBHOOK_SECRET': SECRET,
+        'GCP_PROJECT_ID': 'bench-project',
+        'PUBSUB_TOPIC': 'bench-topic',
+        'PUBSUB_PUBLISH_MODE': mode,
+        'PUBSUB_MAX_IN_FLIGHT': str(max(concurrency * 4, 100)),
+    }
+    prepared = [_build_request(i) for i in range(requests)]
+    
+    def _one(request):
+        start = time.perf_counter()
+        _, status = webhook_receiver(request)
+        return (time.perf_counter() - start) * 1000, status
+    
+    with patch.dict(os.environ, env), \
+            patch.object(pubsub_publisher, '_publisher_client', stub), \
+            patch.object(pubsub_publisher, '_in_flight_slots', None):
+        wall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(_one, prepared))
+        wall_s = time.perf_counter() - wall_start
+        pubsub_publisher.flush_pending_publishes(timeout=30)
+    
+    stub.shutdown()
+    latencies = [r[0] for r in results]
+    errors = sum(1 for r in results if r[1] != 200)
+    return {
+        'mode': mode,
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'throughput_rps': round(requests / wall_s, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--latency-ms', type=float, default=30.0)
+    args = parser.parse_args()
+    
+    logging.disable(logging.CRITICAL)
+    
+    for mode in ('blocking', 'non_blocking'):
+        print(json.dumps(run_mode(mode, args.requests, args.concurrency, args.latency_ms)))
+
+
+if __name__ == '__main__':
+    main()
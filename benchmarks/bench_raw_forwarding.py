@@ -0,0 +1,76 @@
+"""
+Micro-benchmark: forwarding raw request bytes vs re-serializing the payload.
+
+Compares the receiver's previous body handling (decode to text, re-encode for
+HMAC, json.loads, json.dumps for Pub/Sub) with the raw-bytes path (HMAC over
+the received bytes, json.loads, publish the same bytes) across payload sizes.
+Reports CPU time and peak allocated memory per request.
+
+Usage:
+    python benchmarks/bench_raw_forwarding.py --iterations 200
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import time
+import tracemalloc
+
+from common import build_payload_of_size
+
+SECRET = b'bench-secret'
+SIZES = [2_000, 10_000, 50_000, 100_000, 250_000, 500_000]
+
+
+def legacy_path(raw: bytes) -> bytes:
+    body = raw.decode('utf-8')
+    hmac.new(SECRET, body.encode('utf-8'), hashlib.sha256).hexdigest()
+    payload = json.loads(body)
+    payload.get('data', {}).get('attributes', {}).get('event', '')
+    return json.dumps(payload).encode('utf-8')
+
+
+def raw_path(raw: bytes) -> bytes:
+    hmac.new(SECRET, raw, hashlib.sha256).hexdigest()
+    payload = json.loads(raw)
+    payload.get('data', {}).get('attributes', {}).get('event', '')
+    return raw
+
+
+def measure(func, raw: bytes, iterations: int) -> dict:
+    """Return CPU microseconds and peak allocated KiB per call."""
+    cpu_start = time.process_time()
+    for _ in range(iterations):
+        func(raw)
+    cpu_us = (time.process_time() - cpu_start) / iterations * 1e6
+    
+    tracemalloc.start()
+    func(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {'cpu_us': round(cpu_us, 1), 'peak_kib': round(peak / 1024, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+    
+    for size in SIZES:
+        raw = json.dumps(build_payload_of_size(size)).encode('utf-8')
+        iterations = max(5, args.iterations * 10_000 // max(len(raw), 10_000))
+        legacy = measure(legacy_path, raw, iterations)
+        forwarded = measure(raw_path, raw, iterations)
+        print(json.dumps({
+            'payload_bytes': len(raw),
+            'legacy': legacy,
+            'raw': forwarded,
+            'cpu_saving_pct': round(100 * (1 - forwarded['cpu_us'] / legacy['cpu_us']), 1),
+            'peak_saving_pct': round(100 * (1 - forwarded['peak_kib'] / legacy['peak_kib']), 1),
+        }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark: webhook signature validations per second.
+
+Compares the previous per-request path (read the secret from the
+environment, decode the body, build a fresh HMAC and parse the signature
+with int(value, 16)) with WebhookSignatureValidator, which keeps
+precomputed key state and hashes raw bytes. The validator is measured with
+one active key and with two keys during a rotation window, where requests
+still signed with the old secret are checked against the new key first.
+
+Usage:
+    python benchmarks/bench_signature_validation.py --seconds 1
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import time
+
+from common import WEBHOOK_RECEIVER_DIR, add_function_path, build_payload_of_size
+
+add_function_path(WEBHOOK_RECEIVER_DIR)
+
+from webhook_validator import WebhookSignatureValidator, compute_signature  # noqa: E402
+
+SIZES = [512, 4_096, 65_536, 1_048_576]
+
+CURRENT_SECRET = 'benchmark-current-secret'
+PREVIOUS_SECRET = 'benchmark-previous-secret'
+
+
+def legacy_validate(body: bytes, signature: str) -> bool:
+    """Per-call validation as the receiver did it before the validator object."""
+    secret = os.environ.get('TERMINAL49_WEBHOOK_SECRET')
+    if not signature:
+        return False
+    try:
+        int(signature, 16)
+    except ValueError:
+        return False
+    text = body.decode('utf-8')
+    expected = hmac.new(
+        secret.encode('utf-8'),
+        text.encode('utf-8'),
+        hashlib.sha256
+    ).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def per_second(func, body: bytes, signature: str, seconds: float) -> float:
+    assert func(body, signature)
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(50):
+            func(body, signature)
+        calls += 50
+    return calls / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--seconds', type=float, default=1.0, help='Measurement time per case')
+    args = parser.parse_args()
+
+    os.environ['TERMINAL49_WEBHOOK_SECRET'] = CURRENT_SECRET
+    single = WebhookSignatureValidator([CURRENT_SECRET])
+    rotating = WebhookSignatureValidator([CURRENT_SECRET, PREVIOUS_SECRET])
+
+    for size in SIZES:
+        body = json.dumps(build_payload_of_size(size)).encode('utf-8')
+        current = compute_signature(body, CURRENT_SECRET)
+        previous = compute_signature(body, PREVIOUS_SECRET)
+
+        cases = [
+            ('legacy', legacy_validate, current),
+            ('validator-1-key', single.validate, current),
+            ('validator-2-keys-current', rotating.validate, current),
+            ('validator-2-keys-previous', rotating.validate, previous),
+        ]
+        for name, func, signature in cases:
+            print(json.dumps({
+                'body_bytes': len(body),
+                'path': name,
+                'validations_per_sec': round(per_second(func, body, signature, args.seconds)),
+            }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,440 @@
+"""
+Shared helpers for the local benchmarks.
+
+The benchmarks import Cloud Function modules directly (the same way the tests
+do) and replace external services with in-process stand-ins, so they run
+without GCP credentials.
+"""
+
+import heapq
+import io
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+WEBHOOK_RECEIVER_DIR = os.path.join(REPO_ROOT, 'functions', 'webhook_receiver')
+EVENT_PROCESSOR_DIR = os.path.join(REPO_ROOT, 'functions', 'event_processor')
+
+
+def add_function_path(function_dir: str) -> None:
+    """Make a Cloud Function source directory importable."""
+    if function_dir not in sys.path:
+        sys.path.insert(0, function_dir)
+
+
+class StubPublisher:
+    """
+    Local Pub/Sub publisher stand-in.
+    
+    Resolves each publish future on a worker thread after a fixed simulated
+    round-trip latency, mimicking the real client's background batching.
+    """
+    
+    def __init__(self, latency_ms: float = 30.0, workers: int = 64):
+        self.latency_s = latency_ms / 1000.0
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._counter = 0
+        self._lock = threading.Lock()
+    
+    def topic_path(self, project: str, topic: str) -> str:
+        return f"projects/{project}/topics/{topic}"
+    
+    def publish(self, topic_path: str, data: bytes, **attributes) -> Future:
+        future: Future = Future()
+        with self._lock:
+            self._counter += 1
+            message_id = str(self._counter)
+        
+        def _complete():
+            time.sleep(self.latency_s)
+            future.set_result(message_id)
+        
+        self._executor.submit(_complete)
+        return future
+    
+    @property
+    def published_count(self) -> int:
+        return self._counter
+    
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+class DelayedPublisher:
+    """
+    Publisher stand-in with unlimited concurrency.
+    
+    Every publish future resolves after a fixed latency, scheduled on a single
+    timer thread, so Pub/Sub itself never limits throughput. Use StubPublisher
+    to model a publisher with bounded capacity.
+    """
+    
+    def __init__(self, latency_ms: float = 30.0):
+        self.latency_s = latency_ms / 1000.0
+        self._pending: List[tuple] = []
+        self._condition = threading.Condition()
+        self._counter = 0
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def topic_path(self, project: str, topic: str) -> str:
+        return f"projects/{project}/topics/{topic}"
+    
+    def publish(self, topic_path: str, data: bytes, **attributes) -> Future:
+        future: Future = Future()
+        with self._condition:
+            self._counter += 1
+            due = time.monotonic() + self.latency_s
+            heapq.heappush(self._pending, (due, self._counter, future))
+            self._condition.notify()
+        return future
+    
+    def _run(self) -> None:
+        with self._condition:
+            while not self._stopped:
+                if not self._pending:
+                    self._condition.wait()
+                    continue
+                due, counter, future = self._pending[0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                heapq.heappop(self._pending)
+                future.set_result(str(counter))
+    
+    @property
+    def published_count(self) -> int:
+        return self._counter
+    
+    def shutdown(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._thread.join()
+
+
+class BatchingPublisher:
+    """
+    Publisher stand-in that batches like the real client.
+    
+    Messages are grouped per topic until max_messages is reached or
+    max_latency_ms has passed since the first message of the batch; each
+    batch then costs one simulated round trip, with at most
+    concurrent_batches round trips in flight.
+    """
+    
+    def __init__(
+        self,
+        latency_ms: float = 30.0,
+        max_messages: int = 1000,
+        max_latency_ms: float = 50.0,
+        concurrent_batches: int = 16
+    ):
+        self.latency_s = latency_ms / 1000.0
+        self.max_messages = max_messages
+        self.max_latency_s = max_latency_ms / 1000.0
+        self._executor = ThreadPoolExecutor(max_workers=concurrent_batches)
+        self._batches: dict = {}
+        self._lock = threading.Lock()
+        self._counter = 0
+        self.batches_sent = 0
+    
+    def topic_path(self, project: str, topic: str) -> str:
+        return f"projects/{project}/topics/{topic}"
+    
+    def publish(self, topic_path: str, data: bytes, ordering_key: str = '', **attributes) -> Future:
+        future: Future = Future()
+        full = None
+        with self._lock:
+            self._counter += 1
+            batch = self._batches.get(topic_path)
+            if batch is None:
+                batch = self._batches[topic_path] = []
+                timer = threading.Timer(self.max_latency_s, self._flush, args=(topic_path, batch))
+                timer.daemon = True
+                timer.start()
+            batch.append((str(self._counter), future))
+            if len(batch) >= self.max_messages:
+                full = self._batches.pop(topic_path)
+        if full is not None:
+            self._send(full)
+        return future
+    
+    def _flush(self, topic_path: str, batch: list) -> None:
+        with self._lock:
+            if self._batches.get(topic_path) is not batch:
+                return
+            del self._batches[topic_path]
+        self._send(batch)
+    
+    def _send(self, batch: list) -> None:
+        with self._lock:
+            self.batches_sent += 1
+        
+        def _complete():
+            time.sleep(self.latency_s)
+            for message_id, future in batch:
+                future.set_result(message_id)
+        
+        self._executor.submit(_complete)
+    
+    def resume_publish(self, topic_path: str, ordering_key: str) -> None:
+        pass
+    
+    @property
+    def published_count(self) -> int:
+        return self._counter
+    
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+class MockRequest:
+    """Minimal Flask request stand-in accepted by webhook_receiver."""
+    
+    def __init__(self, body: str, headers: Optional[dict] = None,
+                 method: str = 'POST', path: str = '/'):
+        self.method = method
+        self.path = path
+        self.args: dict = {}
+        self.headers = headers or {}
+        self._body = body
+        self.content_type = 'application/json'
+        self.content_length = len(body)
+    
+    @property
+    def stream(self):
+        return io.BytesIO(self._body.encode('utf-8'))
+    
+    def get_data(self, as_text: bool = False):
+        return self._body if as_text else self._body.encode('utf-8')
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def _shipment(index: int) -> dict:
+    return {
+        "id": f"5f1c7a3e-0000-4000-8000-{index:012d}",
+        "type": "shipment",
+        "attributes": {
+            "bill_of_lading_number": f"MAEU{238000000 + index}",
+            "normalized_number": f"{238000000 + index}",
+            "shipping_line_scac": "MAEU",
+            "shipping_line_name": "Maersk",
+            "port_of_lading_locode": "CNSHA",
+            "port_of_lading_name": "Shanghai",
+            "port_of_discharge_locode": "USLAX",
+            "port_of_discharge_name": "Los Angeles",
+            "destination_locode": "USLAX",
+            "pod_vessel_name": "MAERSK EMDEN",
+            "pod_vessel_imo": "9456771",
+            "pod_voyage_number": "0NN3LW1MA",
+            "pol_etd_at": "2024-01-02T08:00:00Z",
+            "pol_atd_at": "2024-01-02T11:30:00Z",
+            "pod_eta_at": "2024-01-20T10:30:00Z",
+            "pod_ata_at": None,
+            "line_tracking_last_attempted_at": "2024-01-15T10:30:00Z",
+            "line_tracking_last_succeeded_at": "2024-01-15T10:30:00Z",
+        },
+        "relationships": {
+            "containers": {"data": []}
+        }
+    }
+
+
+def _container(index: int, shipment_id: str) -> dict:
+    return {
+        "id": f"8a9e4c1d-0000-4000-8000-{index:012d}",
+        "type": "container",
+        "attributes": {
+            "number": f"MSKU{7000000 + index}",
+            "seal_number": f"ML-{4400000 + index}",
+            "equipment_type": "dry",
+            "equipment_length": 40,
+            "equipment_height": "high_cube",
+            "weight_in_lbs": 42100,
+            "pod_arrived_at": "2024-01-20T09:12:00Z",
+            "pod_discharged_at": None,
+            "pickup_lfd": "2024-01-25T00:00:00Z",
+            "available_for_pickup": False,
+            "current_status": "on_ship",
+            "holds_at_pod_terminal": [],
+            "fees_at_pod_terminal": [],
+        },
+        "relationships": {
+            "shipment": {"data": {"id": shipment_id, "type": "shipment"}}
+        }
+    }
+
+
+def _transport_event(index: int, container_id: str, shipment_id: str) -> dict:
+    return {
+        "id": f"c2b7e6f0-0000-4000-8000-{index:012d}",
+        "type": "transport_event",
+        "attributes": {
+            "event": "container.transport.vessel_arrived",
+            "voyage_number": "0NN3LW1MA",
+            "timestamp": "2024-01-20T09:12:00Z",
+            "timezone": "America/Los_Angeles",
+            "location_locode": "USLAX",
+            "location_name": "Los Angeles",
+            "vessel_name": "MAERSK EMDEN",
+            "vessel_imo": "9456771",
+            "data_source": "shipping_line",
+            "created_at": "2024-01-20T09:20:00Z",
+        },
+        "relationships": {
+            "container": {"data": {"id": container_id, "type": "container"}},
+            "shipment": {"data": {"id": shipment_id, "type": "shipment"}},
+            "location": {"data": {"id": "9b1f-usla", "type": "port"}},
+            "terminal": {"data": None}
+        }
+    }
+
+
+def build_payload(
+    event_type: str = 'container.transport.vessel_arrived',
+    containers: int = 1,
+    transport_events: int = 1,
+    notification_index: int = 0,
+    shipments: int = 1
+) -> dict:
+    """
+    Build a Terminal49-shaped notification payload.
+    
+    Args:
+        event_type: Value for data.attributes.event
+        containers: Number of container entities in included
+        transport_events: Number of transport_event entities in included
+        notification_index: Varies IDs between generated payloads
+        shipments: Number of shipment entities in included; containers are
+            assigned to them round robin
+        
+    Returns:
+        Payload dictionary in JSON:API notification format
+    """
+    shipment = _shipment(notification_index)
+    shipment_list = [shipment] + [
+        _shipment(10 ** 9 + notification_index * 100 + i) for i in range(1, shipments)
+    ]
+    included = list(shipment_list)
+    container_refs = []
+    for i in range(containers):
+        container_shipment = shipment_list[i % len(shipment_list)]
+        container = _container(notification_index * 1000 + i, container_shipment["id"])
+        container_refs.append((container["id"], container_shipment["id"]))
+        included.append(container)
+    for i in range(transport_events):
+        container_id, shipment_id = (
+            container_refs[i % len(container_refs)] if container_refs else (None, shipment["id"])
+        )
+        included.append(
+            _transport_event(notification_index * 100000 + i, container_id, shipment_id)
+        )
+    
+    if transport_events:
+        reference = included[-1]
+    else:
+        reference = included[len(shipment_list)] if containers else shipment
+    return {
+        "data": {
+            "id": f"0e6a2b4c-0000-4000-8000-{notification_index:012d}",
+            "type": "notification",
+            "attributes": {
+                "event": event_type,
+                "delivery_status": "pending",
+                "created_at": "2024-01-20T09:20:05Z"
+            },
+            "relationships": {
+                "reference_object": {
+                    "data": {"id": reference["id"], "type": reference["type"]}
+                },
+                "webhook": {"data": {"id": "wh-1", "type": "webhook"}},
+                "webhook_notification_logs": {"data": []}
+            }
+        },
+        "included": included
+    }
+
+
+def build_payload_of_size(
+    target_bytes: int,
+    event_type: str = 'container.transport.vessel_arrived'
+) -> dict:
+    """
+    Build a transport-event payload whose JSON encoding is about target_bytes.
+    
+    Containers and transport events are added in a 1:5 ratio until the
+    serialized size reaches the target.
+    """
+    import json
+    
+    events = 0
+    while True:
+        payload = build_payload(event_type, containers=max(1, events // 5), transport_events=events)
+        if len(json.dumps(payload)) >= target_bytes or events > 10000:
+            return payload
+        events += max(1, events // 10)
+
+
+def build_tracking_request_payload(
+    event_type: str = 'tracking_request.succeeded',
+    notification_index: int = 0
+) -> dict:
+    """Build a tracking_request.* notification payload."""
+    tracking_request_id = f"4d0c2f7a-0000-4000-8000-{notification_index:012d}"
+    status = 'failed' if event_type == 'tracking_request.failed' else 'created'
+    shipment = _shipment(notification_index)
+    return {
+        "data": {
+            "id": f"0e6a2b4c-0000-4000-8000-{notification_index:012d}",
+            "type": "notification",
+            "attributes": {
+                "event": event_type,
+                "delivery_status": "pending",
+                "created_at": "2024-01-20T09:20:05Z"
+            },
+            "relationships": {
+                "reference_object": {
+                    "data": {"id": tracking_request_id, "type": "tracking_request"}
+                },
+                "webhook": {"data": {"id": "wh-1", "type": "webhook"}},
+                "webhook_notification_logs": {"data": []}
+            }
+        },
+        "included": [
+            {
+                "id": tracking_request_id,
+                "type": "tracking_request",
+                "attributes": {
+                    "request_number": f"MAEU{238000000 + notification_index}",
+                    "request_type": "bill_of_lading",
+                    "scac": "MAEU",
+                    "ref_numbers": [],
+                    "created_at": "2024-01-01T08:00:00Z",
+                    "updated_at": "2024-01-01T08:05:00Z",
+                    "status": status,
+                    "failed_reason": "not_found" if status == 'failed' else None,
+                    "is_retrying": False,
+                    "retry_count": 0
+                },
+                "relationships": {
+                    "tracked_object": {"data": {"id": shipment["id"], "type": "shipment"}}
+                }
+            },
+            shipment
+        ]
+    }
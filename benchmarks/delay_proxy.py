@@ -0,0 +1,125 @@
+"""
+TCP proxy adding a fixed network delay, to benchmark against a local Postgres
+as if it were a region away.
+
+Every chunk is forwarded half the round trip after it arrives, in each
+direction, so a request and its reply take --latency-ms longer than they
+would directly. Chunks are queued rather than sent one delay after another:
+data sent back to back (a pipeline) arrives back to back, one delay later,
+the way it would over a long link.
+
+Used by bench_pipeline.py; also runs on its own:
+
+Usage:
+    python benchmarks/delay_proxy.py --upstream 127.0.0.1:5432 --port 55433 --latency-ms 5
+    psql "postgresql://postgres@127.0.0.1:55433/t49_bench"
+"""
+
+import argparse
+import queue
+import socket
+import threading
+import time
+from typing import Tuple
+
+CHUNK_BYTES = 65536
+
+
+class DelayProxy:
+    """Listens on (host, port) and forwards each connection to upstream with added delay."""
+
+    def __init__(self, upstream: Tuple[str, int], latency_ms: float,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.upstream = upstream
+        self.one_way_s = latency_ms / 2000.0
+        self._listener = socket.create_server((host, port))
+        self.address = self._listener.getsockname()[:2]
+        self._closed = threading.Event()
+
+    def start(self) -> 'DelayProxy':
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self
+
+    def close(self) -> None:
+        self._closed.set()
+        self._listener.close()
+
+    def __enter__(self) -> 'DelayProxy':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _accept(self) -> None:
+        while not self._closed.is_set():
+            try:
+                client, _ = self._listener.accept()
+            except OSError:
+                return
+            server = socket.create_connection(self.upstream)
+            for sock in (client, server):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._forward(client, server)
+            self._forward(server, client)
+
+    def _forward(self, source: socket.socket, target: socket.socket) -> None:
+        """Reads source and writes target one delay later, in order."""
+        chunks: queue.Queue = queue.Queue()
+
+        def read():
+            while True:
+                try:
+                    data = source.recv(CHUNK_BYTES)
+                except OSError:
+                    data = b''
+                chunks.put((time.monotonic() + self.one_way_s, data))
+                if not data:
+                    return
+
+        def write():
+            while True:
+                deliver_at, data = chunks.get()
+                wait = deliver_at - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                if not data:
+                    _shutdown(target)
+                    return
+                try:
+                    target.sendall(data)
+                except OSError:
+                    _shutdown(source)
+                    return
+
+        threading.Thread(target=read, daemon=True).start()
+        threading.Thread(target=write, daemon=True).start()
+
+
+def _shutdown(sock: socket.socket) -> None:
+    try:
+        sock.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--upstream', required=True, help='HOST:PORT to forward to')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, required=True, help='Port to listen on')
+    parser.add_argument('--latency-ms', type=float, default=5.0,
+                        help='Round trip added to every request and reply')
+    args = parser.parse_args()
+
+    host, port = args.upstream.rsplit(':', 1)
+    proxy = DelayProxy((host, int(port)), args.latency_ms, args.host, args.port).start()
+    print(f'Forwarding {proxy.address[0]}:{proxy.address[1]} -> {args.upstream} '
+          f'with {args.latency_ms} ms round trip')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        proxy.close()
+
+
+if __name__ == '__main__':
+    main()
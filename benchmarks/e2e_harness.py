@@ -0,0 +1,442 @@
+"""
+Local end-to-end benchmark: load generator -> webhook receiver -> Pub/Sub
+stand-in -> event processor -> Postgres.
+
+Runs the pipeline on one machine, with each function in its own process as
+on Cloud Functions:
+
+- The webhook receiver is served over HTTP by functions-framework's Flask app
+  (threaded). Its Pub/Sub client is replaced by a stand-in that acks each
+  publish after --pubsub-latency-ms and queues the message for the
+  processors.
+- --processors event processor processes each handle one message at a time
+  (the processor is deployed with concurrency 1), against a local Postgres
+  loaded with infrastructure/database/supabase_schema.sql and a fake
+  BigQuery client that accepts inserts after --bigquery-latency-ms. A
+  message whose processing raises is redelivered, up to --max-attempts
+  deliveries.
+- loadgen.py sends --events signed deliveries from --concurrency clients.
+
+Reports the receiver's requests per second, the pipeline's events per second
+(deliveries published, divided by the time from the first request to the last
+commit), per-stage latency percentiles of both functions (merged from their
+in-process histograms, see metrics), queue lag, end-to-end latency and row
+counts per table. The report is printed and, with --output, saved as JSON;
+--baseline prints the change of the headline numbers against a saved report.
+
+Postgres (any local instance; --load-schema drops and recreates the public
+schema of --db-name, so point it at a scratch database):
+    docker run -d --name t49-bench-pg -p 5432:5432 \\
+        -e POSTGRES_PASSWORD=postgres -e POSTGRES_DB=t49_bench postgres:15
+
+Usage:
+    python benchmarks/e2e_harness.py --load-schema --events 2000 --concurrency 16 \\
+        --processors 4 --output e2e-results.json
+    python benchmarks/e2e_harness.py --events 2000 --baseline e2e-results.json
+"""
+
+import argparse
+import base64
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from common import (
+    EVENT_PROCESSOR_DIR,
+    REPO_ROOT,
+    WEBHOOK_RECEIVER_DIR,
+    DelayedPublisher,
+    add_function_path,
+)
+from loadgen import add_load_arguments, describe_webhooks, generate_webhooks, send_webhooks
+
+SECRET = 'bench-secret'
+
+SCHEMA_PATH = os.path.join(REPO_ROOT, 'infrastructure', 'database', 'supabase_schema.sql')
+
+# Roles supabase_schema.sql grants to; they only exist on Supabase
+SUPABASE_ROLES = ('anon', 'authenticated', 'service_role')
+
+TABLES = ('shipments', 'containers', 'container_events', 'tracking_requests', 'webhook_deliveries')
+
+# Shared by both functions; logging cost is measured by bench_logging.py
+FUNCTION_ENV = {
+    'GCP_PROJECT_ID': 'bench-project',
+    'LOG_LEVEL': 'WARNING',
+    'METRICS_FLUSH_INTERVAL_SECONDS': '0',
+}
+
+
+class LocalPubSub(DelayedPublisher):
+    """
+    Publisher stand-in that also delivers each message to the processors.
+
+    The message is queued the moment it is published, in the shape of the
+    `message` field of a Pub/Sub CloudEvent.
+    """
+
+    def __init__(self, messages, latency_ms: float):
+        super().__init__(latency_ms)
+        self._messages = messages
+        self._message_ids = itertools.count(1)
+
+    def publish(self, topic_path: str, data: bytes, ordering_key: str = '', **attributes):
+        self._messages.put({
+            'data': base64.b64encode(data).decode('ascii'),
+            'attributes': attributes,
+            'messageId': str(next(self._message_ids)),
+            'publishTime': datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
+        })
+        return super().publish(topic_path, data, **attributes)
+
+    def resume_publish(self, topic_path: str, ordering_key: str) -> None:
+        pass
+
+
+class FakeBigQueryClient:
+    """BigQuery stand-in whose streaming inserts succeed after a fixed latency."""
+
+    def __init__(self, latency_ms: float):
+        self.latency_s = latency_ms / 1000.0
+        self.rows_inserted = 0
+
+    def insert_rows_json(self, table, rows):
+        time.sleep(self.latency_s)
+        self.rows_inserted += len(rows)
+        return []
+
+
+def _export_metrics(registry) -> Dict[str, list]:
+    """Raw histogram buckets and counter values, so the parent can merge processes."""
+    histograms, counters = [], []
+    for metric in registry.metrics():
+        for labels, series in metric.series():
+            if metric.kind == 'counter':
+                counters.append({'name': metric.name, 'labels': labels, 'value': series.value})
+                continue
+            histograms.append({
+                'name': metric.name,
+                'labels': labels,
+                'min_exponent': series._min_exponent,
+                'counts': list(series.counts),
+                'count': series.count,
+                'total': series.total,
+                'max': series.max,
+            })
+    return {'histograms': histograms, 'counters': counters}
+
+
+def _run_receiver(env: dict, messages, ready, stop, results, pubsub_latency_ms: float) -> None:
+    """Receiver process: serve webhook_receiver over HTTP until stop is set."""
+    os.environ.update(env)
+    add_function_path(WEBHOOK_RECEIVER_DIR)
+
+    from functions_framework import create_app
+    from werkzeug.serving import make_server
+
+    import pubsub_publisher
+    from metrics import get_registry
+
+    publisher = LocalPubSub(messages, pubsub_latency_ms)
+    pubsub_publisher._publisher_client = publisher
+    source = os.path.join(WEBHOOK_RECEIVER_DIR, 'main.py')
+    app = create_app(target='webhook_receiver', source=source)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    ready.put(server.server_port)
+
+    stop.wait()
+    server.shutdown()
+    pubsub_publisher.flush_pending_publishes()
+    publisher.shutdown()
+    # Every message must be in the pipe before the parent queues the
+    # processors' stop sentinels behind them
+    messages.close()
+    messages.join_thread()
+    results.put(dict(_export_metrics(get_registry()), role='receiver',
+                     published=publisher.published_count))
+
+
+def _run_processor(env: dict, messages, results, bigquery_latency_ms: float,
+                   max_attempts: int) -> None:
+    """Processor process: handle messages one at a time until a None sentinel."""
+    os.environ.update(env)
+    add_function_path(EVENT_PROCESSOR_DIR)
+
+    import bigquery_archiver
+    import database
+    from main import process_webhook_event
+    from metrics import get_registry
+
+    bigquery_archiver._bigquery_client = FakeBigQueryClient(bigquery_latency_ms)
+    deliveries = 0
+    dead_lettered = 0
+    last_done = None
+    while True:
+        message = messages.get()
+        if message is None:
+            break
+        event = SimpleNamespace(data={'message': message})
+        for _ in range(max_attempts):
+            deliveries += 1
+            try:
+                process_webhook_event(event)
+                break
+            except Exception:
+                continue
+        else:
+            dead_lettered += 1
+        last_done = time.time()
+
+    database.close_connection_pool()
+    results.put(dict(_export_metrics(get_registry()), role='processor', deliveries=deliveries,
+                     dead_lettered=dead_lettered, last_done=last_done))
+
+
+def _connect(args):
+    import psycopg2
+
+    return psycopg2.connect(
+        host=args.db_host, port=args.db_port, dbname=args.db_name,
+        user=args.db_user, password=args.db_password, connect_timeout=10
+    )
+
+
+def prepare_database(args) -> None:
+    """Check that Postgres is reachable; with --load-schema, recreate the schema."""
+    conn = _connect(args)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        if args.load_schema:
+            for role in SUPABASE_ROLES:
+                cursor.execute(
+                    "DO $$ BEGIN CREATE ROLE %s NOLOGIN; "
+                    "EXCEPTION WHEN duplicate_object THEN NULL; END $$" % role
+                )
+            cursor.execute("DROP SCHEMA IF EXISTS public CASCADE; CREATE SCHEMA public")
+            with open(SCHEMA_PATH) as schema:
+                cursor.execute(schema.read())
+        cursor.execute("SELECT to_regclass('public.webhook_deliveries')")
+        if cursor.fetchone()[0] is None:
+            conn.close()
+            sys.exit(f"{args.db_name} has no webhook_deliveries table; run with --load-schema")
+    conn.close()
+
+
+def count_rows(args) -> Dict[str, int]:
+    conn = _connect(args)
+    counts = {}
+    with conn.cursor() as cursor:
+        for table in TABLES:
+            cursor.execute(f"SELECT count(*) FROM {table}")
+            counts[table] = cursor.fetchone()[0]
+    conn.close()
+    return counts
+
+
+def merge_histograms(exports: List[dict], name: str, group_by: Optional[str] = None) -> dict:
+    """
+    Merge one histogram's series from every process.
+
+    Args:
+        exports: Histogram exports of all processes
+        name: Metric name
+        group_by: Label whose values are kept apart (None merges every series)
+
+    Returns:
+        Summary (count, sum, max, p50, p90, p99) per value of group_by, or a
+        single summary
+    """
+    add_function_path(WEBHOOK_RECEIVER_DIR)
+    from metrics import HistogramSeries
+
+    merged: Dict[str, HistogramSeries] = {}
+    for export in exports:
+        if export['name'] != name:
+            continue
+        key = export['labels'][group_by] if group_by else 'all'
+        series = merged.get(key)
+        if series is None:
+            series = merged[key] = HistogramSeries(export['min_exponent'], len(export['counts']))
+        for index, bucket_count in enumerate(export['counts']):
+            series.counts[index] += bucket_count
+        series.count += export['count']
+        series.total += export['total']
+        series.max = max(series.max, export['max'])
+
+    summaries = {key: series.summary() for key, series in sorted(merged.items())}
+    return summaries if group_by else summaries.get('all', {})
+
+
+def sum_counters(exports: List[dict], name: str, label: str) -> Dict[str, int]:
+    """Counter totals from every process by one label."""
+    totals: Dict[str, int] = {}
+    for export in exports:
+        if export['name'] == name:
+            key = export['labels'][label]
+            totals[key] = totals.get(key, 0) + export['value']
+    return dict(sorted(totals.items()))
+
+
+def compare(report: dict, baseline: dict) -> List[dict]:
+    """Headline numbers of this run next to a saved report."""
+    paths = [
+        ('receiver', 'client', 'requests_per_second'),
+        ('receiver', 'client', 'latency_ms', 'p99'),
+        ('pipeline', 'events_per_second'),
+        ('processor', 'end_to_end_ms', 'p99'),
+        ('processor', 'queue_lag_ms', 'p99'),
+    ]
+    for stage in report['processor']['stages']:
+        paths.append(('processor', 'stages', stage, 'p99'))
+
+    rows = []
+    for path in paths:
+        current, previous = report, baseline
+        for key in path:
+            current = current.get(key, {}) if isinstance(current, dict) else None
+            previous = previous.get(key, {}) if isinstance(previous, dict) else None
+        if not isinstance(current, (int, float)) or not isinstance(previous, (int, float)):
+            continue
+        change = (current - previous) / previous * 100 if previous else None
+        rows.append({
+            'metric': '.'.join(path),
+            'baseline': previous,
+            'current': current,
+            'change_pct': None if change is None else round(change, 1),
+        })
+    return rows
+
+
+def run(args) -> dict:
+    prepare_database(args)
+    webhooks = generate_webhooks(
+        args.events, SECRET, args.event_types, args.shipments, args.containers,
+        args.transport_events, args.duplicate_rate, args.seed
+    )
+
+    receiver_env = dict(FUNCTION_ENV, TERMINAL49_WEBHOOK_SECRET=SECRET,
+                        PUBSUB_TOPIC='bench-topic', PUBSUB_PUBLISH_MODE=args.publish_mode)
+    processor_env = dict(
+        FUNCTION_ENV,
+        SUPABASE_DB_HOST=args.db_host,
+        SUPABASE_DB_PORT=str(args.db_port),
+        SUPABASE_DB_NAME=args.db_name,
+        SUPABASE_DB_USER=args.db_user,
+        SUPABASE_DB_PASSWORD=args.db_password,
+    )
+
+    context = multiprocessing.get_context('spawn')
+    messages, results, ready = context.Queue(), context.Queue(), context.Queue()
+    stop = context.Event()
+    processors = [
+        context.Process(target=_run_processor, args=(
+            processor_env, messages, results, args.bigquery_latency_ms, args.max_attempts
+        ))
+        for _ in range(args.processors)
+    ]
+    receiver = context.Process(target=_run_receiver, args=(
+        receiver_env, messages, ready, stop, results, args.pubsub_latency_ms
+    ))
+    for process in processors + [receiver]:
+        process.start()
+
+    try:
+        port = ready.get(timeout=60)
+        started = time.time()
+        client = send_webhooks(f'http://127.0.0.1:{port}/', webhooks, args.concurrency)
+        stop.set()
+        receiver_result = results.get(timeout=args.timeout)
+        for _ in processors:
+            messages.put(None)
+        processor_results = [results.get(timeout=args.timeout) for _ in processors]
+    except queue.Empty:
+        for process in processors + [receiver]:
+            process.terminate()
+        sys.exit(f"Pipeline did not finish within {args.timeout}s")
+    for process in processors + [receiver]:
+        process.join()
+
+    processor_histograms = [h for r in processor_results for h in r['histograms']]
+    processor_counters = [c for r in processor_results for c in r['counters']]
+    finished = [r['last_done'] for r in processor_results if r['last_done']]
+    elapsed = (max(finished) - started) if finished else 0.0
+    published = receiver_result['published']
+
+    return {
+        'run_at': datetime.now(timezone.utc).isoformat(),
+        'config': {key: value for key, value in vars(args).items()
+                   if key not in ('db_password', 'output', 'baseline')},
+        'load': describe_webhooks(webhooks),
+        'receiver': {
+            'client': client,
+            'published': published,
+            'stages': merge_histograms(
+                receiver_result['histograms'], 'webhook_stage_duration_ms', 'stage'
+            ),
+        },
+        'pipeline': {
+            'seconds': round(elapsed, 3),
+            'events_per_second': round(published / elapsed, 1) if elapsed else 0.0,
+        },
+        'processor': {
+            'deliveries': sum(r['deliveries'] for r in processor_results),
+            'dead_lettered': sum(r['dead_lettered'] for r in processor_results),
+            'outcomes': sum_counters(processor_counters, 'events_processed_total', 'outcome'),
+            'stages': merge_histograms(processor_histograms, 'event_stage_duration_ms', 'stage'),
+            'handlers': merge_histograms(
+                processor_histograms, 'event_handler_duration_ms', 'handler'
+            ),
+            'queue_lag_ms': merge_histograms(processor_histograms, 'event_queue_lag_ms'),
+            'end_to_end_ms': merge_histograms(processor_histograms, 'event_end_to_end_ms'),
+            'end_to_end_ms_by_event_type': merge_histograms(
+                processor_histograms, 'event_end_to_end_ms', 'event_type'
+            ),
+        },
+        'database': {'rows': count_rows(args)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    add_load_arguments(parser)
+    parser.add_argument('--processors', type=int, default=4, help='Event processor processes')
+    parser.add_argument('--max-attempts', type=int, default=5,
+                        help='Deliveries of a failing message before it is dead-lettered')
+    parser.add_argument('--publish-mode', default='blocking', choices=('blocking', 'non_blocking'))
+    parser.add_argument('--pubsub-latency-ms', type=float, default=20.0)
+    parser.add_argument('--bigquery-latency-ms', type=float, default=50.0)
+    parser.add_argument('--db-host', default='localhost')
+    parser.add_argument('--db-port', type=int, default=5432)
+    parser.add_argument('--db-name', default='t49_bench')
+    parser.add_argument('--db-user', default='postgres')
+    parser.add_argument('--db-password', default='postgres')
+    parser.add_argument('--load-schema', action='store_true',
+                        help='Drop and recreate the public schema from supabase_schema.sql')
+    parser.add_argument('--timeout', type=float, default=600.0,
+                        help='Seconds to wait for the pipeline to drain')
+    parser.add_argument('--output', help='Save the report as JSON to this path')
+    parser.add_argument('--baseline', help='Saved report to compare against')
+    args = parser.parse_args()
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            for row in compare(report, json.load(baseline)):
+                print(json.dumps(row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""
+Synthetic Terminal49 webhook load generator.
+
+Builds signed webhooks for every event type transform_event handles, with a
+configurable number of shipments, containers and transport events in
+`included`, and sends them to a webhook receiver over HTTP from concurrent
+clients. A configurable share of the deliveries are duplicates: an earlier
+notification sent again byte for byte, as Terminal49 does when it does not
+get a 2xx in time. Reports response status counts, requests per second and
+client-side latency percentiles as JSON.
+
+e2e_harness.py uses it to drive a local receiver and event processor. On its
+own it can load any receiver, for example one started with:
+    functions-framework --source functions/webhook_receiver/main.py --target webhook_receiver
+
+Usage:
+    python benchmarks/loadgen.py --url http://localhost:8080/ --secret bench-secret \\
+        --events 2000 --concurrency 16 --containers 3 --transport-events 5 --duplicate-rate 0.05
+"""
+
+import argparse
+import collections
+import hashlib
+import hmac
+import http.client
+import json
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+from common import build_payload, build_tracking_request_payload, percentile
+
+# One or more event types per transform_event handler
+EVENT_TYPES = (
+    'container.transport.vessel_arrived',
+    'container.transport.vessel_departed',
+    'container.transport.vessel_discharged',
+    'container.updated',
+    'container.created',
+    'container.pickup_lfd.changed',
+    'shipment.estimated.arrival',
+    'tracking_request.succeeded',
+    'tracking_request.failed',
+)
+
+
+class Webhook:
+    """One delivery: the signed body and the headers it is sent with."""
+
+    __slots__ = ('event_type', 'notification_id', 'body', 'signature', 'duplicate')
+
+    def __init__(self, event_type: str, notification_id: str, body: bytes, signature: str,
+                 duplicate: bool = False):
+        self.event_type = event_type
+        self.notification_id = notification_id
+        self.body = body
+        self.signature = signature
+        self.duplicate = duplicate
+
+
+def sign(body: bytes, secret: str) -> str:
+    """Hex HMAC-SHA256 of the body, as Terminal49 sends in X-T49-Webhook-Signature."""
+    return hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+def build_event_payload(
+    event_type: str,
+    index: int,
+    shipments: int = 1,
+    containers: int = 1,
+    transport_events: int = 1
+) -> dict:
+    """
+    Build a notification payload for event_type.
+
+    Transport events are only included for container.transport.* events, and
+    shipment.estimated.arrival carries shipments only. tracking_request.*
+    notifications carry the tracking request and its shipment in `included`,
+    as Terminal49 sends them.
+    """
+    if event_type.startswith('tracking_request.'):
+        return build_tracking_request_payload(event_type, notification_index=index)
+    if event_type == 'shipment.estimated.arrival':
+        containers = 0
+    if not event_type.startswith('container.transport.'):
+        transport_events = 0
+    return build_payload(
+        event_type,
+        containers=containers,
+        transport_events=transport_events,
+        notification_index=index,
+        shipments=shipments
+    )
+
+
+def generate_webhooks(
+    count: int,
+    secret: str,
+    event_types: Sequence[str] = EVENT_TYPES,
+    shipments: int = 1,
+    containers: int = 1,
+    transport_events: int = 1,
+    duplicate_rate: float = 0.0,
+    seed: int = 1
+) -> List[Webhook]:
+    """
+    Build count signed deliveries, event types drawn uniformly from event_types.
+
+    Args:
+        count: Number of deliveries, duplicates included
+        secret: Webhook secret to sign with
+        event_types: Event types to draw from
+        shipments: Shipments in each payload's included array
+        containers: Containers in each payload's included array
+        transport_events: Transport events in each container.transport.* payload
+        duplicate_rate: Share of deliveries that repeat an earlier notification
+        seed: Random seed, so runs with the same arguments send the same load
+
+    Returns:
+        List of Webhook deliveries in sending order
+    """
+    rng = random.Random(seed)
+    webhooks: List[Webhook] = []
+    unique: List[Webhook] = []
+    for _ in range(count):
+        if unique and rng.random() < duplicate_rate:
+            original = rng.choice(unique)
+            webhooks.append(Webhook(
+                original.event_type, original.notification_id, original.body,
+                original.signature, duplicate=True
+            ))
+            continue
+        event_type = rng.choice(event_types)
+        payload = build_event_payload(
+            event_type, len(unique), shipments, containers, transport_events
+        )
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        webhook = Webhook(event_type, payload['data']['id'], body, sign(body, secret))
+        unique.append(webhook)
+        webhooks.append(webhook)
+    return webhooks
+
+
+def describe_webhooks(webhooks: List[Webhook]) -> Dict[str, object]:
+    """Counts of the generated deliveries by event type, and their sizes."""
+    sizes = [len(webhook.body) for webhook in webhooks]
+    return {
+        'deliveries': len(webhooks),
+        'duplicates': sum(webhook.duplicate for webhook in webhooks),
+        'by_event_type': dict(sorted(collections.Counter(w.event_type for w in webhooks).items())),
+        'body_bytes': {
+            'p50': percentile(sizes, 50),
+            'max': max(sizes) if sizes else 0,
+        },
+    }
+
+
+def send_webhooks(
+    url: str,
+    webhooks: List[Webhook],
+    concurrency: int = 16,
+    timeout: float = 30.0
+) -> Dict[str, object]:
+    """
+    POST every webhook to url from concurrency clients, each on its own connection.
+
+    Returns:
+        Dictionary with the request count, wall time, requests per second,
+        status counts (connection errors under "error") and latency
+        percentiles in milliseconds
+    """
+    target = urlsplit(url)
+    path = target.path or '/'
+    next_index = iter(range(len(webhooks)))
+    index_lock = threading.Lock()
+    latencies: List[float] = []
+    statuses: collections.Counter = collections.Counter()
+    results_lock = threading.Lock()
+
+    def client():
+        connection_class = (
+            http.client.HTTPSConnection if target.scheme == 'https' else http.client.HTTPConnection
+        )
+        connection = connection_class(target.hostname, target.port, timeout=timeout)
+        local_latencies = []
+        local_statuses: collections.Counter = collections.Counter()
+        while True:
+            with index_lock:
+                index = next(next_index, None)
+            if index is None:
+                break
+            webhook = webhooks[index]
+            headers = {
+                'Content-Type': 'application/json',
+                'X-T49-Webhook-Signature': webhook.signature,
+                'X-Request-ID': f'loadgen-{index}',
+            }
+            started = time.perf_counter()
+            try:
+                connection.request('POST', path, body=webhook.body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                local_statuses[str(response.status)] += 1
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                local_statuses['error'] += 1
+            local_latencies.append((time.perf_counter() - started) * 1000)
+        connection.close()
+        with results_lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': len(webhooks),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(webhooks) / elapsed, 1) if elapsed else 0.0,
+        'status_counts': dict(sorted(statuses.items())),
+        'latency_ms': {
+            f'p{pct}': round(percentile(latencies, pct), 2) for pct in (50, 90, 99)
+        },
+    }
+
+
+def add_load_arguments(parser: argparse.ArgumentParser) -> None:
+    """Arguments shared with e2e_harness.py that shape the generated load."""
+    parser.add_argument('--events', type=int, default=2000, help='Deliveries to send')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent HTTP clients')
+    parser.add_argument('--event-types', nargs='+', default=list(EVENT_TYPES))
+    parser.add_argument('--shipments', type=int, default=1, help='Shipments per payload')
+    parser.add_argument('--containers', type=int, default=2, help='Containers per payload')
+    parser.add_argument('--transport-events', type=int, default=3,
+                        help='Transport events per container.transport.* payload')
+    parser.add_argument('--duplicate-rate', type=float, default=0.05,
+                        help='Share of deliveries that repeat an earlier notification')
+    parser.add_argument('--seed', type=int, default=1)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--url', required=True, help='Webhook receiver URL')
+    parser.add_argument('--secret', required=True, help='TERMINAL49_WEBHOOK_SECRET of the receiver')
+    add_load_arguments(parser)
+    args = parser.parse_args(argv)
+
+    webhooks = generate_webhooks(
+        args.events, args.secret, args.event_types, args.shipments, args.containers,
+        args.transport_events, args.duplicate_rate, args.seed
+    )
+    result = send_webhooks(args.url, webhooks, args.concurrency)
+    print(json.dumps({'load': describe_webhooks(webhooks), 'receiver': result}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
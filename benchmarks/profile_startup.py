@@ -0,0 +1,148 @@
+"""
+Profile: cold-start import time of each Cloud Function, with a budget check.
+
+Imports each function's main module in fresh interpreters under
+`python -X importtime`, reports the median cumulative import time of main
+and the modules that contribute most to it, and lists which heavy client
+libraries were imported at startup (they should be imported on first use).
+Exits non-zero if a function's median import time exceeds its budget, so
+it can gate CI against cold-start regressions.
+
+Usage:
+    python benchmarks/profile_startup.py --runs 5 --top 15
+    python benchmarks/profile_startup.py --budget-ms webhook_receiver=350 event_processor=300
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+from common import EVENT_PROCESSOR_DIR, WEBHOOK_RECEIVER_DIR
+
+FUNCTIONS = {
+    'webhook_receiver': WEBHOOK_RECEIVER_DIR,
+    'event_processor': EVENT_PROCESSOR_DIR,
+}
+
+DEFAULT_BUDGET_MS = {
+    'webhook_receiver': 350.0,
+    'event_processor': 300.0,
+}
+
+# Client libraries that should not be imported until first use
+HEAVY_MODULES = (
+    'google.cloud.pubsub_v1',
+    'google.cloud.bigquery',
+    'google.api_core.exceptions',
+    'grpc',
+    'psycopg2',
+)
+
+_REPORT_HEAVY = (
+    "import sys; "
+    "print('HEAVY=' + ','.join(m for m in {modules!r} if m in sys.modules))"
+)
+
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[float, float]]:
+    """
+    Parse `-X importtime` output.
+
+    Args:
+        stderr: Interpreter stderr
+
+    Returns:
+        Module name -> (self_ms, cumulative_ms)
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        self_us, cumulative_us, name = fields
+        modules[name.strip()] = (int(self_us) / 1000.0, int(cumulative_us) / 1000.0)
+    return modules
+
+
+def profile_once(function_dir: str) -> Tuple[Dict[str, Tuple[float, float]], List[str]]:
+    """Import main in a fresh interpreter; returns (import times, heavy modules loaded)."""
+    code = 'import main; ' + _REPORT_HEAVY.format(modules=HEAVY_MODULES)
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=function_dir, env=env, capture_output=True, text=True, check=True
+    )
+    heavy = []
+    for line in result.stdout.splitlines():
+        if line.startswith('HEAVY='):
+            heavy = [m for m in line[len('HEAVY='):].split(',') if m]
+    return parse_importtime(result.stderr), heavy
+
+
+def profile(name: str, function_dir: str, runs: int, top: int) -> dict:
+    """Profile one function over several runs and summarise the median run."""
+    samples = [profile_once(function_dir) for _ in range(runs)]
+    samples.sort(key=lambda sample: sample[0]['main'][1])
+    modules, heavy = samples[len(samples) // 2]
+
+    slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    return {
+        'function': name,
+        'runs': runs,
+        'main_import_ms': round(statistics.median(s[0]['main'][1] for s in samples), 1),
+        'heavy_modules_at_startup': heavy,
+        'top_self_ms': [
+            {
+                'module': module,
+                'self_ms': round(self_ms, 1),
+                'cumulative_ms': round(cumulative_ms, 1)
+            }
+            for module, (self_ms, cumulative_ms) in slowest
+        ],
+    }
+
+
+def _parse_budgets(values: List[str]) -> Dict[str, float]:
+    budgets = dict(DEFAULT_BUDGET_MS)
+    for value in values:
+        name, _, ms = value.partition('=')
+        if name not in FUNCTIONS or not ms:
+            raise SystemExit(f"Invalid --budget-ms entry '{value}', expected <function>=<ms>")
+        budgets[name] = float(ms)
+    return budgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--functions', nargs='+', choices=sorted(FUNCTIONS), default=sorted(FUNCTIONS)
+    )
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--budget-ms', nargs='*', default=[], metavar='FUNCTION=MS',
+                        help='Override the import-time budget for a function')
+    args = parser.parse_args()
+
+    budgets = _parse_budgets(args.budget_ms)
+    over_budget = []
+    for name in args.functions:
+        report = profile(name, FUNCTIONS[name], args.runs, args.top)
+        report['budget_ms'] = budgets[name]
+        report['within_budget'] = report['main_import_ms'] <= budgets[name]
+        if not report['within_budget']:
+            over_budget.append(name)
+        print(json.dumps(report))
+
+    if over_budget:
+        print(f"Cold-start import time over budget: {', '.join(over_budget)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,8 +8,11 @@ import os
 import logging
 from datetime import datetime
 from typing import Dict, Any, Optional
-from google.cloud import bigquery
-from google.api_core import exceptions
+
+from structured_logging import lazy
+
+# google-cloud-bigquery is imported on first use rather than at cold start;
+# it is one of the slowest imports in the function.
 
 logger = logging.getLogger(__name__)
 
@@ -29,12 +32,42 @@ def _get_bigquery_client():
     global _bigquery_client
     
     if _bigquery_client is None:
+        from google.cloud import bigquery
+        
         logger.info("Initializing BigQuery client")
         _bigquery_client = bigquery.Client()
     
     return _bigquery_client
 
 
+def probe_bigquery(timeout: float) -> Dict[str, Any]:
+    """
+    Health probe: fetch the archive table's metadata.
+    
+    A metadata read, so the probe neither runs a query job nor inserts rows.
+    
+    Args:
+        timeout: Request timeout in seconds
+        
+    Returns:
+        Dictionary with the table ID
+        
+    Raises:
+        ValueError: If GCP_PROJECT_ID is not set
+        google.api_core.exceptions.GoogleAPIError: If the table cannot be read
+    """
+    project_id = os.environ.get('GCP_PROJECT_ID')
+    dataset_id = os.environ.get(
+        'BIGQUERY_DATASET_ID', os.environ.get('BIGQUERY_DATASET', 'terminal49_raw_events')
+    )
+    if not project_id:
+        raise ValueError("GCP_PROJECT_ID environment variable not set")
+    
+    table_ref = f"{project_id}.{dataset_id}.raw_events_archive"
+    _get_bigquery_client().get_table(table_ref, retry=None, timeout=timeout)
+    return {'table': table_ref}
+
+
 def _extract_payload_fields(payload: Dict[str, Any], event_type: str) -> Dict[str, Any]:
     """
     Extracts key fields from Terminal49 webhook payload for BigQuery archival.
@@ -177,7 +210,8 @@ def archive_raw_event(
     signature_valid: bool = True,
     signature_header: Optional[str] = None,
     source_ip: Optional[str] = None,
-    user_agent: Optional[str] = None
+    user_agent: Optional[str] = None,
+    queue_lag_ms: Optional[int] = None
 ) -> None:
     """
     Archives raw webhook event to BigQuery.
@@ -194,11 +228,14 @@ def archive_raw_event(
         signature_header: Original webhook signature header
         source_ip: Source IP address of webhook request
         user_agent: User-Agent header from request
+        queue_lag_ms: Milliseconds between publication and the start of
+            processing, if the publish time is known
         
     Raises:
         google.api_core.exceptions.GoogleAPIError: On BigQuery errors
     """
     client = _get_bigquery_client()
+    from google.api_core import exceptions
     
     # Get configuration
     project_id = os.environ.get('GCP_PROJECT_ID')
@@ -235,6 +272,7 @@ def archive_raw_event(
         'signature_header': signature_header,
         'processing_status': 'received',  # Required field - set initial status
         'processing_duration_ms': None,  # Will be updated later if needed
+        'queue_lag_ms': queue_lag_ms,
         'processing_error': None,
         'processed_at': None,
         'request_id': request_id,
@@ -256,7 +294,7 @@ def archive_raw_event(
             'request_id': request_id,
             'notification_id': notification_id,
             'payload_type': type(payload).__name__,
-            'row_keys': list(row.keys())
+            'row_keys': lazy(list, row)
         }
     )
     
@@ -330,6 +368,7 @@ def update_processing_duration(
         duration_ms: Processing duration in milliseconds
     """
     client = _get_bigquery_client()
+    from google.cloud import bigquery
     
     project_id = os.environ.get('GCP_PROJECT_ID')
     dataset_id = os.environ.get('BIGQUERY_DATASET_ID', os.environ.get('BIGQUERY_DATASET', 'terminal49_raw_events'))
@@ -394,6 +433,7 @@ def query_raw_events(
         List of event dictionaries
     """
     client = _get_bigquery_client()
+    from google.cloud import bigquery
     
     project_id = os.environ.get('GCP_PROJECT_ID')
     dataset_id = os.environ.get('BIGQUERY_DATASET_ID', os.environ.get('BIGQUERY_DATASET', 'terminal49_raw_events'))
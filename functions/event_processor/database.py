@@ -2,22 +2,60 @@
 Database Connection Module
 
 Manages PostgreSQL connections to Supabase with connection pooling.
+
+Each pooled connection prepares the hot write statements the first time it
+is checked out (see prepared_statements). A connection found closed when it
+is returned is discarded, so the pool opens, and prepares, a new one.
+
+With DB_BACKEND=psycopg the pool holds psycopg 3 connections, and each
+transaction runs in pipeline mode (see db_pipeline): its statements are sent
+without waiting for each other's results, and BEGIN, the writes and COMMIT
+share one round trip. psycopg 3 prepares repeated statements itself.
+
+Environment Variables:
+    DB_BACKEND: 'psycopg2' (default) or 'psycopg' (psycopg 3, pipelined)
 """
 
+import importlib
 import os
 import logging
 from contextlib import contextmanager
 from typing import Generator
-import psycopg2
-from psycopg2 import pool
-from psycopg2.extras import RealDictCursor
+
+from db_pipeline import pipelined
+from prepared_statements import (
+    prepare_connection, prepared_statements_enabled, reset_prepared_statements
+)
+
+# The driver is imported when the pool is created rather than at cold start
 
 logger = logging.getLogger(__name__)
 
+# Values of DB_BACKEND: the driver module names
+DB_BACKENDS = ('psycopg2', 'psycopg')
+
 # Global connection pool (cached across function invocations)
 _connection_pool = None
 
 
+def get_db_backend() -> str:
+    """
+    Database driver selected by DB_BACKEND.
+    
+    Returns:
+        'psycopg2' (default) or 'psycopg'
+        
+    Raises:
+        ValueError: If DB_BACKEND names another driver
+    """
+    backend = os.environ.get('DB_BACKEND', 'psycopg2').strip().lower()
+    if backend not in DB_BACKENDS:
+        raise ValueError(
+            f"Unsupported DB_BACKEND {backend!r}; expected one of {', '.join(DB_BACKENDS)}"
+        )
+    return backend
+
+
 def _get_connection_pool():
     """
     Gets or creates the connection pool.
@@ -26,12 +64,15 @@ def _get_connection_pool():
     This improves performance by avoiding connection overhead on warm starts.
     
     Returns:
-        SimpleConnectionPool instance
+        SimpleConnectionPool instance, or psycopg_pool.ConnectionPool with
+        DB_BACKEND=psycopg
     """
     global _connection_pool
     
     if _connection_pool is None:
-        logger.info("Initializing database connection pool")
+        backend = get_db_backend()
+        
+        logger.info("Initializing database connection pool", extra={'backend': backend})
         
         # Get database configuration from environment
         db_host = os.environ.get('SUPABASE_DB_HOST')
@@ -48,6 +89,13 @@ def _get_connection_pool():
                 "SUPABASE_DB_USER, and SUPABASE_DB_PASSWORD are set."
             )
         
+        if backend == 'psycopg':
+            _connection_pool = _create_psycopg_pool(db_host, db_port, db_name, db_user, db_password)
+            return _connection_pool
+        
+        import psycopg2
+        from psycopg2 import pool
+        
         # Create connection pool
         # minconn=1, maxconn=5 is appropriate for Cloud Functions
         # Each function instance handles one request at a time
@@ -81,6 +129,44 @@ def _get_connection_pool():
     return _connection_pool
 
 
+def _create_psycopg_pool(host: str, port: str, dbname: str, user: str, password: str):
+    """
+    psycopg 3 connection pool with the same size and connection settings.
+    
+    The pool opens its first connection in the background; getconn waits for
+    it. Connections are in autocommit mode, for pipelined(). Connections
+    returned broken or mid-transaction are discarded or rolled back by the
+    pool.
+    """
+    from psycopg_pool import ConnectionPool
+    
+    pool_instance = ConnectionPool(
+        min_size=1,
+        max_size=5,
+        kwargs={
+            'host': host,
+            'port': port,
+            'dbname': dbname,
+            'user': user,
+            'password': password,
+            'connect_timeout': 10,
+            'keepalives': 1,
+            'keepalives_idle': 30,
+            'keepalives_interval': 10,
+            'keepalives_count': 5,
+            # pipelined() sends BEGIN and COMMIT itself
+            'autocommit': True,
+            # Protocol-level preparation after 5 executions; off behind a
+            # transaction pooler
+            'prepare_threshold': 5 if prepared_statements_enabled() else None
+        },
+        name='event_processor',
+        open=True
+    )
+    logger.info("Database connection pool initialized successfully")
+    return pool_instance
+
+
 @contextmanager
 def get_db_connection() -> Generator:
     """
@@ -95,12 +181,15 @@ def get_db_connection() -> Generator:
             results = cursor.fetchall()
     
     Yields:
-        psycopg2 connection object
+        psycopg2 connection object (psycopg 3 with DB_BACKEND=psycopg)
         
     Raises:
         psycopg2.Error: On database connection or operation errors
+            (psycopg.Error with DB_BACKEND=psycopg)
     """
     pool_instance = _get_connection_pool()
+    backend = get_db_backend()
+    database_error = importlib.import_module(backend).Error
     conn = None
     
     try:
@@ -108,18 +197,31 @@ def get_db_connection() -> Generator:
         conn = pool_instance.getconn()
         
         if conn is None:
-            raise psycopg2.Error("Failed to get connection from pool")
+            raise database_error("Failed to get connection from pool")
         
         logger.debug("Database connection acquired from pool")
         
-        # Yield connection to caller
-        yield conn
-        
-        # Commit transaction on success
-        conn.commit()
+        if backend == 'psycopg':
+            if not prepared_statements_enabled():
+                # Turned off after a missing statement; the pool's connections
+                # were opened with a prepare threshold
+                conn.prepare_threshold = None
+            # Yield connection to caller; its statements and the commit are
+            # pipelined
+            with pipelined(conn):
+                yield conn
+        else:
+            # No-op after the connection's first checkout
+            prepare_connection(conn)
+            
+            # Yield connection to caller
+            yield conn
+            
+            # Commit transaction on success
+            conn.commit()
         logger.debug("Database transaction committed")
         
-    except psycopg2.Error as e:
+    except database_error as e:
         # Rollback on error
         if conn:
             conn.rollback()
@@ -143,8 +245,13 @@ def get_db_connection() -> Generator:
     finally:
         # Always return connection to pool
         if conn:
-            pool_instance.putconn(conn)
-            logger.debug("Database connection returned to pool")
+            if backend == 'psycopg2' and getattr(conn, 'closed', False):
+                # Lost connection (server restart, failover, idle timeout)
+                pool_instance.putconn(conn, close=True)
+                logger.warning("Closed database connection discarded from pool")
+            else:
+                pool_instance.putconn(conn)
+                logger.debug("Database connection returned to pool")
 
 
 def execute_query(conn, query: str, params: dict = None) -> list:
@@ -159,6 +266,8 @@ def execute_query(conn, query: str, params: dict = None) -> list:
     Returns:
         List of result rows as dictionaries
     """
+    from psycopg2.extras import RealDictCursor
+    
     with conn.cursor(cursor_factory=RealDictCursor) as cursor:
         cursor.execute(query, params)
         return cursor.fetchall()
@@ -181,6 +290,71 @@ def execute_update(conn, query: str, params: dict = None) -> int:
         return cursor.rowcount
 
 
+def get_pool_stats() -> dict:
+    """
+    Connection pool counters for the health check.
+    
+    Reads the pool's bookkeeping without touching the database.
+    
+    Returns:
+        Dictionary with initialized and, once the pool exists, min/max
+        connections and the connections in use and idle
+    """
+    pool_instance = _connection_pool
+    if pool_instance is None:
+        return {'initialized': False}
+    
+    if get_db_backend() == 'psycopg':
+        stats = pool_instance.get_stats()
+        return {
+            'initialized': True,
+            'closed': pool_instance.closed,
+            'min_connections': pool_instance.min_size,
+            'max_connections': pool_instance.max_size,
+            'in_use': stats['pool_size'] - stats['pool_available'],
+            'idle': stats['pool_available']
+        }
+    
+    # SimpleConnectionPool keeps idle connections in _pool and checked-out
+    # ones in _used; there is no public accessor
+    return {
+        'initialized': True,
+        'closed': pool_instance.closed,
+        'min_connections': pool_instance.minconn,
+        'max_connections': pool_instance.maxconn,
+        'in_use': len(pool_instance._used),
+        'idle': len(pool_instance._pool)
+    }
+
+
+def probe_database(timeout: float) -> dict:
+    """
+    Health probe: run SELECT 1 on a pooled connection.
+    
+    Creates the pool if needed. The statement timeout is limited to the probe
+    timeout for this transaction only.
+    
+    Args:
+        timeout: Statement timeout in seconds
+        
+    Returns:
+        Dictionary with the pool counters (see get_pool_stats)
+        
+    Raises:
+        psycopg2.Error: If no connection can be made or the query fails
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            # set_config rather than SET: psycopg 3 binds parameters server-side
+            cursor.execute(
+                "SELECT set_config('statement_timeout', %s::text, true)", (int(timeout * 1000),)
+            )
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+    
+    return {'pool': get_pool_stats()}
+
+
 def close_connection_pool():
     """
     Closes all connections in the pool.
@@ -190,6 +364,10 @@ def close_connection_pool():
     global _connection_pool
     
     if _connection_pool:
-        _connection_pool.closeall()
+        if get_db_backend() == 'psycopg':
+            _connection_pool.close()
+        else:
+            _connection_pool.closeall()
         _connection_pool = None
+        reset_prepared_statements()
         logger.info("Database connection pool closed")
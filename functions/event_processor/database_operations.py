@@ -3,22 +3,91 @@ Database Operations Module
 
 Implements upsert and insert operations for Terminal49 entities.
 All operations are idempotent using Terminal49 IDs.
+
+Shipments, containers and container events also have batch variants that
+write every entity of one type in a single multi-row statement, so a payload
+costs one round trip per table instead of one per entity. The batch
+statements, and the tracking request and webhook delivery upserts, are
+prepared on each pooled connection (see prepared_statements). In a pipelined
+transaction (DB_BACKEND=psycopg) they are queued instead of waited for, and
+foreign keys are resolved in SQL (see db_pipeline).
 """
 
 import logging
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
 from datetime import datetime
 import json
 import uuid
 
+import prepared_statements
+from db_pipeline import defer, pipeline_active
+from metrics import counter
+
 logger = logging.getLogger(__name__)
 
+UPSERTS = counter(
+    'db_upserts_total',
+    'Shipment and container upserts by outcome: written, or skipped as unchanged',
+    ('table', 'outcome')
+)
+
+# Parameter names in the column order of each table's INSERT
+SHIPMENT_FIELDS = (
+    't49_id', 'bol', 'normalized', 'scac', 'pol', 'pod', 'destination', 'vessel_name',
+    'vessel_imo', 'pol_etd', 'pol_atd', 'pod_eta', 'pod_ata', 'raw_data'
+)
+CONTAINER_FIELDS = (
+    't49_id', 'shipment_id', 'number', 'seal_number', 'equipment_type', 'equipment_length',
+    'equipment_height', 'pod_arrived_at', 'pod_discharged_at', 'pickup_lfd',
+    'available_for_pickup', 'current_status', 'raw_data'
+)
+CONTAINER_EVENT_FIELDS = (
+    't49_event_id', 'container_id', 'shipment_id', 'event_type', 'event_timestamp',
+    'location_locode', 'location_name', 'vessel_name', 'vessel_imo', 'voyage_number',
+    'data_source', 'raw_data'
+)
+
+
+def _changed(table: str, columns: Tuple[str, ...]) -> str:
+    """DO UPDATE guard that is true only when one of the columns would change."""
+    stored = ', '.join(f'{table}.{column}' for column in columns)
+    excluded = ', '.join(f'EXCLUDED.{column}' for column in columns)
+    return f'({stored}) IS DISTINCT FROM ({excluded})'
+
+
+def _resolve(table: str, key_column: str, references: str) -> str:
+    """
+    Array expression mapping the Terminal49 IDs in references to database IDs.
+    
+    Keeps the order; an ID not in the table maps to NULL.
+    """
+    return (
+        f"ARRAY(SELECT t.id FROM unnest({references}) WITH ORDINALITY AS r(t49_id, n) "
+        f"LEFT JOIN {table} t ON t.{key_column} = r.t49_id ORDER BY r.n)"
+    )
+
+
+# An upsert of identical content leaves the row alone: no new row version,
+# no index or raw_data rewrite, no updated_at bump
+SHIPMENT_CHANGED = _changed('shipments', (
+    'bill_of_lading_number', 'normalized_number', 'shipping_line_scac', 'port_of_lading_locode',
+    'port_of_discharge_locode', 'destination_locode', 'pod_vessel_name', 'pod_vessel_imo',
+    'pol_etd_at', 'pol_atd_at', 'pod_eta_at', 'pod_ata_at', 'raw_data'
+))
+CONTAINER_CHANGED = _changed('containers', (
+    'shipment_id', 'number', 'seal_number', 'equipment_type', 'equipment_length',
+    'equipment_height', 'pod_arrived_at', 'pod_discharged_at', 'pickup_lfd',
+    'available_for_pickup', 'current_status', 'raw_data'
+))
+
 
 def upsert_shipment(shipment_data: Dict[str, Any], conn) -> str:
     """
     Upserts shipment data using Terminal49 shipment ID as unique key.
     
     Updates existing shipment if t49_shipment_id exists, otherwise inserts new.
+    An existing shipment whose content is unchanged is left as is (see
+    SHIPMENT_CHANGED) and its ID is read back.
     
     Args:
         shipment_data: Shipment attributes from Terminal49 payload
@@ -32,12 +101,8 @@ def upsert_shipment(shipment_data: Dict[str, Any], conn) -> str:
     """
     cursor = conn.cursor()
     
-    # Extract shipment attributes
-    attrs = shipment_data.get('attributes', {})
-    t49_id = shipment_data.get('id')
-    
-    if not t49_id:
-        raise ValueError("Shipment data missing 'id' field")
+    params = _shipment_params(shipment_data)
+    t49_id = params['t49_id']
     
     query = """
         INSERT INTO shipments (
@@ -90,33 +155,25 @@ def upsert_shipment(shipment_data: Dict[str, Any], conn) -> str:
             pod_ata_at = EXCLUDED.pod_ata_at,
             raw_data = EXCLUDED.raw_data,
             updated_at = NOW()
+        WHERE """ + SHIPMENT_CHANGED + """
         RETURNING id
     """
     
-    params = {
-        't49_id': t49_id,
-        'bol': attrs.get('bill_of_lading_number'),
-        'normalized': attrs.get('normalized_number'),
-        'scac': attrs.get('shipping_line_scac'),
-        'pol': attrs.get('port_of_lading_locode'),
-        'pod': attrs.get('port_of_discharge_locode'),
-        'destination': attrs.get('destination_locode'),
-        'vessel_name': attrs.get('pod_vessel_name'),
-        'vessel_imo': attrs.get('pod_vessel_imo'),
-        'pol_etd': _parse_timestamp(attrs.get('pol_etd_at')),
-        'pol_atd': _parse_timestamp(attrs.get('pol_atd_at')),
-        'pod_eta': _parse_timestamp(attrs.get('pod_eta_at')),
-        'pod_ata': _parse_timestamp(attrs.get('pod_ata_at')),
-        'raw_data': json.dumps(shipment_data)
-    }
-    
     try:
         cursor.execute(query, params)
         result = cursor.fetchone()
+        written = result is not None
+        if not written:
+            # Unchanged: the guard skipped the update, so nothing was returned
+            cursor.execute(
+                "SELECT id FROM shipments WHERE t49_shipment_id = %(t49_id)s", params
+            )
+            result = cursor.fetchone()
         shipment_id = result[0]
+        UPSERTS.inc('shipments', 'written' if written else 'skipped')
         
         logger.debug(
-            "Shipment upserted",
+            "Shipment upserted" if written else "Shipment unchanged",
             extra={
                 't49_shipment_id': t49_id,
                 'shipment_id': str(shipment_id),
@@ -147,6 +204,9 @@ def upsert_container(
     """
     Upserts container data using Terminal49 container ID as unique key.
     
+    An existing container whose content is unchanged is left as is (see
+    CONTAINER_CHANGED) and its ID is read back.
+    
     Args:
         container_data: Container attributes from Terminal49 payload
         shipment_id: Database shipment UUID (foreign key)
@@ -157,11 +217,8 @@ def upsert_container(
     """
     cursor = conn.cursor()
     
-    attrs = container_data.get('attributes', {})
-    t49_id = container_data.get('id')
-    
-    if not t49_id:
-        raise ValueError("Container data missing 'id' field")
+    params = _container_params(container_data, shipment_id)
+    t49_id = params['t49_id']
     
     query = """
         INSERT INTO containers (
@@ -211,32 +268,25 @@ def upsert_container(
             current_status = EXCLUDED.current_status,
             raw_data = EXCLUDED.raw_data,
             updated_at = NOW()
+        WHERE """ + CONTAINER_CHANGED + """
         RETURNING id
     """
     
-    params = {
-        't49_id': t49_id,
-        'shipment_id': shipment_id,
-        'number': attrs.get('number'),
-        'seal_number': attrs.get('seal_number'),
-        'equipment_type': attrs.get('equipment_type'),
-        'equipment_length': attrs.get('equipment_length'),
-        'equipment_height': attrs.get('equipment_height'),
-        'pod_arrived_at': _parse_timestamp(attrs.get('pod_arrived_at')),
-        'pod_discharged_at': _parse_timestamp(attrs.get('pod_discharged_at')),
-        'pickup_lfd': _parse_timestamp(attrs.get('pickup_lfd')),
-        'available_for_pickup': attrs.get('available_for_pickup'),
-        'current_status': attrs.get('current_status', 'unknown'),
-        'raw_data': json.dumps(container_data)
-    }
-    
     try:
         cursor.execute(query, params)
         result = cursor.fetchone()
+        written = result is not None
+        if not written:
+            # Unchanged: the guard skipped the update, so nothing was returned
+            cursor.execute(
+                "SELECT id FROM containers WHERE t49_container_id = %(t49_id)s", params
+            )
+            result = cursor.fetchone()
         container_id = result[0]
+        UPSERTS.inc('containers', 'written' if written else 'skipped')
         
         logger.debug(
-            "Container upserted",
+            "Container upserted" if written else "Container unchanged",
             extra={
                 't49_container_id': t49_id,
                 'container_id': str(container_id),
@@ -281,11 +331,8 @@ def insert_container_event(
     """
     cursor = conn.cursor()
     
-    attrs = event_data.get('attributes', {})
-    t49_event_id = event_data.get('id')
-    
-    if not t49_event_id:
-        raise ValueError("Event data missing 'id' field")
+    params = _container_event_params(event_data, container_id, shipment_id)
+    t49_event_id = params['t49_event_id']
     
     query = """
         INSERT INTO container_events (
@@ -321,21 +368,6 @@ def insert_container_event(
         RETURNING id
     """
     
-    params = {
-        't49_event_id': t49_event_id,
-        'container_id': container_id,
-        'shipment_id': shipment_id,
-        'event_type': attrs.get('event'),
-        'event_timestamp': _parse_timestamp(attrs.get('timestamp')),
-        'location_locode': attrs.get('location_locode'),
-        'location_name': attrs.get('location_name'),
-        'vessel_name': attrs.get('vessel_name'),
-        'vessel_imo': attrs.get('vessel_imo'),
-        'voyage_number': attrs.get('voyage_number'),
-        'data_source': attrs.get('data_source', 'unknown'),
-        'raw_data': json.dumps(event_data)
-    }
-    
     try:
         cursor.execute(query, params)
         result = cursor.fetchone()
@@ -371,10 +403,432 @@ def insert_container_event(
         raise
 
 
+# Batch statements pass one array per column and unnest them into rows, so
+# their text does not depend on the batch size and they can be prepared
+UPSERT_SHIPMENTS = prepared_statements.register('upsert_shipments', """
+    WITH upserted AS (
+        INSERT INTO shipments (
+            t49_shipment_id,
+            bill_of_lading_number,
+            normalized_number,
+            shipping_line_scac,
+            port_of_lading_locode,
+            port_of_discharge_locode,
+            destination_locode,
+            pod_vessel_name,
+            pod_vessel_imo,
+            pol_etd_at,
+            pol_atd_at,
+            pod_eta_at,
+            pod_ata_at,
+            raw_data,
+            created_at,
+            updated_at
+        )
+        SELECT *, NOW(), NOW() FROM unnest(
+            %(t49_id)s::uuid[],
+            %(bol)s::text[],
+            %(normalized)s::text[],
+            %(scac)s::text[],
+            %(pol)s::text[],
+            %(pod)s::text[],
+            %(destination)s::text[],
+            %(vessel_name)s::text[],
+            %(vessel_imo)s::text[],
+            %(pol_etd)s::timestamptz[],
+            %(pol_atd)s::timestamptz[],
+            %(pod_eta)s::timestamptz[],
+            %(pod_ata)s::timestamptz[],
+            %(raw_data)s::jsonb[]
+        )
+        ON CONFLICT (t49_shipment_id) DO UPDATE SET
+            bill_of_lading_number = EXCLUDED.bill_of_lading_number,
+            normalized_number = EXCLUDED.normalized_number,
+            shipping_line_scac = EXCLUDED.shipping_line_scac,
+            port_of_lading_locode = EXCLUDED.port_of_lading_locode,
+            port_of_discharge_locode = EXCLUDED.port_of_discharge_locode,
+            destination_locode = EXCLUDED.destination_locode,
+            pod_vessel_name = EXCLUDED.pod_vessel_name,
+            pod_vessel_imo = EXCLUDED.pod_vessel_imo,
+            pol_etd_at = EXCLUDED.pol_etd_at,
+            pol_atd_at = EXCLUDED.pol_atd_at,
+            pod_eta_at = EXCLUDED.pod_eta_at,
+            pod_ata_at = EXCLUDED.pod_ata_at,
+            raw_data = EXCLUDED.raw_data,
+            updated_at = NOW()
+        WHERE """ + SHIPMENT_CHANGED + """
+        RETURNING t49_shipment_id, id
+    )
+    SELECT t49_shipment_id, id, TRUE FROM upserted
+    UNION ALL
+    SELECT t49_shipment_id, id, FALSE FROM shipments
+    WHERE t49_shipment_id = ANY(%(t49_id)s::uuid[])
+        AND t49_shipment_id NOT IN (SELECT t49_shipment_id FROM upserted)
+""")
+
+
+def upsert_shipments(shipments: List[Dict[str, Any]], conn) -> Dict[str, str]:
+    """
+    Upserts a batch of shipments in one multi-row INSERT ... ON CONFLICT statement.
+    
+    Writes the same rows as calling upsert_shipment for each shipment in order,
+    in a single round trip. A shipment repeated in the batch is written once,
+    with its last attributes, since one statement cannot update a row twice.
+    Unchanged shipments are not rewritten; their IDs are still returned.
+    
+    In a pipelined transaction the statement is queued and the map holds
+    references instead: each Terminal49 ID maps to itself, and the batch
+    functions resolve it in SQL (see db_pipeline).
+    
+    Args:
+        shipments: Shipment entities from the Terminal49 payload
+        conn: Database connection
+        
+    Returns:
+        Map of Terminal49 shipment ID to shipment UUID (database primary key)
+        
+    Raises:
+        ValueError: If a shipment has no 'id'
+        psycopg2.Error: On database errors
+    """
+    rows = _last_by_id(_shipment_params(shipment_data) for shipment_data in shipments)
+    if not rows:
+        return {}
+    
+    if pipeline_active(conn):
+        _defer_rows(
+            conn, UPSERT_SHIPMENTS, rows, SHIPMENT_FIELDS, _upserts_completed('shipments', rows)
+        )
+        return _references(rows)
+    
+    try:
+        results = _insert_rows(conn, UPSERT_SHIPMENTS, rows, SHIPMENT_FIELDS)
+        shipment_ids = _upserted_ids(conn, 'shipments', 't49_shipment_id', rows, results)
+        
+        logger.debug(
+            "Shipments upserted",
+            extra={
+                'shipments_count': len(shipment_ids),
+                'unchanged_count': sum(not written for _, _, written in results)
+            }
+        )
+        
+        return shipment_ids
+        
+    except Exception as e:
+        logger.error(
+            "Failed to upsert shipments",
+            extra={
+                't49_shipment_ids': [row['t49_id'] for row in rows],
+                'error': str(e),
+                'error_type': type(e).__name__
+            },
+            exc_info=True
+        )
+        raise
+
+
+def _upsert_containers_sql(shipment_ids: str) -> str:
+    """Container batch upsert reading the shipment IDs from the array expression shipment_ids."""
+    return """
+    WITH upserted AS (
+        INSERT INTO containers (
+            t49_container_id,
+            shipment_id,
+            number,
+            seal_number,
+            equipment_type,
+            equipment_length,
+            equipment_height,
+            pod_arrived_at,
+            pod_discharged_at,
+            pickup_lfd,
+            available_for_pickup,
+            current_status,
+            raw_data,
+            created_at,
+            updated_at
+        )
+        SELECT *, NOW(), NOW() FROM unnest(
+            %(t49_id)s::uuid[],
+            """ + shipment_ids + """,
+            %(number)s::text[],
+            %(seal_number)s::text[],
+            %(equipment_type)s::text[],
+            %(equipment_length)s::integer[],
+            %(equipment_height)s::text[],
+            %(pod_arrived_at)s::timestamptz[],
+            %(pod_discharged_at)s::timestamptz[],
+            %(pickup_lfd)s::timestamptz[],
+            %(available_for_pickup)s::boolean[],
+            %(current_status)s::text[],
+            %(raw_data)s::jsonb[]
+        )
+        ON CONFLICT (t49_container_id) DO UPDATE SET
+            shipment_id = EXCLUDED.shipment_id,
+            number = EXCLUDED.number,
+            seal_number = EXCLUDED.seal_number,
+            equipment_type = EXCLUDED.equipment_type,
+            equipment_length = EXCLUDED.equipment_length,
+            equipment_height = EXCLUDED.equipment_height,
+            pod_arrived_at = EXCLUDED.pod_arrived_at,
+            pod_discharged_at = EXCLUDED.pod_discharged_at,
+            pickup_lfd = EXCLUDED.pickup_lfd,
+            available_for_pickup = EXCLUDED.available_for_pickup,
+            current_status = EXCLUDED.current_status,
+            raw_data = EXCLUDED.raw_data,
+            updated_at = NOW()
+        WHERE """ + CONTAINER_CHANGED + """
+        RETURNING t49_container_id, id
+    )
+    SELECT t49_container_id, id, TRUE FROM upserted
+    UNION ALL
+    SELECT t49_container_id, id, FALSE FROM containers
+    WHERE t49_container_id = ANY(%(t49_id)s::uuid[])
+        AND t49_container_id NOT IN (SELECT t49_container_id FROM upserted)
+"""
+
+
+UPSERT_CONTAINERS = prepared_statements.register(
+    'upsert_containers', _upsert_containers_sql('%(shipment_id)s::uuid[]')
+)
+# In a pipelined transaction the shipment IDs are references (see db_pipeline).
+# psycopg 3 prepares statements itself, so the variants are not registered.
+UPSERT_CONTAINERS_BY_REFERENCE = prepared_statements.Statement(
+    'upsert_containers_by_reference',
+    _upsert_containers_sql(_resolve('shipments', 't49_shipment_id', '%(shipment_id)s::uuid[]'))
+)
+
+
+def upsert_containers(
+    containers: List[Tuple[Dict[str, Any], Optional[str]]],
+    conn
+) -> Dict[str, str]:
+    """
+    Upserts a batch of containers in one multi-row INSERT ... ON CONFLICT statement.
+    
+    Writes the same rows as calling upsert_container for each pair in order.
+    A container repeated in the batch is written once, with its last
+    attributes and shipment. Unchanged containers are not rewritten; their
+    IDs are still returned.
+    
+    In a pipelined transaction the shipment IDs are references returned by
+    upsert_shipments, and so are the returned container IDs.
+    
+    Args:
+        containers: (container entity, database shipment UUID or None) pairs
+        conn: Database connection
+        
+    Returns:
+        Map of Terminal49 container ID to container UUID (database primary key)
+        
+    Raises:
+        ValueError: If a container has no 'id'
+        psycopg2.Error: On database errors
+    """
+    rows = _last_by_id(
+        _container_params(container_data, shipment_id)
+        for container_data, shipment_id in containers
+    )
+    if not rows:
+        return {}
+    
+    if pipeline_active(conn):
+        _defer_rows(
+            conn, UPSERT_CONTAINERS_BY_REFERENCE, rows, CONTAINER_FIELDS,
+            _upserts_completed('containers', rows)
+        )
+        return _references(rows)
+    
+    try:
+        results = _insert_rows(conn, UPSERT_CONTAINERS, rows, CONTAINER_FIELDS)
+        container_ids = _upserted_ids(conn, 'containers', 't49_container_id', rows, results)
+        
+        logger.debug(
+            "Containers upserted",
+            extra={
+                'containers_count': len(container_ids),
+                'unchanged_count': sum(not written for _, _, written in results)
+            }
+        )
+        
+        return container_ids
+        
+    except Exception as e:
+        logger.error(
+            "Failed to upsert containers",
+            extra={
+                't49_container_ids': [row['t49_id'] for row in rows],
+                'error': str(e),
+                'error_type': type(e).__name__
+            },
+            exc_info=True
+        )
+        raise
+
+
+def _insert_container_events_sql(container_ids: str, shipment_ids: str) -> str:
+    """Event batch insert reading the container and shipment IDs from array expressions."""
+    return """
+    INSERT INTO container_events (
+        t49_event_id,
+        container_id,
+        shipment_id,
+        event_type,
+        event_timestamp,
+        location_locode,
+        location_name,
+        vessel_name,
+        vessel_imo,
+        voyage_number,
+        data_source,
+        raw_data,
+        created_at
+    )
+    SELECT *, NOW() FROM unnest(
+        %(t49_event_id)s::uuid[],
+        """ + container_ids + """,
+        """ + shipment_ids + """,
+        %(event_type)s::text[],
+        %(event_timestamp)s::timestamptz[],
+        %(location_locode)s::text[],
+        %(location_name)s::text[],
+        %(vessel_name)s::text[],
+        %(vessel_imo)s::text[],
+        %(voyage_number)s::text[],
+        %(data_source)s::text[],
+        %(raw_data)s::jsonb[]
+    )
+    ON CONFLICT (t49_event_id) DO NOTHING
+    RETURNING t49_event_id, id
+"""
+
+
+INSERT_CONTAINER_EVENTS = prepared_statements.register(
+    'insert_container_events',
+    _insert_container_events_sql('%(container_id)s::uuid[]', '%(shipment_id)s::uuid[]')
+)
+INSERT_CONTAINER_EVENTS_BY_REFERENCE = prepared_statements.Statement(
+    'insert_container_events_by_reference',
+    _insert_container_events_sql(
+        _resolve('containers', 't49_container_id', '%(container_id)s::uuid[]'),
+        _resolve('shipments', 't49_shipment_id', '%(shipment_id)s::uuid[]')
+    )
+)
+
+
+def insert_container_events(
+    events: List[Tuple[Dict[str, Any], str, Optional[str]]],
+    conn
+) -> Dict[str, str]:
+    """
+    Inserts a batch of container transport events in one multi-row statement.
+    
+    Uses ON CONFLICT DO NOTHING like insert_container_event, so events already
+    stored, and repeats of an event within the batch, are skipped: the first
+    occurrence is the one written.
+    
+    In a pipelined transaction the container and shipment IDs are references
+    returned by the batch upserts, and the result is empty.
+    
+    Args:
+        events: (event entity, database container UUID, database shipment UUID
+            or None) tuples
+        conn: Database connection
+        
+    Returns:
+        Map of Terminal49 event ID to event UUID for the events inserted;
+        duplicates are absent
+        
+    Raises:
+        ValueError: If an event has no 'id'
+        psycopg2.Error: On database errors
+    """
+    rows = [
+        _container_event_params(event_data, container_id, shipment_id)
+        for event_data, container_id, shipment_id in events
+    ]
+    if not rows:
+        return {}
+    
+    if pipeline_active(conn):
+        def inserted(results):
+            logger.debug(
+                "Container events inserted",
+                extra={'events_count': len(results), 'duplicates_count': len(rows) - len(results)}
+            )
+        
+        _defer_rows(
+            conn, INSERT_CONTAINER_EVENTS_BY_REFERENCE, rows, CONTAINER_EVENT_FIELDS, inserted
+        )
+        return {}
+    
+    try:
+        event_ids = {
+            str(t49_id): str(db_id)
+            for t49_id, db_id in _insert_rows(
+                conn, INSERT_CONTAINER_EVENTS, rows, CONTAINER_EVENT_FIELDS
+            )
+        }
+        
+        logger.debug(
+            "Container events inserted",
+            extra={
+                'events_count': len(event_ids),
+                'duplicates_count': len(rows) - len(event_ids)
+            }
+        )
+        
+        return event_ids
+        
+    except Exception as e:
+        logger.error(
+            "Failed to insert container events",
+            extra={
+                't49_event_ids': [row['t49_event_id'] for row in rows],
+                'error': str(e),
+                'error_type': type(e).__name__
+            },
+            exc_info=True
+        )
+        raise
+
+
+UPSERT_TRACKING_REQUEST = prepared_statements.register('upsert_tracking_request', """
+    INSERT INTO tracking_requests (
+        t49_tracking_request_id,
+        request_number,
+        request_type,
+        scac,
+        status,
+        failed_reason,
+        raw_data,
+        created_at,
+        updated_at
+    ) VALUES (
+        %(t49_id)s,
+        %(request_number)s,
+        %(request_type)s,
+        %(scac)s,
+        %(status)s,
+        %(failed_reason)s,
+        %(raw_data)s,
+        NOW(),
+        NOW()
+    )
+    ON CONFLICT (t49_tracking_request_id) DO UPDATE SET
+        status = EXCLUDED.status,
+        failed_reason = EXCLUDED.failed_reason,
+        raw_data = EXCLUDED.raw_data,
+        updated_at = NOW()
+    RETURNING id
+""")
+
+
 def upsert_tracking_request(
     tracking_request_data: Dict[str, Any],
     conn
-) -> str:
+) -> Optional[str]:
     """
     Upserts tracking request data.
     
@@ -383,7 +837,7 @@ def upsert_tracking_request(
         conn: Database connection
         
     Returns:
-        Tracking request UUID
+        Tracking request UUID, or None in a pipelined transaction
     """
     cursor = conn.cursor()
     
@@ -393,36 +847,6 @@ def upsert_tracking_request(
     if not t49_id:
         raise ValueError("Tracking request data missing 'id' field")
     
-    query = """
-        INSERT INTO tracking_requests (
-            t49_tracking_request_id,
-            request_number,
-            request_type,
-            scac,
-            status,
-            failed_reason,
-            raw_data,
-            created_at,
-            updated_at
-        ) VALUES (
-            %(t49_id)s,
-            %(request_number)s,
-            %(request_type)s,
-            %(scac)s,
-            %(status)s,
-            %(failed_reason)s,
-            %(raw_data)s,
-            NOW(),
-            NOW()
-        )
-        ON CONFLICT (t49_tracking_request_id) DO UPDATE SET
-            status = EXCLUDED.status,
-            failed_reason = EXCLUDED.failed_reason,
-            raw_data = EXCLUDED.raw_data,
-            updated_at = NOW()
-        RETURNING id
-    """
-    
     params = {
         't49_id': t49_id,
         'request_number': attrs.get('request_number'),
@@ -433,8 +857,20 @@ def upsert_tracking_request(
         'raw_data': json.dumps(tracking_request_data)
     }
     
+    if pipeline_active(conn):
+        prepared_statements.execute(cursor, UPSERT_TRACKING_REQUEST, params)
+        defer(conn, cursor, lambda results: logger.debug(
+            "Tracking request upserted",
+            extra={
+                't49_tracking_request_id': t49_id,
+                'tracking_request_id': str(results[0][0]),
+                'status': params['status']
+            }
+        ))
+        return None
+    
     try:
-        cursor.execute(query, params)
+        prepared_statements.execute(cursor, UPSERT_TRACKING_REQUEST, params)
         result = cursor.fetchone()
         tracking_request_id = result[0]
         
@@ -462,17 +898,56 @@ def upsert_tracking_request(
         raise
 
 
+RECORD_WEBHOOK_DELIVERY = prepared_statements.register('record_webhook_delivery', """
+    INSERT INTO webhook_deliveries (
+        t49_notification_id,
+        event_type,
+        delivery_status,
+        processing_status,
+        processing_error,
+        processing_duration_ms,
+        raw_payload,
+        received_at,
+        processed_at
+    ) VALUES (
+        %(notification_id)s,
+        %(event_type)s,
+        'succeeded',
+        %(processing_status)s,
+        %(processing_error)s,
+        %(processing_duration_ms)s,
+        %(raw_payload)s,
+        NOW(),
+        CASE WHEN %(processing_status)s::varchar IN ('completed', 'failed')
+             THEN clock_timestamp()
+             ELSE NULL
+        END
+    )
+    ON CONFLICT (t49_notification_id) DO UPDATE SET
+        processing_status = EXCLUDED.processing_status,
+        processing_error = EXCLUDED.processing_error,
+        processing_duration_ms = EXCLUDED.processing_duration_ms,
+        processed_at = EXCLUDED.processed_at
+    RETURNING id
+""")
+
+
 def record_webhook_delivery(
     notification_id: str,
     event_type: str,
     payload: Dict[str, Any],
     processing_status: str,
     processing_error: Optional[str],
-    conn
-) -> str:
+    conn,
+    processing_duration_ms: Optional[int] = None
+) -> Optional[str]:
     """
     Records webhook delivery for tracking and debugging.
     
+    The event processor writes each delivery once, with its final status.
+    A redelivered notification updates the status, error and timing of the
+    existing row; the payload is not rewritten.
+    
     Args:
         notification_id: Terminal49 notification ID (will generate UUID if invalid)
         event_type: Event type
@@ -480,9 +955,10 @@ def record_webhook_delivery(
         processing_status: Status (received, processing, completed, failed)
         processing_error: Error message if failed
         conn: Database connection
+        processing_duration_ms: Time spent processing the delivery
         
     Returns:
-        Webhook delivery UUID
+        Webhook delivery UUID, or None in a pipelined transaction
     """
     cursor = conn.cursor()
     
@@ -498,46 +974,29 @@ def record_webhook_delivery(
             }
         )
     
-    query = """
-        INSERT INTO webhook_deliveries (
-            t49_notification_id,
-            event_type,
-            delivery_status,
-            processing_status,
-            processing_error,
-            raw_payload,
-            received_at,
-            processed_at
-        ) VALUES (
-            %(notification_id)s,
-            %(event_type)s,
-            'succeeded',
-            %(processing_status)s,
-            %(processing_error)s,
-            %(raw_payload)s,
-            NOW(),
-            CASE WHEN %(processing_status)s IN ('completed', 'failed') 
-                 THEN NOW() 
-                 ELSE NULL 
-            END
-        )
-        ON CONFLICT (t49_notification_id) DO UPDATE SET
-            processing_status = EXCLUDED.processing_status,
-            processing_error = EXCLUDED.processing_error,
-            processed_at = EXCLUDED.processed_at
-        RETURNING id
-    """
-    
     params = {
         'notification_id': validated_notification_id,
         'event_type': event_type,
         'processing_status': processing_status,
         'processing_error': processing_error,
+        'processing_duration_ms': processing_duration_ms,
         'raw_payload': json.dumps(payload)
     }
     
+    if pipeline_active(conn):
+        prepared_statements.execute(cursor, RECORD_WEBHOOK_DELIVERY, params)
+        defer(conn, cursor, lambda results: logger.debug(
+            "Webhook delivery recorded",
+            extra={
+                'notification_id': notification_id,
+                'delivery_id': str(results[0][0]),
+                'processing_status': processing_status
+            }
+        ))
+        return None
+    
     try:
-        cursor.execute(query, params)
+        prepared_statements.execute(cursor, RECORD_WEBHOOK_DELIVERY, params)
         result = cursor.fetchone()
         delivery_id = result[0]
         
@@ -613,3 +1072,194 @@ def _parse_timestamp(timestamp_str: Optional[str]) -> Optional[datetime]:
             extra={'timestamp': timestamp_str, 'error': str(e)}
         )
         return None
+
+
+def _shipment_params(shipment_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Query parameters for one shipments row."""
+    attrs = shipment_data.get('attributes', {})
+    t49_id = shipment_data.get('id')
+    
+    if not t49_id:
+        raise ValueError("Shipment data missing 'id' field")
+    
+    return {
+        't49_id': t49_id,
+        'bol': attrs.get('bill_of_lading_number'),
+        'normalized': attrs.get('normalized_number'),
+        'scac': attrs.get('shipping_line_scac'),
+        'pol': attrs.get('port_of_lading_locode'),
+        'pod': attrs.get('port_of_discharge_locode'),
+        'destination': attrs.get('destination_locode'),
+        'vessel_name': attrs.get('pod_vessel_name'),
+        'vessel_imo': attrs.get('pod_vessel_imo'),
+        'pol_etd': _parse_timestamp(attrs.get('pol_etd_at')),
+        'pol_atd': _parse_timestamp(attrs.get('pol_atd_at')),
+        'pod_eta': _parse_timestamp(attrs.get('pod_eta_at')),
+        'pod_ata': _parse_timestamp(attrs.get('pod_ata_at')),
+        'raw_data': json.dumps(shipment_data)
+    }
+
+
+def _container_params(container_data: Dict[str, Any], shipment_id: Optional[str]) -> Dict[str, Any]:
+    """Query parameters for one containers row."""
+    attrs = container_data.get('attributes', {})
+    t49_id = container_data.get('id')
+    
+    if not t49_id:
+        raise ValueError("Container data missing 'id' field")
+    
+    return {
+        't49_id': t49_id,
+        'shipment_id': shipment_id,
+        'number': attrs.get('number'),
+        'seal_number': attrs.get('seal_number'),
+        'equipment_type': attrs.get('equipment_type'),
+        'equipment_length': attrs.get('equipment_length'),
+        'equipment_height': attrs.get('equipment_height'),
+        'pod_arrived_at': _parse_timestamp(attrs.get('pod_arrived_at')),
+        'pod_discharged_at': _parse_timestamp(attrs.get('pod_discharged_at')),
+        'pickup_lfd': _parse_timestamp(attrs.get('pickup_lfd')),
+        'available_for_pickup': attrs.get('available_for_pickup'),
+        'current_status': attrs.get('current_status', 'unknown'),
+        'raw_data': json.dumps(container_data)
+    }
+
+
+def _container_event_params(
+    event_data: Dict[str, Any],
+    container_id: str,
+    shipment_id: Optional[str]
+) -> Dict[str, Any]:
+    """Query parameters for one container_events row."""
+    attrs = event_data.get('attributes', {})
+    t49_event_id = event_data.get('id')
+    
+    if not t49_event_id:
+        raise ValueError("Event data missing 'id' field")
+    
+    return {
+        't49_event_id': t49_event_id,
+        'container_id': container_id,
+        'shipment_id': shipment_id,
+        'event_type': attrs.get('event'),
+        'event_timestamp': _parse_timestamp(attrs.get('timestamp')),
+        'location_locode': attrs.get('location_locode'),
+        'location_name': attrs.get('location_name'),
+        'vessel_name': attrs.get('vessel_name'),
+        'vessel_imo': attrs.get('vessel_imo'),
+        'voyage_number': attrs.get('voyage_number'),
+        'data_source': attrs.get('data_source', 'unknown'),
+        'raw_data': json.dumps(event_data)
+    }
+
+
+def _last_by_id(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Keeps the last row for each t49_id, in order of first appearance."""
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        by_id[row['t49_id']] = row
+    return list(by_id.values())
+
+
+def _insert_rows(
+    conn,
+    statement: prepared_statements.Statement,
+    rows: List[Dict[str, Any]],
+    fields: Tuple[str, ...]
+) -> List[tuple]:
+    """
+    Executes a batch statement with one array parameter per field.
+    
+    Args:
+        conn: Database connection
+        statement: Registered statement unnesting the arrays into rows
+        rows: Query parameters per row
+        fields: Parameter names
+        
+    Returns:
+        Rows returned by the statement
+    """
+    params = {field: [row[field] for row in rows] for field in fields}
+    
+    cursor = conn.cursor()
+    prepared_statements.execute(cursor, statement, params)
+    return cursor.fetchall()
+
+
+def _defer_rows(
+    conn,
+    statement: prepared_statements.Statement,
+    rows: List[Dict[str, Any]],
+    fields: Tuple[str, ...],
+    callback: Callable[[List[tuple]], None]
+) -> None:
+    """Queues a batch statement in the connection's pipeline; callback gets its rows."""
+    params = {field: [row[field] for row in rows] for field in fields}
+    
+    cursor = conn.cursor()
+    prepared_statements.execute(cursor, statement, params)
+    defer(conn, cursor, callback)
+
+
+def _references(rows: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Map of each row's Terminal49 ID to itself, resolved in SQL by later statements."""
+    return {row['t49_id']: row['t49_id'] for row in rows}
+
+
+def _upserts_completed(table: str, rows: List[Dict[str, Any]]) -> Callable[[List[tuple]], None]:
+    """Deferred callback counting the rows of a guarded batch upsert."""
+    def completed(results: List[tuple]) -> None:
+        written = _count_upserts(table, len(rows), results)
+        logger.debug(
+            "Upserts completed",
+            extra={'table': table, 'rows_count': len(rows), 'unchanged_count': len(rows) - written}
+        )
+    
+    return completed
+
+
+def _count_upserts(table: str, row_count: int, results: List[tuple]) -> int:
+    """Counts written and skipped rows from (Terminal49 ID, database ID, written) results."""
+    written = sum(1 for _, _, was_written in results if was_written)
+    UPSERTS.inc(table, 'written', amount=written)
+    UPSERTS.inc(table, 'skipped', amount=row_count - written)
+    return written
+
+
+def _upserted_ids(
+    conn,
+    table: str,
+    key_column: str,
+    rows: List[Dict[str, Any]],
+    results: List[tuple]
+) -> Dict[str, str]:
+    """
+    Map of Terminal49 ID to database ID from a guarded batch upsert.
+    
+    results holds (Terminal49 ID, database ID, written) for each row. Skipped
+    rows are read from the statement's snapshot, which misses a row another
+    transaction committed with identical content after it began; those are
+    read again by a second statement.
+    
+    Args:
+        conn: Database connection
+        table: Table written
+        key_column: Terminal49 ID column
+        rows: Query parameters per row, keyed by 't49_id'
+        results: Rows returned by the upsert
+        
+    Returns:
+        Map of Terminal49 ID to database ID for every row
+    """
+    ids = {str(t49_id): str(db_id) for t49_id, db_id, _ in results}
+    
+    missing = [row['t49_id'] for row in rows if row['t49_id'] not in ids]
+    if missing:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT {key_column}, id FROM {table} WHERE {key_column} = ANY(%s::uuid[])", (missing,)
+        )
+        ids.update((str(t49_id), str(db_id)) for t49_id, db_id in cursor.fetchall())
+    
+    _count_upserts(table, len(rows), results)
+    return ids
@@ -0,0 +1,84 @@
+"""
+Pipelined Transactions (psycopg 3)
+
+With DB_BACKEND=psycopg, get_db_connection runs each transaction in psycopg
+3 pipeline mode: statements are sent without waiting for the previous
+result, and the transaction's BEGIN, writes and COMMIT cost one round trip.
+The connections are in autocommit mode and the transaction is opened and
+committed explicitly, inside the pipeline; psycopg's implicit transaction
+would sync (wait for the server) after BEGIN and again at COMMIT.
+
+A statement can only be pipelined if nothing needs its result before the
+next one is sent. The hot writes in database_operations therefore defer
+their results: inside pipelined() they queue their statement with defer()
+and return at once. The batch upserts return references (each Terminal49
+ID mapped to itself) instead of database IDs, and the statements that take
+foreign keys resolve those references in SQL, from the rows the earlier
+statements in the same pipeline wrote. The deferred callbacks (metrics and
+debug logs) run with the statements' results after the commit.
+
+Any statement that fetches its result inside the pipeline still works; the
+fetch waits for everything queued before it.
+"""
+
+import logging
+import weakref
+from contextlib import contextmanager
+from typing import Any, Callable, Generator, List
+
+logger = logging.getLogger(__name__)
+
+# Connections in a pipelined transaction, with their deferred results
+_pending: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+
+
+def pipeline_active(conn) -> bool:
+    """Whether conn is inside pipelined(), so writes should be deferred."""
+    try:
+        return conn in _pending
+    except TypeError:
+        return False
+
+
+def defer(conn, cursor, callback: Callable[[List[tuple]], Any]) -> None:
+    """
+    Calls callback with the rows of cursor's statement once the pipeline commits.
+
+    Args:
+        conn: Connection inside pipelined()
+        cursor: Cursor the statement was executed on; not reused before then
+        callback: Called with the statement's rows
+    """
+    _pending[conn].append((cursor, callback))
+
+
+@contextmanager
+def pipelined(conn) -> Generator:
+    """
+    Runs the block's statements in one transaction, pipelined, and commits it.
+
+    BEGIN, the statements and COMMIT are sent as they are queued and their
+    results are read once, when the pipeline is synced on exit. A failed
+    statement aborts the rest and raises here; so does an exception in the
+    block, before COMMIT is sent. Either way the transaction is left open for
+    the caller to roll back. Deferred callbacks run after a successful
+    commit.
+
+    Args:
+        conn: psycopg 3 connection in autocommit mode, idle
+
+    Yields:
+        conn
+    """
+    _pending[conn] = []
+    try:
+        with conn.pipeline():
+            conn.execute('BEGIN')
+            yield conn
+            conn.execute('COMMIT')
+        pending = _pending.get(conn, [])
+    finally:
+        _pending.pop(conn, None)
+
+    for cursor, callback in pending:
+        callback(cursor.fetchall())
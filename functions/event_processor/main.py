@@ -4,29 +4,113 @@ Event Processor Cloud Function
 Processes Terminal49 webhook events from Pub/Sub.
 Transforms data and writes to Supabase and BigQuery.
 
-Triggered by: Pub/Sub subscription to terminal49-webhook-events topic
+Triggered by: Pub/Sub subscription to terminal49-webhook-events topic, or to
+a routing lane topic (the same code is deployed once per lane; the lane
+attribute is only used for logging)
 Timeout: 120 seconds
 Memory: 512MB
+
+The HTTP entry point health_check reports configuration and connection pool
+counters; with ?deep=true it also probes Postgres and BigQuery (results
+cached for HEALTH_PROBE_TTL_SECONDS, see health_probes).
+
+Logs are written as JSON with their extra fields; LOG_FORMAT, LOG_LEVEL and
+LOG_SAMPLE_RATE control the output (see structured_logging).
+
+Stage latencies (decode, archive, transform, commit and the whole event) and
+outcomes are kept as metrics labeled by event type and logged as a snapshot
+every METRICS_FLUSH_INTERVAL_SECONDS (see metrics).
+
+Each event's webhook_deliveries row is written once: as completed in the
+event's transaction, or as failed in a separate transaction after the
+event's writes have been rolled back.
+
+Queue lag (from the timestamp attribute the webhook receiver stamps when it
+publishes, or Pub/Sub's publish time for messages without it, to the start
+of processing) and end-to-end latency (from the received_at attribute, the
+time the webhook request arrived at the receiver, to the database commit)
+are recorded per event type. Messages without received_at measure
+end-to-end latency from the publish time. Queue lag is also written to
+the archived row. An event whose queue lag exceeds QUEUE_LAG_ALERT_SECONDS
+logs a "Queue lag above threshold" warning, which a log-based metric turns
+into an alert.
+
+Environment Variables:
+    QUEUE_LAG_ALERT_SECONDS: Queue lag above which a warning is logged
+        (default: 300, 0 disables the warning)
 """
 
 import functions_framework
 import base64
+import gzip
 import json
 import logging
-from datetime import datetime
-from typing import Dict, Any, Optional
+import os
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Tuple
 
-from database import get_db_connection
+from database import get_db_connection, get_pool_stats, probe_database
 from transformers import transform_event
-from bigquery_archiver import archive_raw_event
+from database_operations import record_webhook_delivery
+from prepared_statements import get_prepared_stats, is_missing_statement
+from bigquery_archiver import archive_raw_event, probe_bigquery
+from health_probes import register_probe, run_probes
+from structured_logging import configure_logging
+from metrics import counter, histogram, maybe_flush_metrics
 
 # Configure structured logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+STAGE_DURATION = histogram(
+    'event_stage_duration_ms',
+    'Event processor stage latency in milliseconds',
+    ('stage', 'event_type')
+)
+EVENTS = counter(
+    'events_processed_total',
+    'Events processed by outcome',
+    ('event_type', 'outcome')
+)
+
+# Backlogged messages can wait up to the 7-day Pub/Sub retention period
+LAG_HIGHEST_MS = 7 * 24 * 3600 * 1000.0
+QUEUE_LAG = histogram(
+    'event_queue_lag_ms',
+    'Time from publish to processing start in milliseconds',
+    ('event_type',),
+    highest=LAG_HIGHEST_MS
+)
+END_TO_END = histogram(
+    'event_end_to_end_ms',
+    'Time from receipt by the webhook receiver to database commit in milliseconds',
+    ('event_type',),
+    highest=LAG_HIGHEST_MS
+)
+QUEUE_LAG_ALERTS = counter(
+    'event_queue_lag_alerts_total',
+    'Events whose queue lag exceeded QUEUE_LAG_ALERT_SECONDS',
+    ('event_type',)
+)
+
+# Checked by the deep health check (health_check?deep=true)
+register_probe('postgres', probe_database)
+register_probe('bigquery', probe_bigquery)
+
+REQUIRED_ENV_VARS = (
+    'GCP_PROJECT_ID',
+    'SUPABASE_DB_HOST',
+    'SUPABASE_DB_NAME',
+    'SUPABASE_DB_USER',
+    'SUPABASE_DB_PASSWORD'
+)
+
+
+class UnsupportedContentEncodingError(Exception):
+    """Raised for a content_encoding this processor cannot decode."""
+
 
 @functions_framework.cloud_event
 def process_webhook_event(cloud_event):
@@ -46,26 +130,40 @@ def process_webhook_event(cloud_event):
         Exception: On processing failure (triggers Pub/Sub retry)
     """
     start_time = datetime.utcnow()
+    started = time.perf_counter()
     
     # Extract message data and attributes
     try:
         message_data = base64.b64decode(cloud_event.data["message"]["data"])
+        attributes = cloud_event.data["message"].get("attributes", {})
+        
+        message_data = _decode_message_data(message_data, attributes.get('content_encoding'))
         payload = json.loads(message_data)
         
-        attributes = cloud_event.data["message"].get("attributes", {})
         event_type = attributes.get('event_type', 'unknown')
         request_id = attributes.get('request_id', 'unknown')
+        lane = attributes.get('lane', 'default')
+        stage_started = _observe_stage('decode', event_type, started)
+        
+        published_at = _parse_timestamp(attributes.get('timestamp')) or _parse_timestamp(
+            cloud_event.data["message"].get('publishTime')
+        )
+        received_at = _parse_timestamp(attributes.get('received_at')) or published_at
+        queue_lag_ms = _observe_lag(QUEUE_LAG, event_type, published_at, start_time)
         
         logger.info(
             "Processing event started",
             extra={
                 'request_id': request_id,
                 'event_type': event_type,
-                'message_id': cloud_event.data["message"]["messageId"]
+                'lane': lane,
+                'message_id': cloud_event.data["message"]["messageId"],
+                'queue_lag_ms': queue_lag_ms
             }
         )
+        _check_queue_lag(queue_lag_ms, event_type, request_id, lane)
         
-    except (KeyError, json.JSONDecodeError) as e:
+    except (KeyError, ValueError) as e:
         logger.error(
             "Failed to decode Pub/Sub message",
             extra={
@@ -74,6 +172,8 @@ def process_webhook_event(cloud_event):
             }
         )
         # Don't retry for malformed messages
+        EVENTS.labels('unknown', 'malformed').inc()
+        maybe_flush_metrics()
         return
     
     # Extract notification ID for idempotency
@@ -85,43 +185,72 @@ def process_webhook_event(cloud_event):
             payload=payload,
             event_type=event_type,
             request_id=request_id,
-            notification_id=notification_id
+            notification_id=notification_id,
+            queue_lag_ms=None if queue_lag_ms is None else round(queue_lag_ms)
         )
+        stage_started = _observe_stage('archive', event_type, stage_started)
         logger.info(
             "Raw event archived to BigQuery",
             extra={'request_id': request_id, 'notification_id': notification_id}
         )
         
         # Step 2: Transform and write to Supabase
-        with get_db_connection() as conn:
-            transform_event(
-                payload=payload,
-                event_type=event_type,
-                notification_id=notification_id,
-                conn=conn
-            )
+        transform_started = stage_started
+        for attempt in (1, 2):
+            try:
+                with get_db_connection() as conn:
+                    transform_event(
+                        payload=payload,
+                        event_type=event_type,
+                        notification_id=notification_id,
+                        conn=conn
+                    )
+                    stage_started = _observe_stage('transform', event_type, stage_started)
+                break
+            except Exception as e:
+                # The transaction was rolled back with everything in it
+                if attempt == 1 and is_missing_statement(e):
+                    # Preparation is now off; run the transaction once more
+                    logger.warning(
+                        "Prepared statement missing, retrying the transaction unprepared",
+                        extra={'request_id': request_id, 'notification_id': notification_id}
+                    )
+                    continue
+                _record_failed_delivery(payload, event_type, notification_id, e, transform_started)
+                raise
+        # Leaving the block commits the transaction
+        _observe_stage('commit', event_type, stage_started)
+        _observe_stage('event', event_type, started)
+        EVENTS.labels(event_type, 'processed').inc()
+        committed_at = datetime.utcnow()
+        end_to_end_ms = _observe_lag(END_TO_END, event_type, received_at, committed_at)
         
         # Calculate processing duration
-        duration_ms = (datetime.utcnow() - start_time).total_seconds() * 1000
+        duration_ms = (committed_at - start_time).total_seconds() * 1000
         
         logger.info(
             "Event processed successfully",
             extra={
                 'request_id': request_id,
                 'event_type': event_type,
+                'lane': lane,
                 'notification_id': notification_id,
-                'duration_ms': duration_ms
+                'duration_ms': duration_ms,
+                'queue_lag_ms': queue_lag_ms,
+                'end_to_end_ms': end_to_end_ms
             }
         )
         
     except Exception as e:
         duration_ms = (datetime.utcnow() - start_time).total_seconds() * 1000
+        EVENTS.labels(event_type, 'failed').inc()
         
         logger.error(
             "Event processing failed",
             extra={
                 'request_id': request_id,
                 'event_type': event_type,
+                'lane': lane,
                 'notification_id': notification_id,
                 'error': str(e),
                 'error_type': type(e).__name__,
@@ -132,6 +261,187 @@ def process_webhook_event(cloud_event):
         
         # Re-raise to trigger Pub/Sub retry
         raise
+    
+    finally:
+        maybe_flush_metrics()
+
+
+@functions_framework.http
+def health_check(request):
+    """
+    HTTP health check for the event processor.
+    
+    The Pub/Sub-triggered function has no HTTP endpoint, so this is deployed
+    from the same source with entry point health_check.
+    
+    Args:
+        request: Flask request object; ?deep=true adds dependency probes
+        
+    Returns:
+        Tuple of (JSON body, status_code, headers)
+    """
+    deep = request.args.get('deep', '').strip().lower() in ('1', 'true', 'yes')
+    status, status_code = health_status(deep=deep)
+    return (
+        json.dumps(status, separators=(',', ':')),
+        status_code,
+        {'Content-Type': 'application/json'}
+    )
+
+
+def health_status(deep: bool = False) -> Tuple[Dict[str, Any], int]:
+    """
+    Build the health document.
+    
+    Checks:
+    - Environment variables are configured
+    - Deep only: connection pool and prepared statement counters, and
+      whether Postgres answers SELECT 1 and the BigQuery archive table can
+      be read, with probe latencies (cached, see health_probes)
+    
+    Args:
+        deep: Whether to include the counters and dependency probes
+        
+    Returns:
+        Tuple of (health document, status_code)
+    """
+    status = {
+        'status': 'healthy',
+        'timestamp': datetime.utcnow().isoformat(),
+        'checks': {
+            var: 'configured' if os.environ.get(var) else 'missing'
+            for var in REQUIRED_ENV_VARS
+        }
+    }
+    if deep:
+        status['database_pool'] = get_pool_stats()
+        status['prepared_statements'] = get_prepared_stats()
+    
+    if 'missing' in status['checks'].values():
+        status['status'] = 'unhealthy'
+        return status, 503
+    
+    if deep:
+        status['dependencies'], dependencies_ok = run_probes()
+        if not dependencies_ok:
+            status['status'] = 'unhealthy'
+            return status, 503
+    
+    return status, 200
+
+
+def _record_failed_delivery(
+    payload: Dict[str, Any],
+    event_type: str,
+    notification_id: Optional[str],
+    error: Exception,
+    started: float
+) -> None:
+    """
+    Records a failed delivery in its own short transaction.
+    
+    Called after the event's transaction has been rolled back, so the
+    failure survives until a retry succeeds. A failure to record it (for
+    example when the database is unreachable) is logged and does not
+    replace the original error.
+    """
+    try:
+        with get_db_connection() as conn:
+            record_webhook_delivery(
+                notification_id=notification_id,
+                event_type=event_type,
+                payload=payload,
+                processing_status='failed',
+                processing_error=str(error),
+                conn=conn,
+                processing_duration_ms=round((time.perf_counter() - started) * 1000)
+            )
+    except Exception as e:
+        logger.warning(
+            "Failed to record webhook delivery failure",
+            extra={'notification_id': notification_id, 'error': str(e)}
+        )
+
+
+def _observe_stage(stage: str, event_type: str, started: float) -> float:
+    """Record the time since started as a stage latency; returns the current time."""
+    now = time.perf_counter()
+    STAGE_DURATION.labels(stage, event_type).observe((now - started) * 1000)
+    return now
+
+
+def get_queue_lag_alert_seconds() -> float:
+    """Queue lag in seconds above which a warning is logged (0 disables it)."""
+    return float(os.environ.get('QUEUE_LAG_ALERT_SECONDS', '300'))
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parses an ISO 8601 timestamp attribute as a naive UTC datetime.
+    
+    The receiver's timestamp and received_at attributes are naive UTC;
+    Pub/Sub's publishTime ends in Z.
+    
+    Args:
+        value: Timestamp string, or None
+        
+    Returns:
+        Naive UTC datetime, or None if the value is missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _observe_lag(
+    metric,
+    event_type: str,
+    published_at: Optional[datetime],
+    now: datetime
+) -> Optional[float]:
+    """
+    Record the time since publication in a lag histogram.
+    
+    Clock skew between the receiver and the processor can make the
+    difference slightly negative; it is recorded as 0.
+    
+    Returns:
+        Milliseconds since publication, or None if the publish time is unknown
+    """
+    if published_at is None:
+        return None
+    lag_ms = max(0.0, (now - published_at).total_seconds() * 1000)
+    metric.labels(event_type).observe(lag_ms)
+    return lag_ms
+
+
+def _check_queue_lag(
+    queue_lag_ms: Optional[float],
+    event_type: str,
+    request_id: str,
+    lane: str
+) -> None:
+    """Log a warning (the alert signal) if queue lag exceeds QUEUE_LAG_ALERT_SECONDS."""
+    threshold_seconds = get_queue_lag_alert_seconds()
+    if queue_lag_ms is None or threshold_seconds <= 0 or queue_lag_ms <= threshold_seconds * 1000:
+        return
+    QUEUE_LAG_ALERTS.labels(event_type).inc()
+    logger.warning(
+        "Queue lag above threshold",
+        extra={
+            'request_id': request_id,
+            'event_type': event_type,
+            'lane': lane,
+            'queue_lag_ms': queue_lag_ms,
+            'threshold_ms': threshold_seconds * 1000
+        }
+    )
 
 
 def _extract_notification_id(payload: Dict[str, Any]) -> Optional[str]:
@@ -149,3 +459,43 @@ def _extract_notification_id(payload: Dict[str, Any]) -> Optional[str]:
         return payload.get('data', {}).get('id')
     except (AttributeError, TypeError):
         return None
+
+
+def _decode_message_data(message_data: bytes, content_encoding: Optional[str]) -> bytes:
+    """
+    Decompresses a message body according to its content_encoding attribute.
+    
+    Messages without the attribute are passed through unchanged, so
+    uncompressed messages from older receivers keep working.
+    
+    Args:
+        message_data: Message body after base64 decoding
+        content_encoding: Value of the content_encoding attribute
+        
+    Returns:
+        Uncompressed message body
+        
+    Raises:
+        ValueError: If the compressed body is corrupt
+        UnsupportedContentEncodingError: If the encoding is unknown (the
+            message is retried rather than dropped)
+    """
+    if not content_encoding or content_encoding == 'identity':
+        return message_data
+    
+    if content_encoding == 'gzip':
+        try:
+            return gzip.decompress(message_data)
+        except (OSError, EOFError, zlib.error) as e:
+            raise ValueError(f"Corrupt gzip message body: {e}") from e
+    
+    if content_encoding == 'zstd':
+        import zstandard
+        try:
+            return zstandard.ZstdDecompressor().decompress(message_data)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Corrupt zstd message body: {e}") from e
+    
+    raise UnsupportedContentEncodingError(
+        f"Unsupported content_encoding: {content_encoding}"
+    )
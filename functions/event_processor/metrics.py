@@ -0,0 +1,383 @@
+"""
+In-Process Metrics
+
+Counters and latency histograms kept per function instance, so stage
+latencies can be read as percentiles instead of being reconstructed from
+`duration_ms` log fields.
+
+Histograms use HDR-style log-linear buckets: every power of two between
+the lowest and highest trackable value is split into SUB_BUCKETS equal
+slots, which bounds the relative error of a percentile to 1/SUB_BUCKETS
+(12.5%) at any magnitude. A series preallocates its slots, and recording
+an observation computes the slot from the float's exponent and mantissa,
+then takes the series' own lock to bump the slot, the count, the sum and
+the max; no lists, dicts or series are created per observation.
+
+Metrics leave the instance in two ways:
+- render_prometheus() returns the Prometheus text exposition format (the
+  webhook receiver serves it on GET /metrics). Histogram buckets are
+  exported at every power-of-two boundary.
+- maybe_flush_metrics() logs a "Metrics snapshot" record with counts,
+  sums and percentiles of every series at most once per
+  METRICS_FLUSH_INTERVAL_SECONDS. It is called at the end of requests
+  rather than from a timer, since Cloud Functions throttles CPU between
+  requests. The record is never dropped by log sampling.
+
+Values are cumulative for the life of the instance.
+
+Environment Variables:
+    METRICS_FLUSH_INTERVAL_SECONDS: Minimum seconds between metrics
+        snapshots in the log (default: 60, 0 disables them)
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SUB_BUCKETS = 8
+
+# Trackable range of histograms in milliseconds (10 us to ~2 minutes);
+# values outside it are counted in the first or last slot
+DEFAULT_LOWEST_MS = 0.01
+DEFAULT_HIGHEST_MS = 120_000.0
+
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class CounterSeries:
+    """One labeled counter."""
+
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class HistogramSeries:
+    """One labeled histogram with preallocated log-linear buckets."""
+
+    __slots__ = ('counts', 'count', 'total', 'max', '_min_exponent', '_lock')
+
+    def __init__(self, min_exponent: int, slots: int):
+        self.counts = [0] * slots
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._min_exponent = min_exponent
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Record one value (e.g. a duration in milliseconds)."""
+        index = self._index(value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def _index(self, value: float) -> int:
+        if value <= 0:
+            return 0
+        mantissa, exponent = math.frexp(value)
+        slot = int((mantissa * 2 - 1) * SUB_BUCKETS)
+        index = (exponent - self._min_exponent) * SUB_BUCKETS + slot
+        if index < 0:
+            return 0
+        last = len(self.counts) - 1
+        return index if index < last else last
+
+    def upper_bound(self, index: int) -> float:
+        """Upper edge of a bucket."""
+        octave, slot = divmod(index, SUB_BUCKETS)
+        return math.ldexp(1 + (slot + 1) / SUB_BUCKETS, octave + self._min_exponent - 1)
+
+    def percentile(self, pct: float) -> float:
+        """
+        Value at a percentile, as the upper edge of its bucket.
+
+        Args:
+            pct: Percentile between 0 and 100
+
+        Returns:
+            Upper bound of the value (capped at the largest observed
+            value), or 0.0 for an empty series
+        """
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+            largest = self.max
+        if count == 0:
+            return 0.0
+        rank = max(1, math.ceil(pct / 100 * count))
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(self.upper_bound(index), largest)
+        return largest
+
+    def summary(self, percentiles=DEFAULT_PERCENTILES) -> Dict[str, Any]:
+        """Count, sum, max and percentiles of the series."""
+        with self._lock:
+            count, total, largest = self.count, self.total, self.max
+        result = {'count': count, 'sum': round(total, 3), 'max': round(largest, 3)}
+        for pct in percentiles:
+            result[f'p{pct}'] = round(self.percentile(pct), 3)
+        return result
+
+    def cumulative_buckets(self) -> List[Tuple[float, int]]:
+        """(upper bound, cumulative count) at every power-of-two boundary."""
+        with self._lock:
+            counts = list(self.counts)
+        buckets = []
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            cumulative += bucket_count
+            if (index + 1) % SUB_BUCKETS == 0:
+                buckets.append((self.upper_bound(index), cumulative))
+        return buckets
+
+
+class _Metric:
+    """A named metric family with one series per label combination."""
+
+    kind = ''
+
+    def __init__(self, name: str, description: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._series: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """
+        Series for a label combination, created on first use.
+
+        Hot paths can keep the returned series and call it directly.
+        """
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(
+                    f"{self.name} expects labels {self.label_names}, got {len(values)} values"
+                )
+            with self._lock:
+                series = self._series.get(values)
+                if series is None:
+                    series = self._new_series()
+                    self._series[values] = series
+        return series
+
+    def series(self) -> List[Tuple[Dict[str, str], Any]]:
+        with self._lock:
+            items = list(self._series.items())
+        return [(dict(zip(self.label_names, values)), series) for values, series in items]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def _new_series(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic counter."""
+
+    kind = 'counter'
+
+    def _new_series(self) -> CounterSeries:
+        return CounterSeries()
+
+    def inc(self, *label_values: str, amount: int = 1) -> None:
+        self.labels(*label_values).inc(amount)
+
+
+class Histogram(_Metric):
+    """Latency histogram (see module docstring for the bucket layout)."""
+
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: Tuple[str, ...],
+        lowest: float = DEFAULT_LOWEST_MS,
+        highest: float = DEFAULT_HIGHEST_MS
+    ):
+        super().__init__(name, description, label_names)
+        self._min_exponent = math.frexp(lowest)[1]
+        self._slots = (math.frexp(highest)[1] - self._min_exponent + 1) * SUB_BUCKETS
+
+    def _new_series(self) -> HistogramSeries:
+        return HistogramSeries(self._min_exponent, self._slots)
+
+    def observe(self, value: float, *label_values: str) -> None:
+        self.labels(*label_values).observe(value)
+
+
+class MetricsRegistry:
+    """Metric families of one function instance."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, description: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        """Get or create a counter."""
+        return self._register(Counter, name, description, label_names)
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        label_names: Tuple[str, ...] = (),
+        lowest: float = DEFAULT_LOWEST_MS,
+        highest: float = DEFAULT_HIGHEST_MS
+    ) -> Histogram:
+        """Get or create a histogram tracking values between lowest and highest."""
+        return self._register(
+            Histogram, name, description, label_names, lowest=lowest, highest=highest
+        )
+
+    def _register(self, metric_class, name: str, description: str, label_names, **kwargs) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = metric_class(name, description, label_names, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, metric_class) or metric.label_names != tuple(label_names):
+                raise ValueError(f"Metric {name} is already registered with another type or labels")
+            return metric
+
+    def metrics(self) -> List[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics():
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for labels, series in metric.series():
+                if metric.kind == 'counter':
+                    lines.append(f'{metric.name}{_format_labels(labels)} {series.value}')
+                    continue
+                for bound, cumulative in series.cumulative_buckets():
+                    bucket_labels = _format_labels(dict(labels, le=f'{bound:g}'))
+                    lines.append(f'{metric.name}_bucket{bucket_labels} {cumulative}')
+                inf_labels = dict(labels, le='+Inf')
+                lines.append(f'{metric.name}_bucket{_format_labels(inf_labels)} {series.count}')
+                lines.append(f'{metric.name}_sum{_format_labels(labels)} {series.total}')
+                lines.append(f'{metric.name}_count{_format_labels(labels)} {series.count}')
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Counter values and histogram summaries of every series."""
+        result = {}
+        for metric in self.metrics():
+            entries = []
+            for labels, series in metric.series():
+                if metric.kind == 'counter':
+                    entries.append(dict(labels, value=series.value))
+                else:
+                    entries.append(dict(labels, **series.summary()))
+            result[metric.name] = entries
+        return result
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(f'{key}="{_escape(str(value))}"' for key, value in labels.items())
+    return '{' + pairs + '}'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+# Instance-wide registry
+_registry = MetricsRegistry()
+_last_flush = time.monotonic()
+_flush_lock = threading.Lock()
+
+
+def get_registry() -> MetricsRegistry:
+    """Registry of this function instance."""
+    return _registry
+
+
+def counter(name: str, description: str, label_names: Tuple[str, ...] = ()) -> Counter:
+    """Get or create a counter in the instance registry."""
+    return _registry.counter(name, description, label_names)
+
+
+def histogram(
+    name: str,
+    description: str,
+    label_names: Tuple[str, ...] = (),
+    lowest: float = DEFAULT_LOWEST_MS,
+    highest: float = DEFAULT_HIGHEST_MS
+) -> Histogram:
+    """Get or create a histogram in the instance registry."""
+    return _registry.histogram(name, description, label_names, lowest, highest)
+
+
+def render_prometheus() -> str:
+    """Instance metrics in the Prometheus text exposition format."""
+    return _registry.render_prometheus()
+
+
+def get_flush_interval() -> float:
+    """Minimum seconds between metrics snapshots in the log (0 disables them)."""
+    return float(os.environ.get('METRICS_FLUSH_INTERVAL_SECONDS', '60'))
+
+
+def maybe_flush_metrics(now: Optional[float] = None) -> bool:
+    """
+    Log a metrics snapshot if the flush interval has elapsed.
+
+    Args:
+        now: Monotonic time (for tests)
+
+    Returns:
+        True if a snapshot was logged
+    """
+    global _last_flush
+
+    interval = get_flush_interval()
+    now = time.monotonic() if now is None else now
+    if interval <= 0 or now - _last_flush < interval:
+        return False
+    with _flush_lock:
+        if now - _last_flush < interval:
+            return False
+        _last_flush = now
+
+    logger.info("Metrics snapshot", extra={'metrics': _registry.snapshot(), 'sample': False})
+    return True
+
+
+def reset_metrics() -> None:
+    """Drop every recorded series (for tests); registered metrics are kept."""
+    global _last_flush
+    for metric in _registry.metrics():
+        metric.clear()
+    _last_flush = time.monotonic()
@@ -0,0 +1,226 @@
+"""
+Prepared Statement Registry
+
+The hot insert and upsert statements in database_operations are registered
+here. Each pooled connection prepares all of them with one round trip the
+first time it is checked out (see database.get_db_connection), and they are
+then executed by name: Postgres parses and plans them once per connection,
+and each execution sends a short EXECUTE instead of the full SQL text.
+
+Statements are written with psycopg2 placeholders (%s or %(name)s). A
+placeholder may carry a cast (%(t49_id)s::uuid[]), which is kept in both the
+PREPARE and the EXECUTE; array parameters need one. Unprepared execution
+runs the same SQL, so both paths send the same parameters.
+
+Prepared statements belong to a server session, so they do not survive a
+transaction-mode pooler such as pgbouncer or Supabase's pooler on port 6543,
+where consecutive transactions can run on different server connections.
+'auto' only recognizes Supabase's pooler, by its port; set
+DB_PREPARED_STATEMENTS=false behind any other transaction-mode pooler. If a
+statement turns out to be missing anyway, preparation is turned off for the
+instance and the transaction that hit it is rolled back; the event
+processor runs it once more, unprepared (see is_missing_statement).
+
+Environment Variables:
+    DB_PREPARED_STATEMENTS: 'auto' (default), 'true' or 'false'. 'auto'
+        prepares unless SUPABASE_DB_PORT is 6543 (Supabase's transaction
+        pooler); other ports, including a pgbouncer in transaction mode, are
+        prepared
+"""
+
+import logging
+import os
+import re
+import threading
+import weakref
+from typing import Any, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Supabase's transaction-mode pooler
+TRANSACTION_POOLER_PORT = '6543'
+
+# SQLSTATE for EXECUTE of a statement the session has not prepared
+INVALID_SQL_STATEMENT_NAME = '26000'
+
+_PLACEHOLDER = re.compile(r'%(?:\((\w+)\))?s(::\w+(?:\[\])?)?')
+
+
+class Statement:
+    """A registered statement and the SQL used to prepare and execute it."""
+
+    __slots__ = ('name', 'sql', 'prepare_sql', 'execute_sql')
+
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.sql = sql
+
+        # Number each distinct parameter in order of first appearance
+        numbers: Dict[str, int] = {}
+        arguments: List[str] = []
+
+        def to_positional(match) -> str:
+            key = match.group(1) or str(len(numbers))
+            cast = match.group(2) or ''
+            if key not in numbers:
+                numbers[key] = len(numbers) + 1
+                arguments.append(match.group(0))
+            return f'${numbers[key]}{cast}'
+
+        self.prepare_sql = f'PREPARE {name} AS {_PLACEHOLDER.sub(to_positional, sql)}'
+        self.execute_sql = f"EXECUTE {name} ({', '.join(arguments)})"
+
+
+_statements: Dict[str, Statement] = {}
+_prepared: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+_disabled_reason: Optional[str] = None
+
+
+def register(name: str, sql: str) -> Statement:
+    """
+    Registers a statement to prepare on every connection.
+
+    Args:
+        name: Statement name, unique in the session
+        sql: Statement with psycopg2 placeholders
+
+    Returns:
+        Statement to pass to execute()
+    """
+    statement = Statement(name, sql)
+    _statements[name] = statement
+    return statement
+
+
+def prepared_statements_enabled() -> bool:
+    """Whether connections prepare the registered statements."""
+    if _disabled_reason is not None:
+        return False
+    mode = os.environ.get('DB_PREPARED_STATEMENTS', 'auto').strip().lower()
+    if mode == 'auto':
+        return os.environ.get('SUPABASE_DB_PORT', '5432') != TRANSACTION_POOLER_PORT
+    return mode in ('true', '1', 'yes', 'on')
+
+
+def prepare_connection(conn) -> bool:
+    """
+    Prepares the registered statements on conn, once per connection.
+
+    Called when a connection is checked out of the pool, before the caller
+    uses it. A new connection (after a reconnect) is a new object, so it is
+    prepared again. If the server rejects the statements, the transaction is
+    rolled back and the instance falls back to unprepared execution.
+
+    Args:
+        conn: psycopg2 connection, idle
+
+    Returns:
+        True if the statements are prepared on conn
+    """
+    if not prepared_statements_enabled() or not _statements:
+        return False
+    with _lock:
+        if _prepared.get(conn):
+            return True
+
+    # A session pooler can hand over a server session that a previous client
+    # prepared on, so start from an empty set
+    sql = ';\n'.join(['DEALLOCATE ALL'] + [s.prepare_sql for s in _statements.values()])
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql)
+    except Exception as e:
+        if getattr(e, 'pgcode', None) is None:
+            # Connection failure rather than a rejected statement
+            raise
+        conn.rollback()
+        _disable(f'PREPARE failed: {e}', e.pgcode)
+        return False
+
+    with _lock:
+        _prepared[conn] = True
+    logger.debug("Prepared statements on connection", extra={'statements': len(_statements)})
+    return True
+
+
+def execute(cursor, statement: Statement, params: Union[Dict[str, Any], List[Any], None]) -> None:
+    """
+    Executes statement by name if it is prepared on the cursor's connection.
+
+    Falls back to sending the SQL when the connection has not prepared it.
+    A missing prepared statement (the session changed under a transaction
+    pooler, or was reset) turns preparation off and re-raises: the
+    transaction is aborted, and the caller may run it again unprepared (see
+    is_missing_statement).
+    """
+    conn = getattr(cursor, 'connection', None)
+    try:
+        prepared = conn is not None and _prepared.get(conn, False)
+    except TypeError:
+        prepared = False
+
+    if not prepared or _disabled_reason is not None:
+        cursor.execute(statement.sql, params)
+        return
+
+    try:
+        cursor.execute(statement.execute_sql, params)
+    except Exception as e:
+        if getattr(e, 'pgcode', None) == INVALID_SQL_STATEMENT_NAME:
+            _disable(f'Prepared statement {statement.name} missing', e.pgcode)
+        raise
+
+
+def is_missing_statement(error: BaseException) -> bool:
+    """
+    Whether a transaction failed on a missing prepared statement.
+
+    Such a transaction can be run again: preparation is turned off (psycopg2
+    via execute(), psycopg 3 here), so the retry sends plain SQL.
+
+    Args:
+        error: Exception the transaction raised
+
+    Returns:
+        True for SQLSTATE 26000 (invalid_sql_statement_name)
+    """
+    # psycopg2 sets pgcode, psycopg 3 sqlstate
+    code = getattr(error, 'pgcode', None) or getattr(error, 'sqlstate', None)
+    if code != INVALID_SQL_STATEMENT_NAME:
+        return False
+    _disable(f'Prepared statement missing: {error}', code)
+    return True
+
+
+def get_prepared_stats() -> Dict[str, Any]:
+    """Registry state for the health check."""
+    with _lock:
+        connections = len(_prepared)
+    return {
+        'enabled': prepared_statements_enabled(),
+        'statements': sorted(_statements),
+        'prepared_connections': connections,
+        'disabled_reason': _disabled_reason,
+    }
+
+
+def reset_prepared_statements() -> None:
+    """Forgets prepared connections and re-enables preparation (tests, pool reset)."""
+    global _disabled_reason
+    with _lock:
+        _prepared.clear()
+        _disabled_reason = None
+
+
+def _disable(reason: str, pgcode: Optional[str]) -> None:
+    global _disabled_reason
+    with _lock:
+        if _disabled_reason is not None:
+            return
+        _disabled_reason = reason
+        _prepared.clear()
+    logger.warning(
+        "Prepared statements disabled, falling back to unprepared execution",
+        extra={'reason': reason, 'pgcode': pgcode}
+    )
@@ -3,20 +3,30 @@ Event Transformers Module
 
 Transforms Terminal49 webhook events into database operations.
 Handles all event types with appropriate extraction and storage logic.
+Each handler's latency is recorded per event type (see metrics).
 """
 
 import logging
+import time
 from typing import Dict, Any, List, Optional
 from database_operations import (
-    upsert_shipment,
-    upsert_container,
-    insert_container_event,
+    upsert_shipments,
+    upsert_containers,
+    insert_container_events,
     upsert_tracking_request,
     record_webhook_delivery
 )
+from structured_logging import lazy
+from metrics import histogram
 
 logger = logging.getLogger(__name__)
 
+HANDLER_DURATION = histogram(
+    'event_handler_duration_ms',
+    'Transformer handler latency in milliseconds',
+    ('handler', 'event_type')
+)
+
 
 def transform_event(
     payload: Dict[str, Any],
@@ -27,7 +37,11 @@ def transform_event(
     """
     Main event transformation dispatcher.
     
-    Routes events to appropriate handler based on event type.
+    Routes events to appropriate handler based on event type, then records
+    the webhook delivery once, as completed, in the same transaction. When a
+    handler raises, nothing is recorded here: the caller rolls the
+    transaction back and records the failure in a transaction of its own
+    (the failure would otherwise be rolled back with the event's writes).
     
     Args:
         payload: Raw webhook payload
@@ -38,70 +52,55 @@ def transform_event(
     Raises:
         ValueError: If event type is unknown or payload is invalid
     """
-    # Record webhook delivery
-    try:
-        record_webhook_delivery(
-            notification_id=notification_id,
-            event_type=event_type,
-            payload=payload,
-            processing_status='processing',
-            processing_error=None,
-            conn=conn
-        )
-    except Exception as e:
-        logger.warning(
-            "Failed to record webhook delivery",
-            extra={'notification_id': notification_id, 'error': str(e)}
-        )
+    started = time.perf_counter()
     
     # Route to appropriate handler
-    try:
-        if event_type.startswith('container.transport.'):
-            _handle_container_transport_event(payload, conn)
-            
-        elif event_type == 'container.updated':
-            _handle_container_updated_event(payload, conn)
-            
-        elif event_type == 'container.created':
-            _handle_container_created_event(payload, conn)
-            
-        elif event_type.startswith('tracking_request.'):
-            _handle_tracking_request_event(payload, conn)
-            
-        elif event_type == 'shipment.estimated.arrival':
-            _handle_shipment_estimated_arrival_event(payload, conn)
-            
-        elif event_type == 'container.pickup_lfd.changed':
-            _handle_container_pickup_lfd_changed_event(payload, conn)
-            
-        else:
-            logger.warning(
-                "Unknown event type, storing raw data only",
-                extra={'event_type': event_type, 'notification_id': notification_id}
-            )
-            # Still record as completed even if we don't process it
+    handler = None
+    if event_type.startswith('container.transport.'):
+        handler = 'container_transport'
+        _handle_container_transport_event(payload, conn)
         
-        # Update webhook delivery status to completed
-        record_webhook_delivery(
-            notification_id=notification_id,
-            event_type=event_type,
-            payload=payload,
-            processing_status='completed',
-            processing_error=None,
-            conn=conn
-        )
+    elif event_type == 'container.updated':
+        handler = 'container_updated'
+        _handle_container_updated_event(payload, conn)
+        
+    elif event_type == 'container.created':
+        handler = 'container_created'
+        _handle_container_created_event(payload, conn)
+        
+    elif event_type.startswith('tracking_request.'):
+        handler = 'tracking_request'
+        _handle_tracking_request_event(payload, conn)
+        
+    elif event_type == 'shipment.estimated.arrival':
+        handler = 'shipment_estimated_arrival'
+        _handle_shipment_estimated_arrival_event(payload, conn)
         
-    except Exception as e:
-        # Record failure
-        record_webhook_delivery(
-            notification_id=notification_id,
-            event_type=event_type,
-            payload=payload,
-            processing_status='failed',
-            processing_error=str(e),
-            conn=conn
+    elif event_type == 'container.pickup_lfd.changed':
+        handler = 'container_pickup_lfd_changed'
+        _handle_container_pickup_lfd_changed_event(payload, conn)
+        
+    else:
+        logger.warning(
+            "Unknown event type, storing raw data only",
+            extra={'event_type': event_type, 'notification_id': notification_id}
         )
-        raise
+        # Still record as completed even if we don't process it
+    
+    duration_ms = (time.perf_counter() - started) * 1000
+    if handler is not None:
+        HANDLER_DURATION.labels(handler, event_type).observe(duration_ms)
+    
+    # Record the delivery with its final status
+    record_webhook_delivery(
+        notification_id=notification_id,
+        event_type=event_type,
+        payload=payload,
+        processing_status='completed',
+        processing_error=None,
+        conn=conn,
+        processing_duration_ms=round(duration_ms)
+    )
 
 
 def _handle_container_transport_event(payload: Dict[str, Any], conn) -> None:
@@ -127,27 +126,19 @@ def _handle_container_transport_event(payload: Dict[str, Any], conn) -> None:
     )
     
     # Process shipments first (foreign key dependency)
-    shipment_ids = {}
-    for shipment_data in shipments:
-        t49_shipment_id = shipment_data.get('id')
-        db_shipment_id = upsert_shipment(shipment_data, conn)
-        shipment_ids[t49_shipment_id] = db_shipment_id
+    shipment_ids = upsert_shipments(shipments, conn)
     
-    # Process containers
-    container_ids = {}
-    for container_data in containers:
-        t49_container_id = container_data.get('id')
-        
-        # Find related shipment
-        relationships = container_data.get('relationships', {})
-        shipment_rel = relationships.get('shipment', {}).get('data', {})
-        t49_shipment_id = shipment_rel.get('id')
-        
-        db_shipment_id = shipment_ids.get(t49_shipment_id)
-        db_container_id = upsert_container(container_data, db_shipment_id, conn)
-        container_ids[t49_container_id] = db_container_id
+    # Process containers, each with its related shipment
+    container_ids = upsert_containers(
+        [
+            (container_data, find_related_entity(container_data, 'shipment', shipment_ids))
+            for container_data in containers
+        ],
+        conn
+    )
     
     # Process transport events
+    events = []
     for event_data in transport_events:
         # Find related container
         relationships = event_data.get('relationships', {})
@@ -162,12 +153,14 @@ def _handle_container_transport_event(payload: Dict[str, Any], conn) -> None:
         db_shipment_id = shipment_ids.get(t49_shipment_id) if t49_shipment_id else None
         
         if db_container_id:
-            insert_container_event(event_data, db_container_id, db_shipment_id, conn)
+            events.append((event_data, db_container_id, db_shipment_id))
         else:
             logger.warning(
                 "Transport event missing container reference",
                 extra={'event_id': event_data.get('id')}
             )
+    
+    insert_container_events(events, conn)
 
 
 def _handle_container_updated_event(payload: Dict[str, Any], conn) -> None:
@@ -190,20 +183,16 @@ def _handle_container_updated_event(payload: Dict[str, Any], conn) -> None:
     )
     
     # Process shipments
-    shipment_ids = {}
-    for shipment_data in shipments:
-        t49_shipment_id = shipment_data.get('id')
-        db_shipment_id = upsert_shipment(shipment_data, conn)
-        shipment_ids[t49_shipment_id] = db_shipment_id
+    shipment_ids = upsert_shipments(shipments, conn)
     
     # Process containers
-    for container_data in containers:
-        relationships = container_data.get('relationships', {})
-        shipment_rel = relationships.get('shipment', {}).get('data', {})
-        t49_shipment_id = shipment_rel.get('id')
-        
-        db_shipment_id = shipment_ids.get(t49_shipment_id)
-        upsert_container(container_data, db_shipment_id, conn)
+    upsert_containers(
+        [
+            (container_data, find_related_entity(container_data, 'shipment', shipment_ids))
+            for container_data in containers
+        ],
+        conn
+    )
 
 
 def _handle_container_created_event(payload: Dict[str, Any], conn) -> None:
@@ -241,7 +230,7 @@ def _handle_tracking_request_event(payload: Dict[str, Any], conn) -> None:
     else:
         logger.warning(
             "Tracking request event missing data",
-            extra={'payload_keys': list(payload.keys())}
+            extra={'payload_keys': lazy(list, payload)}
         )
 
 
@@ -259,8 +248,7 @@ def _handle_shipment_estimated_arrival_event(payload: Dict[str, Any], conn) -> N
         extra={'shipments_count': len(shipments)}
     )
     
-    for shipment_data in shipments:
-        upsert_shipment(shipment_data, conn)
+    upsert_shipments(shipments, conn)
 
 
 def _handle_container_pickup_lfd_changed_event(payload: Dict[str, Any], conn) -> None:
@@ -283,20 +271,16 @@ def _handle_container_pickup_lfd_changed_event(payload: Dict[str, Any], conn) ->
     )
     
     # Process shipments
-    shipment_ids = {}
-    for shipment_data in shipments:
-        t49_shipment_id = shipment_data.get('id')
-        db_shipment_id = upsert_shipment(shipment_data, conn)
-        shipment_ids[t49_shipment_id] = db_shipment_id
+    shipment_ids = upsert_shipments(shipments, conn)
     
     # Process containers with updated LFD
-    for container_data in containers:
-        relationships = container_data.get('relationships', {})
-        shipment_rel = relationships.get('shipment', {}).get('data', {})
-        t49_shipment_id = shipment_rel.get('id')
-        
-        db_shipment_id = shipment_ids.get(t49_shipment_id)
-        upsert_container(container_data, db_shipment_id, conn)
+    upsert_containers(
+        [
+            (container_data, find_related_entity(container_data, 'shipment', shipment_ids))
+            for container_data in containers
+        ],
+        conn
+    )
 
 
 def extract_entities_by_type(
@@ -0,0 +1,253 @@
+"""
+Admission Control for Terminal49 Webhooks
+
+During incident recovery Terminal49 can flush a large backlog at once. Rather
+than accepting every request and letting latency grow until requests time
+out (and are redelivered), each instance admits requests at a bounded rate
+and with a bounded number of publishes in flight, and answers the rest with
+429 Too Many Requests and a Retry-After header so the sender backs off.
+
+The rate limit is a token bucket: tokens refill at ADMISSION_RATE_PER_SECOND
+up to ADMISSION_BURST, and each admitted request takes one. The in-flight
+limit counts requests being handled plus non-blocking publishes that Pub/Sub
+has not acknowledged yet.
+
+Environment Variables:
+    ADMISSION_RATE_PER_SECOND: Sustained requests per second per instance
+        (default: 0, no rate limit)
+    ADMISSION_BURST: Requests admitted at once after an idle period
+        (default: one second's worth of ADMISSION_RATE_PER_SECOND)
+    ADMISSION_MAX_IN_FLIGHT: Maximum in-flight publishes per instance
+        (default: 0, no limit)
+    ADMISSION_RETRY_AFTER_SECONDS: Retry-After sent when the in-flight limit
+        is reached (default: 1)
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from pubsub_publisher import get_publish_stats
+
+logger = logging.getLogger(__name__)
+
+# Process-wide controller (reused across invocations)
+_admission_controller = None
+_admission_controller_loaded = False
+_admission_controller_lock = threading.Lock()
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when a request is over the admission limits."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Request rejected by admission control: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter.
+
+    Tokens refill continuously at rate per second up to burst; the bucket
+    starts full.
+    """
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        if rate <= 0:
+            raise ValueError("Token bucket rate must be positive")
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def try_take(self) -> float:
+        """
+        Take one token if available.
+
+        Not thread-safe; the caller holds its own lock.
+
+        Returns:
+            0.0 if a token was taken, otherwise seconds until one is available
+        """
+        self._refill()
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return 0.0
+        return (1.0 - self._tokens) / self.rate
+
+    def available(self) -> float:
+        """Tokens currently in the bucket."""
+        self._refill()
+        return self._tokens
+
+
+class AdmissionController:
+    """
+    Rate and concurrency limits for incoming webhooks, with counters.
+
+    Every successful admit() must be paired with release() once the request
+    has been answered.
+    """
+
+    def __init__(
+        self,
+        rate_per_second: Optional[float] = None,
+        burst: Optional[float] = None,
+        max_in_flight: Optional[int] = None,
+        retry_after_seconds: int = 1,
+        pending_publishes: Optional[Callable[[], int]] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            rate_per_second: Sustained admission rate, or None for no rate limit
+            burst: Bucket size (default: rate_per_second)
+            max_in_flight: Maximum in-flight requests plus pending publishes,
+                or None for no limit
+            retry_after_seconds: Retry-After for in-flight rejections
+            pending_publishes: Returns publishes still awaiting a Pub/Sub ack
+                after their request was answered (non-blocking mode)
+            clock: Monotonic clock, replaceable in tests
+        """
+        self.bucket = (
+            TokenBucket(rate_per_second, burst or rate_per_second, clock)
+            if rate_per_second else None
+        )
+        self.max_in_flight = max_in_flight
+        self.retry_after_seconds = max(1, retry_after_seconds)
+        self._pending_publishes = pending_publishes
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.admitted = 0
+        self.rejected_rate = 0
+        self.rejected_in_flight = 0
+
+    def admit(self) -> None:
+        """
+        Admit a request or reject it.
+
+        The in-flight limit is checked first so a rejected request never
+        consumes a token.
+
+        Raises:
+            AdmissionRejectedError: If the request is over a limit
+        """
+        pending = self._pending_publishes() if self._pending_publishes else 0
+
+        with self._lock:
+            if self.max_in_flight and self._in_flight + pending >= self.max_in_flight:
+                self.rejected_in_flight += 1
+                raise AdmissionRejectedError('in_flight', self.retry_after_seconds)
+
+            if self.bucket is not None:
+                wait_seconds = self.bucket.try_take()
+                if wait_seconds:
+                    self.rejected_rate += 1
+                    raise AdmissionRejectedError('rate', max(1, math.ceil(wait_seconds)))
+
+            self._in_flight += 1
+            self.admitted += 1
+
+    def release(self) -> None:
+        """Mark an admitted request as answered."""
+        with self._lock:
+            self._in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Limits and accept/reject counters for /health."""
+        with self._lock:
+            stats = {
+                'rate_per_second': self.bucket.rate if self.bucket else None,
+                'burst': self.bucket.burst if self.bucket else None,
+                'max_in_flight': self.max_in_flight,
+                'in_flight': self._in_flight,
+                'admitted': self.admitted,
+                'rejected_rate': self.rejected_rate,
+                'rejected_in_flight': self.rejected_in_flight
+            }
+            if self.bucket is not None:
+                stats['tokens'] = round(self.bucket.available(), 2)
+        return stats
+
+
+def get_admission_controller() -> Optional[AdmissionController]:
+    """
+    Get or create the process-wide admission controller.
+
+    Returns:
+        AdmissionController, or None if neither limit is configured
+    """
+    global _admission_controller, _admission_controller_loaded
+
+    if not _admission_controller_loaded:
+        with _admission_controller_lock:
+            if not _admission_controller_loaded:
+                _admission_controller = _load_controller()
+                _admission_controller_loaded = True
+
+    return _admission_controller
+
+
+def _load_controller() -> Optional[AdmissionController]:
+    rate = float(os.environ.get('ADMISSION_RATE_PER_SECOND', '0'))
+    burst = float(os.environ.get('ADMISSION_BURST', '0')) or rate
+    max_in_flight = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', '0'))
+    retry_after = int(os.environ.get('ADMISSION_RETRY_AFTER_SECONDS', '1'))
+
+    if rate <= 0 and max_in_flight <= 0:
+        return None
+
+    controller = AdmissionController(
+        rate_per_second=rate if rate > 0 else None,
+        burst=burst,
+        max_in_flight=max_in_flight if max_in_flight > 0 else None,
+        retry_after_seconds=retry_after,
+        pending_publishes=lambda: get_publish_stats()['in_flight']
+    )
+    logger.info(
+        "Admission control initialized",
+        extra={
+            'rate_per_second': rate,
+            'burst': burst,
+            'max_in_flight': max_in_flight
+        }
+    )
+    return controller
+
+
+def set_admission_controller(
+    controller: Optional[AdmissionController],
+    reload: bool = False
+) -> None:
+    """
+    Replace the process-wide controller.
+
+    Args:
+        controller: Controller to use, or None to disable admission control
+        reload: Rebuild from the environment on next use instead
+    """
+    global _admission_controller, _admission_controller_loaded
+
+    with _admission_controller_lock:
+        _admission_controller = controller
+        _admission_controller_loaded = not reload
+
+
+def get_admission_stats() -> Optional[Dict[str, Any]]:
+    """Counters for the active controller, or None if admission control is off."""
+    controller = get_admission_controller()
+    return controller.stats() if controller is not None else None
@@ -0,0 +1,315 @@
+"""
+ASGI Entry Point for the Terminal49 Webhook Receiver
+
+An asyncio-native alternative to the Flask handler in main. Requests go
+through the same checks (webhook_handler) and are published with the same
+publisher client, but the Pub/Sub ack is awaited instead of blocking a
+worker thread, so one instance can hold hundreds of webhooks in flight.
+The body is fed to the size cap and the HMAC chunk by chunk as it arrives,
+so the signature check costs the loop little per chunk and oversized or
+unsigned requests are rejected before they are read in full. Payloads
+above INSPECT_OFFLOAD_BYTES are inspected on a worker thread so large
+sniff passes do not stall the event loop; spooling (file I/O with fsync)
+also runs on a worker thread.
+
+The app is a plain ASGI 3 callable with no framework dependency. Run it with
+any ASGI server, e.g.:
+
+    cd functions/webhook_receiver
+    uvicorn asgi_app:app --port 8080
+
+Environment Variables:
+    Same as main. PUBSUB_PUBLISH_MODE is ignored: the ack is always awaited.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+from pubsub_publisher import publish_raw_event_async
+from publish_spool import (
+    drain_spool_inline, get_publish_budget, is_spool_enabled, replay_spool_on_startup,
+    spool_has_records
+)
+from admission_control import AdmissionRejectedError, get_admission_controller
+from webhook_handler import (
+    RequestTimer,
+    SignedBodyReader,
+    WebhookRejected,
+    health_status,
+    inspect_signed_body,
+    is_deep_health_check,
+    spool_webhook,
+)
+from warmup import start_warm_up
+from structured_logging import configure_logging
+from metrics import PROMETHEUS_CONTENT_TYPE, maybe_flush_metrics, render_prometheus
+
+# Configure structured logging
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Payloads at least this large are inspected on a worker thread
+INSPECT_OFFLOAD_BYTES = 64 * 1024
+
+Response = Tuple[int, str, Dict[str, str]]
+
+_TEXT = 'text/plain; charset=utf-8'
+_JSON = 'application/json'
+
+
+async def app(scope, receive, send) -> None:
+    """
+    ASGI application.
+
+    Args:
+        scope: ASGI connection scope
+        receive: ASGI receive channel
+        send: ASGI send channel
+    """
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+
+    if scope['type'] != 'http':
+        raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    status_code, body, headers = await handle_request(scope, receive)
+    await send({
+        'type': 'http.response.start',
+        'status': status_code,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                    for name, value in headers.items()]
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': body.encode('utf-8')
+    })
+    start_warm_up()
+
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Resume delivery of webhooks spooled by a previous process
+            replay_spool_on_startup()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def handle_request(scope, receive) -> Response:
+    """
+    Handle one HTTP request.
+
+    Args:
+        scope: ASGI http scope
+        receive: ASGI receive channel
+
+    Returns:
+        Tuple of (status_code, response_body, headers)
+    """
+    start_time = datetime.utcnow()
+    headers = _request_headers(scope['headers'])
+    request_id = headers.get('x-request-id') or str(uuid.uuid4())
+    method = scope['method']
+
+    # Handle health check endpoint
+    if method == 'GET' and scope['path'] == '/health':
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        deep = is_deep_health_check(query.get('deep', [None])[0])
+        logger.info(
+            "Health check requested",
+            extra={'request_id': request_id, 'deep': deep}
+        )
+        if deep:
+            # Probes make blocking calls to Pub/Sub
+            status, status_code = await asyncio.to_thread(health_status, True)
+        else:
+            status, status_code = health_status()
+        return (status_code, json.dumps(status, separators=(',', ':')), {'Content-Type': _JSON})
+
+    # Serve this instance's metrics
+    if method == 'GET' and scope['path'] == '/metrics':
+        return (200, render_prometheus(), {'Content-Type': PROMETHEUS_CONTENT_TYPE})
+
+    # Only accept POST requests for webhooks
+    if method != 'POST':
+        logger.warning(
+            "Method not allowed",
+            extra={
+                'request_id': request_id,
+                'method': method
+            }
+        )
+        return (405, 'Method Not Allowed', {'Content-Type': _TEXT})
+
+    # Shed load before reading the body
+    admission = get_admission_controller()
+    if admission is not None:
+        try:
+            admission.admit()
+        except AdmissionRejectedError as e:
+            logger.warning(
+                "Request rejected by admission control",
+                extra={
+                    'request_id': request_id,
+                    'reason': e.reason,
+                    'retry_after': e.retry_after
+                }
+            )
+            return (429, 'Too Many Requests',
+                    {'Content-Type': _TEXT, 'Retry-After': str(e.retry_after)})
+
+    timer = RequestTimer()
+    status_code = 500
+    try:
+        content_length = _content_length(headers)
+        logger.info(
+            "Webhook received",
+            extra={
+                'request_id': request_id,
+                'content_length': content_length,
+                'content_type': headers.get('content-type')
+            }
+        )
+        status_code, message = await _process_webhook(
+            receive, headers.get('x-t49-webhook-signature'), content_length, request_id, start_time,
+            timer
+        )
+        return (status_code, message, {'Content-Type': _TEXT})
+
+    except Exception as e:
+        logger.error(
+            "Unexpected error processing webhook",
+            extra={
+                'request_id': request_id,
+                'error': str(e),
+                'error_type': type(e).__name__
+            }
+        )
+        return (500, 'Internal Server Error', {'Content-Type': _TEXT})
+
+    finally:
+        if admission is not None:
+            admission.release()
+        timer.finish(status_code)
+        maybe_flush_metrics()
+        # CPU may be throttled once the response is sent, so spooled webhooks
+        # are republished before it is
+        if spool_has_records():
+            await asyncio.to_thread(drain_spool_inline)
+
+
+async def _process_webhook(
+    receive,
+    signature: Optional[str],
+    content_length: Optional[int],
+    request_id: str,
+    start_time: datetime,
+    timer: RequestTimer
+) -> Tuple[int, str]:
+    try:
+        body, signature_key = await _read_signed_body(
+            receive, signature, content_length, request_id
+        )
+        timer.lap('signature')
+        if len(body) >= INSPECT_OFFLOAD_BYTES:
+            webhook = await asyncio.to_thread(inspect_signed_body, body, signature_key, request_id)
+        else:
+            webhook = inspect_signed_body(body, signature_key, request_id)
+        timer.lap('parse')
+    except WebhookRejected as e:
+        return (e.status_code, e.message)
+
+    timer.event_type = webhook.event_type
+    if webhook.duplicate:
+        return (200, 'OK')
+
+    # With the spool enabled, publishes slower than the latency budget are
+    # spooled instead of holding the response
+    spool_enabled = is_spool_enabled()
+    try:
+        message_id = await publish_raw_event_async(
+            webhook.body,
+            webhook.event_type,
+            request_id,
+            notification_id=webhook.notification_id,
+            timeout=get_publish_budget() if spool_enabled else None,
+            extra_attributes={'received_at': start_time.isoformat()},
+            ordering_key=webhook.ordering_key
+        )
+        timer.lap('publish')
+    except Exception as e:
+        if spool_enabled and await asyncio.to_thread(
+            spool_webhook, webhook, request_id, e, start_time
+        ):
+            webhook.mark_published()
+            return (200, 'OK')
+
+        logger.error(
+            "Failed to publish to Pub/Sub",
+            extra={
+                'request_id': request_id,
+                'event_type': webhook.event_type,
+                'error': str(e)
+            }
+        )
+        return (500, 'Internal Server Error: Failed to queue event')
+
+    webhook.mark_published()
+
+    logger.info(
+        "Webhook processed successfully",
+        extra={
+            'request_id': request_id,
+            'event_type': webhook.event_type,
+            'duration_ms': (datetime.utcnow() - start_time).total_seconds() * 1000,
+            'pubsub_message_id': message_id,
+            'signature_key': webhook.signature_key
+        }
+    )
+    return (200, 'OK')
+
+
+async def _read_signed_body(
+    receive,
+    signature: Optional[str],
+    content_length: Optional[int],
+    request_id: str
+) -> Tuple[bytes, str]:
+    """Read the body from the receive channel through a SignedBodyReader."""
+    reader = SignedBodyReader(signature, content_length, request_id)
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ConnectionError("Client disconnected before the body was received")
+        reader.feed(message.get('body', b''))
+        if not message.get('more_body', False):
+            return reader.finish()
+
+
+def _content_length(headers: Dict[str, str]) -> Optional[int]:
+    """
+    Declared Content-Length, or None if absent or malformed.
+
+    The body size cap still applies while reading.
+    """
+    try:
+        return int(headers['content-length'])
+    except (KeyError, ValueError):
+        return None
+
+
+def _request_headers(raw_headers) -> Dict[str, str]:
+    """ASGI header pairs as a dict keyed by lower-case name."""
+    return {
+        name.decode('latin-1').lower(): value.decode('latin-1')
+        for name, value in raw_headers
+    }
@@ -0,0 +1,203 @@
+"""
+Duplicate Notification Suppression for Terminal49 Webhooks
+
+Terminal49 redelivers a notification when our response times out, so the same
+data.id can arrive several times within seconds. Each copy would otherwise
+become a Pub/Sub message, a BigQuery streaming insert and a round of Postgres
+upserts. The receiver remembers recently published notification IDs and
+acknowledges repeats without publishing them again.
+
+IDs are only recorded after a successful publish, so a delivery that failed
+to publish is never suppressed on retry. Two copies arriving concurrently can
+both be published; the event processor stays idempotent for that case.
+
+Environment Variables:
+    DEDUP_CACHE_SIZE: Maximum notification IDs remembered per instance
+        (default: 10000, 0 disables suppression)
+    DEDUP_CACHE_TTL_SECONDS: How long a published ID suppresses repeats
+        (default: 900)
+"""
+
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Process-wide cache (reused across invocations)
+_dedup_cache = None
+_dedup_cache_lock = threading.Lock()
+
+
+class DedupBackend(ABC):
+    """
+    Storage for recently published notification IDs.
+
+    Implement this interface to share suppression state across instances
+    (e.g. Memorystore) and install it with set_dedup_backend().
+    """
+
+    @abstractmethod
+    def contains(self, key: str) -> bool:
+        """Return True if key was recorded and has not expired."""
+
+    @abstractmethod
+    def add(self, key: str) -> None:
+        """Record key as published."""
+
+    def size(self) -> Optional[int]:
+        """Number of keys currently held, if the backend can report it cheaply."""
+        return None
+
+
+class InMemoryDedupBackend(DedupBackend):
+    """
+    Per-instance TTL + LRU store.
+
+    Entries expire after ttl_seconds; when max_size is reached the least
+    recently recorded entry is evicted.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 900.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return False
+            return True
+
+    def add(self, key: str) -> None:
+        with self._lock:
+            self._entries[key] = self._clock() + self.ttl_seconds
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+
+class NotificationDedupCache:
+    """
+    Front for a DedupBackend that keeps hit/miss counters.
+
+    The counters are what the cache is sized from: a low hit rate with a full
+    cache means entries are evicted before redeliveries arrive.
+    """
+
+    def __init__(self, backend: DedupBackend):
+        self.backend = backend
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def is_duplicate(self, notification_id: str) -> bool:
+        """
+        Check whether notification_id was published recently.
+
+        Backend failures are treated as a miss so suppression can never cause
+        an event to be dropped.
+        """
+        try:
+            duplicate = self.backend.contains(notification_id)
+        except Exception as e:
+            logger.warning(
+                "Dedup backend lookup failed",
+                extra={'notification_id': notification_id, 'error': str(e)}
+            )
+            with self._stats_lock:
+                self.errors += 1
+            return False
+
+        with self._stats_lock:
+            if duplicate:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return duplicate
+
+    def mark_published(self, notification_id: str) -> None:
+        """Record notification_id after it has been handed to Pub/Sub."""
+        try:
+            self.backend.add(notification_id)
+        except Exception as e:
+            logger.warning(
+                "Dedup backend write failed",
+                extra={'notification_id': notification_id, 'error': str(e)}
+            )
+            with self._stats_lock:
+                self.errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of counters for /health."""
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': type(self.backend).__name__,
+                'hits': self.hits,
+                'misses': self.misses,
+                'errors': self.errors,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'size': self.backend.size()
+            }
+
+
+def get_dedup_cache() -> Optional[NotificationDedupCache]:
+    """
+    Get or create the process-wide dedup cache.
+
+    Returns:
+        NotificationDedupCache, or None if DEDUP_CACHE_SIZE is 0
+    """
+    global _dedup_cache
+
+    if _dedup_cache is None:
+        with _dedup_cache_lock:
+            if _dedup_cache is None:
+                max_size = int(os.environ.get('DEDUP_CACHE_SIZE', '10000'))
+                if max_size <= 0:
+                    return None
+                ttl_seconds = float(os.environ.get('DEDUP_CACHE_TTL_SECONDS', '900'))
+                _dedup_cache = NotificationDedupCache(
+                    InMemoryDedupBackend(max_size=max_size, ttl_seconds=ttl_seconds)
+                )
+                logger.info(
+                    "Dedup cache initialized",
+                    extra={'max_size': max_size, 'ttl_seconds': ttl_seconds}
+                )
+
+    return _dedup_cache
+
+
+def set_dedup_backend(backend: Optional[DedupBackend]) -> None:
+    """
+    Replace the dedup backend (e.g. with a shared store).
+
+    Args:
+        backend: Backend to use, or None to rebuild the default from the
+            environment on next use
+    """
+    global _dedup_cache
+
+    with _dedup_cache_lock:
+        _dedup_cache = NotificationDedupCache(backend) if backend is not None else None
+
+
+def get_dedup_stats() -> Optional[Dict[str, Any]]:
+    """Counters for the active cache, or None if suppression is disabled."""
+    cache = get_dedup_cache()
+    return cache.stats() if cache is not None else None
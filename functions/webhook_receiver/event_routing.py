@@ -0,0 +1,263 @@
+"""
+Event-Type Routing to Pub/Sub Lanes
+
+A lane is a Pub/Sub topic plus the publisher settings used for it, consumed
+by its own event processor deployment. Routing latency-sensitive events
+(e.g. container.pickup_lfd.changed, tracking_request.failed) to their own
+lane keeps them from queueing behind bursts of container.updated.
+
+Rules use the same matching as transform_event: an exact event type, or a
+prefix written with a trailing '*' (e.g. "container.transport.*"). An exact
+rule wins over a prefix; among prefixes the longest match wins. Events that
+match no rule go to the default lane (PUBSUB_TOPIC).
+
+Example PUBSUB_ROUTING_CONFIG:
+
+    {
+      "lanes": {
+        "priority": {"topic": "terminal49-webhook-events-priority",
+                     "max_latency_seconds": 0.001, "publish_timeout_seconds": 2},
+        "bulk": {"topic": "terminal49-webhook-events-bulk",
+                 "max_messages": 500, "max_latency_seconds": 0.05}
+      },
+      "rules": {
+        "container.pickup_lfd.changed": "priority",
+        "tracking_request.failed": "priority",
+        "container.updated": "bulk"
+      }
+    }
+
+Environment Variables:
+    PUBSUB_ROUTING_CONFIG: JSON routing table (default: every event to the
+        default lane). An invalid table is logged and ignored.
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LANE = 'default'
+
+# Lane settings accepted in PUBSUB_ROUTING_CONFIG
+LANE_SETTINGS = (
+    'max_messages',
+    'max_bytes',
+    'max_latency_seconds',
+    'publish_timeout_seconds'
+)
+
+# Process-wide router (reused across invocations)
+_event_router = None
+_event_router_lock = threading.Lock()
+
+
+class Lane:
+    """
+    A Pub/Sub topic and the publisher settings used for it.
+
+    Batch settings left as None use the client library defaults; a lane
+    without any batch settings shares the default publisher client.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        topic: Optional[str] = None,
+        max_messages: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_latency_seconds: Optional[float] = None,
+        publish_timeout_seconds: Optional[float] = None
+    ):
+        self.name = name
+        self.topic = topic
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.max_latency_seconds = max_latency_seconds
+        self.publish_timeout_seconds = publish_timeout_seconds
+
+    def batch_settings(self) -> Dict[str, Any]:
+        """Keyword arguments for pubsub_v1.types.BatchSettings (empty for defaults)."""
+        settings = {
+            'max_messages': self.max_messages,
+            'max_bytes': self.max_bytes,
+            'max_latency': self.max_latency_seconds
+        }
+        return {key: value for key, value in settings.items() if value is not None}
+
+    def describe(self) -> Dict[str, Any]:
+        """Lane configuration for /health."""
+        description = {'topic': self.topic}
+        for key in LANE_SETTINGS:
+            if getattr(self, key) is not None:
+                description[key] = getattr(self, key)
+        return description
+
+
+class EventRouter:
+    """Maps event types to lanes and counts routing decisions per lane."""
+
+    def __init__(
+        self,
+        lanes: Optional[Dict[str, Lane]] = None,
+        rules: Optional[Dict[str, str]] = None
+    ):
+        """
+        Args:
+            lanes: Lanes by name; a default lane is added if missing
+            rules: Event type pattern -> lane name
+
+        Raises:
+            ValueError: If a rule names an unknown lane or has an empty pattern
+        """
+        self.lanes = dict(lanes or {})
+        self.lanes.setdefault(DEFAULT_LANE, Lane(DEFAULT_LANE))
+
+        self._exact: Dict[str, Lane] = {}
+        self._prefixes: List[Tuple[str, Lane]] = []
+        for pattern, lane_name in (rules or {}).items():
+            lane = self.lanes.get(lane_name)
+            if lane is None:
+                raise ValueError(f"Routing rule '{pattern}' refers to unknown lane '{lane_name}'")
+            if pattern.endswith('*'):
+                self._prefixes.append((pattern[:-1], lane))
+            elif pattern:
+                self._exact[pattern] = lane
+            else:
+                raise ValueError("Routing rule pattern must not be empty")
+        self._prefixes.sort(key=lambda rule: len(rule[0]), reverse=True)
+
+        self._counts_lock = threading.Lock()
+        self._routed = {name: 0 for name in self.lanes}
+
+    def route(self, event_type: str) -> Lane:
+        """
+        Select the lane for an event type and count the decision.
+
+        Args:
+            event_type: Terminal49 event type
+
+        Returns:
+            Lane the event is published to
+        """
+        lane = self._exact.get(event_type)
+        if lane is None:
+            lane = self.lanes[DEFAULT_LANE]
+            for prefix, prefix_lane in self._prefixes:
+                if event_type.startswith(prefix):
+                    lane = prefix_lane
+                    break
+
+        with self._counts_lock:
+            self._routed[lane.name] += 1
+        return lane
+
+    def stats(self) -> Dict[str, Any]:
+        """Lane configuration and routing counters for /health."""
+        with self._counts_lock:
+            routed = dict(self._routed)
+        return {
+            name: dict(lane.describe(), routed=routed[name])
+            for name, lane in self.lanes.items()
+        }
+
+
+def parse_routing_config(config: Dict[str, Any]) -> EventRouter:
+    """
+    Build a router from a routing table.
+
+    Args:
+        config: Dictionary with optional "lanes" and "rules" (see module docstring)
+
+    Returns:
+        EventRouter
+
+    Raises:
+        ValueError: If the table is malformed
+    """
+    if not isinstance(config, dict):
+        raise ValueError("Routing config must be a JSON object")
+
+    lane_settings = config.get('lanes', {})
+    if not isinstance(lane_settings, dict):
+        raise ValueError("Routing lanes must be an object of name -> settings")
+
+    lanes = {}
+    for name, settings in lane_settings.items():
+        if not isinstance(settings, dict):
+            raise ValueError(f"Settings for lane '{name}' must be an object")
+        unknown = set(settings) - set(LANE_SETTINGS) - {'topic'}
+        if unknown:
+            raise ValueError(f"Unknown settings for lane '{name}': {', '.join(sorted(unknown))}")
+        if name != DEFAULT_LANE and not settings.get('topic'):
+            raise ValueError(f"Lane '{name}' needs a topic")
+        lanes[name] = Lane(name, **settings)
+
+    rules = config.get('rules', {})
+    if not isinstance(rules, dict):
+        raise ValueError("Routing rules must be an object of pattern -> lane")
+
+    return EventRouter(lanes, rules)
+
+
+def get_event_router() -> EventRouter:
+    """
+    Get or create the process-wide router from PUBSUB_ROUTING_CONFIG.
+
+    A config that cannot be parsed is logged and replaced by a router that
+    sends everything to the default lane, so a typo never drops events.
+
+    Returns:
+        EventRouter
+    """
+    global _event_router
+
+    if _event_router is None:
+        with _event_router_lock:
+            if _event_router is None:
+                _event_router = _load_router()
+
+    return _event_router
+
+
+def _load_router() -> EventRouter:
+    raw_config = os.environ.get('PUBSUB_ROUTING_CONFIG', '').strip()
+    if not raw_config:
+        return EventRouter()
+
+    try:
+        router = parse_routing_config(json.loads(raw_config))
+    except (ValueError, TypeError) as e:
+        logger.error(
+            "Invalid PUBSUB_ROUTING_CONFIG, routing all events to the default lane",
+            extra={'error': str(e)}
+        )
+        return EventRouter()
+
+    logger.info(
+        "Event routing initialized",
+        extra={'lanes': sorted(router.lanes)}
+    )
+    return router
+
+
+def set_event_router(router: Optional[EventRouter]) -> None:
+    """
+    Replace the process-wide router.
+
+    Args:
+        router: Router to use, or None to rebuild from the environment on
+            next use
+    """
+    global _event_router
+
+    with _event_router_lock:
+        _event_router = router
+
+
+def get_routing_stats() -> Dict[str, Any]:
+    """Per-lane routing counters for /health."""
+    return get_event_router().stats()
@@ -0,0 +1,124 @@
+"""
+Dependency Health Probes
+
+A deep health check (/health?deep=true) calls each registered probe, which
+checks one dependency (e.g. that a Pub/Sub topic or the database answers)
+and reports how long it took. Results are cached for HEALTH_PROBE_TTL_SECONDS so
+load balancers and uptime checks polling every few seconds do not multiply
+calls to the dependencies: while a result is fresh every caller gets it, and
+when it expires one caller re-runs the probe while concurrent callers wait
+for its result.
+
+A probe is a callable taking the timeout in seconds and returning a
+dictionary of details (or None); raising marks the dependency unhealthy.
+
+Environment Variables:
+    HEALTH_PROBE_TTL_SECONDS: How long a probe result is reused (default: 30)
+    HEALTH_PROBE_TIMEOUT_SECONDS: Timeout passed to each probe (default: 2)
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ProbeCheck = Callable[[float], Optional[Dict[str, Any]]]
+
+# Registered probes, in registration order
+_probes: List['DependencyProbe'] = []
+_probes_lock = threading.Lock()
+
+
+def get_probe_ttl() -> float:
+    """Seconds a probe result is reused."""
+    return float(os.environ.get('HEALTH_PROBE_TTL_SECONDS', '30'))
+
+
+def get_probe_timeout() -> float:
+    """Timeout in seconds passed to each probe."""
+    return float(os.environ.get('HEALTH_PROBE_TIMEOUT_SECONDS', '2'))
+
+
+class DependencyProbe:
+    """A dependency check whose latest result is cached for a TTL."""
+
+    def __init__(self, name: str, check: ProbeCheck, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.check = check
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._result: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+
+    def result(self, ttl: float, timeout: float) -> Dict[str, Any]:
+        """
+        Latest result, probing again if it is older than ttl.
+
+        Args:
+            ttl: Seconds a result is reused
+            timeout: Timeout passed to the check
+
+        Returns:
+            Dictionary with status ('ok' or 'error'), latency_ms, checked_at,
+            age_seconds, the check's details and, on failure, the error
+        """
+        with self._lock:
+            if self._result is None or self._clock() - self._checked_at >= ttl:
+                self._result = self._probe(timeout)
+                self._checked_at = self._clock()
+            return dict(self._result, age_seconds=round(self._clock() - self._checked_at, 3))
+
+    def _probe(self, timeout: float) -> Dict[str, Any]:
+        start = self._clock()
+        try:
+            details = self.check(timeout) or {}
+            result = dict(details, status='ok')
+        except Exception as e:
+            logger.warning(
+                "Health probe failed",
+                extra={'probe': self.name, 'error': str(e), 'error_type': type(e).__name__}
+            )
+            result = {'status': 'error', 'error': str(e), 'error_type': type(e).__name__}
+        result['latency_ms'] = round((self._clock() - start) * 1000, 1)
+        result['checked_at'] = datetime.utcnow().isoformat()
+        return result
+
+
+def register_probe(name: str, check: ProbeCheck) -> None:
+    """
+    Register a dependency probe for the deep health check.
+
+    Args:
+        name: Key of the result in the health document
+        check: Callable taking the timeout in seconds
+    """
+    with _probes_lock:
+        _probes.append(DependencyProbe(name, check))
+
+
+def run_probes() -> Tuple[Dict[str, Dict[str, Any]], bool]:
+    """
+    Results of every registered probe, fresh or cached.
+
+    Returns:
+        Tuple of (results by probe name, whether all probes succeeded)
+    """
+    ttl = get_probe_ttl()
+    timeout = get_probe_timeout()
+    with _probes_lock:
+        probes = list(_probes)
+
+    results = {probe.name: probe.result(ttl, timeout) for probe in probes}
+    return results, all(result['status'] == 'ok' for result in results.values())
+
+
+def reset_probes() -> None:
+    """Forget cached results (for tests); registered probes are kept."""
+    with _probes_lock:
+        for probe in _probes:
+            with probe._lock:
+                probe._result = None
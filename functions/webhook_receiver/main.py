@@ -6,28 +6,60 @@ signatures, and publishes events to Pub/Sub for asynchronous processing.
 
 Environment Variables:
     TERMINAL49_WEBHOOK_SECRET: Secret key for HMAC signature validation
+    TERMINAL49_WEBHOOK_PREVIOUS_SECRETS: Secrets still accepted during rotation
+        (see webhook_validator)
     GCP_PROJECT_ID: GCP project ID for Pub/Sub
     PUBSUB_TOPIC: Pub/Sub topic name (default: terminal49-webhook-events)
+    PUBSUB_PUBLISH_MODE: 'blocking' (default) or 'non_blocking' (see pubsub_publisher)
+    DEDUP_CACHE_SIZE / DEDUP_CACHE_TTL_SECONDS: Redelivery suppression (see dedup_cache)
+    SPOOL_ENABLED: Spool failed or slow publishes to local disk (see publish_spool)
+    PUBSUB_ENABLE_MESSAGE_ORDERING: Per-container ordering keys (see ordering_keys)
+    PUBSUB_ROUTING_CONFIG: Event-type routing to per-lane topics (see event_routing)
+    WEBHOOK_MAX_BODY_BYTES: Largest accepted body, 413 beyond it (see webhook_handler)
+    ADMISSION_RATE_PER_SECOND / ADMISSION_BURST / ADMISSION_MAX_IN_FLIGHT:
+        Per-instance admission limits, 429 beyond them (see admission_control)
+    WARMUP_AFTER_FIRST_REQUEST: Create Pub/Sub clients in the background after
+        the first request (see warmup)
+    HEALTH_PROBE_TTL_SECONDS / HEALTH_PROBE_TIMEOUT_SECONDS: Caching and timeout
+        of the /health?deep=true dependency probes (see health_probes)
+    LOG_FORMAT / LOG_LEVEL / LOG_SAMPLE_RATE: JSON log output and sampling of
+        per-request INFO logs (see structured_logging)
+    METRICS_FLUSH_INTERVAL_SECONDS: Interval of metrics snapshots in the log;
+        GET /metrics serves them in Prometheus text format (see metrics)
 """
 
 import functions_framework
 import json
 import logging
-import os
 import uuid
 from datetime import datetime
 from typing import Tuple
 
-from webhook_validator import validate_signature
-from pubsub_publisher import publish_event
+from pubsub_publisher import publish_raw_event
+from publish_spool import (
+    drain_spool_inline, get_publish_budget, is_spool_enabled, replay_spool_on_startup
+)
+from admission_control import AdmissionRejectedError, get_admission_controller
+from webhook_handler import (
+    RequestTimer,
+    WebhookRejected,
+    health_status,
+    inspect_signed_body,
+    is_deep_health_check,
+    read_signed_body,
+    spool_webhook,
+)
+from warmup import start_warm_up
+from structured_logging import configure_logging
+from metrics import PROMETHEUS_CONTENT_TYPE, maybe_flush_metrics, render_prometheus
 
 # Configure structured logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+# Resume delivery of webhooks spooled by a previous process on this instance
+replay_spool_on_startup()
+
 
 def generate_request_id() -> str:
     """Generate a unique request ID for tracking."""
@@ -44,14 +76,22 @@ def webhook_receiver(request):
         request: Flask request object
         
     Returns:
-        Tuple of (response_body, status_code)
+        Tuple of (response_body, status_code), plus headers for 429
     """
     start_time = datetime.utcnow()
     request_id = request.headers.get('X-Request-ID', generate_request_id())
     
     # Handle health check endpoint
     if request.method == 'GET' and request.path == '/health':
-        return handle_health_check(request_id)
+        try:
+            deep = is_deep_health_check(request.args.get('deep'))
+            return handle_health_check(request_id, deep=deep)
+        finally:
+            start_warm_up()
+    
+    # Serve this instance's metrics
+    if request.method == 'GET' and request.path == '/metrics':
+        return (render_prometheus(), 200, {'Content-Type': PROMETHEUS_CONTENT_TYPE})
     
     # Only accept POST requests for webhooks
     if request.method != 'POST':
@@ -64,6 +104,57 @@ def webhook_receiver(request):
         )
         return ('Method Not Allowed', 405)
     
+    # Shed load before doing any work for it
+    admission = get_admission_controller()
+    if admission is not None:
+        try:
+            admission.admit()
+        except AdmissionRejectedError as e:
+            logger.warning(
+                "Request rejected by admission control",
+                extra={
+                    'request_id': request_id,
+                    'reason': e.reason,
+                    'retry_after': e.retry_after
+                }
+            )
+            return ('Too Many Requests', 429, {'Retry-After': str(e.retry_after)})
+    
+    timer = RequestTimer()
+    response = ('Internal Server Error', 500)
+    try:
+        response = _receive_webhook(request, request_id, start_time, timer)
+        return response
+    
+    finally:
+        if admission is not None:
+            admission.release()
+        timer.finish(response[1])
+        maybe_flush_metrics()
+        # CPU is throttled once the response is returned, so spooled
+        # webhooks are republished here rather than by the drain thread
+        drain_spool_inline()
+        start_warm_up()
+
+
+def _receive_webhook(
+    request,
+    request_id: str,
+    start_time: datetime,
+    timer: RequestTimer
+) -> Tuple[str, int]:
+    """
+    Validate and publish an admitted webhook.
+    
+    Args:
+        request: Flask request object
+        request_id: Request tracking ID
+        start_time: When the request was received
+        timer: Stage latencies of this request
+        
+    Returns:
+        Tuple of (response_body, status_code)
+    """
     # Log receipt
     logger.info(
         "Webhook received",
@@ -75,57 +166,47 @@ def webhook_receiver(request):
     )
     
     try:
-        # Get raw body and signature
-        signature = request.headers.get('X-T49-Webhook-Signature')
-        body = request.get_data(as_text=True)
-        
-        if not body:
-            logger.warning(
-                "Empty request body",
-                extra={'request_id': request_id}
-            )
-            return ('Bad Request: Empty body', 400)
-        
-        # Validate signature
-        if not validate_signature(body, signature):
-            logger.warning(
-                "Invalid signature",
-                extra={
-                    'request_id': request_id,
-                    'signature_present': bool(signature)
-                }
-            )
-            return ('Unauthorized: Invalid signature', 401)
-        
-        # Parse payload
+        # Stream the body through the size cap and the HMAC instead of
+        # buffering it first, so oversized or unsigned requests are
+        # rejected before they are read in full
         try:
-            payload = json.loads(body)
-        except json.JSONDecodeError as e:
-            logger.error(
-                "Invalid JSON payload",
-                extra={
-                    'request_id': request_id,
-                    'error': str(e),
-                    'body_preview': body[:200]
-                }
+            body, signature_key = read_signed_body(
+                request.stream,
+                request.headers.get('X-T49-Webhook-Signature'),
+                request.content_length,
+                request_id
             )
-            return ('Bad Request: Invalid JSON', 400)
+            timer.lap('signature')
+            webhook = inspect_signed_body(body, signature_key, request_id)
+            timer.lap('parse')
+        except WebhookRejected as e:
+            return e.response
         
-        # Extract event type
-        event_type = extract_event_type(payload)
-        if not event_type:
-            logger.warning(
-                "Missing event type in payload",
-                extra={
-                    'request_id': request_id,
-                    'payload_keys': list(payload.keys())
-                }
-            )
-            return ('Bad Request: Missing event type', 400)
+        timer.event_type = webhook.event_type
+        if webhook.duplicate:
+            return ('OK', 200)
         
-        # Publish to Pub/Sub
+        # Publish to Pub/Sub. With the spool enabled, publishes slower than
+        # the latency budget are spooled instead of holding the response, as
+        # are non-blocking publishes that fail after the response.
+        spool_enabled = is_spool_enabled()
         try:
-            message_id = publish_event(payload, event_type, request_id)
+            message_id = publish_raw_event(
+                webhook.body,
+                webhook.event_type,
+                request_id,
+                notification_id=webhook.notification_id,
+                timeout=get_publish_budget() if spool_enabled else None,
+                extra_attributes={'received_at': start_time.isoformat()},
+                ordering_key=webhook.ordering_key,
+                on_failure=(
+                    (lambda error: spool_webhook(webhook, request_id, error, start_time))
+                    if spool_enabled else None
+                )
+            )
+            timer.lap('publish')
+            
+            webhook.mark_published()
             
             # Calculate processing time
             duration_ms = (datetime.utcnow() - start_time).total_seconds() * 1000
@@ -134,20 +215,25 @@ def webhook_receiver(request):
                 "Webhook processed successfully",
                 extra={
                     'request_id': request_id,
-                    'event_type': event_type,
+                    'event_type': webhook.event_type,
                     'duration_ms': duration_ms,
-                    'pubsub_message_id': message_id
+                    'pubsub_message_id': message_id,
+                    'signature_key': webhook.signature_key
                 }
             )
             
             return ('OK', 200)
             
         except Exception as e:
+            if spool_enabled and spool_webhook(webhook, request_id, e, start_time):
+                webhook.mark_published()
+                return ('OK', 200)
+            
             logger.error(
                 "Failed to publish to Pub/Sub",
                 extra={
                     'request_id': request_id,
-                    'event_type': event_type,
+                    'event_type': webhook.event_type,
                     'error': str(e)
                 }
             )
@@ -190,51 +276,27 @@ def extract_event_type(payload: dict) -> str:
         return ''
 
 
-def handle_health_check(request_id: str) -> Tuple[str, int]:
+def handle_health_check(request_id: str, deep: bool = False) -> Tuple[str, int]:
     """
     Handle health check endpoint.
     
     Checks:
     - Function is running
     - Environment variables are configured
-    - Pub/Sub connectivity (basic check)
+    - Deep only (?deep=true): in-process counters, and whether the Pub/Sub
+      topics answer, with probe latencies
     
     Args:
         request_id: Request tracking ID
+        deep: Whether to run (or reuse cached) dependency probes
         
     Returns:
         Tuple of (response_body, status_code)
     """
     logger.info(
         "Health check requested",
-        extra={'request_id': request_id}
+        extra={'request_id': request_id, 'deep': deep}
     )
     
-    health_status = {
-        'status': 'healthy',
-        'timestamp': datetime.utcnow().isoformat(),
-        'version': '1.0.0',
-        'checks': {}
-    }
-    
-    # Check environment variables
-    required_env_vars = [
-        'TERMINAL49_WEBHOOK_SECRET',
-        'GCP_PROJECT_ID'
-    ]
-    
-    for var in required_env_vars:
-        health_status['checks'][var] = 'configured' if os.environ.get(var) else 'missing'
-    
-    # Check Pub/Sub topic configuration
-    pubsub_topic = os.environ.get('PUBSUB_TOPIC', 'terminal49-webhook-events')
-    health_status['checks']['pubsub_topic'] = pubsub_topic
-    
-    # Determine overall health
-    if any(status == 'missing' for status in health_status['checks'].values()):
-        health_status['status'] = 'unhealthy'
-        status_code = 503
-    else:
-        status_code = 200
-    
-    return (json.dumps(health_status, indent=2), status_code)
+    status, status_code = health_status(deep=deep)
+    return (json.dumps(status, separators=(',', ':')), status_code)
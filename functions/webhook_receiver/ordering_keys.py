@@ -0,0 +1,146 @@
+"""
+Pub/Sub Ordering Keys for Terminal49 Webhooks
+
+Messages that share an ordering key are delivered to the event processor in
+publish order, while messages with different keys are processed in parallel.
+Keying by the entity a notification updates keeps two updates for the same
+container from being applied out of order (e.g. an older
+containers.current_status overwriting a newer one).
+
+Key selection, from data.relationships.reference_object:
+- container or shipment: that entity ("container:<id>", "shipment:<id>")
+- tracking_request: the tracking request ("tracking_request:<id>"), so its
+  status changes stay ordered even before a shipment exists
+- transport_event: the container the transport event belongs to, looked up
+  in "included"
+- anything else, or no reference: the first container in "included", then
+  the first shipment, then data itself if it is a tracking request
+
+An empty key means the message is published unordered.
+
+Limitations:
+- A notification covering several containers is ordered by the referenced
+  container only.
+- Shipment rows are also written by container events, which are ordered by
+  container; shipment attributes are not protected across keys.
+"""
+
+import logging
+from typing import Any, Dict, Iterable, Optional, Union
+
+from payload_sniffer import sniff_document
+
+logger = logging.getLogger(__name__)
+
+ORDERING_KEY_TYPES = ('container', 'shipment')
+TRACKING_REQUEST_TYPE = 'tracking_request'
+
+
+def ordering_key_for_payload(payload: Dict[str, Any]) -> str:
+    """
+    Derive the ordering key for a parsed webhook payload.
+
+    Args:
+        payload: Parsed Terminal49 webhook payload
+
+    Returns:
+        Ordering key, or an empty string if the payload has no entity to key on
+    """
+    if not isinstance(payload, dict):
+        return ''
+
+    data = payload.get('data')
+    included = payload.get('included')
+    return _select_ordering_key(
+        data if isinstance(data, dict) else {},
+        included if isinstance(included, list) else ()
+    )
+
+
+def ordering_key_for_body(body: Union[str, bytes]) -> str:
+    """
+    Derive the ordering key from a raw webhook body.
+
+    Only "data" and as much of "included" as the key needs are parsed.
+
+    Args:
+        body: Raw request body
+
+    Returns:
+        Ordering key, or an empty string if none can be derived
+    """
+    try:
+        data, included = sniff_document(body)
+        return _select_ordering_key(data, included)
+    except ValueError as e:
+        # The body already passed the event sniffer; publishing it unordered
+        # is better than rejecting it here.
+        logger.warning(
+            "Could not derive ordering key",
+            extra={'error': str(e)}
+        )
+        return ''
+
+
+def _select_ordering_key(data: Dict[str, Any], included: Iterable[Any]) -> str:
+    reference_type, reference_id = _reference_object(data)
+
+    if reference_type in ORDERING_KEY_TYPES and reference_id:
+        return _format_key(reference_type, reference_id)
+    if reference_type == TRACKING_REQUEST_TYPE and reference_id:
+        return _format_key(TRACKING_REQUEST_TYPE, reference_id)
+
+    first_container = None
+    first_shipment = None
+
+    for entity in included:
+        if not isinstance(entity, dict):
+            continue
+        entity_type = entity.get('type')
+        entity_id = entity.get('id')
+
+        if (
+            reference_type == 'transport_event'
+            and entity_type == 'transport_event'
+            and entity_id == reference_id
+        ):
+            container_id = _related_id(entity, 'container')
+            if container_id:
+                return _format_key('container', container_id)
+        elif entity_type == 'container' and first_container is None and entity_id:
+            first_container = entity_id
+        elif entity_type == 'shipment' and first_shipment is None and entity_id:
+            first_shipment = entity_id
+
+    if first_container is not None:
+        return _format_key('container', first_container)
+    if first_shipment is not None:
+        return _format_key('shipment', first_shipment)
+
+    if data.get('type') == TRACKING_REQUEST_TYPE and data.get('id'):
+        return _format_key(TRACKING_REQUEST_TYPE, data['id'])
+
+    return ''
+
+
+def _reference_object(data: Dict[str, Any]):
+    reference = _relationship_data(data, 'reference_object')
+    return reference.get('type'), reference.get('id')
+
+
+def _related_id(entity: Dict[str, Any], relationship_name: str) -> Optional[Any]:
+    return _relationship_data(entity, relationship_name).get('id')
+
+
+def _relationship_data(entity: Dict[str, Any], relationship_name: str) -> Dict[str, Any]:
+    """Return relationships.<name>.data, or an empty dict if any level is missing."""
+    value: Any = entity
+    for key in ('relationships', relationship_name, 'data'):
+        if not isinstance(value, dict):
+            return {}
+        value = value.get(key)
+    return value if isinstance(value, dict) else {}
+
+
+def _format_key(entity_type: str, entity_id: Any) -> str:
+    return f"{entity_type}:{entity_id}"
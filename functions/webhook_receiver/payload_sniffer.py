@@ -0,0 +1,281 @@
+"""
+Lightweight Event Metadata Sniffer for Terminal49 Webhooks
+
+The receiver only needs two fields from each notification to route it:
+data.attributes.event and data.id. This module walks the JSON document with
+the standard library's C scanner and collects them from the top-level "data"
+object without building a dict for the whole document.
+
+The rest of the document, notably the (often much larger) "included" array,
+is still read by the C scanner, so malformed JSON anywhere in the body is
+rejected with the receiver's 400 instead of being published and dropped by
+the event processor; validating it in pure Python instead costs more than
+the C scanner does. Documents the sniffer cannot read are handed to
+json.loads, so malformed JSON is still reported as a JSONDecodeError.
+
+Limitations:
+- If "data" appears more than once, the first occurrence is used.
+
+sniff_document() serves callers that also need entities from "included"
+(ordering keys): it parses "data" and then yields "included" entries one at a
+time, so the caller can stop as soon as it has what it needs.
+"""
+
+import json
+import re
+from json.decoder import scanstring
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+# Below this size json.loads is as cheap as sniffing, so small bodies are
+# parsed directly.
+SNIFF_MIN_BYTES = 4096
+
+_scan_once = json.JSONDecoder().scan_once
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class _Malformed(Exception):
+    """The scanned text is not valid JSON (or was cut off by the prefix)."""
+
+
+class _Complete(Exception):
+    """Everything the caller needs was found; stop scanning."""
+
+
+class _SniffState:
+    """Fields collected while walking the document."""
+
+    __slots__ = ('event_type', 'notification_id', 'data_read')
+
+    def __init__(self):
+        self.event_type: Optional[str] = None
+        self.notification_id: Optional[str] = None
+        self.data_read = False
+
+
+def sniff_event_metadata(body: Union[str, bytes]) -> Tuple[str, Optional[str]]:
+    """
+    Extract the event type and notification ID from a webhook body.
+
+    Equivalent to json.loads followed by reading data.attributes.event and
+    data.id, without building a dict for the whole document.
+
+    Args:
+        body: Raw request body
+
+    Returns:
+        Tuple of (event_type, notification_id). event_type is an empty string
+        and notification_id is None when the fields are missing.
+
+    Raises:
+        ValueError: If the body is not valid JSON (json.JSONDecodeError) or
+            not valid UTF-8 (UnicodeDecodeError)
+    """
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+
+    if len(body) >= SNIFF_MIN_BYTES:
+        result = _try_sniff(body.decode('utf-8'))
+        if result is not None:
+            return result
+
+    # The sniffer could not read the document: let the full parser decide
+    # whether it is malformed (raises) or merely unusual (returns a value).
+    payload = json.loads(body)
+    return _fields_from_parsed(payload)
+
+
+def sniff_document(body: Union[str, bytes]) -> Tuple[Dict[str, Any], Iterator[Any]]:
+    """
+    Parse the top-level "data" object and return a lazy view of "included".
+
+    Entries of "included" are parsed as the iterator advances. Errors in
+    entries the caller never reaches are not detected.
+
+    Args:
+        body: Raw request body
+
+    Returns:
+        Tuple of (data, included). data is an empty dict when missing or not
+        an object; included yields nothing when missing or not an array.
+
+    Raises:
+        ValueError: If the scanned part of the body is not valid JSON, or
+            the body is not valid UTF-8. Iterating included can also raise
+            ValueError.
+    """
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+
+    found: Dict[str, Any] = {}
+
+    def visit(key: str, idx: int) -> int:
+        if key == 'data' and 'data' not in found:
+            value, end = _scan_once(body, idx)
+            found['data'] = value
+            if 'included' in found:
+                raise _Complete
+            return end
+        if key == 'included' and 'included' not in found:
+            if 'data' in found:
+                # Leave the array for the caller to walk lazily
+                found['included'] = idx
+                raise _Complete
+            value, end = _scan_once(body, idx)
+            found['included'] = value
+            return end
+        return _skip_value(body, idx)
+
+    try:
+        idx = _skip_ws(body, 0)
+        if body[idx:idx + 1] != '{':
+            raise _Malformed
+        _scan_object(body, idx, visit)
+    except _Complete:
+        pass
+    except (_Malformed, StopIteration) as e:
+        raise ValueError("Malformed JSON document") from e
+
+    data = found.get('data')
+    if not isinstance(data, dict):
+        data = {}
+
+    included = found.get('included')
+    if isinstance(included, int):
+        return data, _iter_array(body, included)
+    if isinstance(included, list):
+        return data, iter(included)
+    return data, iter(())
+
+
+def _iter_array(text: str, idx: int) -> Iterator[Any]:
+    """Yield the elements of the JSON array at text[idx], parsing each on demand."""
+    if text[idx:idx + 1] != '[':
+        return
+    idx = _skip_ws(text, idx + 1)
+    if text[idx:idx + 1] == ']':
+        return
+
+    while True:
+        try:
+            value, idx = _scan_once(text, idx)
+        except StopIteration as e:
+            raise ValueError("Malformed JSON array element") from e
+        yield value
+
+        idx = _skip_ws(text, idx)
+        delimiter = text[idx:idx + 1]
+        if delimiter == ',':
+            idx = _skip_ws(text, idx + 1)
+        elif delimiter == ']':
+            return
+        else:
+            raise ValueError("Malformed JSON array")
+
+
+def _try_sniff(text: str) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    Walk the whole document and collect the fields.
+
+    Returns:
+        Tuple of (event_type, notification_id), or None if the text could not
+        be scanned
+    """
+    state = _SniffState()
+
+    try:
+        idx = _skip_ws(text, 0)
+        if text[idx:idx + 1] != '{':
+            return None
+        idx = _scan_object(text, idx, lambda key, i: _visit_top_level(text, key, i, state))
+        if _skip_ws(text, idx) != len(text):
+            return None
+    except (_Malformed, StopIteration, ValueError):
+        return None
+
+    return state.event_type or '', state.notification_id
+
+
+def _visit_top_level(text: str, key: str, idx: int, state: _SniffState) -> int:
+    if key == 'data' and not state.data_read:
+        state.data_read = True
+        if text[idx:idx + 1] == '{':
+            return _scan_object(text, idx, lambda k, i: _visit_data(text, k, i, state))
+    # Only "data" carries the fields we need; the rest of the document
+    # (notably "included") is scanned for validity and discarded.
+    return _skip_value(text, idx)
+
+
+def _visit_data(text: str, key: str, idx: int, state: _SniffState) -> int:
+    if key == 'id':
+        value, end = _scan_once(text, idx)
+        state.notification_id = str(value) if value is not None else None
+        return end
+
+    if key == 'attributes' and text[idx:idx + 1] == '{':
+        return _scan_object(text, idx, lambda k, i: _visit_attributes(text, k, i, state))
+
+    return _skip_value(text, idx)
+
+
+def _visit_attributes(text: str, key: str, idx: int, state: _SniffState) -> int:
+    if key == 'event':
+        value, end = _scan_once(text, idx)
+        state.event_type = value if isinstance(value, str) else None
+        return end
+    return _skip_value(text, idx)
+
+
+def _scan_object(text: str, idx: int, visit) -> int:
+    """
+    Walk a JSON object starting at text[idx] == '{'.
+
+    visit(key, value_index) must consume the value and return the index just
+    past it.
+
+    Returns:
+        Index just past the closing brace
+    """
+    idx = _skip_ws(text, idx + 1)
+    if text[idx:idx + 1] == '}':
+        return idx + 1
+
+    while True:
+        if text[idx:idx + 1] != '"':
+            raise _Malformed
+        key, idx = scanstring(text, idx + 1)
+        idx = _skip_ws(text, idx)
+        if text[idx:idx + 1] != ':':
+            raise _Malformed
+        idx = _skip_ws(text, visit(key, _skip_ws(text, idx + 1)))
+
+        delimiter = text[idx:idx + 1]
+        if delimiter == ',':
+            idx = _skip_ws(text, idx + 1)
+        elif delimiter == '}':
+            return idx + 1
+        else:
+            raise _Malformed
+
+
+def _skip_value(text: str, idx: int) -> int:
+    _, end = _scan_once(text, idx)
+    return end
+
+
+def _skip_ws(text: str, idx: int) -> int:
+    return _WHITESPACE.match(text, idx).end()
+
+
+def _fields_from_parsed(payload) -> Tuple[str, Optional[str]]:
+    """Read the fields from a fully parsed payload (fallback path)."""
+    try:
+        data = payload.get('data', {})
+        event_type = data.get('attributes', {}).get('event', '')
+        notification_id = data.get('id')
+    except (AttributeError, TypeError):
+        return '', None
+
+    if not isinstance(event_type, str):
+        event_type = ''
+    return event_type, str(notification_id) if notification_id is not None else None
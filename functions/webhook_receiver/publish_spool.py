@@ -0,0 +1,772 @@
+"""
+Local Write-Ahead Spool for Webhooks That Could Not Be Published
+
+When Pub/Sub is slow or failing, returning 500 makes Terminal49 retry, which
+adds load exactly when the system is degraded. With the spool enabled the
+receiver instead appends the raw body and its routing attributes to a local
+append-only segment file, fsyncs it, and returns 200. The spool is drained to
+Pub/Sub with bounded concurrency at the end of later requests
+(drain_spool_inline, within SPOOL_PUBLISH_BUDGET_SECONDS so a hung Pub/Sub
+does not hold the response), while the instance still has CPU: Cloud Functions
+throttles CPU between requests, so the background drain thread cannot be
+relied on there. The thread still drains when CPU is available, for example
+on an idle instance with CPU always allocated.
+
+Segment format (one file per segment, records appended back to back):
+
+    >II header_length body_length | header (JSON) | body | >I crc32
+
+A torn or corrupted record is skipped: the reader resyncs to the next intact
+record and replays everything else. A segment that contained corruption is
+renamed to *.corrupt once its intact records are published, instead of being
+deleted, so the damaged bytes can be inspected. Delivery from the spool is
+at-least-once: a record can be published again if the instance stops
+mid-drain, or if a publish that exceeded the latency budget completes after
+the record was spooled. The event processor is idempotent on Terminal49 IDs,
+so duplicates are harmless.
+
+With PUBSUB_PUBLISH_MODE=non_blocking the webhook is acknowledged before
+Pub/Sub acks the message: a publish that fails afterwards is spooled from the
+publisher's completion callback, and waiting for an in-flight slot is bounded
+by the same budget.
+
+On Cloud Functions /tmp is backed by instance memory: the spool survives
+process restarts and worker recycling on the same instance, not instance
+loss. Segments found at startup are replayed.
+
+Environment Variables:
+    SPOOL_ENABLED: 'true' to spool failed/slow publishes (default: false)
+    SPOOL_DIR: Spool directory (default: /tmp/terminal49-webhook-spool)
+    SPOOL_MAX_BYTES: Total spool size cap (default: 268435456)
+    SPOOL_SEGMENT_MAX_BYTES: Segment rotation size (default: 8388608)
+    SPOOL_DRAIN_CONCURRENCY: Concurrent publishes while draining (default: 8)
+    SPOOL_PUBLISH_BUDGET_SECONDS: Publish latency budget before spooling,
+        and the time limit of an inline drain (default: 2.0)
+    SPOOL_INLINE_DRAIN_MAX_RECORDS: Records republished at the end of one
+        request (default: 50)
+"""
+
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_FRAME_HEADER = struct.Struct('>II')
+_FRAME_CRC = struct.Struct('>I')
+_SEGMENT_PREFIX = 'segment-'
+_SEGMENT_SUFFIX = '.log'
+_CORRUPT_SUFFIX = '.corrupt'
+
+# Process-wide spool (created on first use when enabled)
+_spool = None
+_spool_lock = threading.Lock()
+
+SpoolRecord = Tuple[Dict[str, Any], bytes]
+
+
+class SpoolFullError(RuntimeError):
+    """Raised when appending would exceed the spool size cap."""
+
+
+class _SegmentCursor:
+    """How far a sealed segment has been drained."""
+
+    __slots__ = ('offset', 'spans', 'corrupt')
+
+    def __init__(self):
+        # Every record before offset is published or skipped as corrupt
+        self.offset = 0
+        # start -> end of published records and corrupt spans past offset
+        self.spans: Dict[int, int] = {}
+        self.corrupt = 0
+
+    def mark(self, start: int, end: int) -> None:
+        """Record start..end as done and advance offset over done spans."""
+        self.spans[start] = end
+        while self.offset in self.spans:
+            self.offset = self.spans.pop(self.offset)
+
+
+class PublishSpool:
+    """
+    Append-only, segmented on-disk spool with a background drainer.
+
+    Args:
+        directory: Directory holding segment files
+        publish: Callable(header, body, timeout) that publishes one record,
+            waiting at most timeout seconds (None for its default), and
+            raises on failure
+        max_bytes: Total size cap across all segments
+        segment_max_bytes: Size at which the active segment is rotated
+        drain_concurrency: Maximum concurrent publishes while draining
+        retry_max_seconds: Upper bound of the drain retry backoff
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        publish: Callable[[Dict[str, Any], bytes, Optional[float]], Any],
+        max_bytes: int = 256 * 1024 * 1024,
+        segment_max_bytes: int = 8 * 1024 * 1024,
+        drain_concurrency: int = 8,
+        retry_max_seconds: float = 30.0
+    ):
+        self.directory = directory
+        self.publish = publish
+        self.max_bytes = max_bytes
+        self.segment_max_bytes = segment_max_bytes
+        self.drain_concurrency = max(1, drain_concurrency)
+        self.retry_max_seconds = retry_max_seconds
+
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._active_file = None
+        self._active_name: Optional[str] = None
+        self._active_size = 0
+
+        existing = self._segment_names()
+        self._next_seq = (self._segment_seq(existing[-1]) + 1) if existing else 1
+        self._total_bytes = sum(
+            os.path.getsize(os.path.join(directory, name)) for name in existing
+        )
+
+        # Drain progress of segments that only partly drained, so a retry
+        # neither republishes nor rereads their published records
+        self._cursors: Dict[str, _SegmentCursor] = {}
+
+        # Held while draining, so inline and background drains do not overlap
+        self._drain_lock = threading.RLock()
+        self._inline_retry_at = 0.0
+        self._inline_backoff = 1.0
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._drainer: Optional[threading.Thread] = None
+
+        self.stats = {
+            'spooled': 0,
+            'rejected': 0,
+            'drained': 0,
+            'drain_failures': 0,
+            'corrupt_records': 0,
+            'quarantined_segments': 0
+        }
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def append(self, body: bytes, header: Dict[str, Any]) -> None:
+        """
+        Durably append one record.
+
+        The record is fsync'd before returning, so it is safe to acknowledge
+        the webhook afterwards.
+
+        Args:
+            body: Raw webhook body
+            header: Routing attributes needed to republish the body
+
+        Raises:
+            SpoolFullError: If the record would exceed max_bytes
+            OSError: On filesystem errors
+        """
+        header_bytes = json.dumps(header).encode('utf-8')
+        crc = zlib.crc32(body, zlib.crc32(header_bytes))
+        frame_size = _FRAME_HEADER.size + len(header_bytes) + len(body) + _FRAME_CRC.size
+
+        with self._lock:
+            if self._total_bytes + frame_size > self.max_bytes:
+                self.stats['rejected'] += 1
+                raise SpoolFullError("Webhook spool is full")
+
+            if self._active_file is not None and \
+                    self._active_size + frame_size > self.segment_max_bytes:
+                self._seal_active()
+
+            if self._active_file is None:
+                self._open_segment()
+
+            f = self._active_file
+            f.write(_FRAME_HEADER.pack(len(header_bytes), len(body)))
+            f.write(header_bytes)
+            f.write(body)
+            f.write(_FRAME_CRC.pack(crc))
+            f.flush()
+            os.fsync(f.fileno())
+
+            self._active_size += frame_size
+            self._total_bytes += frame_size
+            self.stats['spooled'] += 1
+            # The publish that failed for this record would most likely fail
+            # again if retried inline straight away
+            self._inline_retry_at = time.monotonic() + self._inline_backoff
+
+        self._wake.set()
+
+    def _open_segment(self) -> None:
+        name = f"{_SEGMENT_PREFIX}{self._next_seq:010d}{_SEGMENT_SUFFIX}"
+        self._next_seq += 1
+        self._active_file = open(os.path.join(self.directory, name), 'ab')
+        self._active_name = name
+        self._active_size = 0
+
+    def _seal_active(self) -> None:
+        if self._active_file is not None:
+            self._active_file.close()
+        self._active_file = None
+        self._active_name = None
+        self._active_size = 0
+
+    # ------------------------------------------------------------------
+    # Draining
+    # ------------------------------------------------------------------
+
+    def drain_once(
+        self,
+        max_records: Optional[int] = None,
+        budget_seconds: Optional[float] = None
+    ) -> bool:
+        """
+        Publish every spooled record once, or the first max_records of them.
+
+        The active segment is sealed first so new appends go to a fresh
+        segment. Fully published segments are deleted. Draining stops at the
+        first failed publish.
+
+        Args:
+            max_records: Most records to publish in this call; None for all
+            budget_seconds: Wall-clock time the call may take; each publish
+                waits at most the time left. None for no limit.
+
+        Returns:
+            True if the spool is empty afterwards, False if any publish failed
+            or records are left over
+        """
+        deadline = None if budget_seconds is None else time.monotonic() + budget_seconds
+        with self._drain_lock:
+            with self._lock:
+                if self._active_size > 0:
+                    self._seal_active()
+                active = self._active_name
+                segments = [name for name in self._segment_names() if name != active]
+
+            budget = max_records
+            for name in segments:
+                if self._stop.is_set() or (budget is not None and budget <= 0):
+                    return False
+                if deadline is not None and time.monotonic() >= deadline:
+                    return False
+                drained, attempted = self._drain_segment(name, budget, deadline)
+                if budget is not None:
+                    budget -= attempted
+                if not drained:
+                    return False
+
+            return True
+
+    def drain_inline(self, max_records: int, budget_seconds: float) -> bool:
+        """
+        Publish up to max_records spooled records on the calling request's time.
+
+        Returns at once if the spool is empty, another drain is running, or a
+        record was spooled or an inline drain failed less than the retry
+        backoff ago, so a Pub/Sub outage does not slow down every request.
+        Otherwise returns within budget_seconds: publishes still running then
+        are abandoned, and their records stay in the spool.
+
+        Args:
+            max_records: Most records to publish
+            budget_seconds: Wall-clock time the drain may take
+
+        Returns:
+            True if the spool is empty afterwards
+        """
+        if self.pending_bytes() == 0:
+            return True
+        if time.monotonic() < self._inline_retry_at:
+            return False
+        if not self._drain_lock.acquire(blocking=False):
+            return False
+        try:
+            failures_before = self.get_stats()['drain_failures']
+            drained = self.drain_once(max_records, budget_seconds)
+            failed = self.get_stats()['drain_failures'] > failures_before
+        finally:
+            self._drain_lock.release()
+
+        if failed:
+            self._inline_retry_at = time.monotonic() + self._inline_backoff
+            self._inline_backoff = min(self._inline_backoff * 2, self.retry_max_seconds)
+        else:
+            self._inline_backoff = 1.0
+        return drained
+
+    def _drain_segment(
+        self,
+        name: str,
+        limit: Optional[int] = None,
+        deadline: Optional[float] = None
+    ) -> Tuple[bool, int]:
+        """
+        Publish a segment's unpublished records, or the first limit of them.
+
+        Stops at the first failed publish, or when the deadline (a
+        time.monotonic() value) passes.
+
+        Returns:
+            (whether the segment is fully drained and removed, records attempted)
+        """
+        path = os.path.join(self.directory, name)
+        cursor = self._cursors.setdefault(name, _SegmentCursor())
+        size = os.path.getsize(path)
+        pending = self._read_pending(path, size, cursor, limit)
+
+        ends = {offset: end for offset, _, _, end in pending}
+        published, failed = self._publish_records(
+            [(offset, header, body) for offset, header, body, _ in pending], deadline
+        )
+        for offset in published:
+            cursor.mark(offset, ends[offset])
+
+        with self._lock:
+            self.stats['drained'] += len(published)
+            self.stats['drain_failures'] += failed
+
+        if failed:
+            logger.warning(
+                "Spool segment partially drained",
+                extra={'segment': name, 'failed': failed, 'pending': len(pending)}
+            )
+            return False, len(pending)
+
+        if cursor.offset < size:
+            return False, len(pending)
+
+        corrupt = cursor.corrupt
+        if corrupt:
+            os.replace(path, path + _CORRUPT_SUFFIX)
+        else:
+            os.remove(path)
+        self._cursors.pop(name, None)
+        with self._lock:
+            self._total_bytes -= size
+            if corrupt:
+                self.stats['quarantined_segments'] += 1
+
+        if corrupt:
+            logger.error(
+                "Spool segment with corrupt records quarantined",
+                extra={'segment': name + _CORRUPT_SUFFIX, 'corrupt_records': corrupt}
+            )
+        else:
+            logger.info("Spool segment drained", extra={'segment': name})
+        return True, len(pending)
+
+    def _publish_records(
+        self,
+        records: List[Tuple[int, Dict[str, Any], bytes]],
+        deadline: Optional[float]
+    ) -> Tuple[List[int], int]:
+        """
+        Publish records, up to drain_concurrency at a time.
+
+        No record is started after one has failed. With a deadline, returns
+        once it passes; publishes still running are left to finish on their
+        own and their records are not marked published.
+
+        Returns:
+            (offsets of the published records, records started but not published)
+        """
+        if not records:
+            return [], 0
+
+        failure = threading.Event()
+        pool = ThreadPoolExecutor(max_workers=min(self.drain_concurrency, len(records)))
+        futures = {
+            pool.submit(self._publish_record, header, body, deadline, failure): offset
+            for offset, header, body in records
+        }
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                if future.result() is False:
+                    break
+        except FuturesTimeoutError:
+            pass
+        finally:
+            pool.shutdown(wait=deadline is None, cancel_futures=True)
+
+        published = []
+        failed = 0
+        for future, offset in futures.items():
+            if future.cancelled() or (future.done() and future.result() is None):
+                continue
+            if future.done() and future.result():
+                published.append(offset)
+            else:
+                failed += 1
+        return published, failed
+
+    def _publish_record(
+        self,
+        header: Dict[str, Any],
+        body: bytes,
+        deadline: Optional[float],
+        failure: threading.Event
+    ) -> Optional[bool]:
+        """Publish one record; None if it was skipped after a failure or past the deadline."""
+        timeout = None
+        if deadline is not None:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                return None
+        if failure.is_set():
+            return None
+        try:
+            self.publish(header, body, timeout)
+            return True
+        except Exception as e:
+            logger.warning(
+                "Failed to publish spooled record",
+                extra={
+                    'request_id': header.get('request_id'),
+                    'event_type': header.get('event_type'),
+                    'error': str(e)
+                }
+            )
+            failure.set()
+            return False
+
+    def _read_pending(
+        self,
+        path: str,
+        size: int,
+        cursor: _SegmentCursor,
+        limit: Optional[int]
+    ) -> List[Tuple[int, Dict[str, Any], bytes, int]]:
+        """
+        (offset, header, body, end) of the next unpublished records of a segment.
+
+        Reads from the cursor one record at a time, so a drain bounded by
+        limit reads only the records it publishes. After a torn or corrupt
+        record, reading resumes at the next offset where an intact record
+        starts; the skipped span is marked done on the cursor.
+        """
+        records = []
+        offset = cursor.offset
+        with open(path, 'rb') as f:
+            while offset < size and (limit is None or len(records) < limit):
+                if offset in cursor.spans:
+                    offset = cursor.spans[offset]
+                    continue
+
+                f.seek(offset)
+                frame = f.read(_FRAME_HEADER.size)
+                record = None
+                if len(frame) == _FRAME_HEADER.size:
+                    header_len, body_len = _FRAME_HEADER.unpack(frame)
+                    record_len = _FRAME_HEADER.size + header_len + body_len + _FRAME_CRC.size
+                    if offset + record_len <= size:
+                        record = _parse_record(
+                            frame + f.read(record_len - _FRAME_HEADER.size), 0
+                        )
+
+                if record is None:
+                    f.seek(offset)
+                    resync = offset + _next_record(f.read(size - offset), 1)
+                    self._record_corruption(path, offset)
+                    cursor.corrupt += 1
+                    cursor.mark(offset, resync)
+                    offset = resync
+                    continue
+
+                header, body, record_len = record
+                records.append((offset, header, body, offset + record_len))
+                offset += record_len
+        return records
+
+    def _record_corruption(self, path: str, offset: int) -> None:
+        with self._lock:
+            self.stats['corrupt_records'] += 1
+        logger.error(
+            "Torn or corrupt spool record, resyncing to the next intact record",
+            extra={'segment': os.path.basename(path), 'offset': offset}
+        )
+
+    def start_drainer(self) -> None:
+        """Start the background drain thread if it is not running."""
+        with self._lock:
+            if self._drainer is not None and self._drainer.is_alive():
+                return
+            self._stop.clear()
+            self._drainer = threading.Thread(
+                target=self._drain_loop,
+                name='webhook-spool-drainer',
+                daemon=True
+            )
+            self._drainer.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the drain thread and close the active segment."""
+        self._stop.set()
+        self._wake.set()
+        if self._drainer is not None:
+            self._drainer.join(timeout)
+        with self._lock:
+            self._seal_active()
+
+    def _drain_loop(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                drained = self.drain_once()
+            except Exception as e:
+                logger.error(
+                    "Spool drain error",
+                    extra={'error': str(e), 'error_type': type(e).__name__},
+                    exc_info=True
+                )
+                drained = False
+
+            if drained:
+                backoff = 1.0
+                self._wake.wait(5.0)
+                self._wake.clear()
+            else:
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.retry_max_seconds)
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+
+    def _segment_names(self) -> List[str]:
+        return sorted(
+            name for name in os.listdir(self.directory)
+            if name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX)
+        )
+
+    @staticmethod
+    def _segment_seq(name: str) -> int:
+        return int(name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)])
+
+    def pending_bytes(self) -> int:
+        """Bytes currently held across all segments."""
+        with self._lock:
+            return self._total_bytes
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Snapshot of counters for /health."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['pending_bytes'] = self._total_bytes
+            return stats
+
+
+def _parse_record(data: bytes, offset: int) -> Optional[Tuple[Dict[str, Any], bytes, int]]:
+    """(header, body, end offset) of the record at offset, or None if it is torn or corrupt."""
+    frame_end = offset + _FRAME_HEADER.size
+    if frame_end > len(data):
+        return None
+    header_len, body_len = _FRAME_HEADER.unpack_from(data, offset)
+    header_end = frame_end + header_len
+    body_end = header_end + body_len
+    record_end = body_end + _FRAME_CRC.size
+    # Headers are JSON objects; checked first so resyncing rarely computes a CRC
+    if header_len < 2 or record_end > len(data) or data[frame_end:frame_end + 1] != b'{':
+        return None
+
+    header_bytes = data[frame_end:header_end]
+    body = data[header_end:body_end]
+    (crc,) = _FRAME_CRC.unpack_from(data, body_end)
+    if zlib.crc32(body, zlib.crc32(header_bytes)) != crc:
+        return None
+    try:
+        header = json.loads(header_bytes)
+    except ValueError:
+        return None
+    return header, body, record_end
+
+
+def _next_record(data: bytes, start: int) -> int:
+    """Offset of the first intact record at or after start, or len(data)."""
+    offset = data.find(b'{', start + _FRAME_HEADER.size)
+    while offset != -1:
+        candidate = offset - _FRAME_HEADER.size
+        if _parse_record(data, candidate) is not None:
+            return candidate
+        offset = data.find(b'{', offset + 1)
+    return len(data)
+
+
+def _publish_spooled(header: Dict[str, Any], body: bytes, timeout: Optional[float]) -> None:
+    """
+    Republish a spooled record, waiting for the Pub/Sub ack.
+
+    timestamp is the republish time; received_at keeps the time the receiver
+    got the webhook (spooled_at for records written before it was recorded).
+    """
+    from pubsub_publisher import publish_raw_event
+
+    publish_raw_event(
+        body,
+        header['event_type'],
+        header['request_id'],
+        notification_id=header.get('notification_id'),
+        timeout=timeout,
+        blocking=True,
+        extra_attributes={
+            'spooled_at': header['spooled_at'],
+            'received_at': header.get('received_at') or header['spooled_at']
+        },
+        ordering_key=header.get('ordering_key')
+    )
+
+
+def is_spool_enabled() -> bool:
+    """Whether SPOOL_ENABLED is set to a true value."""
+    return os.environ.get('SPOOL_ENABLED', 'false').strip().lower() in ('1', 'true', 'yes')
+
+
+def get_publish_budget() -> float:
+    """Seconds a publish may take before the receiver spools instead."""
+    return float(os.environ.get('SPOOL_PUBLISH_BUDGET_SECONDS', '2.0'))
+
+
+def get_spool() -> Optional[PublishSpool]:
+    """
+    Get or create the process-wide spool.
+
+    Returns:
+        PublishSpool, or None if SPOOL_ENABLED is not set
+    """
+    global _spool
+
+    if not is_spool_enabled():
+        return None
+
+    if _spool is None:
+        with _spool_lock:
+            if _spool is None:
+                _spool = PublishSpool(
+                    directory=os.environ.get('SPOOL_DIR', '/tmp/terminal49-webhook-spool'),
+                    publish=_publish_spooled,
+                    max_bytes=int(os.environ.get('SPOOL_MAX_BYTES', str(256 * 1024 * 1024))),
+                    segment_max_bytes=int(
+                        os.environ.get('SPOOL_SEGMENT_MAX_BYTES', str(8 * 1024 * 1024))
+                    ),
+                    drain_concurrency=int(os.environ.get('SPOOL_DRAIN_CONCURRENCY', '8'))
+                )
+                _spool.start_drainer()
+                logger.info(
+                    "Webhook spool initialized",
+                    extra={'directory': _spool.directory, 'pending_bytes': _spool.pending_bytes()}
+                )
+
+    return _spool
+
+
+def spool_event(
+    body: bytes,
+    event_type: str,
+    request_id: str,
+    notification_id: Optional[str],
+    ordering_key: Optional[str] = None,
+    received_at: Optional[datetime] = None
+) -> None:
+    """
+    Spool a webhook for later delivery to Pub/Sub.
+
+    Spooled webhooks are drained concurrently, so they keep their ordering
+    key but may reach the topic after later events for the same container.
+
+    Args:
+        received_at: When the receiver got the webhook (default: now);
+            republished unchanged as the received_at attribute
+
+    Raises:
+        SpoolFullError: If the spool is full
+        RuntimeError: If the spool is not enabled
+        OSError: On filesystem errors
+    """
+    spool = get_spool()
+    if spool is None:
+        raise RuntimeError("Webhook spool is not enabled")
+
+    spooled_at = datetime.utcnow()
+    spool.append(body, {
+        'event_type': event_type,
+        'request_id': request_id,
+        'notification_id': notification_id,
+        'ordering_key': ordering_key,
+        'spooled_at': spooled_at.isoformat(),
+        'received_at': (received_at or spooled_at).isoformat()
+    })
+
+
+def replay_spool_on_startup() -> None:
+    """
+    Start draining segments left behind by a previous process.
+
+    Cheap when the spool is disabled or empty: only the directory listing is
+    read.
+    """
+    if not is_spool_enabled():
+        return
+
+    directory = os.environ.get('SPOOL_DIR', '/tmp/terminal49-webhook-spool')
+    try:
+        leftover = any(
+            name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX)
+            for name in os.listdir(directory)
+        )
+    except FileNotFoundError:
+        return
+
+    if leftover:
+        logger.info("Replaying spooled webhooks from previous process")
+        get_spool()
+
+
+def spool_has_records() -> bool:
+    """Whether the spool is enabled, in use and holds records; no locking."""
+    return _spool is not None and _spool._total_bytes > 0 and is_spool_enabled()
+
+
+def drain_spool_inline() -> None:
+    """
+    Republish spooled webhooks before the current request returns.
+
+    Called at the end of every webhook request. A no-op unless the spool is
+    enabled, in use and holds records. Takes at most the publish latency
+    budget (SPOOL_PUBLISH_BUDGET_SECONDS).
+    """
+    if not spool_has_records():
+        return
+    try:
+        _spool.drain_inline(
+            int(os.environ.get('SPOOL_INLINE_DRAIN_MAX_RECORDS', '50')),
+            get_publish_budget()
+        )
+    except Exception as e:
+        logger.error(
+            "Spool drain error",
+            extra={'error': str(e), 'error_type': type(e).__name__},
+            exc_info=True
+        )
+
+
+def get_spool_stats() -> Optional[Dict[str, Any]]:
+    """Counters for the active spool, or None if it is disabled or unused."""
+    return _spool.get_stats() if _spool is not None and is_spool_enabled() else None
@@ -0,0 +1,327 @@
+"""
+Publisher Configuration for Terminal49 Webhooks
+
+Everything the Pub/Sub publisher clients are built from, resolved from the
+environment once per instance: topic paths, client batch settings, publish
+flow control and the publish retry and timeout policy.
+
+The client library defaults favour persistence over predictability: no flow
+control (a burst buffers without limit), and a failing publish is retried
+with backoff of up to 60 seconds for up to 10 minutes, long after the
+receiver has answered the webhook. The defaults below bound both, so publish
+latency and memory stay predictable under bursts.
+
+Flow control defaults to 'error': a publish over the limit fails at once and
+is handled like any other publish failure (500, or spooled). 'block' waits
+for room with no timeout, which also stalls the ASGI event loop; use it only
+with the Flask entry point.
+
+Environment Variables:
+    GCP_PROJECT_ID: GCP project of the topics
+    PUBSUB_TOPIC: Default topic (default: terminal49-webhook-events)
+    PUBSUB_ENABLE_MESSAGE_ORDERING: Publish with ordering keys (default: false)
+    PUBSUB_PUBLISH_MAX_MESSAGES / PUBSUB_PUBLISH_MAX_BYTES /
+    PUBSUB_PUBLISH_MAX_LATENCY_SECONDS: Batch settings of the live publisher
+        clients; lanes override them individually (default: 100 messages,
+        1 MB, 0.01 s)
+    PUBSUB_BATCH_MAX_MESSAGES / PUBSUB_BATCH_MAX_BYTES /
+    PUBSUB_BATCH_MAX_LATENCY_SECONDS: Batch settings of the publish_batch
+        client (default: 1000 messages, 8 MiB, 0.05 s)
+    PUBSUB_FLOW_CONTROL_MAX_MESSAGES: Messages a live client buffers before
+        flow control applies (default: 1000)
+    PUBSUB_FLOW_CONTROL_MAX_BYTES: Bytes a live client buffers before flow
+        control applies (default: 32 MiB)
+    PUBSUB_FLOW_CONTROL_BEHAVIOR: 'error' (default), 'block' or 'ignore'
+    PUBSUB_RETRY_INITIAL_SECONDS / PUBSUB_RETRY_MAX_SECONDS /
+    PUBSUB_RETRY_MULTIPLIER: Backoff between publish retries (default: 0.1 s,
+        2 s, 2.0)
+    PUBSUB_RETRY_DEADLINE_SECONDS: Time the client keeps retrying a message
+        (default: 30)
+    PUBSUB_RPC_TIMEOUT_SECONDS: Timeout of each publish RPC (default: 10)
+"""
+
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from event_routing import DEFAULT_LANE, Lane
+
+if TYPE_CHECKING:
+    from google.api_core.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOPIC = 'terminal49-webhook-events'
+
+FLOW_CONTROL_BEHAVIORS = ('error', 'block', 'ignore')
+DEFAULT_FLOW_CONTROL_BEHAVIOR = 'error'
+
+# Defaults, overridable by the environment variables listed above
+DEFAULT_BATCH_SETTINGS = {'max_messages': 100, 'max_bytes': 1000 * 1000, 'max_latency': 0.01}
+DEFAULT_REPLAY_BATCH_SETTINGS = {
+    'max_messages': 1000,
+    'max_bytes': 8 * 1024 * 1024,
+    'max_latency': 0.05
+}
+DEFAULT_FLOW_CONTROL = {
+    'max_messages': 1000,
+    'max_bytes': 32 * 1024 * 1024,
+    'behavior': DEFAULT_FLOW_CONTROL_BEHAVIOR
+}
+DEFAULT_RETRY = {'initial': 0.1, 'maximum': 2.0, 'multiplier': 2.0, 'deadline': 30.0}
+DEFAULT_RPC_TIMEOUT_SECONDS = 10.0
+
+# Process-wide configuration (resolved on first use)
+_publisher_config = None
+_publisher_config_lock = threading.Lock()
+
+
+def is_message_ordering_enabled() -> bool:
+    """Whether messages are published with ordering keys."""
+    value = os.environ.get('PUBSUB_ENABLE_MESSAGE_ORDERING', 'false').strip().lower()
+    return value in ('1', 'true', 'yes')
+
+
+class PublisherConfig:
+    """Resolved publisher settings and the topic paths derived from them."""
+
+    def __init__(
+        self,
+        project_id: Optional[str] = None,
+        topic: str = DEFAULT_TOPIC,
+        message_ordering: bool = False,
+        batch_settings: Optional[Dict[str, Any]] = None,
+        replay_batch_settings: Optional[Dict[str, Any]] = None,
+        flow_control: Optional[Dict[str, Any]] = None,
+        retry: Optional[Dict[str, float]] = None,
+        rpc_timeout_seconds: float = DEFAULT_RPC_TIMEOUT_SECONDS
+    ):
+        """
+        Args:
+            project_id: GCP project of the topics
+            topic: Default topic name or full path
+            message_ordering: Whether clients enable message ordering
+            batch_settings: max_messages, max_bytes and max_latency of the
+                live clients (missing keys use DEFAULT_BATCH_SETTINGS)
+            replay_batch_settings: Same, for the publish_batch client
+            flow_control: max_messages, max_bytes and behavior of the live
+                clients
+            retry: initial, maximum, multiplier and deadline (seconds)
+            rpc_timeout_seconds: Timeout of each publish RPC
+
+        Raises:
+            ValueError: If the flow control behavior is unknown
+        """
+        self.project_id = project_id
+        self.topic = topic
+        self.message_ordering = message_ordering
+        self.batch_settings = dict(DEFAULT_BATCH_SETTINGS, **(batch_settings or {}))
+        self.replay_batch_settings = dict(
+            DEFAULT_REPLAY_BATCH_SETTINGS, **(replay_batch_settings or {})
+        )
+        self.flow_control = dict(DEFAULT_FLOW_CONTROL, **(flow_control or {}))
+        if self.flow_control['behavior'] not in FLOW_CONTROL_BEHAVIORS:
+            raise ValueError(f"Unknown flow control behavior '{self.flow_control['behavior']}'")
+        self.retry = dict(DEFAULT_RETRY, **(retry or {}))
+        self.rpc_timeout_seconds = rpc_timeout_seconds
+
+        self._topic_paths: Dict[Tuple[str, Optional[str]], str] = {}
+
+    def topic_path(self, lane: Optional[Lane] = None) -> str:
+        """
+        Full topic path for a lane, resolved once and cached.
+
+        Args:
+            lane: Routing lane; lanes without a topic (including the default
+                lane) publish to the default topic
+
+        Returns:
+            Topic path in format: projects/{project}/topics/{topic}
+
+        Raises:
+            ValueError: If the topic is not a full path and GCP_PROJECT_ID is
+                not configured
+        """
+        lane_topic = lane.topic if lane is not None else None
+        key = (lane.name if lane is not None else DEFAULT_LANE, lane_topic)
+        path = self._topic_paths.get(key)
+        if path is None:
+            path = self._topic_paths[key] = self._resolve_topic_path(lane_topic or self.topic)
+        return path
+
+    def _resolve_topic_path(self, topic: str) -> str:
+        if topic.startswith('projects/'):
+            return topic
+        if not self.project_id:
+            raise ValueError("GCP_PROJECT_ID environment variable not configured")
+        return f"projects/{self.project_id}/topics/{topic}"
+
+    def client_kwargs(
+        self,
+        batch_settings: Optional[Dict[str, Any]] = None,
+        flow_control: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Keyword arguments for pubsub_v1.PublisherClient.
+
+        Args:
+            batch_settings: Settings that override the live client batch
+                settings (e.g. a lane's)
+            flow_control: Whether to apply the flow control limits; the
+                publish_batch client bounds its own in-flight messages
+
+        Returns:
+            Dictionary with batch_settings and publisher_options
+        """
+        from google.cloud import pubsub_v1
+
+        settings = dict(self.batch_settings, **(batch_settings or {}))
+        if flow_control:
+            publish_flow_control = pubsub_v1.types.PublishFlowControl(
+                message_limit=self.flow_control['max_messages'],
+                byte_limit=self.flow_control['max_bytes'],
+                limit_exceeded_behavior=pubsub_v1.types.LimitExceededBehavior(
+                    self.flow_control['behavior']
+                )
+            )
+        else:
+            publish_flow_control = pubsub_v1.types.PublishFlowControl()
+        return {
+            'batch_settings': pubsub_v1.types.BatchSettings(**settings),
+            'publisher_options': pubsub_v1.types.PublisherOptions(
+                enable_message_ordering=self.message_ordering,
+                flow_control=publish_flow_control,
+                retry=self.retry_policy(),
+                timeout=self.rpc_timeout_seconds
+            )
+        }
+
+    def retry_policy(self) -> 'Retry':
+        """Publish retry policy; retries the same errors as the client library default."""
+        from google.api_core import exceptions, retry
+
+        return retry.Retry(
+            initial=self.retry['initial'],
+            maximum=self.retry['maximum'],
+            multiplier=self.retry['multiplier'],
+            timeout=self.retry['deadline'],
+            predicate=retry.if_exception_type(
+                exceptions.Aborted,
+                exceptions.Cancelled,
+                exceptions.DeadlineExceeded,
+                exceptions.InternalServerError,
+                exceptions.ResourceExhausted,
+                exceptions.ServiceUnavailable,
+                exceptions.Unknown
+            )
+        )
+
+    def describe(self) -> Dict[str, Any]:
+        """Configuration for /health."""
+        return {
+            'project_id': self.project_id,
+            'topic': self.topic,
+            'topic_paths': {name: path for (name, _), path in self._topic_paths.items()},
+            'message_ordering': self.message_ordering,
+            'batch_settings': dict(self.batch_settings),
+            'replay_batch_settings': dict(self.replay_batch_settings),
+            'flow_control': dict(self.flow_control),
+            'retry': dict(self.retry),
+            'rpc_timeout_seconds': self.rpc_timeout_seconds
+        }
+
+
+def get_publisher_config() -> PublisherConfig:
+    """
+    Get or create the process-wide configuration from the environment.
+
+    An unknown PUBSUB_FLOW_CONTROL_BEHAVIOR is logged and replaced by the
+    default rather than failing every publish.
+
+    Returns:
+        PublisherConfig
+    """
+    global _publisher_config
+
+    if _publisher_config is None:
+        with _publisher_config_lock:
+            if _publisher_config is None:
+                _publisher_config = _load_config()
+                logger.info(
+                    "Pub/Sub publisher configuration resolved",
+                    extra={'publisher_config': _publisher_config.describe()}
+                )
+
+    return _publisher_config
+
+
+def _load_config() -> PublisherConfig:
+    behavior = os.environ.get(
+        'PUBSUB_FLOW_CONTROL_BEHAVIOR', DEFAULT_FLOW_CONTROL_BEHAVIOR
+    ).strip().lower()
+    if behavior not in FLOW_CONTROL_BEHAVIORS:
+        logger.warning(
+            "Unknown PUBSUB_FLOW_CONTROL_BEHAVIOR, using default",
+            extra={'value': behavior, 'default': DEFAULT_FLOW_CONTROL_BEHAVIOR}
+        )
+        behavior = DEFAULT_FLOW_CONTROL_BEHAVIOR
+
+    return PublisherConfig(
+        project_id=os.environ.get('GCP_PROJECT_ID'),
+        topic=os.environ.get('PUBSUB_TOPIC', DEFAULT_TOPIC),
+        message_ordering=is_message_ordering_enabled(),
+        batch_settings=_batch_settings_from_env('PUBSUB_PUBLISH', DEFAULT_BATCH_SETTINGS),
+        replay_batch_settings=_batch_settings_from_env(
+            'PUBSUB_BATCH', DEFAULT_REPLAY_BATCH_SETTINGS
+        ),
+        flow_control={
+            'max_messages': _env_number(
+                'PUBSUB_FLOW_CONTROL_MAX_MESSAGES', DEFAULT_FLOW_CONTROL['max_messages']
+            ),
+            'max_bytes': _env_number(
+                'PUBSUB_FLOW_CONTROL_MAX_BYTES', DEFAULT_FLOW_CONTROL['max_bytes']
+            ),
+            'behavior': behavior
+        },
+        retry={
+            'initial': _env_number('PUBSUB_RETRY_INITIAL_SECONDS', DEFAULT_RETRY['initial']),
+            'maximum': _env_number('PUBSUB_RETRY_MAX_SECONDS', DEFAULT_RETRY['maximum']),
+            'multiplier': _env_number('PUBSUB_RETRY_MULTIPLIER', DEFAULT_RETRY['multiplier']),
+            'deadline': _env_number('PUBSUB_RETRY_DEADLINE_SECONDS', DEFAULT_RETRY['deadline'])
+        },
+        rpc_timeout_seconds=_env_number('PUBSUB_RPC_TIMEOUT_SECONDS', DEFAULT_RPC_TIMEOUT_SECONDS)
+    )
+
+
+def _batch_settings_from_env(prefix: str, defaults: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'max_messages': _env_number(f'{prefix}_MAX_MESSAGES', defaults['max_messages']),
+        'max_bytes': _env_number(f'{prefix}_MAX_BYTES', defaults['max_bytes']),
+        'max_latency': _env_number(f'{prefix}_MAX_LATENCY_SECONDS', defaults['max_latency'])
+    }
+
+
+def _env_number(name: str, default: Any) -> Any:
+    """Environment variable parsed as the type of its default."""
+    value = os.environ.get(name)
+    return default if value is None else type(default)(value)
+
+
+def set_publisher_config(config: Optional[PublisherConfig]) -> None:
+    """
+    Replace the process-wide configuration.
+
+    Args:
+        config: Configuration to use, or None to resolve it from the
+            environment on next use (clients already created keep theirs)
+    """
+    global _publisher_config
+
+    with _publisher_config_lock:
+        _publisher_config = config
+
+
+def get_publisher_config_stats() -> Dict[str, Any]:
+    """Publisher configuration for /health."""
+    return get_publisher_config().describe()
@@ -9,67 +9,489 @@ Features:
 - Message attributes for filtering and routing
 - Structured error handling
 - Performance monitoring
+- Optional non-blocking publish mode with a bounded in-flight window
+- Per-entity ordering keys (see ordering_keys)
+- Event-type routing to per-lane topics and publisher settings (see event_routing)
+
+Environment Variables:
+    PUBSUB_PUBLISH_MODE: 'blocking' (default) waits for the Pub/Sub ack before
+        returning; 'non_blocking' returns once the message is handed to the client
+    PUBSUB_MAX_IN_FLIGHT: Maximum unacknowledged publishes in non-blocking mode
+        (default: 1000)
+    PUBSUB_FLUSH_TIMEOUT_SECONDS: Time allowed to drain in-flight publishes on
+        instance shutdown (default: 10)
+    PUBSUB_COMPRESSION: Message body compression: 'none' (default), 'gzip' or
+        'zstd'. Compressed messages carry a content_encoding attribute.
+    PUBSUB_COMPRESSION_LEVEL: Compression level (default: 6 for gzip, 3 for zstd)
+    PUBSUB_COMPRESSION_MIN_BYTES: Bodies smaller than this are sent uncompressed
+        (default: 1024)
+    PUBSUB_ENABLE_MESSAGE_ORDERING: Publish with per-container/shipment ordering
+        keys (default: false). The subscription must have message ordering
+        enabled for the keys to affect delivery.
+    PUBSUB_ROUTING_CONFIG: Lanes and event-type routing rules (see event_routing)
+    PUBSUB_PUBLISH_*, PUBSUB_BATCH_MAX_*, PUBSUB_FLOW_CONTROL_*, PUBSUB_RETRY_*,
+    PUBSUB_RPC_TIMEOUT_SECONDS: Client batch settings, flow control and retry
+        policy (see publisher_config)
+    PUBSUB_BATCH_MAX_IN_FLIGHT: Unacknowledged messages publish_batch keeps
+        in flight (default: 5000)
+    PUBSUB_BATCH_DEADLINE_SECONDS: Default deadline for a whole
+        publish_batch call (default: 600)
 """
 
+import asyncio
+import atexit
+import gzip
 import json
 import logging
 import os
+import threading
+import time
 from datetime import datetime
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Callable, Dict, Any, List, Optional, Tuple, Union
+
+from event_routing import DEFAULT_LANE, Lane, get_event_router
+from ordering_keys import ordering_key_for_body, ordering_key_for_payload
+from payload_sniffer import sniff_event_metadata
+from publisher_config import get_publisher_config, is_message_ordering_enabled
 
-from google.cloud import pubsub_v1
-from google.api_core import retry
-from google.api_core.exceptions import GoogleAPIError
+# google-cloud-pubsub (and the gRPC stack under it) takes a few hundred
+# milliseconds to import, so it is imported on first publish rather than at
+# cold start; /health never needs it.
+if TYPE_CHECKING:
+    from google.cloud import pubsub_v1
 
 logger = logging.getLogger(__name__)
 
 # Initialize publisher client (reused across invocations)
 _publisher_client = None
 
+# Clients for lanes with their own batch settings, keyed by lane name
+_lane_publisher_clients: Dict[str, Any] = {}
+_lane_publisher_clients_lock = threading.Lock()
+
+# Throughput-oriented client used by publish_batch (created on first use)
+_batch_publisher_client = None
+
+PUBLISH_MODE_BLOCKING = 'blocking'
+PUBLISH_MODE_NON_BLOCKING = 'non_blocking'
+
+# Seconds to wait for a Pub/Sub ack (blocking mode) or a free in-flight slot
+PUBLISH_TIMEOUT_SECONDS = 5.0
+
+# In-flight window for non-blocking publishes (created on first use)
+_in_flight_slots: Optional[threading.BoundedSemaphore] = None
+_in_flight_lock = threading.Lock()
+_in_flight_drained = threading.Condition(_in_flight_lock)
+_in_flight_count = 0
+_publish_stats = {
+    'submitted': 0,
+    'succeeded': 0,
+    'failed': 0,
+    'rejected': 0
+}
+
+
+CONTENT_ENCODING_GZIP = 'gzip'
+CONTENT_ENCODING_ZSTD = 'zstd'
+
+_DEFAULT_COMPRESSION_LEVELS = {
+    CONTENT_ENCODING_GZIP: 6,
+    CONTENT_ENCODING_ZSTD: 3
+}
+
+# zstd compressors keyed by level (zstandard is optional)
+_zstd_compressors: Dict[int, Any] = {}
+
 
-def get_publisher_client() -> pubsub_v1.PublisherClient:
+class PublishBackpressureError(RuntimeError):
+    """Raised when the non-blocking in-flight window stays full past the timeout."""
+
+
+class BatchDeadlineExceededError(TimeoutError):
+    """Raised for (recorded on) batch messages not acknowledged before the deadline."""
+
+
+class BatchPublishResult:
+    """Outcome of one event passed to publish_batch."""
+    
+    def __init__(self, index: int, event_type: str):
+        self.index = index
+        self.event_type = event_type
+        self.message_id: Optional[str] = None
+        self.error: Optional[Exception] = None
+    
+    @property
+    def succeeded(self) -> bool:
+        return self.message_id is not None
+    
+    def __repr__(self) -> str:
+        outcome = self.message_id if self.succeeded else repr(self.error)
+        return f"BatchPublishResult(index={self.index}, {outcome})"
+
+
+def get_publisher_client(lane: Optional[Lane] = None) -> 'pubsub_v1.PublisherClient':
     """
     Get or create Pub/Sub publisher client.
     
-    The client is cached to improve performance across function invocations.
+    The client is cached to improve performance across function invocations
+    and built from the publisher configuration (see publisher_config). Lanes
+    with their own batch settings get a dedicated client; all other lanes
+    share the default one.
+    
+    Args:
+        lane: Routing lane the client publishes for (default: default lane)
     
     Returns:
         PublisherClient instance
     """
     global _publisher_client
     
+    if lane is not None and lane.batch_settings():
+        return _get_lane_publisher_client(lane)
+    
     if _publisher_client is None:
-        _publisher_client = pubsub_v1.PublisherClient()
-        logger.info("Pub/Sub publisher client initialized")
+        from google.cloud import pubsub_v1
+        
+        config = get_publisher_config()
+        _publisher_client = pubsub_v1.PublisherClient(**config.client_kwargs())
+        logger.info(
+            "Pub/Sub publisher client initialized",
+            extra={
+                'message_ordering': config.message_ordering,
+                'batch_settings': config.batch_settings,
+                'flow_control': config.flow_control
+            }
+        )
     
     return _publisher_client
 
 
-def get_topic_path() -> str:
+def _get_lane_publisher_client(lane: Lane) -> 'pubsub_v1.PublisherClient':
+    """
+    Get or create the dedicated client for a lane with its own batch settings.
+    
+    Batch settings the lane leaves unset, flow control and the retry policy
+    come from the publisher configuration.
+    
+    Args:
+        lane: Routing lane
+        
+    Returns:
+        PublisherClient instance
+    """
+    client = _lane_publisher_clients.get(lane.name)
+    if client is None:
+        with _lane_publisher_clients_lock:
+            client = _lane_publisher_clients.get(lane.name)
+            if client is None:
+                from google.cloud import pubsub_v1
+                
+                client = pubsub_v1.PublisherClient(
+                    **get_publisher_config().client_kwargs(lane.batch_settings())
+                )
+                _lane_publisher_clients[lane.name] = client
+                logger.info(
+                    "Pub/Sub lane publisher client initialized",
+                    extra={'lane': lane.name, 'batch_settings': lane.batch_settings()}
+                )
+    return client
+
+
+def get_batch_settings() -> Dict[str, Any]:
+    """
+    Client batch settings for publish_batch.
+    
+    Returns:
+        Dictionary of max_messages, max_bytes and max_latency (seconds)
+    """
+    return dict(get_publisher_config().replay_batch_settings)
+
+
+def _get_batch_publisher_client() -> 'pubsub_v1.PublisherClient':
+    """
+    Get or create the client used by publish_batch.
+    
+    Separate from the receiver's clients so replays batch for throughput
+    (get_batch_settings) without changing the latency of live webhooks.
+    publish_batch bounds its own in-flight messages, so client flow control
+    is left off.
+    
+    Returns:
+        PublisherClient instance
+    """
+    global _batch_publisher_client
+    
+    if _batch_publisher_client is None:
+        with _lane_publisher_clients_lock:
+            if _batch_publisher_client is None:
+                from google.cloud import pubsub_v1
+                
+                batch_settings = get_batch_settings()
+                _batch_publisher_client = pubsub_v1.PublisherClient(
+                    **get_publisher_config().client_kwargs(batch_settings, flow_control=False)
+                )
+                logger.info(
+                    "Pub/Sub batch publisher client initialized",
+                    extra={'batch_settings': batch_settings}
+                )
+    
+    return _batch_publisher_client
+
+
+def get_topic_path(lane: Optional[Lane] = None) -> str:
     """
     Get the full Pub/Sub topic path.
     
+    Paths are resolved once per lane by the publisher configuration.
+    
+    Args:
+        lane: Routing lane; lanes without a topic (including the default
+            lane) publish to PUBSUB_TOPIC
+    
     Returns:
         Full topic path in format: projects/{project}/topics/{topic}
         
     Raises:
         ValueError: If required environment variables are not set
     """
-    project_id = os.environ.get('GCP_PROJECT_ID')
-    topic_name = os.environ.get('PUBSUB_TOPIC', 'terminal49-webhook-events')
+    return get_publisher_config().topic_path(lane)
+
+
+def warm_up_publishers() -> None:
+    """
+    Create the publisher client and topic path for every routing lane.
+    
+    Run by warmup after the first request so the first publish on each lane
+    does not pay for importing the client library and creating its client.
+    """
+    for lane in get_event_router().lanes.values():
+        get_publisher_client(lane)
+        get_topic_path(lane)
+
+
+def probe_topics(timeout: float) -> Dict[str, Any]:
+    """
+    Health probe: fetch the topic of every routing lane from Pub/Sub.
+    
+    Each distinct topic is fetched once, without retries, so the probe
+    reports how Pub/Sub answers right now. Requires pubsub.topics.get on the
+    topics (roles/pubsub.viewer).
+    
+    Args:
+        timeout: Timeout of each request in seconds
+        
+    Returns:
+        Dictionary with the topic path and fetch latency of each lane
+        
+    Raises:
+        GoogleAPIError: If a topic does not exist or Pub/Sub does not answer
+    """
+    topics: Dict[str, Dict[str, Any]] = {}
+    fetched: Dict[str, float] = {}
+    for lane in get_event_router().lanes.values():
+        topic_path = get_topic_path(lane)
+        if topic_path not in fetched:
+            start = time.monotonic()
+            get_publisher_client(lane).get_topic(
+                request={'topic': topic_path}, retry=None, timeout=timeout
+            )
+            fetched[topic_path] = round((time.monotonic() - start) * 1000, 1)
+        topics[lane.name] = {'topic': topic_path, 'latency_ms': fetched[topic_path]}
+    return {'topics': topics}
+
+
+def get_publish_mode() -> str:
+    """
+    Get the configured publish mode.
+    
+    Unknown values fall back to blocking so a typo never weakens delivery
+    guarantees.
+    
+    Returns:
+        PUBLISH_MODE_BLOCKING or PUBLISH_MODE_NON_BLOCKING
+    """
+    mode = os.environ.get('PUBSUB_PUBLISH_MODE', PUBLISH_MODE_BLOCKING).strip().lower()
+    if mode == PUBLISH_MODE_NON_BLOCKING:
+        return PUBLISH_MODE_NON_BLOCKING
+    return PUBLISH_MODE_BLOCKING
+
+
+def _get_in_flight_slots() -> threading.BoundedSemaphore:
+    """
+    Get or create the semaphore bounding non-blocking publishes.
     
-    if not project_id:
-        raise ValueError("GCP_PROJECT_ID environment variable not configured")
+    The flush-on-shutdown hook is registered together with the window so
+    blocking-mode instances never pay for it.
     
-    publisher = get_publisher_client()
-    return publisher.topic_path(project_id, topic_name)
+    Returns:
+        BoundedSemaphore sized by PUBSUB_MAX_IN_FLIGHT
+    """
+    global _in_flight_slots
+    
+    if _in_flight_slots is None:
+        with _in_flight_lock:
+            if _in_flight_slots is None:
+                max_in_flight = int(os.environ.get('PUBSUB_MAX_IN_FLIGHT', '1000'))
+                _in_flight_slots = threading.BoundedSemaphore(max(1, max_in_flight))
+                atexit.register(flush_pending_publishes)
+                logger.info(
+                    "Non-blocking publish window initialized",
+                    extra={'max_in_flight': max_in_flight}
+                )
+    
+    return _in_flight_slots
+
+
+def _resume_ordering_key(
+    topic_path: str,
+    ordering_key: str,
+    lane: Optional[Lane] = None
+) -> None:
+    """
+    Resume publishing on an ordering key after a failed publish.
+    
+    The client pauses a key when a publish on it fails, rejecting every later
+    message with that key until it is resumed. Terminal49 redelivers the
+    failed webhook, so the key is resumed immediately rather than blocking
+    all further events for the container.
+    
+    Args:
+        topic_path: Full Pub/Sub topic path
+        ordering_key: Key of the failed message
+        lane: Routing lane the message was published on
+    """
+    try:
+        get_publisher_client(lane).resume_publish(topic_path, ordering_key)
+    except (RuntimeError, ValueError):
+        # Key was not paused (e.g. the publish timed out rather than failed)
+        return
+    
+    logger.warning(
+        "Resumed publishing on ordering key after failure",
+        extra={'ordering_key': ordering_key}
+    )
+
+
+def _on_publish_done(
+    future,
+    request_id: str,
+    event_type: str,
+    topic_path: Optional[str] = None,
+    ordering_key: Optional[str] = None,
+    lane: Optional[Lane] = None,
+    on_failure: Optional[Callable[[BaseException], Any]] = None
+) -> None:
+    """
+    Completion callback for non-blocking publishes.
+    
+    Releases the in-flight slot, records the outcome and passes a failure on
+    to on_failure. Runs on the publisher client's callback thread, so it must
+    never raise.
+    
+    Args:
+        future: Publish future returned by the client
+        request_id: Request correlation ID
+        event_type: Terminal49 event type
+        topic_path: Topic the message was published to
+        ordering_key: Ordering key of the message, if any
+        lane: Routing lane the message was published on
+        on_failure: Called with the error if the publish failed
+    """
+    global _in_flight_count
+    
+    error = future.exception()
+    
+    with _in_flight_lock:
+        _in_flight_count -= 1
+        if error is None:
+            _publish_stats['succeeded'] += 1
+        else:
+            _publish_stats['failed'] += 1
+        if _in_flight_count == 0:
+            _in_flight_drained.notify_all()
+    
+    _get_in_flight_slots().release()
+    
+    if error is not None:
+        if ordering_key:
+            _resume_ordering_key(topic_path, ordering_key, lane)
+        logger.error(
+            "Non-blocking publish failed",
+            extra={
+                'request_id': request_id,
+                'event_type': event_type,
+                'lane': lane.name if lane is not None else DEFAULT_LANE,
+                'error': str(error),
+                'error_type': type(error).__name__
+            }
+        )
+        if on_failure is not None:
+            try:
+                on_failure(error)
+            except Exception as e:
+                logger.error(
+                    "Publish failure handler failed",
+                    extra={
+                        'request_id': request_id,
+                        'event_type': event_type,
+                        'error': str(e),
+                        'error_type': type(e).__name__
+                    },
+                    exc_info=True
+                )
+
+
+def get_publish_stats() -> Dict[str, int]:
+    """
+    Get a snapshot of non-blocking publish counters.
+    
+    Returns:
+        Dictionary with submitted/succeeded/failed/rejected counts and the
+        current number of in-flight publishes
+    """
+    with _in_flight_lock:
+        stats = dict(_publish_stats)
+        stats['in_flight'] = _in_flight_count
+    return stats
+
+
+def flush_pending_publishes(timeout: Optional[float] = None) -> bool:
+    """
+    Wait for all in-flight non-blocking publishes to complete.
+    
+    Registered with atexit so an instance that is shutting down gets a chance
+    to deliver messages it has already acknowledged to Terminal49.
+    
+    Args:
+        timeout: Seconds to wait (default: PUBSUB_FLUSH_TIMEOUT_SECONDS or 10)
+        
+    Returns:
+        True if nothing is left in flight, False if the timeout expired
+    """
+    if timeout is None:
+        timeout = float(os.environ.get('PUBSUB_FLUSH_TIMEOUT_SECONDS', '10'))
+    
+    deadline = time.monotonic() + timeout
+    
+    with _in_flight_lock:
+        while _in_flight_count > 0:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(
+                    "Timed out flushing in-flight publishes",
+                    extra={'in_flight': _in_flight_count}
+                )
+                return False
+            _in_flight_drained.wait(remaining)
+    
+    return True
 
 
 def publish_event(
     payload: Dict[str, Any],
     event_type: str,
     request_id: str
-) -> str:
+) -> Optional[str]:
     """
     Publishes webhook event to Pub/Sub.
     
@@ -77,6 +499,16 @@ def publish_event(
     - event_type: Type of Terminal49 event
     - request_id: Correlation ID for tracking
     - timestamp: ISO 8601 timestamp of publication
+    - lane: Routing lane the event was published on
+    
+    The topic is chosen by the event-type routing table (see event_routing).
+    
+    With message ordering enabled, the ordering key is derived from the
+    container or shipment the payload refers to (see ordering_keys).
+    
+    In non-blocking mode (PUBSUB_PUBLISH_MODE=non_blocking) the call returns as
+    soon as the message is handed to the publisher client. Delivery failures
+    are then recorded by the completion callback instead of being raised.
     
     Args:
         payload: Parsed webhook payload (dict)
@@ -84,10 +516,11 @@ def publish_event(
         request_id: Request correlation ID
         
     Returns:
-        Message ID from Pub/Sub
+        Message ID from Pub/Sub, or None in non-blocking mode
         
     Raises:
         GoogleAPIError: If publishing fails after retries
+        PublishBackpressureError: If the non-blocking in-flight window is full
         ValueError: If configuration is invalid
         
     Example:
@@ -96,47 +529,110 @@ def publish_event(
         >>> print(message_id)
         "1234567890"
     """
+    # Extract additional metadata if available
+    notification_id = None
+    if 'data' in payload and 'id' in payload['data']:
+        notification_id = payload['data']['id']
+    
+    ordering_key = None
+    if is_message_ordering_enabled():
+        ordering_key = ordering_key_for_payload(payload)
+    
+    return publish_raw_event(
+        json.dumps(payload).encode('utf-8'),
+        event_type,
+        request_id,
+        notification_id=notification_id,
+        ordering_key=ordering_key
+    )
+
+
+def publish_raw_event(
+    body: bytes,
+    event_type: str,
+    request_id: str,
+    notification_id: Optional[str] = None,
+    timeout: Optional[float] = None,
+    blocking: Optional[bool] = None,
+    extra_attributes: Optional[Dict[str, str]] = None,
+    ordering_key: Optional[str] = None,
+    on_failure: Optional[Callable[[BaseException], Any]] = None
+) -> Optional[str]:
+    """
+    Publishes an already-serialized webhook body to Pub/Sub unchanged.
+    
+    This is the receiver's hot path: the bytes Terminal49 signed are forwarded
+    as the message data, so the payload is never re-encoded. The event
+    processor parses the message data as JSON either way. If
+    PUBSUB_COMPRESSION is set, the body is compressed and the encoding is
+    recorded in the content_encoding attribute.
+    
+    Args:
+        body: Raw request body exactly as received
+        event_type: Terminal49 event type
+        request_id: Request correlation ID
+        notification_id: Terminal49 notification ID (data.id), if known
+        timeout: Seconds to wait for the Pub/Sub ack in blocking mode
+            (default: the lane's publish_timeout_seconds, else
+            PUBLISH_TIMEOUT_SECONDS), or for an in-flight slot in
+            non-blocking mode (default: PUBLISH_TIMEOUT_SECONDS)
+        blocking: Force blocking (True) or non-blocking (False) publishing;
+            None uses PUBSUB_PUBLISH_MODE
+        extra_attributes: Additional message attributes
+        ordering_key: Pub/Sub ordering key; ignored unless message ordering
+            is enabled. On failure the key is resumed before raising.
+        on_failure: Non-blocking mode only: called with the error, on the
+            client's callback thread, if the publish fails after this
+            function has returned
+        
+    Returns:
+        Message ID from Pub/Sub, or None in non-blocking mode
+        
+    Raises:
+        GoogleAPIError: If publishing fails after retries
+        PublishBackpressureError: If the non-blocking in-flight window is full
+        ValueError: If configuration is invalid
+    """
     start_time = datetime.utcnow()
+    topic_path = None
+    lane = None
+    
+    if not is_message_ordering_enabled():
+        ordering_key = None
     
     try:
-        # Get topic path
-        topic_path = get_topic_path()
-        
-        # Serialize payload to JSON bytes
-        message_data = json.dumps(payload).encode('utf-8')
+        # Route by event type, then resolve the lane's topic
+        lane = get_event_router().route(event_type)
+        topic_path = get_topic_path(lane)
         
-        # Prepare message attributes
-        attributes = {
-            'event_type': event_type,
-            'request_id': request_id,
-            'timestamp': datetime.utcnow().isoformat(),
-            'source': 'webhook_receiver'
-        }
+        message_data, attributes = _build_message(
+            body, event_type, request_id, lane, topic_path, notification_id,
+            extra_attributes, ordering_key
+        )
         
-        # Extract additional metadata if available
-        if 'data' in payload and 'id' in payload['data']:
-            attributes['notification_id'] = payload['data']['id']
+        if blocking is None:
+            blocking = get_publish_mode() == PUBLISH_MODE_BLOCKING
         
-        logger.info(
-            "Publishing event to Pub/Sub",
-            extra={
-                'request_id': request_id,
-                'event_type': event_type,
-                'topic_path': topic_path,
-                'message_size_bytes': len(message_data)
-            }
-        )
+        if not blocking:
+            _submit_non_blocking(
+                topic_path, message_data, attributes, request_id, event_type, ordering_key,
+                lane, timeout, on_failure
+            )
+            return None
         
         # Publish with retry configuration
-        publisher = get_publisher_client()
+        publisher = get_publisher_client(lane)
         future = publisher.publish(
             topic_path,
             message_data,
+            ordering_key=ordering_key or '',
             **attributes
         )
         
         # Wait for publish to complete (with timeout)
-        message_id = future.result(timeout=5.0)
+        if timeout is None:
+            timeout = lane.publish_timeout_seconds or PUBLISH_TIMEOUT_SECONDS
+        message_id = future.result(timeout=timeout)
         
         # Calculate publish duration
         duration_ms = (datetime.utcnow() - start_time).total_seconds() * 1000
@@ -153,21 +649,119 @@ def publish_event(
         
         return message_id
         
-    except GoogleAPIError as e:
+    except Exception as e:
+        if ordering_key and topic_path:
+            _resume_ordering_key(topic_path, ordering_key, lane)
+        if _is_google_api_error(e):
+            logger.error(
+                "Failed to publish to Pub/Sub",
+                extra={
+                    'request_id': request_id,
+                    'event_type': event_type,
+                    'error': str(e),
+                    'error_code': e.code if hasattr(e, 'code') else None
+                }
+            )
+            raise
         logger.error(
-            "Failed to publish to Pub/Sub",
+            "Unexpected error publishing to Pub/Sub",
             extra={
                 'request_id': request_id,
                 'event_type': event_type,
                 'error': str(e),
-                'error_code': e.code if hasattr(e, 'code') else None
+                'error_type': type(e).__name__
             }
         )
         raise
+
+
+def _is_google_api_error(error: Exception) -> bool:
+    """Whether error is a GoogleAPIError, without importing google.api_core for other errors."""
+    if not type(error).__module__.startswith('google.'):
+        return False
+    from google.api_core.exceptions import GoogleAPIError
+    return isinstance(error, GoogleAPIError)
+
+
+async def publish_raw_event_async(
+    body: bytes,
+    event_type: str,
+    request_id: str,
+    notification_id: Optional[str] = None,
+    timeout: Optional[float] = None,
+    extra_attributes: Optional[Dict[str, str]] = None,
+    ordering_key: Optional[str] = None
+) -> str:
+    """
+    Asyncio counterpart of publish_raw_event for the ASGI receiver.
+    
+    The message is handed to the same publisher client, whose batching runs
+    on its own threads; the caller awaits the ack without holding a thread.
+    PUBSUB_PUBLISH_MODE does not apply: the ack is always awaited.
+    
+    Args:
+        body: Raw request body exactly as received
+        event_type: Terminal49 event type
+        request_id: Request correlation ID
+        notification_id: Terminal49 notification ID (data.id), if known
+        timeout: Seconds to wait for the Pub/Sub ack (default: the lane's
+            publish_timeout_seconds, else PUBLISH_TIMEOUT_SECONDS)
+        extra_attributes: Additional message attributes
+        ordering_key: Pub/Sub ordering key; ignored unless message ordering
+            is enabled. On failure the key is resumed before raising.
+        
+    Returns:
+        Message ID from Pub/Sub
+        
+    Raises:
+        GoogleAPIError: If publishing fails after retries
+        asyncio.TimeoutError: If the ack does not arrive within the timeout
+        ValueError: If configuration is invalid
+    """
+    start_time = datetime.utcnow()
+    topic_path = None
+    lane = None
+    
+    if not is_message_ordering_enabled():
+        ordering_key = None
+    
+    try:
+        lane = get_event_router().route(event_type)
+        topic_path = get_topic_path(lane)
+        
+        message_data, attributes = _build_message(
+            body, event_type, request_id, lane, topic_path, notification_id,
+            extra_attributes, ordering_key
+        )
+        
+        future = get_publisher_client(lane).publish(
+            topic_path,
+            message_data,
+            ordering_key=ordering_key or '',
+            **attributes
+        )
+        
+        if timeout is None:
+            timeout = lane.publish_timeout_seconds or PUBLISH_TIMEOUT_SECONDS
+        message_id = await _as_awaitable(future, timeout)
+        
+        logger.info(
+            "Event published successfully",
+            extra={
+                'request_id': request_id,
+                'event_type': event_type,
+                'message_id': message_id,
+                'publish_duration_ms': (datetime.utcnow() - start_time).total_seconds() * 1000
+            }
+        )
+        
+        return message_id
         
     except Exception as e:
+        if ordering_key and topic_path:
+            _resume_ordering_key(topic_path, ordering_key, lane)
         logger.error(
-            "Unexpected error publishing to Pub/Sub",
+            "Failed to publish to Pub/Sub",
             extra={
                 'request_id': request_id,
                 'event_type': event_type,
@@ -178,43 +772,410 @@ def publish_event(
         raise
 
 
-def publish_batch(
-    events: list[Dict[str, Any]],
-    request_id: str
-) -> list[str]:
+def _as_awaitable(future, timeout: float) -> 'asyncio.Future':
+    """
+    Bridge a publisher future, resolved on a client thread, to the running loop.
+    
+    The timeout is a timer on the loop rather than asyncio.wait_for, which
+    would wrap every publish in an extra Task.
+    """
+    loop = asyncio.get_running_loop()
+    result = loop.create_future()
+    
+    def _copy(done_future):
+        timer.cancel()
+        if result.done():
+            return
+        error = done_future.exception()
+        if error is not None:
+            result.set_exception(error)
+        else:
+            result.set_result(done_future.result())
+    
+    def _expire():
+        if not result.done():
+            result.set_exception(
+                asyncio.TimeoutError(f"Pub/Sub ack not received within {timeout}s")
+            )
+    
+    timer = loop.call_later(timeout, _expire)
+    future.add_done_callback(lambda f: loop.call_soon_threadsafe(_copy, f))
+    return result
+
+
+def _build_message(
+    body: bytes,
+    event_type: str,
+    request_id: str,
+    lane: Lane,
+    topic_path: str,
+    notification_id: Optional[str],
+    extra_attributes: Optional[Dict[str, str]],
+    ordering_key: Optional[str],
+    log: bool = True
+) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Encode the message data and build the attributes for a raw webhook body.
+    
+    publish_batch passes log=False and logs once per batch instead.
     """
-    Publish multiple events in batch for improved performance.
+    message_data, content_encoding = encode_message_data(body)
     
-    Note: This is an optimization for future use. Currently, webhooks
-    arrive one at a time, but batch publishing may be useful for
-    reprocessing scenarios.
+    # Prepare message attributes
+    attributes = {
+        'event_type': event_type,
+        'request_id': request_id,
+        'timestamp': datetime.utcnow().isoformat(),
+        'source': 'webhook_receiver',
+        'lane': lane.name
+    }
+    
+    if notification_id is not None:
+        attributes['notification_id'] = notification_id
+    
+    if content_encoding is not None:
+        attributes['content_encoding'] = content_encoding
+    
+    if extra_attributes:
+        attributes.update(extra_attributes)
+    
+    if not log:
+        return message_data, attributes
+    
+    logger.info(
+        "Publishing event to Pub/Sub",
+        extra={
+            'request_id': request_id,
+            'event_type': event_type,
+            'lane': lane.name,
+            'topic_path': topic_path,
+            'message_size_bytes': len(message_data),
+            'body_size_bytes': len(body),
+            'ordering_key': ordering_key
+        }
+    )
+    
+    return message_data, attributes
+
+
+def _get_compression() -> Optional[str]:
+    """
+    Get the configured message compression.
+    
+    zstd needs the optional zstandard package; without it gzip is used.
+    
+    Returns:
+        CONTENT_ENCODING_GZIP, CONTENT_ENCODING_ZSTD or None
+    """
+    compression = os.environ.get('PUBSUB_COMPRESSION', 'none').strip().lower()
+    
+    if compression == CONTENT_ENCODING_ZSTD:
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            logger.warning("zstandard not installed, falling back to gzip compression")
+            return CONTENT_ENCODING_GZIP
+        return CONTENT_ENCODING_ZSTD
+    
+    if compression == CONTENT_ENCODING_GZIP:
+        return CONTENT_ENCODING_GZIP
+    
+    return None
+
+
+def encode_message_data(body: bytes) -> Tuple[bytes, Optional[str]]:
+    """
+    Compress a message body according to PUBSUB_COMPRESSION.
     
     Args:
-        events: List of (payload, event_type) tuples
-        request_id: Request correlation ID
+        body: Serialized message body
         
     Returns:
-        List of message IDs
+        Tuple of (message_data, content_encoding); content_encoding is None
+        when the body is sent as-is
+    """
+    compression = _get_compression()
+    if compression is None:
+        return body, None
+    
+    if len(body) < int(os.environ.get('PUBSUB_COMPRESSION_MIN_BYTES', '1024')):
+        return body, None
+    
+    level = int(os.environ.get(
+        'PUBSUB_COMPRESSION_LEVEL',
+        str(_DEFAULT_COMPRESSION_LEVELS[compression])
+    ))
+    
+    if compression == CONTENT_ENCODING_ZSTD:
+        compressor = _zstd_compressors.get(level)
+        if compressor is None:
+            import zstandard
+            compressor = _zstd_compressors.setdefault(
+                level, zstandard.ZstdCompressor(level=level)
+            )
+        return compressor.compress(body), CONTENT_ENCODING_ZSTD
+    
+    # mtime=0 keeps output deterministic for identical bodies
+    return gzip.compress(body, compresslevel=level, mtime=0), CONTENT_ENCODING_GZIP
+
+
+def _submit_non_blocking(
+    topic_path: str,
+    message_data: bytes,
+    attributes: Dict[str, str],
+    request_id: str,
+    event_type: str,
+    ordering_key: Optional[str] = None,
+    lane: Optional[Lane] = None,
+    timeout: Optional[float] = None,
+    on_failure: Optional[Callable[[BaseException], Any]] = None
+) -> None:
+    """
+    Hand a message to the publisher client without waiting for the ack.
+    
+    Args:
+        topic_path: Full Pub/Sub topic path
+        message_data: Serialized message body
+        attributes: Message attributes
+        request_id: Request correlation ID
+        event_type: Terminal49 event type
+        ordering_key: Pub/Sub ordering key, if any
+        lane: Routing lane the message is published on
+        timeout: Seconds to wait for an in-flight slot (default:
+            PUBLISH_TIMEOUT_SECONDS)
+        on_failure: Called with the error if the publish later fails
         
     Raises:
-        GoogleAPIError: If publishing fails
+        PublishBackpressureError: If no in-flight slot frees up in time
     """
-    message_ids = []
+    global _in_flight_count
+    
+    slots = _get_in_flight_slots()
+    if not slots.acquire(timeout=timeout if timeout is not None else PUBLISH_TIMEOUT_SECONDS):
+        with _in_flight_lock:
+            _publish_stats['rejected'] += 1
+        raise PublishBackpressureError("Pub/Sub in-flight publish window is full")
+    
+    with _in_flight_lock:
+        _in_flight_count += 1
+        _publish_stats['submitted'] += 1
     
-    for payload, event_type in events:
+    try:
+        future = get_publisher_client(lane).publish(
+            topic_path,
+            message_data,
+            ordering_key=ordering_key or '',
+            **attributes
+        )
+    except Exception:
+        with _in_flight_lock:
+            _in_flight_count -= 1
+            _publish_stats['failed'] += 1
+            if _in_flight_count == 0:
+                _in_flight_drained.notify_all()
+        slots.release()
+        raise
+    
+    future.add_done_callback(
+        lambda f: _on_publish_done(
+            f, request_id, event_type, topic_path, ordering_key, lane, on_failure
+        )
+    )
+    
+    logger.info(
+        "Event handed to Pub/Sub publisher",
+        extra={'request_id': request_id, 'event_type': event_type}
+    )
+
+
+def publish_batch(
+    events: List[Tuple[Union[Dict[str, Any], bytes, str], str]],
+    request_id: str,
+    deadline_seconds: Optional[float] = None,
+    max_in_flight: Optional[int] = None,
+    rate_per_second: Optional[float] = None
+) -> List[BatchPublishResult]:
+    """
+    Publish many events concurrently, for reprocessing and replays.
+    
+    Every message is handed to a dedicated publisher client without waiting
+    for earlier acks, so the client packs them into batches according to
+    get_batch_settings and sends the batches in parallel. At most
+    max_in_flight messages are unacknowledged at a time, which bounds memory
+    for very large replays. Each event is routed, keyed and attributed like
+    a live webhook.
+    
+    A failed message does not stop the batch: its error is recorded in its
+    result. Messages not submitted or not acknowledged when the deadline
+    expires are recorded as BatchDeadlineExceededError. Ordering keys paused
+    by a failure are resumed once the batch has finished.
+    
+    Args:
+        events: List of (payload, event_type) tuples; payload is a parsed
+            webhook (dict) or a raw body (bytes or str) forwarded unchanged
+        request_id: Request correlation ID, set on every message
+        deadline_seconds: Time allowed for the whole batch (default:
+            PUBSUB_BATCH_DEADLINE_SECONDS)
+        max_in_flight: Maximum unacknowledged messages (default:
+            PUBSUB_BATCH_MAX_IN_FLIGHT)
+        rate_per_second: Maximum messages submitted per second, or None
+            for no limit
+        
+    Returns:
+        One BatchPublishResult per event, in the order given
+    """
+    if deadline_seconds is None:
+        deadline_seconds = float(os.environ.get('PUBSUB_BATCH_DEADLINE_SECONDS', '600'))
+    if max_in_flight is None:
+        max_in_flight = int(os.environ.get('PUBSUB_BATCH_MAX_IN_FLIGHT', '5000'))
+        
+    start = time.monotonic()
+    deadline = start + deadline_seconds
+    ordering_enabled = is_message_ordering_enabled()
+    publisher = _get_batch_publisher_client()
+    router = get_event_router()
+    
+    results = [
+        BatchPublishResult(index, event_type) for index, (_, event_type) in enumerate(events)
+    ]
+    slots = threading.BoundedSemaphore(max(1, max_in_flight))
+    done = threading.Condition()
+    state = {'pending': 0}
+    paused_keys: Dict[Tuple[str, str], None] = {}
+    
+    bucket = None
+    if rate_per_second:
+        from admission_control import TokenBucket
+        bucket = TokenBucket(rate_per_second, burst=1)
+    
+    def _on_done(
+        future,
+        result: BatchPublishResult,
+        topic_path: str,
+        ordering_key: Optional[str]
+    ) -> None:
+        # Runs on a client thread; must never raise
+        error = future.exception()
+        with done:
+            if result.error is None:
+                if error is None:
+                    result.message_id = future.result()
+                else:
+                    result.error = error
+                    if ordering_key:
+                        paused_keys[(topic_path, ordering_key)] = None
+            state['pending'] -= 1
+            done.notify_all()
+        slots.release()
+    
+    for result, (payload, event_type) in zip(results, events):
+        if bucket is not None and not _wait_for_token(bucket, deadline):
+            result.error = BatchDeadlineExceededError(
+                "Batch deadline expired before the event was submitted"
+            )
+            continue
+    
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not slots.acquire(timeout=remaining):
+            result.error = BatchDeadlineExceededError(
+                "Batch deadline expired before the event was submitted"
+            )
+            continue
+        
         try:
-            message_id = publish_event(payload, event_type, request_id)
-            message_ids.append(message_id)
-        except Exception as e:
-            logger.error(
-                "Failed to publish event in batch",
-                extra={
-                    'request_id': request_id,
-                    'event_type': event_type,
-                    'error': str(e)
-                }
+            body, notification_id, ordering_key = _batch_event_fields(payload, ordering_enabled)
+            lane = router.route(event_type)
+            topic_path = get_topic_path(lane)
+            message_data, attributes = _build_message(
+                body, event_type, request_id, lane, topic_path, notification_id,
+                None, ordering_key, log=False
             )
-            # Continue with remaining events
+            future = publisher.publish(
+                topic_path,
+                message_data,
+                ordering_key=ordering_key or '',
+                **attributes
+            )
+        except Exception as e:
+            result.error = e
+            slots.release()
             continue
+        
+        with done:
+            state['pending'] += 1
+        future.add_done_callback(
+            lambda f, r=result, t=topic_path, k=ordering_key: _on_done(f, r, t, k)
+        )
+    
+    with done:
+        while state['pending'] > 0:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done.wait(remaining)
+        for result in results:
+            if result.message_id is None and result.error is None:
+                result.error = BatchDeadlineExceededError(
+                    "Pub/Sub ack not received before the batch deadline"
+                )
+        keys_to_resume = list(paused_keys)
+    
+    for topic_path, ordering_key in keys_to_resume:
+        try:
+            publisher.resume_publish(topic_path, ordering_key)
+        except (RuntimeError, ValueError):
+            continue
+    
+    duration_s = time.monotonic() - start
+    succeeded = sum(1 for result in results if result.succeeded)
+    log = logger.info if succeeded == len(results) else logger.warning
+    log(
+        "Batch published",
+        extra={
+            'request_id': request_id,
+            'events': len(results),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'duration_ms': duration_s * 1000,
+            'messages_per_second': succeeded / duration_s if duration_s > 0 else None
+        }
+    )
+    
+    return results
+
+
+def _wait_for_token(bucket, deadline: float) -> bool:
+    """Block until the rate limiter grants a token; False if the deadline comes first."""
+    wait = bucket.try_take()
+    while wait:
+        if time.monotonic() + wait > deadline:
+            return False
+        time.sleep(wait)
+        wait = bucket.try_take()
+    return True
+
+
+def _batch_event_fields(
+    payload: Union[Dict[str, Any], bytes, str],
+    ordering_enabled: bool
+) -> Tuple[bytes, Optional[str], Optional[str]]:
+    """
+    Message body, notification ID and ordering key for a publish_batch event.
+    
+    Args:
+        payload: Parsed webhook (dict) or raw body (bytes or str)
+        ordering_enabled: Whether to derive an ordering key
+        
+    Returns:
+        Tuple of (body, notification_id, ordering_key)
+    """
+    if isinstance(payload, dict):
+        data = payload.get('data')
+        notification_id = data.get('id') if isinstance(data, dict) else None
+        ordering_key = ordering_key_for_payload(payload) if ordering_enabled else None
+        return json.dumps(payload).encode('utf-8'), notification_id, ordering_key
     
-    return message_ids
+    body = payload.encode('utf-8') if isinstance(payload, str) else payload
+    _, notification_id = sniff_event_metadata(body)
+    ordering_key = ordering_key_for_body(body) if ordering_enabled else None
+    return body, notification_id, ordering_key
@@ -0,0 +1,195 @@
+"""
+Structured JSON Logging
+
+Cloud Functions (gen2) parses each JSON object written to stdout or stderr
+as one log entry: `severity` and `message` become the entry's level and
+text, and every other key lands in jsonPayload. The JSON handler therefore
+emits the `extra` fields passed to every log call (request_id, event_type,
+duration_ms, ...) as queryable fields, which the plain-text format dropped.
+
+Per-request success logs are sampled: with LOG_SAMPLE_RATE below 1, only
+that fraction of requests emit their DEBUG/INFO records. The decision is
+made from the record's request_id, so a sampled request keeps all of its
+records and the others emit none. Warnings and errors are always emitted,
+as are records logged with extra={'sample': False} (e.g. metrics snapshots).
+
+Fields that are expensive to build (payload keys, body previews) can be
+wrapped with lazy(), which defers the work until a record is actually
+formatted, i.e. past the level check and the sampler.
+
+Environment Variables:
+    LOG_FORMAT: 'json' (default) or 'text'
+    LOG_LEVEL: Root log level (default: INFO)
+    LOG_SAMPLE_RATE: Fraction of requests whose DEBUG/INFO records are
+        emitted (default: 1.0)
+"""
+
+import json
+import logging
+import os
+import random
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+LOG_FORMATS = ('json', 'text')
+
+# LogRecord attributes that are not `extra` fields
+_RECORD_ATTRIBUTES = frozenset(
+    vars(logging.LogRecord('', logging.INFO, '', 0, '', None, None))
+) | {'message', 'asctime', 'taskName'}
+
+_SAMPLE_SPACE = 0xFFFFFFFF
+
+
+class LazyField:
+    """A log field computed only when the record is formatted."""
+
+    __slots__ = ('_func', '_args')
+
+    def __init__(self, func: Callable[..., Any], *args: Any):
+        self._func = func
+        self._args = args
+
+    def resolve(self) -> Any:
+        try:
+            return self._func(*self._args)
+        except Exception as e:
+            return f'<unavailable: {type(e).__name__}>'
+
+    def __str__(self) -> str:
+        return str(self.resolve())
+
+    __repr__ = __str__
+
+
+def lazy(func: Callable[..., Any], *args: Any) -> LazyField:
+    """
+    Defer building a log field until the record is emitted.
+
+    Example:
+        logger.warning("Missing event type", extra={'payload_keys': lazy(_payload_keys, body)})
+
+    Args:
+        func: Callable producing the field value
+        *args: Arguments passed to func
+
+    Returns:
+        LazyField resolved by the formatter
+    """
+    return LazyField(func, *args)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one line of JSON, including its `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            'severity': record.levelname,
+            'message': record.getMessage(),
+            'logger': record.name,
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value.resolve() if isinstance(value, LazyField) else value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+
+class RequestSampler(logging.Filter):
+    """
+    Keeps DEBUG/INFO records for a fraction of requests.
+
+    Records carrying a request_id are kept or dropped by a hash of it, so
+    a request's records are sampled together; records without one are
+    sampled independently. WARNING and above, and records marked
+    sample=False, always pass.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = min(max(rate, 0.0), 1.0)
+        self._threshold = int(self.rate * _SAMPLE_SPACE)
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1.0:
+            return True
+        if getattr(record, 'sample', True) is False:
+            return True
+        request_id = getattr(record, 'request_id', None)
+        if request_id is None:
+            keep = random.random() < self.rate
+        else:
+            keep = zlib.crc32(str(request_id).encode('utf-8')) <= self._threshold
+        if not keep:
+            self.dropped += 1
+        return keep
+
+
+def get_log_format() -> str:
+    """Configured log format ('json' or 'text')."""
+    log_format = os.environ.get('LOG_FORMAT', 'json').strip().lower()
+    return log_format if log_format in LOG_FORMATS else 'json'
+
+
+def get_log_level() -> int:
+    """Configured root log level (default: INFO)."""
+    level = logging.getLevelName(os.environ.get('LOG_LEVEL', 'INFO').strip().upper())
+    return level if isinstance(level, int) else logging.INFO
+
+
+def get_sample_rate() -> float:
+    """Fraction of requests whose DEBUG/INFO records are emitted."""
+    try:
+        return float(os.environ.get('LOG_SAMPLE_RATE', '1.0'))
+    except ValueError:
+        return 1.0
+
+
+def configure_logging(stream=None, force: bool = False) -> logging.Handler:
+    """
+    Install the structured log handler on the root logger.
+
+    Replaces logging.basicConfig in the function entry modules. Calling it
+    again (e.g. from a second entry module) returns the installed handler.
+
+    Args:
+        stream: Stream to write to (default: stderr)
+        force: Replace a handler installed by a previous call
+
+    Returns:
+        The installed handler
+    """
+    root = logging.getLogger()
+    existing = _installed_handler(root)
+    if existing is not None:
+        if not force:
+            return existing
+        root.removeHandler(existing)
+
+    handler = logging.StreamHandler(stream)
+    handler._structured_logging = True
+    if get_log_format() == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    sample_rate = get_sample_rate()
+    if sample_rate < 1.0:
+        handler.addFilter(RequestSampler(sample_rate))
+
+    root.addHandler(handler)
+    root.setLevel(get_log_level())
+    return handler
+
+
+def _installed_handler(root: logging.Logger) -> Optional[logging.Handler]:
+    for handler in root.handlers:
+        if getattr(handler, '_structured_logging', False):
+            return handler
+    return None
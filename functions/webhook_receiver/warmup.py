@@ -0,0 +1,121 @@
+"""
+Optional Warm-Up After the First Request
+
+Client libraries are imported, and clients created, on first use so a cold
+instance can answer its first request quickly. With warm-up enabled, the
+first request served starts a background thread that runs the registered
+warm-up tasks (import libraries, create clients, open connections), so the
+requests after it do not pay for them.
+
+Warm-up runs at most once per process. Task failures are logged and
+otherwise ignored: the same work is retried on first use.
+
+Environment Variables:
+    WARMUP_AFTER_FIRST_REQUEST: 'true' to warm up after the first request
+        (default: false)
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_tasks: List[Tuple[str, Callable[[], Any]]] = []
+_results: Dict[str, Dict[str, Any]] = {}
+_started = False
+_lock = threading.Lock()
+
+
+def is_warm_up_enabled() -> bool:
+    """Whether WARMUP_AFTER_FIRST_REQUEST is set."""
+    value = os.environ.get('WARMUP_AFTER_FIRST_REQUEST', 'false').strip().lower()
+    return value in ('1', 'true', 'yes')
+
+
+def register_warm_up(name: str, task: Callable[[], Any]) -> None:
+    """
+    Register a task to run when warm-up starts.
+
+    Args:
+        name: Task name used in logs and stats
+        task: Callable taking no arguments
+    """
+    with _lock:
+        _tasks.append((name, task))
+
+
+def start_warm_up() -> Optional[threading.Thread]:
+    """
+    Start warm-up on a daemon thread if enabled and not already started.
+
+    Cheap to call on every request: after the first call it only checks a flag.
+
+    Returns:
+        The warm-up thread, or None if warm-up is disabled or already started
+    """
+    global _started
+
+    if _started or not is_warm_up_enabled():
+        return None
+
+    with _lock:
+        if _started:
+            return None
+        _started = True
+        tasks = list(_tasks)
+
+    thread = threading.Thread(target=_run_tasks, args=(tasks,), name='warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+def _run_tasks(tasks: List[Tuple[str, Callable[[], Any]]]) -> None:
+    for name, task in tasks:
+        start = time.perf_counter()
+        error = None
+        try:
+            task()
+        except Exception as e:
+            error = e
+        duration_ms = round((time.perf_counter() - start) * 1000, 1)
+
+        with _lock:
+            _results[name] = {'duration_ms': duration_ms, 'error': str(error) if error else None}
+
+        if error is None:
+            logger.info(
+                "Warm-up task completed",
+                extra={'task': name, 'duration_ms': duration_ms}
+            )
+        else:
+            logger.warning(
+                "Warm-up task failed",
+                extra={
+                    'task': name,
+                    'duration_ms': duration_ms,
+                    'error': str(error),
+                    'error_type': type(error).__name__
+                }
+            )
+
+
+def get_warm_up_stats() -> Dict[str, Any]:
+    """Warm-up state and per-task results for /health."""
+    with _lock:
+        return {
+            'enabled': is_warm_up_enabled(),
+            'started': _started,
+            'tasks': {name: dict(result) for name, result in _results.items()}
+        }
+
+
+def reset_warm_up() -> None:
+    """Allow warm-up to run again and clear results (for tests)."""
+    global _started
+
+    with _lock:
+        _started = False
+        _results.clear()
@@ -0,0 +1,522 @@
+"""
+Transport-Independent Webhook Handling
+
+The checks every receiver entry point runs before publishing: body present,
+signature valid for an active secret, JSON with an event type, not a
+recently published redelivery. Shared by the Flask entry point (main) and
+the ASGI entry point (asgi_app) so both accept and reject exactly the same
+requests; the entry points only differ in how they read the request and
+wait for Pub/Sub.
+
+Bodies are read in chunks by SignedBodyReader, which enforces the size cap
+(from Content-Length before reading, and while reading) and feeds each
+chunk to the HMAC as it arrives, so oversized requests get 413 and requests
+without a usable signature get 401 without being buffered.
+
+RequestTimer records per-stage latency (signature, parse, publish and the
+whole request) labeled with the event type, and counts responses by status
+(see metrics).
+
+Environment Variables:
+    WEBHOOK_MAX_BODY_BYTES: Largest accepted request body; larger requests
+        get 413 (default: 5 MiB, well below Pub/Sub's 10 MB message limit)
+"""
+
+import io
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+from webhook_validator import begin_signature_check, get_signature_stats, match_signature
+from pubsub_publisher import is_message_ordering_enabled, probe_topics, warm_up_publishers
+from publisher_config import get_publisher_config_stats
+from payload_sniffer import sniff_event_metadata
+from ordering_keys import ordering_key_for_body
+from dedup_cache import get_dedup_cache, get_dedup_stats
+from event_routing import get_routing_stats
+from publish_spool import get_spool_stats, spool_event
+from admission_control import get_admission_stats
+from warmup import get_warm_up_stats, register_warm_up
+from health_probes import register_probe, run_probes
+from structured_logging import lazy
+from metrics import counter, histogram
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BODY_BYTES = 5 * 1024 * 1024
+
+# Chunk size for reading request bodies from a stream
+READ_CHUNK_BYTES = 64 * 1024
+
+# Create Pub/Sub clients in the background once the first request has been
+# served, when WARMUP_AFTER_FIRST_REQUEST is set
+register_warm_up('pubsub_publishers', warm_up_publishers)
+
+# Checked by the deep health check (/health?deep=true)
+register_probe('pubsub', probe_topics)
+
+STAGE_DURATION = histogram(
+    'webhook_stage_duration_ms',
+    'Webhook receiver stage latency in milliseconds',
+    ('stage', 'event_type')
+)
+REQUESTS = counter(
+    'webhook_requests_total',
+    'Webhook requests by response status',
+    ('status', 'event_type')
+)
+
+UNKNOWN_EVENT_TYPE = 'unknown'
+
+
+class WebhookRejected(Exception):
+    """Raised when a webhook fails a check; carries the HTTP response."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+    @property
+    def response(self) -> Tuple[str, int]:
+        return (self.message, self.status_code)
+
+
+class InspectedWebhook:
+    """A webhook that passed every check and is ready to publish."""
+
+    def __init__(
+        self,
+        body: bytes,
+        event_type: str,
+        notification_id: Optional[str],
+        ordering_key: Optional[str],
+        signature_key: str,
+        duplicate: bool = False
+    ):
+        self.body = body
+        self.event_type = event_type
+        self.notification_id = notification_id
+        self.ordering_key = ordering_key
+        self.signature_key = signature_key
+        self.duplicate = duplicate
+
+    def mark_published(self) -> None:
+        """Record the notification so Terminal49 redeliveries are suppressed."""
+        dedup_cache = get_dedup_cache() if self.notification_id else None
+        if dedup_cache is not None:
+            dedup_cache.mark_published(self.notification_id)
+
+
+class RequestTimer:
+    """
+    Stage latencies of one webhook request.
+
+    The event type is only known once the body has been parsed, so laps are
+    kept until finish() records them with it. Requests rejected before
+    parsing are recorded with event_type 'unknown'.
+    """
+
+    __slots__ = ('event_type', '_started', '_mark', '_laps')
+
+    def __init__(self):
+        self.event_type = UNKNOWN_EVENT_TYPE
+        self._started = self._mark = time.perf_counter()
+        self._laps = []
+
+    def lap(self, stage: str) -> None:
+        """End a stage that started at the previous lap (or at creation)."""
+        now = time.perf_counter()
+        self._laps.append((stage, now - self._mark))
+        self._mark = now
+
+    def finish(self, status_code: int) -> None:
+        """Record every lap and the whole request, and count the response."""
+        event_type = self.event_type or UNKNOWN_EVENT_TYPE
+        for stage, seconds in self._laps:
+            STAGE_DURATION.labels(stage, event_type).observe(seconds * 1000)
+        total_ms = (time.perf_counter() - self._started) * 1000
+        STAGE_DURATION.labels('request', event_type).observe(total_ms)
+        REQUESTS.labels(str(status_code), event_type).inc()
+
+
+def get_max_body_bytes() -> int:
+    """Largest accepted request body (WEBHOOK_MAX_BODY_BYTES)."""
+    return int(os.environ.get('WEBHOOK_MAX_BODY_BYTES', DEFAULT_MAX_BODY_BYTES))
+
+
+class SignedBodyReader:
+    """
+    Reads a request body chunk by chunk, checking size and signature as it goes.
+
+    Feed every chunk to feed(), then call finish(). Rejections raise
+    WebhookRejected as soon as they are known:
+
+    - 413 before reading if Content-Length exceeds the cap, or as soon as
+      the bytes read exceed it (chunked uploads have no Content-Length)
+    - 401 on the first body chunk if the signature is missing or malformed
+    - 400 at finish() for an empty body, 401 for a signature mismatch
+    """
+
+    def __init__(
+        self,
+        signature: Optional[str],
+        content_length: Optional[int],
+        request_id: str,
+        max_bytes: Optional[int] = None
+    ):
+        """
+        Args:
+            signature: X-T49-Webhook-Signature header value
+            content_length: Declared Content-Length, None if not sent
+            request_id: Request tracking ID
+            max_bytes: Body size cap (default: WEBHOOK_MAX_BODY_BYTES)
+
+        Raises:
+            WebhookRejected: 413 if content_length exceeds the cap
+            ValueError: If TERMINAL49_WEBHOOK_SECRET is not configured
+        """
+        self._request_id = request_id
+        self._max_bytes = get_max_body_bytes() if max_bytes is None else max_bytes
+        if content_length is not None and content_length > self._max_bytes:
+            self._reject_too_large(content_length)
+
+        self._check = begin_signature_check(signature)
+        self._buffer = io.BytesIO()
+        self.size = 0
+
+    def feed(self, chunk: bytes) -> None:
+        """
+        Add the next chunk of the body.
+
+        Raises:
+            WebhookRejected: 413 once the body exceeds the cap, 401 if the
+                signature cannot match
+        """
+        if not chunk:
+            return
+
+        self.size += len(chunk)
+        if self.size > self._max_bytes:
+            self._reject_too_large(self.size)
+
+        if not self._check.well_formed:
+            self._reject_signature()
+
+        self._check.update(chunk)
+        self._buffer.write(chunk)
+
+    def finish(self) -> Tuple[bytes, str]:
+        """
+        Complete the read.
+
+        Returns:
+            Tuple of (body, label of the matching secret)
+
+        Raises:
+            WebhookRejected: 400 for an empty body, 401 for an invalid signature
+        """
+        if not self.size:
+            logger.warning(
+                "Empty request body",
+                extra={'request_id': self._request_id}
+            )
+            raise WebhookRejected(400, 'Bad Request: Empty body')
+
+        # getvalue() hands over the buffer without copying it
+        body = self._buffer.getvalue()
+        signature_key = self._check.finish(body)
+        if signature_key is None:
+            self._reject_signature(checked=True)
+        return body, signature_key
+
+    def _reject_too_large(self, size: int) -> None:
+        logger.warning(
+            "Request body too large",
+            extra={
+                'request_id': self._request_id,
+                'content_length': size,
+                'max_bytes': self._max_bytes
+            }
+        )
+        raise WebhookRejected(413, 'Payload Too Large')
+
+    def _reject_signature(self, checked: bool = False) -> None:
+        if not checked:
+            # Logs and counts the missing or malformed signature
+            self._check.finish(b'')
+        logger.warning(
+            "Invalid signature",
+            extra={
+                'request_id': self._request_id,
+                'signature_present': bool(self._check.signature)
+            }
+        )
+        raise WebhookRejected(401, 'Unauthorized: Invalid signature')
+
+
+def read_signed_body(
+    stream: BinaryIO,
+    signature: Optional[str],
+    content_length: Optional[int],
+    request_id: str
+) -> Tuple[bytes, str]:
+    """
+    Read and authenticate a request body from a file-like stream.
+
+    Args:
+        stream: Request body stream (e.g. Flask's request.stream)
+        signature: X-T49-Webhook-Signature header value
+        content_length: Declared Content-Length, None if not sent
+        request_id: Request tracking ID
+
+    Returns:
+        Tuple of (body, label of the matching secret)
+
+    Raises:
+        WebhookRejected: 413, 401 or 400 (see SignedBodyReader)
+        ValueError: If TERMINAL49_WEBHOOK_SECRET is not configured
+    """
+    reader = SignedBodyReader(signature, content_length, request_id)
+    while True:
+        chunk = stream.read(READ_CHUNK_BYTES)
+        if not chunk:
+            return reader.finish()
+        reader.feed(chunk)
+
+
+def inspect_webhook(body: bytes, signature: Optional[str], request_id: str) -> InspectedWebhook:
+    """
+    Validate a webhook and extract what publishing needs.
+
+    The body stays as bytes: the signature is checked over the exact bytes
+    received and the same bytes are forwarded to Pub/Sub.
+
+    Args:
+        body: Raw request body
+        signature: X-T49-Webhook-Signature header value
+        request_id: Request tracking ID
+
+    Returns:
+        InspectedWebhook; duplicate is True for a suppressed redelivery,
+        which is acknowledged without publishing
+
+    Raises:
+        WebhookRejected: If the body, signature or payload is invalid
+        ValueError: If TERMINAL49_WEBHOOK_SECRET is not configured
+    """
+    if not body:
+        logger.warning(
+            "Empty request body",
+            extra={'request_id': request_id}
+        )
+        raise WebhookRejected(400, 'Bad Request: Empty body')
+
+    # Validate signature against every active secret
+    signature_key = match_signature(body, signature)
+    if signature_key is None:
+        logger.warning(
+            "Invalid signature",
+            extra={
+                'request_id': request_id,
+                'signature_present': bool(signature)
+            }
+        )
+        raise WebhookRejected(401, 'Unauthorized: Invalid signature')
+
+    return inspect_signed_body(body, signature_key, request_id)
+
+
+def inspect_signed_body(body: bytes, signature_key: str, request_id: str) -> InspectedWebhook:
+    """
+    Inspect a body whose signature has already been checked.
+
+    Args:
+        body: Raw request body
+        signature_key: Label of the secret that signed it
+        request_id: Request tracking ID
+
+    Returns:
+        InspectedWebhook (see inspect_webhook)
+
+    Raises:
+        WebhookRejected: If the payload is invalid
+    """
+    # Extract event type and notification ID without parsing the whole
+    # document; malformed JSON still raises here
+    try:
+        event_type, notification_id = sniff_event_metadata(body)
+    except ValueError as e:
+        logger.error(
+            "Invalid JSON payload",
+            extra={
+                'request_id': request_id,
+                'error': str(e),
+                'body_preview': lazy(_body_preview, body)
+            }
+        )
+        raise WebhookRejected(400, 'Bad Request: Invalid JSON')
+
+    if not event_type:
+        logger.warning(
+            "Missing event type in payload",
+            extra={
+                'request_id': request_id,
+                'payload_keys': lazy(_payload_keys, body)
+            }
+        )
+        raise WebhookRejected(400, 'Bad Request: Missing event type')
+
+    # Acknowledge Terminal49 redeliveries without publishing them again
+    dedup_cache = get_dedup_cache() if notification_id else None
+    if dedup_cache is not None and dedup_cache.is_duplicate(notification_id):
+        logger.info(
+            "Duplicate notification suppressed",
+            extra={
+                'request_id': request_id,
+                'event_type': event_type,
+                'notification_id': notification_id
+            }
+        )
+        return InspectedWebhook(
+            body, event_type, notification_id, None, signature_key, duplicate=True
+        )
+
+    # Keep updates for the same container in order downstream
+    ordering_key = ordering_key_for_body(body) if is_message_ordering_enabled() else None
+
+    return InspectedWebhook(body, event_type, notification_id, ordering_key, signature_key)
+
+
+def spool_webhook(
+    webhook: InspectedWebhook,
+    request_id: str,
+    publish_error: Exception,
+    received_at: Optional[datetime] = None
+) -> bool:
+    """
+    Spool a webhook whose publish failed or exceeded the latency budget.
+
+    Args:
+        webhook: Inspected webhook
+        request_id: Request tracking ID
+        publish_error: Error raised by the publish attempt
+        received_at: When the request arrived, kept through the spool
+
+    Returns:
+        True if the webhook was durably spooled and can be acknowledged
+    """
+    try:
+        spool_event(
+            webhook.body, webhook.event_type, request_id, webhook.notification_id,
+            webhook.ordering_key, received_at=received_at
+        )
+    except Exception as e:
+        logger.error(
+            "Failed to spool webhook",
+            extra={
+                'request_id': request_id,
+                'event_type': webhook.event_type,
+                'publish_error': str(publish_error),
+                'error': str(e),
+                'error_type': type(e).__name__
+            }
+        )
+        return False
+
+    logger.warning(
+        "Publish failed or exceeded budget, webhook spooled",
+        extra={
+            'request_id': request_id,
+            'event_type': webhook.event_type,
+            'error': str(publish_error),
+            'error_type': type(publish_error).__name__
+        }
+    )
+    return True
+
+
+def _body_preview(body: bytes) -> str:
+    """Start of a body, for diagnostics on the rejection path."""
+    return body[:200].decode('utf-8', errors='replace')
+
+
+def _payload_keys(body: bytes) -> list:
+    """Top-level keys of a JSON object body, for diagnostics on the rejection path."""
+    try:
+        payload = json.loads(body)
+        return list(payload.keys())
+    except (ValueError, AttributeError):
+        return []
+
+
+def is_deep_health_check(value: Optional[str]) -> bool:
+    """Whether the `deep` query parameter asks for dependency probes."""
+    return value is not None and value.strip().lower() in ('1', 'true', 'yes')
+
+
+def health_status(deep: bool = False) -> Tuple[Dict[str, Any], int]:
+    """
+    Build the /health document.
+
+    The plain check only reads the environment, so load balancers can poll
+    it without touching any module's counters or locks.
+
+    Checks:
+    - Environment variables are configured
+    - Pub/Sub topic configuration
+    - Deep only: the in-process counters (dedup cache, spool, routing,
+      signature keys, admission, warm-up, publisher) and whether the Pub/Sub
+      topics answer (cached, see health_probes)
+
+    Args:
+        deep: Whether to include the counters and dependency probes
+
+    Returns:
+        Tuple of (health document, status_code)
+    """
+    status = {
+        'status': 'healthy',
+        'timestamp': datetime.utcnow().isoformat(),
+        'version': '1.0.0',
+        'checks': {}
+    }
+
+    # Check environment variables
+    required_env_vars = [
+        'TERMINAL49_WEBHOOK_SECRET',
+        'GCP_PROJECT_ID'
+    ]
+
+    for var in required_env_vars:
+        status['checks'][var] = 'configured' if os.environ.get(var) else 'missing'
+
+    # Check Pub/Sub topic configuration
+    pubsub_topic = os.environ.get('PUBSUB_TOPIC', 'terminal49-webhook-events')
+    status['checks']['pubsub_topic'] = pubsub_topic
+
+    # Counters are not pass/fail checks
+    if deep:
+        status['dedup_cache'] = get_dedup_stats()
+        status['spool'] = get_spool_stats()
+        status['routing'] = get_routing_stats()
+        status['signature_keys'] = get_signature_stats()
+        status['admission'] = get_admission_stats()
+        status['warm_up'] = get_warm_up_stats()
+        status['publisher'] = get_publisher_config_stats()
+
+    # Determine overall health
+    if any(value == 'missing' for value in status['checks'].values()):
+        status['status'] = 'unhealthy'
+        return status, 503
+
+    if deep:
+        status['dependencies'], dependencies_ok = run_probes()
+        if not dependencies_ok:
+            status['status'] = 'unhealthy'
+            return status, 503
+
+    return status, 200
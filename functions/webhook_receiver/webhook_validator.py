@@ -8,92 +8,358 @@ Security Features:
 - Constant-time comparison to prevent timing attacks
 - Validates signature format before computation
 - Comprehensive error logging without exposing secrets
+
+Secret Rotation:
+    Several secrets can be active at once. Deploy the new secret as
+    TERMINAL49_WEBHOOK_SECRET with the old one in
+    TERMINAL49_WEBHOOK_PREVIOUS_SECRETS, switch the secret in Terminal49, and
+    remove the old one once /health?deep=true shows it no longer matches.
+    Keys are identified by their position in the configuration (key[0] is
+    TERMINAL49_WEBHOOK_SECRET, key[1] onwards the previous secrets in the
+    order listed), so logs and counters contain nothing derived from a
+    secret.
+
+Environment Variables:
+    TERMINAL49_WEBHOOK_SECRET: Current webhook secret (required)
+    TERMINAL49_WEBHOOK_PREVIOUS_SECRETS: Comma-separated secrets still
+        accepted during a rotation window (optional)
 """
 
 import hmac
 import hashlib
 import os
 import logging
-from typing import Optional
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
+# Hex-encoded SHA-256 digest length
+SIGNATURE_HEX_LENGTH = 64
+
+_HEX_DIGITS = '0123456789abcdefABCDEF'
+
+# Process-wide validator, rebuilt only when the secret configuration changes
+_validator = None
+_validator_config: Optional[Tuple[Optional[str], Optional[str]]] = None
+_validator_lock = threading.Lock()
+
 
-def validate_signature(body: str, signature: Optional[str]) -> bool:
+def _as_bytes(body: Union[str, bytes]) -> bytes:
+    """Return the body as bytes, encoding text bodies as UTF-8."""
+    return body.encode('utf-8') if isinstance(body, str) else body
+
+
+def key_label(index: int) -> str:
     """
-    Validates Terminal49 webhook signature using HMAC-SHA256.
-    
-    Terminal49 sends the signature in the X-T49-Webhook-Signature header.
-    The signature is computed as: HMAC-SHA256(webhook_secret, request_body)
+    Identifier for the secret at a position in the configuration, safe to log.
     
     Args:
-        body: Raw request body as string
-        signature: X-T49-Webhook-Signature header value
+        index: 0 for the current secret, 1 onwards for the previous secrets
         
     Returns:
-        True if signature is valid, False otherwise
+        Label such as 'key[1]'
+    """
+    return f'key[{index}]'
+
+
+class WebhookSignatureValidator:
+    """
+    Validates signatures against one or more active webhook secrets.
+    
+    The HMAC key schedule for each secret is computed once; each validation
+    copies that state and hashes the raw body bytes. Keys are tried in order,
+    so the current secret should come first.
+    """
+    
+    def __init__(self, secrets: Sequence[str]):
+        """
+        Args:
+            secrets: Active secrets, current secret first
+            
+        Raises:
+            ValueError: If no secret is given
+        """
+        if not secrets:
+            raise ValueError("At least one webhook secret is required")
         
-    Raises:
-        ValueError: If TERMINAL49_WEBHOOK_SECRET is not configured
+        self._keys: List[Tuple[str, 'hmac.HMAC']] = []
+        seen = set()
+        for index, secret in enumerate(secrets):
+            if secret in seen:
+                continue
+            seen.add(secret)
+            self._keys.append(
+                (key_label(index), hmac.new(secret.encode('utf-8'), digestmod=hashlib.sha256))
+            )
         
-    Example:
-        >>> body = '{"data": {"type": "notification"}}'
-        >>> signature = "a1b2c3d4..."
-        >>> validate_signature(body, signature)
-        True
-    """
-    # Check if signature is provided
-    if not signature:
-        logger.warning("No signature provided in request")
-        return False
+        self._stats_lock = threading.Lock()
+        self._matches: Dict[str, int] = {key_id: 0 for key_id, _ in self._keys}
+        self._rejected = 0
     
-    # Check if signature is a valid hex string
-    if not _is_valid_hex(signature):
-        logger.warning(
-            "Invalid signature format",
-            extra={'signature_length': len(signature)}
-        )
-        return False
+    @property
+    def key_ids(self) -> List[str]:
+        """Labels of the active keys, in the order they are tried."""
+        return [key_id for key_id, _ in self._keys]
     
-    # Get webhook secret from environment
-    secret = os.environ.get('TERMINAL49_WEBHOOK_SECRET')
-    if not secret:
-        logger.error("TERMINAL49_WEBHOOK_SECRET environment variable not configured")
-        raise ValueError("TERMINAL49_WEBHOOK_SECRET not configured")
+    def match(self, body: Union[str, bytes], signature: Optional[str]) -> Optional[str]:
+        """
+        Find the active key that produced a signature.
+        
+        Args:
+            body: Raw request body; text is encoded as UTF-8
+            signature: X-T49-Webhook-Signature header value
+            
+        Returns:
+            Label of the matching key, or None if the signature is
+            missing, malformed or matches no active key
+        """
+        check = self.begin(signature)
+        body = _as_bytes(body)
+        check.update(body)
+        return check.finish(body)
     
-    # Compute HMAC-SHA256 signature
-    try:
-        computed_signature = hmac.new(
-            secret.encode('utf-8'),
-            body.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
-    except Exception as e:
-        logger.error(
-            "Failed to compute signature",
-            extra={'error': str(e)}
+    def begin(self, signature: Optional[str]) -> 'SignatureCheck':
+        """
+        Start checking a signature over a body that is still being read.
+        
+        Args:
+            signature: X-T49-Webhook-Signature header value
+            
+        Returns:
+            SignatureCheck to feed the body chunks to
+        """
+        return SignatureCheck(self, signature)
+    
+    def validate(self, body: Union[str, bytes], signature: Optional[str]) -> bool:
+        """Return True if the signature matches any active key."""
+        return self.match(body, signature) is not None
+    
+    def _record(self, key_id: Optional[str]) -> None:
+        with self._stats_lock:
+            if key_id is None:
+                self._rejected += 1
+            else:
+                self._matches[key_id] += 1
+    
+    def stats(self) -> Dict[str, object]:
+        """Matches per key label and rejected count, for /health."""
+        with self._stats_lock:
+            return {
+                'keys': dict(self._matches),
+                'rejected': self._rejected
+            }
+
+
+class SignatureCheck:
+    """
+    Incremental signature check for a body read in chunks.
+    
+    Chunks are hashed with the first (current) key as they arrive, so the
+    HMAC is done when the last chunk is read. Other keys, only active during
+    a rotation, are tried over the complete body if the first does not match.
+    """
+    
+    def __init__(self, validator: Optional[WebhookSignatureValidator], signature: Optional[str]):
+        """
+        Args:
+            validator: Validator holding the active keys; may be None when
+                the signature is missing
+            signature: X-T49-Webhook-Signature header value
+        """
+        self._validator = validator
+        self.signature = signature
+        self.well_formed = bool(signature) and (
+            len(signature) == SIGNATURE_HEX_LENGTH and _is_valid_hex(signature)
         )
-        return False
+        self._mac = None
+        if self.well_formed:
+            self._mac = validator._keys[0][1].copy()
     
-    # Constant-time comparison to prevent timing attacks
-    is_valid = hmac.compare_digest(computed_signature, signature)
+    def update(self, chunk: bytes) -> None:
+        """Hash the next chunk of the body."""
+        if self._mac is not None:
+            self._mac.update(chunk)
     
-    if not is_valid:
+    def finish(self, body: bytes) -> Optional[str]:
+        """
+        Complete the check and record the result.
+        
+        Args:
+            body: Complete body, hashed again only for the other active keys
+            
+        Returns:
+            Label of the matching key, or None if the signature is
+            missing, malformed or matches no active key
+        """
+        validator = self._validator
+        signature = self.signature
+        
+        if not signature:
+            logger.warning("No signature provided in request")
+            if validator is not None:
+                validator._record(None)
+            return None
+        
+        if not self.well_formed:
+            logger.warning(
+                "Invalid signature format",
+                extra={'signature_length': len(signature)}
+            )
+            validator._record(None)
+            return None
+        
+        key_id = validator._keys[0][0]
+        # Constant-time comparison to prevent timing attacks
+        if hmac.compare_digest(self._mac.hexdigest(), signature):
+            validator._record(key_id)
+            return key_id
+        
+        for key_id, key_state in validator._keys[1:]:
+            mac = key_state.copy()
+            mac.update(body)
+            if hmac.compare_digest(mac.hexdigest(), signature):
+                validator._record(key_id)
+                return key_id
+        
         logger.warning(
             "Signature mismatch",
             extra={
-                'expected_length': len(computed_signature),
+                'keys_tried': len(validator._keys),
                 'received_length': len(signature)
             }
         )
+        validator._record(None)
+        return None
+
+
+def get_signature_validator() -> WebhookSignatureValidator:
+    """
+    Get the validator for the configured secrets.
+    
+    The environment is only compared against the cached configuration; key
+    state is rebuilt when the secrets change.
+    
+    Returns:
+        WebhookSignatureValidator
+        
+    Raises:
+        ValueError: If TERMINAL49_WEBHOOK_SECRET is not configured
+    """
+    global _validator, _validator_config
     
-    return is_valid
+    config = (
+        os.environ.get('TERMINAL49_WEBHOOK_SECRET'),
+        os.environ.get('TERMINAL49_WEBHOOK_PREVIOUS_SECRETS')
+    )
+    
+    validator = _validator
+    if validator is not None and config == _validator_config:
+        return validator
+    
+    secret, previous_secrets = config
+    if not secret:
+        logger.error("TERMINAL49_WEBHOOK_SECRET environment variable not configured")
+        raise ValueError("TERMINAL49_WEBHOOK_SECRET not configured")
+    
+    secrets = [secret]
+    if previous_secrets:
+        secrets.extend(s.strip() for s in previous_secrets.split(',') if s.strip())
+    
+    with _validator_lock:
+        if _validator is None or config != _validator_config:
+            _validator = WebhookSignatureValidator(secrets)
+            _validator_config = config
+            logger.info(
+                "Webhook signature validator initialized",
+                extra={'key_ids': _validator.key_ids}
+            )
+        return _validator
 
 
-def _is_valid_hex(value: str) -> bool:
+def get_signature_stats() -> Optional[Dict[str, object]]:
+    """Per-key match counters, or None if no secret is configured."""
+    try:
+        return get_signature_validator().stats()
+    except ValueError:
+        return None
+
+
+def match_signature(body: Union[str, bytes], signature: Optional[str]) -> Optional[str]:
+    """
+    Validate a signature and report which active secret produced it.
+    
+    Args:
+        body: Raw request body
+        signature: X-T49-Webhook-Signature header value
+        
+    Returns:
+        Label of the matching secret, or None if the signature is invalid
+        
+    Raises:
+        ValueError: If TERMINAL49_WEBHOOK_SECRET is not configured
+    """
+    if not signature:
+        logger.warning("No signature provided in request")
+        return None
+    
+    return get_signature_validator().match(body, signature)
+
+
+def begin_signature_check(signature: Optional[str]) -> SignatureCheck:
+    """
+    Start an incremental signature check against every active secret.
+    
+    Args:
+        signature: X-T49-Webhook-Signature header value
+        
+    Returns:
+        SignatureCheck; feed it the body with update() and call finish()
+        
+    Raises:
+        ValueError: If a signature is present but TERMINAL49_WEBHOOK_SECRET
+            is not configured
+    """
+    if not signature:
+        return SignatureCheck(None, signature)
+    
+    return get_signature_validator().begin(signature)
+
+
+def validate_signature(body: Union[str, bytes], signature: Optional[str]) -> bool:
+    """
+    Validates Terminal49 webhook signature using HMAC-SHA256.
+    
+    Terminal49 sends the signature in the X-T49-Webhook-Signature header.
+    The signature is computed as: HMAC-SHA256(webhook_secret, request_body)
+    
+    Args:
+        body: Raw request body; bytes are validated as received, text is
+            encoded as UTF-8 first
+        signature: X-T49-Webhook-Signature header value
+        
+    Returns:
+        True if signature is valid for any active secret, False otherwise
+        
+    Raises:
+        ValueError: If TERMINAL49_WEBHOOK_SECRET is not configured
+        
+    Example:
+        >>> body = '{"data": {"type": "notification"}}'
+        >>> signature = "a1b2c3d4..."
+        >>> validate_signature(body, signature)
+        True
+    """
+    return match_signature(body, signature) is not None
+
+
+def _is_valid_hex(value: Optional[str]) -> bool:
     """
     Check if a string is a valid hexadecimal string.
     
+    Strips hex digits instead of parsing the value as an integer, so a
+    64-character signature is checked without building a 256-bit int.
+    
     Args:
         value: String to validate
         
@@ -103,14 +369,10 @@ def _is_valid_hex(value: str) -> bool:
     if not value:
         return False
     
-    try:
-        int(value, 16)
-        return True
-    except ValueError:
-        return False
+    return not value.strip(_HEX_DIGITS)
 
 
-def compute_signature(body: str, secret: str) -> str:
+def compute_signature(body: Union[str, bytes], secret: str) -> str:
     """
     Compute HMAC-SHA256 signature for a given body and secret.
     
@@ -118,7 +380,7 @@ def compute_signature(body: str, secret: str) -> str:
     In production, signatures are validated, not computed.
     
     Args:
-        body: Request body as string
+        body: Request body as string or bytes
         secret: Webhook secret key
         
     Returns:
@@ -130,6 +392,6 @@ def compute_signature(body: str, secret: str) -> str:
     """
     return hmac.new(
         secret.encode('utf-8'),
-        body.encode('utf-8'),
+        _as_bytes(body),
         hashlib.sha256
     ).hexdigest()
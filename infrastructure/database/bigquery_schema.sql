@@ -44,6 +44,7 @@ CREATE TABLE IF NOT EXISTS `li-customer-datalake.terminal49_raw_events.raw_event
   -- Processing metadata
   processing_status STRING NOT NULL OPTIONS(description="Status: received, processed, failed, reprocessed"),
   processing_duration_ms INT64 OPTIONS(description="Time taken to process event in milliseconds"),
+  queue_lag_ms INT64 OPTIONS(description="Time between publication to Pub/Sub and the start of processing in milliseconds"),
   processing_error STRING OPTIONS(description="Error message if processing failed"),
   processed_at TIMESTAMP OPTIONS(description="When event processing completed"),
   
@@ -71,6 +72,11 @@ OPTIONS(
   require_partition_filter=true
 );
 
+-- Tables created before queue_lag_ms was added:
+-- ALTER TABLE `li-customer-datalake.terminal49_raw_events.raw_events_archive`
+--   ADD COLUMN IF NOT EXISTS queue_lag_ms INT64
+--   OPTIONS(description="Time between publication to Pub/Sub and the start of processing in milliseconds");
+
 -- ============================================================================
 -- TABLE: events_historical
 -- Description: Historical events moved from Supabase (>90 days old)
@@ -61,6 +61,46 @@ locals {
   # Pub/Sub topic names
   webhook_events_topic = "${var.pubsub_topic_prefix}-webhook-events-${var.environment}"
   dlq_topic            = "${var.pubsub_topic_prefix}-webhook-events-dlq-${var.environment}"
+
+  # Routing lanes: one topic and event processor per lane
+  lane_topics = {
+    for name, lane in var.event_lanes :
+    name => "${var.pubsub_topic_prefix}-webhook-events-${name}-${var.environment}"
+  }
+
+  # Webhook receiver routing table (see functions/webhook_receiver/event_routing.py)
+  routing_config = jsonencode({
+    lanes = {
+      for name, lane in var.event_lanes : name => {
+        for key, value in {
+          topic                   = local.lane_topics[name]
+          max_messages            = lane.max_messages
+          max_latency_seconds     = lane.max_latency_seconds
+          publish_timeout_seconds = lane.publish_timeout_seconds
+        } : key => value if value != null
+      }
+    }
+    rules = merge({}, [
+      for name, lane in var.event_lanes : { for event_type in lane.event_types : event_type => name }
+    ]...)
+  })
+
+  event_processor_environment = {
+    GCP_PROJECT_ID       = var.project_id
+    BIGQUERY_DATASET_ID  = var.bigquery_dataset_id
+    BIGQUERY_DATASET     = var.bigquery_dataset_id # Backward compatibility
+    SUPABASE_DB_HOST     = var.supabase_db_host
+    SUPABASE_DB_PORT     = var.supabase_db_port
+    SUPABASE_DB_NAME     = var.supabase_db_name
+    SUPABASE_DB_USER     = var.supabase_db_user
+    SUPABASE_DB_PASSWORD = var.supabase_db_password
+    LOG_LEVEL            = var.log_level
+    ENVIRONMENT          = var.environment
+
+    QUEUE_LAG_ALERT_SECONDS = var.queue_lag_alert_threshold
+    DB_PREPARED_STATEMENTS  = var.db_prepared_statements
+    DB_BACKEND              = var.db_backend
+  }
 }
 
 # ============================================================================
@@ -103,6 +143,8 @@ module "pubsub" {
   message_retention_duration = var.pubsub_message_retention_duration
   ack_deadline_seconds       = var.pubsub_ack_deadline_seconds
   max_delivery_attempts      = var.pubsub_max_delivery_attempts
+  enable_message_ordering    = var.pubsub_enable_message_ordering
+  lane_topic_names           = local.lane_topics
 
   labels = local.common_labels
 
@@ -162,6 +204,17 @@ module "webhook_receiver" {
     LOG_LEVEL                   = var.log_level
     ENVIRONMENT                 = var.environment
     ENABLE_SIGNATURE_VALIDATION = "true"
+
+    PUBSUB_ENABLE_MESSAGE_ORDERING = var.pubsub_enable_message_ordering ? "true" : "false"
+    PUBSUB_ROUTING_CONFIG          = local.routing_config
+
+    TERMINAL49_WEBHOOK_PREVIOUS_SECRETS = join(",", var.terminal49_webhook_previous_secrets)
+
+    ADMISSION_RATE_PER_SECOND = tostring(var.webhook_receiver_admission_rate_per_second)
+    ADMISSION_BURST           = tostring(var.webhook_receiver_admission_burst)
+    ADMISSION_MAX_IN_FLIGHT   = tostring(var.webhook_receiver_admission_max_in_flight)
+
+    WARMUP_AFTER_FIRST_REQUEST = var.webhook_receiver_warmup_after_first_request ? "true" : "false"
   }
 
   # Resource allocation
@@ -196,18 +249,7 @@ module "event_processor" {
   pubsub_topic = module.pubsub.webhook_events_topic_id
 
   # Environment variables
-  environment_variables = {
-    GCP_PROJECT_ID       = var.project_id
-    BIGQUERY_DATASET_ID  = var.bigquery_dataset_id
-    BIGQUERY_DATASET     = var.bigquery_dataset_id # Backward compatibility
-    SUPABASE_DB_HOST     = var.supabase_db_host
-    SUPABASE_DB_PORT     = var.supabase_db_port
-    SUPABASE_DB_NAME     = var.supabase_db_name
-    SUPABASE_DB_USER     = var.supabase_db_user
-    SUPABASE_DB_PASSWORD = var.supabase_db_password
-    LOG_LEVEL            = var.log_level
-    ENVIRONMENT          = var.environment
-  }
+  environment_variables = local.event_processor_environment
 
   # Resource allocation (Phase 3 requirements: 512MB, 120s timeout)
   available_memory_mb = var.event_processor_memory_mb
@@ -220,6 +262,40 @@ module "event_processor" {
   depends_on = [module.pubsub, module.bigquery, module.service_accounts]
 }
 
+# Cloud Functions Module - Event Processor per routing lane (same code,
+# independent scaling so one lane's backlog cannot delay another)
+module "event_processor_lane" {
+  source   = "./modules/cloud_function"
+  for_each = var.event_lanes
+
+  project_id  = var.project_id
+  region      = var.region
+  environment = var.environment
+
+  function_name        = "${var.function_name_prefix}-event-processor-${each.key}-${var.environment}"
+  function_description = "Processes Terminal49 webhook events routed to the ${each.key} lane"
+  entry_point          = "process_webhook_event"
+  runtime              = var.function_runtime
+  source_dir           = "${path.root}/../../functions/event_processor"
+
+  service_account_email = local.event_processor_sa_email
+
+  # Pub/Sub trigger configuration
+  trigger_type = "pubsub"
+  pubsub_topic = module.pubsub.lane_topic_ids[each.key]
+
+  environment_variables = local.event_processor_environment
+
+  available_memory_mb = var.event_processor_memory_mb
+  timeout_seconds     = var.event_processor_timeout_seconds
+  max_instance_count  = each.value.max_instances
+  min_instance_count  = var.event_processor_min_instances
+
+  labels = merge(local.common_labels, { lane = each.key })
+
+  depends_on = [module.pubsub, module.bigquery, module.service_accounts]
+}
+
 # Cloud Functions Module - Supabase Archiver
 module "supabase_archiver" {
   source = "./modules/cloud_function"
@@ -306,6 +382,7 @@ module "monitoring" {
   # Alert thresholds
   webhook_error_rate_threshold       = var.webhook_error_rate_threshold
   event_processing_latency_threshold = var.event_processing_latency_threshold
+  queue_lag_alert_threshold          = var.queue_lag_alert_threshold
   dlq_depth_threshold                = var.dlq_depth_threshold
 
   labels = local.common_labels
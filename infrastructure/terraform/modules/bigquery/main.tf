@@ -129,6 +129,12 @@ resource "google_bigquery_table" "raw_events_archive" {
       mode        = "NULLABLE"
       description = "Time taken to process event in milliseconds"
     },
+    {
+      name        = "queue_lag_ms"
+      type        = "INTEGER"
+      mode        = "NULLABLE"
+      description = "Time between publication to Pub/Sub and the start of processing in milliseconds"
+    },
     {
       name        = "processing_error"
       type        = "STRING"
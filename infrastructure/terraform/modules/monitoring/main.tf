@@ -116,6 +116,57 @@ resource "google_monitoring_alert_policy" "event_processing_latency" {
   }
 }
 
+# ============================================================================
+# Alert Policy: Event Queue Lag
+# ============================================================================
+
+# Counts the warning the event processor logs for each event whose queue lag
+# (publish to processing start) exceeds QUEUE_LAG_ALERT_SECONDS
+resource "google_logging_metric" "event_queue_lag_exceeded" {
+  name    = "event_queue_lag_exceeded"
+  project = var.project_id
+  filter  = "severity=WARNING AND jsonPayload.message=\"Queue lag above threshold\""
+
+  metric_descriptor {
+    metric_kind = "DELTA"
+    value_type  = "INT64"
+    unit        = "1"
+  }
+}
+
+resource "google_monitoring_alert_policy" "event_queue_lag" {
+  display_name = "[${upper(var.environment)}] Terminal49 Event Queue Lag High"
+  project      = var.project_id
+  combiner     = "OR"
+
+  conditions {
+    display_name = "Events waiting > ${var.queue_lag_alert_threshold}s in Pub/Sub"
+
+    condition_threshold {
+      filter          = "metric.type=\"logging.googleapis.com/user/${google_logging_metric.event_queue_lag_exceeded.name}\""
+      duration        = "0s"
+      comparison      = "COMPARISON_GT"
+      threshold_value = 0
+
+      aggregations {
+        alignment_period   = "300s"
+        per_series_aligner = "ALIGN_SUM"
+      }
+    }
+  }
+
+  notification_channels = var.notification_channels
+
+  alert_strategy {
+    auto_close = "1800s"
+  }
+
+  documentation {
+    content   = "Events are starting to process more than ${var.queue_lag_alert_threshold} seconds after the webhook receiver published them. The subscription is backlogged: check the event processor's instance limit, its error rate and Postgres/BigQuery latency (event_stage_duration_ms in the \"Metrics snapshot\" logs)."
+    mime_type = "text/markdown"
+  }
+}
+
 # ============================================================================
 # Alert Policy: Dead Letter Queue Depth
 # ============================================================================
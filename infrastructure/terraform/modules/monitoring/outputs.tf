@@ -22,6 +22,11 @@ output "event_processing_latency_alert_id" {
   value       = google_monitoring_alert_policy.event_processing_latency.id
 }
 
+output "event_queue_lag_alert_id" {
+  description = "ID of the event queue lag alert policy"
+  value       = google_monitoring_alert_policy.event_queue_lag.id
+}
+
 output "dlq_depth_alert_id" {
   description = "ID of the DLQ depth alert policy"
   value       = google_monitoring_alert_policy.dlq_depth.id
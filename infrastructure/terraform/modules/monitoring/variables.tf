@@ -38,6 +38,12 @@ variable "event_processing_latency_threshold" {
   default     = 30
 }
 
+variable "queue_lag_alert_threshold" {
+  description = "Queue lag above which the event processor logs an alert warning (seconds)"
+  type        = number
+  default     = 300
+}
+
 variable "dlq_depth_threshold" {
   description = "Threshold for dead letter queue depth alerts"
   type        = number
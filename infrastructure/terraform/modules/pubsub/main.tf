@@ -14,6 +14,23 @@ resource "google_pubsub_topic" "webhook_events" {
   labels = var.labels
 }
 
+# ============================================================================
+# Routing Lane Topics
+# ============================================================================
+
+# One topic per processing lane; the webhook receiver routes event types to
+# them (PUBSUB_ROUTING_CONFIG) and each is consumed by its own event processor
+resource "google_pubsub_topic" "lane" {
+  for_each = var.lane_topic_names
+
+  name    = each.value
+  project = var.project_id
+
+  message_retention_duration = var.message_retention_duration
+
+  labels = merge(var.labels, { lane = each.key })
+}
+
 # ============================================================================
 # Dead Letter Queue Topic
 # ============================================================================
@@ -54,8 +71,10 @@ resource "google_pubsub_subscription" "event_processor" {
     max_delivery_attempts = var.max_delivery_attempts
   }
 
-  # Enable message ordering (optional, set to false for higher throughput)
-  enable_message_ordering = false
+  # Deliver messages sharing an ordering key (one key per container or
+  # shipment, set by the webhook receiver) in publish order. Changing this
+  # replaces the subscription and drops its unacked backlog
+  enable_message_ordering = var.enable_message_ordering
 
   # Expiration policy (never expire)
   expiration_policy {
@@ -110,6 +129,33 @@ resource "google_pubsub_topic_iam_member" "webhook_receiver_publisher" {
   member  = "serviceAccount:${var.webhook_receiver_sa_email}"
 }
 
+# Allow webhook receiver to publish to lane topics
+resource "google_pubsub_topic_iam_member" "webhook_receiver_lane_publisher" {
+  for_each = google_pubsub_topic.lane
+
+  project = var.project_id
+  topic   = each.value.name
+  role    = "roles/pubsub.publisher"
+  member  = "serviceAccount:${var.webhook_receiver_sa_email}"
+}
+
+# Allow webhook receiver to read topic metadata (deep health check probe)
+resource "google_pubsub_topic_iam_member" "webhook_receiver_viewer" {
+  project = var.project_id
+  topic   = google_pubsub_topic.webhook_events.name
+  role    = "roles/pubsub.viewer"
+  member  = "serviceAccount:${var.webhook_receiver_sa_email}"
+}
+
+resource "google_pubsub_topic_iam_member" "webhook_receiver_lane_viewer" {
+  for_each = google_pubsub_topic.lane
+
+  project = var.project_id
+  topic   = each.value.name
+  role    = "roles/pubsub.viewer"
+  member  = "serviceAccount:${var.webhook_receiver_sa_email}"
+}
+
 # Allow event processor to subscribe to main topic
 resource "google_pubsub_subscription_iam_member" "event_processor_subscriber" {
   project      = var.project_id
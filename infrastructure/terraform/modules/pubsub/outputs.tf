@@ -10,6 +10,11 @@ output "webhook_events_topic_name" {
   value       = google_pubsub_topic.webhook_events.name
 }
 
+output "lane_topic_ids" {
+  description = "IDs of the routing lane topics, by lane name"
+  value       = { for name, topic in google_pubsub_topic.lane : name => topic.id }
+}
+
 output "dlq_topic_id" {
   description = "ID of the dead letter queue topic"
   value       = google_pubsub_topic.dlq.id
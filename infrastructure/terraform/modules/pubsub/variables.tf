@@ -48,6 +48,18 @@ variable "max_delivery_attempts" {
   default     = 5
 }
 
+variable "enable_message_ordering" {
+  description = "Deliver messages with the same ordering key in publish order. Forces replacement of the subscription when changed"
+  type        = bool
+  default     = false
+}
+
+variable "lane_topic_names" {
+  description = "Topic name per routing lane (lane name => topic name)"
+  type        = map(string)
+  default     = {}
+}
+
 variable "labels" {
   description = "Labels to apply to all resources"
   type        = map(string)
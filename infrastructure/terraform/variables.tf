@@ -85,6 +85,30 @@ variable "webhook_receiver_min_instances" {
   default     = 0
 }
 
+variable "webhook_receiver_admission_rate_per_second" {
+  description = "Sustained webhooks per second admitted per receiver instance before answering 429 (0 disables)"
+  type        = number
+  default     = 0
+}
+
+variable "webhook_receiver_admission_burst" {
+  description = "Webhooks admitted at once per receiver instance after an idle period (0 = one second of the rate)"
+  type        = number
+  default     = 0
+}
+
+variable "webhook_receiver_admission_max_in_flight" {
+  description = "Maximum in-flight Pub/Sub publishes per receiver instance before answering 429 (0 disables)"
+  type        = number
+  default     = 0
+}
+
+variable "webhook_receiver_warmup_after_first_request" {
+  description = "Create Pub/Sub clients in the background after each receiver instance's first request"
+  type        = bool
+  default     = false
+}
+
 # Event Processor Configuration
 variable "event_processor_memory_mb" {
   description = "Memory allocation for event processor function (MB)"
@@ -138,6 +162,24 @@ variable "pubsub_max_delivery_attempts" {
   default     = 5
 }
 
+variable "event_lanes" {
+  description = "Processing lanes beyond the default topic. Event types matching a lane (exact, or prefix ending in '*') are published to the lane's topic and processed by a dedicated event processor."
+  type = map(object({
+    event_types             = list(string)
+    max_messages            = optional(number)
+    max_latency_seconds     = optional(number)
+    publish_timeout_seconds = optional(number)
+    max_instances           = optional(number, 10)
+  }))
+  default = {}
+}
+
+variable "pubsub_enable_message_ordering" {
+  description = "Publish and deliver webhook events in per-container order. Changing it replaces the processor subscription; see the webhook receiver README for the migration"
+  type        = bool
+  default     = false
+}
+
 # ============================================================================
 # BigQuery Configuration
 # ============================================================================
@@ -200,6 +242,28 @@ variable "supabase_db_port" {
   default     = "5432"
 }
 
+variable "db_prepared_statements" {
+  description = "Prepare the event processor's hot writes per connection: auto (off only on Supabase's 6543 transaction pooler), true or false. Use false behind any other transaction-mode pooler"
+  type        = string
+  default     = "auto"
+
+  validation {
+    condition     = contains(["auto", "true", "false"], var.db_prepared_statements)
+    error_message = "db_prepared_statements must be auto, true or false."
+  }
+}
+
+variable "db_backend" {
+  description = "Event processor database driver: psycopg2, or psycopg (psycopg 3, pipelined transactions)"
+  type        = string
+  default     = "psycopg2"
+
+  validation {
+    condition     = contains(["psycopg2", "psycopg"], var.db_backend)
+    error_message = "db_backend must be psycopg2 or psycopg."
+  }
+}
+
 variable "supabase_db_name" {
   description = "Supabase database name"
   type        = string
@@ -228,6 +292,13 @@ variable "terminal49_webhook_secret" {
   sensitive   = true
 }
 
+variable "terminal49_webhook_previous_secrets" {
+  description = "Previous Terminal49 webhook secrets still accepted during a secret rotation window"
+  type        = list(string)
+  default     = []
+  sensitive   = true
+}
+
 # ============================================================================
 # Logging Configuration
 # ============================================================================
@@ -265,6 +336,12 @@ variable "event_processing_latency_threshold" {
   default     = 30
 }
 
+variable "queue_lag_alert_threshold" {
+  description = "Queue lag above which the event processor logs an alert warning (seconds)"
+  type        = number
+  default     = 300
+}
+
 variable "dlq_depth_threshold" {
   description = "Threshold for dead letter queue depth alerts"
   type        = number
@@ -0,0 +1,385 @@
+"""
+Integration tests for the ASGI webhook receiver entry point.
+
+Tests cover:
+- Same responses as the Flask handler for valid and invalid webhooks
+- Chunked request bodies and the body size cap
+- Health check and method handling
+- Admission control and publish failures
+- Many concurrent webhooks awaiting Pub/Sub on one event loop
+- ASGI lifespan
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from unittest.mock import patch
+
+import pytest
+
+# Import the module under test
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../functions/webhook_receiver'))
+
+import asgi_app
+import pubsub_publisher
+from asgi_app import app
+from admission_control import AdmissionController, set_admission_controller
+from dedup_cache import set_dedup_backend
+from health_probes import reset_probes
+from metrics import get_registry, reset_metrics
+from webhook_validator import compute_signature
+
+
+SECRET = 'test-secret-key'
+
+
+class TimedPublisher:
+    """Publisher stand-in that acks each message after a delay on a timer thread."""
+
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.published = []
+        self._lock = threading.Lock()
+
+    def topic_path(self, project, topic):
+        return f"projects/{project}/topics/{topic}"
+
+    def publish(self, topic_path, data, ordering_key='', **attributes):
+        future = Future()
+        with self._lock:
+            self.published.append((topic_path, data, ordering_key, attributes))
+            message_id = str(len(self.published))
+
+        def _resolve():
+            if self.error is not None:
+                future.set_exception(self.error)
+            else:
+                future.set_result(message_id)
+
+        if self.delay is None:
+            return future
+        threading.Timer(self.delay, _resolve).start()
+        return future
+
+    def resume_publish(self, topic_path, ordering_key):
+        pass
+
+
+async def call(method='POST', path='/', headers=None, body=b'', chunk_size=None, query_string=b''):
+    """Drive the ASGI app for one request; returns (status, headers, body)."""
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] if chunk_size else [body]
+    messages = [
+        {'type': 'http.request', 'body': chunk, 'more_body': i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query_string,
+        'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in (headers or {}).items()]
+    }
+    await app(scope, receive, send)
+
+    start, response_body = sent
+    return (
+        start['status'],
+        {k.decode('latin-1'): v.decode('latin-1') for k, v in start['headers']},
+        response_body['body'].decode('utf-8')
+    )
+
+
+def signed(payload):
+    body = json.dumps(payload).encode('utf-8')
+    return body, {'X-T49-Webhook-Signature': compute_signature(body, SECRET)}
+
+
+def sample_payload(notification_id='notif_123'):
+    return {
+        "data": {
+            "id": notification_id,
+            "type": "notification",
+            "attributes": {"event": "container.transport.vessel_arrived"},
+            "relationships": {"reference_object": {"data": {"id": "cont_1", "type": "container"}}}
+        },
+        "included": []
+    }
+
+
+@pytest.fixture(autouse=True)
+def reset_state():
+    set_dedup_backend(None)
+    set_admission_controller(None, reload=True)
+    yield
+    set_dedup_backend(None)
+    set_admission_controller(None, reload=True)
+
+
+@pytest.fixture
+def mock_env():
+    env_vars = {
+        'TERMINAL49_WEBHOOK_SECRET': SECRET,
+        'GCP_PROJECT_ID': 'test-project',
+        'PUBSUB_TOPIC': 'terminal49-webhook-events'
+    }
+    with patch.dict(os.environ, env_vars):
+        yield env_vars
+
+
+@pytest.fixture
+def publisher():
+    stub = TimedPublisher()
+    with patch.object(pubsub_publisher, '_publisher_client', stub):
+        yield stub
+
+
+class TestAsgiWebhook:
+    """Webhook handling through the ASGI entry point."""
+
+    def test_successful_webhook(self, mock_env, publisher):
+        body, headers = signed(sample_payload())
+
+        with patch.dict(os.environ, {'PUBSUB_ENABLE_MESSAGE_ORDERING': 'true'}):
+            status, response_headers, response = asyncio.run(call(headers=headers, body=body))
+
+        assert (status, response) == (200, 'OK')
+        topic_path, data, ordering_key, attributes = publisher.published[0]
+        assert data == body
+        assert ordering_key == 'container:cont_1'
+        assert attributes['event_type'] == 'container.transport.vessel_arrived'
+        assert attributes['notification_id'] == 'notif_123'
+        assert attributes['received_at'] <= attributes['timestamp']
+
+    def test_chunked_body(self, mock_env, publisher):
+        body, headers = signed(sample_payload())
+
+        status, _, _ = asyncio.run(call(headers=headers, body=body, chunk_size=7))
+
+        assert status == 200
+        assert publisher.published[0][1] == body
+
+    def test_chunked_body_over_limit(self, mock_env, publisher):
+        body, headers = signed(sample_payload())
+
+        with patch.dict(os.environ, {'WEBHOOK_MAX_BODY_BYTES': str(len(body) - 1)}):
+            status, _, response = asyncio.run(call(headers=headers, body=body, chunk_size=7))
+
+        assert (status, response) == (413, 'Payload Too Large')
+        assert publisher.published == []
+
+    def test_declared_length_over_limit_rejected_before_reading(self, mock_env, publisher):
+        body, headers = signed(sample_payload())
+        headers['Content-Length'] = str(len(body))
+        receive_calls = []
+
+        async def receive():
+            receive_calls.append(1)
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        scope = {
+            'type': 'http',
+            'method': 'POST',
+            'path': '/',
+            'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers.items()]
+        }
+        with patch.dict(os.environ, {'WEBHOOK_MAX_BODY_BYTES': '100'}):
+            status, _, _ = asyncio.run(asgi_app.handle_request(scope, receive))
+
+        assert status == 413
+        assert receive_calls == []
+
+    def test_unsigned_body_rejected_at_first_chunk(self, mock_env, publisher):
+        body, _ = signed(sample_payload())
+        chunks = [body[:16], body[16:]]
+        received = []
+
+        async def receive():
+            received.append(chunks[len(received)])
+            return {'type': 'http.request', 'body': received[-1], 'more_body': len(received) < len(chunks)}
+
+        scope = {'type': 'http', 'method': 'POST', 'path': '/', 'headers': []}
+        status, _, _ = asyncio.run(asgi_app.handle_request(scope, receive))
+
+        assert status == 401
+        assert len(received) == 1
+
+    @pytest.mark.parametrize('body,headers,expected', [
+        (b'{}', {'X-T49-Webhook-Signature': '0' * 64}, (401, 'Unauthorized: Invalid signature')),
+        (b'{}', {}, (401, 'Unauthorized: Invalid signature')),
+        (b'', {}, (400, 'Bad Request: Empty body')),
+    ])
+    def test_rejected(self, mock_env, publisher, body, headers, expected):
+        status, _, response = asyncio.run(call(headers=headers, body=body))
+
+        assert (status, response) == expected
+        assert publisher.published == []
+
+    def test_invalid_json(self, mock_env, publisher):
+        body = b'not valid json {'
+        headers = {'X-T49-Webhook-Signature': compute_signature(body, SECRET)}
+
+        status, _, response = asyncio.run(call(headers=headers, body=body))
+
+        assert (status, response) == (400, 'Bad Request: Invalid JSON')
+
+    def test_duplicate_suppressed(self, mock_env, publisher):
+        body, headers = signed(sample_payload())
+
+        async def twice():
+            return [await call(headers=headers, body=body) for _ in range(2)]
+
+        assert [r[0] for r in asyncio.run(twice())] == [200, 200]
+        assert len(publisher.published) == 1
+
+    def test_large_body_inspected_off_loop(self, mock_env, publisher):
+        body, headers = signed(sample_payload())
+
+        with patch.object(asgi_app, 'INSPECT_OFFLOAD_BYTES', 1), \
+                patch.object(asgi_app.asyncio, 'to_thread', wraps=asyncio.to_thread) as mock_to_thread:
+            status, _, _ = asyncio.run(call(headers=headers, body=body))
+
+        assert status == 200
+        assert mock_to_thread.called
+
+    def test_publish_failure(self, mock_env, publisher):
+        publisher.error = RuntimeError("Pub/Sub unavailable")
+        body, headers = signed(sample_payload())
+
+        status, _, response = asyncio.run(call(headers=headers, body=body))
+
+        assert (status, response) == (500, 'Internal Server Error: Failed to queue event')
+
+    def test_publish_timeout(self, mock_env, publisher):
+        publisher.delay = None
+        body, headers = signed(sample_payload())
+
+        with patch.object(pubsub_publisher, 'PUBLISH_TIMEOUT_SECONDS', 0.05):
+            status, _, _ = asyncio.run(call(headers=headers, body=body))
+
+        assert status == 500
+
+    def test_admission_control(self, mock_env, publisher):
+        set_admission_controller(AdmissionController(rate_per_second=0.5, burst=1))
+
+        requests = [signed(sample_payload(f"n-{i}")) for i in range(2)]
+
+        async def two():
+            return [await call(headers=headers, body=body) for body, headers in requests]
+
+        first, second = asyncio.run(two())
+        assert first[0] == 200
+        assert second[0] == 429
+        assert second[1]['retry-after'] == '2'
+
+
+class TestAsgiConcurrency:
+    """One event loop holding many webhooks that are waiting on Pub/Sub."""
+
+    def test_concurrent_webhooks_share_one_thread(self, mock_env, publisher):
+        publisher.delay = 0.2
+        requests = [signed(sample_payload(f"notif-{i}")) for i in range(300)]
+
+        async def run_all():
+            return await asyncio.gather(*(call(headers=h, body=b) for b, h in requests))
+
+        start = time.perf_counter()
+        results = asyncio.run(run_all())
+        elapsed = time.perf_counter() - start
+
+        assert [r[0] for r in results] == [200] * 300
+        # Sequential handling would take 300 * 0.2s
+        assert elapsed < 5
+
+
+class TestAsgiEndpoints:
+    """Health check, methods and lifespan."""
+
+    def test_health(self, mock_env):
+        status, headers, body = asyncio.run(call(method='GET', path='/health'))
+
+        assert status == 200
+        assert headers['content-type'] == 'application/json'
+        assert json.loads(body)['checks']['GCP_PROJECT_ID'] == 'configured'
+
+    def test_health_unhealthy(self):
+        with patch.dict(os.environ, {}, clear=True):
+            status, _, body = asyncio.run(call(method='GET', path='/health'))
+
+        assert status == 503
+        assert json.loads(body)['status'] == 'unhealthy'
+
+    def test_deep_health_probes_topic_off_loop(self, mock_env):
+        threads = []
+
+        def get_topic(request, retry=None, timeout=None):
+            threads.append(threading.current_thread())
+            return {'name': request['topic']}
+
+        reset_probes()
+        try:
+            with patch('pubsub_publisher.get_publisher_client') as mock_client:
+                mock_client.return_value.get_topic.side_effect = get_topic
+                status, _, body = asyncio.run(call(method='GET', path='/health', query_string=b'deep=1'))
+        finally:
+            reset_probes()
+
+        assert status == 200
+        assert json.loads(body)['dependencies']['pubsub']['status'] == 'ok'
+        assert threads and threads[0] is not threading.main_thread()
+
+    def test_metrics_recorded_and_served(self, mock_env, publisher):
+        reset_metrics()
+        body, headers = signed(sample_payload())
+
+        asyncio.run(call(headers=headers, body=body))
+        asyncio.run(call(headers={'X-T49-Webhook-Signature': 'sha256=bad'}, body=body))
+        status, response_headers, text = asyncio.run(call(method='GET', path='/metrics'))
+
+        stages = {
+            (entry['stage'], entry['event_type'])
+            for entry in get_registry().snapshot()['webhook_stage_duration_ms']
+        }
+        event_type = 'container.transport.vessel_arrived'
+        assert {('signature', event_type), ('parse', event_type), ('publish', event_type)} <= stages
+        assert status == 200
+        assert response_headers['content-type'].startswith('text/plain; version=0.0.4')
+        assert f'webhook_requests_total{{status="200",event_type="{event_type}"}} 1' in text
+        assert 'webhook_requests_total{status="401",event_type="unknown"} 1' in text
+
+    def test_method_not_allowed(self, mock_env):
+        status, _, body = asyncio.run(call(method='PUT'))
+
+        assert (status, body) == (405, 'Method Not Allowed')
+
+    def test_lifespan(self):
+        messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        with patch.object(asgi_app, 'replay_spool_on_startup') as mock_replay:
+            asyncio.run(app({'type': 'lifespan'}, receive, send))
+
+        assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+        mock_replay.assert_called_once()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,115 @@
+"""
+Integration tests for cold-start imports.
+
+Each test imports a function's entry point in a fresh interpreter, so the
+modules already loaded by other tests do not hide an eager import.
+
+Tests cover:
+- Heavy client libraries are not imported by the receiver or processor at startup
+- The receiver answers /health (Flask and ASGI) without importing them
+- They are imported on first use
+"""
+
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+WEBHOOK_RECEIVER_DIR = os.path.join(REPO_ROOT, 'functions', 'webhook_receiver')
+EVENT_PROCESSOR_DIR = os.path.join(REPO_ROOT, 'functions', 'event_processor')
+
+HEAVY_MODULES = [
+    'google.cloud.pubsub_v1',
+    'google.cloud.bigquery',
+    'google.api_core.exceptions',
+    'grpc',
+    'psycopg2',
+]
+
+ENV = {
+    'TERMINAL49_WEBHOOK_SECRET': 'test-secret-key',
+    'GCP_PROJECT_ID': 'test-project',
+    'PUBSUB_TOPIC': 'terminal49-webhook-events',
+}
+
+
+def loaded_heavy_modules(function_dir, code):
+    """Run code in a fresh interpreter; returns the heavy modules it imported."""
+    script = textwrap.dedent(code) + textwrap.dedent(f"""
+        import json, sys
+        print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))
+    """)
+    result = subprocess.run(
+        [sys.executable, '-c', script],
+        cwd=function_dir,
+        env=dict(os.environ, **ENV),
+        capture_output=True,
+        text=True,
+        timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class TestReceiverColdStart:
+    """Webhook receiver startup imports."""
+
+    def test_import_main(self):
+        assert loaded_heavy_modules(WEBHOOK_RECEIVER_DIR, "import main\n") == []
+
+    def test_flask_health_check(self):
+        code = """
+            import flask
+            import main
+
+            with flask.Flask(__name__).test_request_context('/health', method='GET'):
+                body, status = main.webhook_receiver(flask.request)[:2]
+            assert status == 200, body
+        """
+
+        assert loaded_heavy_modules(WEBHOOK_RECEIVER_DIR, code) == []
+
+    def test_asgi_health_check(self):
+        code = """
+            import asyncio
+            from asgi_app import handle_request
+
+            async def receive():
+                return {'type': 'http.request', 'body': b''}
+
+            scope = {'type': 'http', 'method': 'GET', 'path': '/health', 'headers': []}
+            status = asyncio.run(handle_request(scope, receive))[0]
+            assert status == 200, status
+        """
+
+        assert loaded_heavy_modules(WEBHOOK_RECEIVER_DIR, code) == []
+
+    def test_client_library_imported_on_first_use(self):
+        code = """
+            import os
+            import pubsub_publisher
+
+            # The emulator setting lets the client start without credentials
+            os.environ['PUBSUB_EMULATOR_HOST'] = 'localhost:8085'
+            pubsub_publisher.get_publisher_client()
+        """
+
+        loaded = loaded_heavy_modules(WEBHOOK_RECEIVER_DIR, code)
+
+        assert 'google.cloud.pubsub_v1' in loaded
+
+
+class TestProcessorColdStart:
+    """Event processor startup imports."""
+
+    def test_import_main(self):
+        assert loaded_heavy_modules(EVENT_PROCESSOR_DIR, "import main\n") == []
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -5,18 +5,32 @@ Tests end-to-end event processing with mocked external dependencies.
 """
 
 import pytest
+import os
 import sys
 import json
 import base64
+from contextlib import contextmanager
 from pathlib import Path
 from unittest.mock import Mock, MagicMock, patch
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # Add functions directory to path
 functions_path = Path(__file__).parent.parent.parent / 'functions' / 'event_processor'
 sys.path.insert(0, str(functions_path))
 
-from main import process_webhook_event, _extract_notification_id
+from main import (
+    health_check,
+    health_status,
+    process_webhook_event,
+    _extract_notification_id,
+    _decode_message_data,
+    UnsupportedContentEncodingError
+)
+import database
+import bigquery_archiver
+from health_probes import reset_probes
+from prepared_statements import get_prepared_stats, reset_prepared_statements
+from metrics import get_registry, reset_metrics
 
 
 class TestProcessWebhookEvent:
@@ -220,6 +234,142 @@ class TestProcessWebhookEvent:
         # Archive should still have been called
         mock_archive.assert_called_once()
     
+    @patch('main.record_webhook_delivery')
+    @patch('main.archive_raw_event')
+    @patch('main.get_db_connection')
+    @patch('main.transform_event')
+    def test_transformation_error_recorded_after_rollback(
+        self,
+        mock_transform,
+        mock_get_db,
+        mock_archive,
+        mock_record_delivery
+    ):
+        """Test the failure is recorded in a second transaction, after the first is left."""
+        payload = {'data': {'id': 'notif-error', 'type': 'container'}}
+        cloud_event = Mock()
+        cloud_event.data = {
+            'message': {
+                'data': base64.b64encode(json.dumps(payload).encode('utf-8')),
+                'messageId': 'msg-error',
+                'attributes': {'event_type': 'container.updated', 'request_id': 'req-error'}
+            }
+        }
+        failed_conn, recording_conn = Mock(), Mock()
+        mock_get_db.return_value.__enter__.side_effect = [failed_conn, recording_conn]
+        mock_transform.side_effect = ValueError("Invalid data")
+        
+        with pytest.raises(ValueError, match="Invalid data"):
+            process_webhook_event(cloud_event)
+        
+        # The first transaction saw the exception (and rolled back) before the failure write
+        assert mock_get_db.return_value.__exit__.call_args_list[0][0][0] is ValueError
+        mock_record_delivery.assert_called_once()
+        kwargs = mock_record_delivery.call_args[1]
+        assert kwargs['conn'] is recording_conn
+        assert kwargs['notification_id'] == 'notif-error'
+        assert kwargs['processing_status'] == 'failed'
+        assert kwargs['processing_error'] == 'Invalid data'
+        assert kwargs['processing_duration_ms'] >= 0
+    
+    @patch('main.record_webhook_delivery')
+    @patch('main.archive_raw_event')
+    @patch('main.get_db_connection')
+    @patch('main.transform_event')
+    def test_failure_record_error_keeps_original(
+        self,
+        mock_transform,
+        mock_get_db,
+        mock_archive,
+        mock_record_delivery
+    ):
+        """Test a failed failure write does not replace the processing error."""
+        payload = {'data': {'id': 'notif-error', 'type': 'container'}}
+        cloud_event = Mock()
+        cloud_event.data = {
+            'message': {
+                'data': base64.b64encode(json.dumps(payload).encode('utf-8')),
+                'messageId': 'msg-error',
+                'attributes': {'event_type': 'container.updated', 'request_id': 'req-error'}
+            }
+        }
+        mock_transform.side_effect = ValueError("Invalid data")
+        mock_record_delivery.side_effect = RuntimeError("connection refused")
+        
+        with pytest.raises(ValueError, match="Invalid data"):
+            process_webhook_event(cloud_event)
+    
+    @staticmethod
+    def _missing_statement_error():
+        error = Exception('prepared statement "upsert_containers" does not exist')
+        error.pgcode = '26000'
+        return error
+    
+    @patch('main.record_webhook_delivery')
+    @patch('main.archive_raw_event')
+    @patch('main.get_db_connection')
+    @patch('main.transform_event')
+    def test_missing_prepared_statement_retried_unprepared(
+        self,
+        mock_transform,
+        mock_get_db,
+        mock_archive,
+        mock_record_delivery
+    ):
+        """Test a transaction that hit a missing prepared statement is run once more."""
+        payload = {'data': {'id': 'notif-pooler', 'type': 'container'}}
+        cloud_event = Mock()
+        cloud_event.data = {
+            'message': {
+                'data': base64.b64encode(json.dumps(payload).encode('utf-8')),
+                'messageId': 'msg-pooler',
+                'attributes': {'event_type': 'container.updated', 'request_id': 'req-pooler'}
+            }
+        }
+        mock_transform.side_effect = [self._missing_statement_error(), None]
+        
+        try:
+            process_webhook_event(cloud_event)
+            
+            assert mock_transform.call_count == 2
+            assert mock_get_db.call_count == 2
+            mock_record_delivery.assert_not_called()
+            assert get_prepared_stats()['enabled'] is False
+        finally:
+            reset_prepared_statements()
+    
+    @patch('main.record_webhook_delivery')
+    @patch('main.archive_raw_event')
+    @patch('main.get_db_connection')
+    @patch('main.transform_event')
+    def test_missing_prepared_statement_retried_once(
+        self,
+        mock_transform,
+        mock_get_db,
+        mock_archive,
+        mock_record_delivery
+    ):
+        """Test the unprepared retry is not repeated if it fails the same way."""
+        payload = {'data': {'id': 'notif-pooler', 'type': 'container'}}
+        cloud_event = Mock()
+        cloud_event.data = {
+            'message': {
+                'data': base64.b64encode(json.dumps(payload).encode('utf-8')),
+                'messageId': 'msg-pooler',
+                'attributes': {'event_type': 'container.updated', 'request_id': 'req-pooler'}
+            }
+        }
+        mock_transform.side_effect = [self._missing_statement_error(), self._missing_statement_error()]
+        
+        try:
+            with pytest.raises(Exception, match='does not exist'):
+                process_webhook_event(cloud_event)
+            
+            assert mock_transform.call_count == 2
+            mock_record_delivery.assert_called_once()
+        finally:
+            reset_prepared_statements()
+    
     @patch('main.archive_raw_event')
     def test_process_webhook_event_malformed_message(self, mock_archive):
         """Test handling of malformed Pub/Sub message."""
@@ -276,6 +426,75 @@ class TestProcessWebhookEvent:
         assert mock_transform.call_args[0][1] == 'unknown'
 
 
+class TestCompressedMessages:
+    """Tests for transparent decompression of message bodies."""
+    
+    PAYLOAD = {
+        'data': {
+            'id': 'notif-compressed',
+            'type': 'notification',
+            'attributes': {'event': 'container.updated'}
+        },
+        'included': [{'type': 'container', 'id': 'cont-1', 'attributes': {'number': 'CONT1'}}]
+    }
+    
+    def _cloud_event(self, message_data, content_encoding=None):
+        attributes = {'event_type': 'container.updated', 'request_id': 'req-compressed'}
+        if content_encoding:
+            attributes['content_encoding'] = content_encoding
+        cloud_event = Mock()
+        cloud_event.data = {
+            'message': {
+                'data': base64.b64encode(message_data),
+                'messageId': 'msg-compressed',
+                'attributes': attributes
+            }
+        }
+        return cloud_event
+    
+    @pytest.mark.parametrize('content_encoding', [None, 'gzip', 'zstd'])
+    @patch('main.archive_raw_event')
+    @patch('main.get_db_connection')
+    @patch('main.transform_event')
+    def test_payload_decoded(self, mock_transform, mock_get_db, mock_archive, content_encoding):
+        """Test that compressed and uncompressed messages produce the same payload."""
+        import gzip
+        import zstandard
+        
+        body = json.dumps(self.PAYLOAD).encode('utf-8')
+        if content_encoding == 'gzip':
+            body = gzip.compress(body)
+        elif content_encoding == 'zstd':
+            body = zstandard.ZstdCompressor().compress(body)
+        
+        mock_get_db.return_value.__enter__.return_value = Mock()
+        
+        process_webhook_event(self._cloud_event(body, content_encoding))
+        
+        assert mock_transform.call_args[1]['payload'] == self.PAYLOAD
+        assert mock_archive.call_args[1]['payload'] == self.PAYLOAD
+    
+    @patch('main.archive_raw_event')
+    def test_corrupt_body_not_retried(self, mock_archive):
+        """Test that a corrupt compressed body is treated as malformed."""
+        process_webhook_event(self._cloud_event(b'not gzip', 'gzip'))
+        
+        mock_archive.assert_not_called()
+    
+    @patch('main.archive_raw_event')
+    def test_unknown_encoding_retried(self, mock_archive):
+        """Test that an unknown encoding raises so the message is redelivered."""
+        with pytest.raises(UnsupportedContentEncodingError):
+            process_webhook_event(self._cloud_event(b'data', 'br'))
+        
+        mock_archive.assert_not_called()
+    
+    def test_identity_passthrough(self):
+        """Test that identity and missing encodings return the body unchanged."""
+        assert _decode_message_data(b'{}', None) == b'{}'
+        assert _decode_message_data(b'{}', 'identity') == b'{}'
+
+
 class TestExtractNotificationId:
     """Tests for notification ID extraction."""
     
@@ -502,6 +721,451 @@ class TestPerformanceMetrics:
         success_log = [call for call in info_calls if 'successfully' in str(call)]
         
         assert len(success_log) > 0
+    
+    @patch('main.archive_raw_event')
+    @patch('main.get_db_connection')
+    @patch('main.transform_event')
+    def test_stage_latencies_recorded(
+        self,
+        mock_transform,
+        mock_get_db,
+        mock_archive
+    ):
+        """Test that each stage's latency and the outcome are recorded with the event type."""
+        reset_metrics()
+        payload = {'data': {'id': 'notif-perf', 'type': 'container'}}
+        cloud_event = Mock()
+        cloud_event.data = {
+            'message': {
+                'data': base64.b64encode(json.dumps(payload).encode('utf-8')),
+                'messageId': 'msg-perf',
+                'attributes': {'event_type': 'container.updated', 'request_id': 'req-perf'}
+            }
+        }
+        mock_get_db.return_value.__enter__.return_value = Mock()
+        
+        process_webhook_event(cloud_event)
+        
+        snapshot = get_registry().snapshot()
+        stages = {
+            entry['stage'] for entry in snapshot['event_stage_duration_ms']
+            if entry['event_type'] == 'container.updated'
+        }
+        assert stages == {'decode', 'archive', 'transform', 'commit', 'event'}
+        assert snapshot['events_processed_total'] == [
+            {'event_type': 'container.updated', 'outcome': 'processed', 'value': 1}
+        ]
+    
+    @patch('main.archive_raw_event')
+    def test_malformed_message_counted(self, mock_archive):
+        """Test that malformed messages are counted without stage latencies."""
+        reset_metrics()
+        cloud_event = Mock()
+        cloud_event.data = {'message': {'data': base64.b64encode(b'not json'), 'messageId': 'msg-bad'}}
+        
+        process_webhook_event(cloud_event)
+        
+        assert get_registry().snapshot()['events_processed_total'] == [
+            {'event_type': 'unknown', 'outcome': 'malformed', 'value': 1}
+        ]
+
+
+class TestQueueLag:
+    """Tests for queue lag and end-to-end latency measurement."""
+    
+    @pytest.fixture(autouse=True)
+    def clean_metrics(self):
+        reset_metrics()
+        yield
+        reset_metrics()
+    
+    def _cloud_event(self, timestamp=None, publish_time=None, received_at=None):
+        attributes = {'event_type': 'container.updated', 'request_id': 'req-lag'}
+        if timestamp is not None:
+            attributes['timestamp'] = timestamp
+        if received_at is not None:
+            attributes['received_at'] = received_at
+        message = {
+            'data': base64.b64encode(json.dumps({'data': {'id': 'notif-lag'}}).encode('utf-8')),
+            'messageId': 'msg-lag',
+            'attributes': attributes
+        }
+        if publish_time is not None:
+            message['publishTime'] = publish_time
+        cloud_event = Mock()
+        cloud_event.data = {'message': message}
+        return cloud_event
+    
+    def _series(self, name):
+        return {
+            entry['event_type']: entry for entry in get_registry().snapshot().get(name, [])
+        }
+    
+    @patch('main.archive_raw_event')
+    @patch('main.get_db_connection')
+    @patch('main.transform_event')
+    def test_lag_from_timestamp_attribute(self, mock_transform, mock_get_db, mock_archive):
+        """Test that queue lag and end-to-end latency are measured from the timestamp attribute."""
+        published_at = datetime.utcnow() - timedelta(seconds=30)
+        
+        process_webhook_event(self._cloud_event(timestamp=published_at.isoformat()))
+        
+        queue_lag = self._series('event_queue_lag_ms')['container.updated']
+        end_to_end = self._series('event_end_to_end_ms')['container.updated']
+        assert queue_lag['count'] == 1
+        assert 30000 <= queue_lag['max'] < 35000
+        assert end_to_end['count'] == 1
+        assert end_to_end['max'] >= queue_lag['max']
+        assert 30000 <= mock_archive.call_args[1]['queue_lag_ms'] < 35000
+        assert self._series('event_queue_lag_alerts_total') == {}
+    
+    @patch('main.archive_raw_event')
+    @patch('main.get_db_connection')
+    @patch('main.transform_event')
+    def test_end_to_end_from_receipt(self, mock_transform, mock_get_db, mock_archive):
+        """Test that end-to-end latency is measured from the receiver's received_at attribute."""
+        received_at = datetime.utcnow() - timedelta(seconds=120)
+        published_at = received_at + timedelta(seconds=100)
+        
+        process_webhook_event(self._cloud_event(
+            timestamp=published_at.isoformat(), received_at=received_at.isoformat()
+        ))
+        
+        assert 20000 <= self._series('event_queue_lag_ms')['container.updated']['max'] < 25000
+        assert 120000 <= self._series('event_end_to_end_ms')['container.updated']['max'] < 125000
+    
+    @patch('main.archive_raw_event')
+    @patch('main.get_db_connection')
+    @patch('main.transform_event')
+    def test_publish_time_fallback(self, mock_transform, mock_get_db, mock_archive):
+        """Test that Pub/Sub's publishTime is used for messages without the attribute."""
+        published_at = datetime.utcnow() - timedelta(seconds=90)
+        
+        process_webhook_event(self._cloud_event(publish_time=published_at.isoformat() + 'Z'))
+        
+        assert 90000 <= self._series('event_queue_lag_ms')['container.updated']['max'] < 95000
+    
+    @patch('main.archive_raw_event')
+    @patch('main.get_db_connection')
+    @patch('main.transform_event')
+    def test_missing_timestamp_not_recorded(self, mock_transform, mock_get_db, mock_archive):
+        """Test that events without a usable publish time are processed without lag."""
+        process_webhook_event(self._cloud_event(timestamp='not-a-timestamp'))
+        
+        mock_transform.assert_called_once()
+        assert mock_archive.call_args[1]['queue_lag_ms'] is None
+        assert self._series('event_queue_lag_ms') == {}
+        assert self._series('event_end_to_end_ms') == {}
+    
+    @patch('main.archive_raw_event')
+    @patch('main.get_db_connection')
+    @patch('main.transform_event')
+    def test_clock_skew_clamped(self, mock_transform, mock_get_db, mock_archive):
+        """Test that a publish time slightly in the future is recorded as zero lag."""
+        published_at = datetime.utcnow() + timedelta(seconds=2)
+        
+        process_webhook_event(self._cloud_event(timestamp=published_at.isoformat()))
+        
+        assert mock_archive.call_args[1]['queue_lag_ms'] == 0
+    
+    @patch('main.archive_raw_event')
+    @patch('main.get_db_connection')
+    @patch('main.transform_event')
+    @patch('main.logger')
+    def test_alert_above_threshold(self, mock_logger, mock_transform, mock_get_db, mock_archive):
+        """Test that lag above QUEUE_LAG_ALERT_SECONDS logs a warning and is counted."""
+        published_at = datetime.utcnow() - timedelta(minutes=10)
+        
+        with patch.dict(os.environ, {'QUEUE_LAG_ALERT_SECONDS': '300'}):
+            process_webhook_event(self._cloud_event(timestamp=published_at.isoformat()))
+        
+        warnings = [
+            call for call in mock_logger.warning.call_args_list
+            if call[0][0] == "Queue lag above threshold"
+        ]
+        assert len(warnings) == 1
+        assert warnings[0][1]['extra']['queue_lag_ms'] >= 600000
+        assert warnings[0][1]['extra']['threshold_ms'] == 300000
+        assert get_registry().snapshot()['event_queue_lag_alerts_total'] == [
+            {'event_type': 'container.updated', 'value': 1}
+        ]
+        mock_transform.assert_called_once()
+    
+    @patch('main.archive_raw_event')
+    @patch('main.get_db_connection')
+    @patch('main.transform_event')
+    @patch('main.logger')
+    def test_alert_disabled(self, mock_logger, mock_transform, mock_get_db, mock_archive):
+        """Test that QUEUE_LAG_ALERT_SECONDS=0 disables the warning."""
+        published_at = datetime.utcnow() - timedelta(hours=1)
+        
+        with patch.dict(os.environ, {'QUEUE_LAG_ALERT_SECONDS': '0'}):
+            process_webhook_event(self._cloud_event(timestamp=published_at.isoformat()))
+        
+        mock_logger.warning.assert_not_called()
+        assert self._series('event_queue_lag_ms')['container.updated']['max'] >= 3600000
+
+
+class StubCursor:
+    """Cursor stand-in recording executed statements."""
+    
+    def __init__(self, connection):
+        self.connection = connection
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+    
+    def execute(self, query, params=None):
+        if self.connection.error is not None:
+            raise self.connection.error
+        self.connection.statements.append((query, params))
+    
+    def fetchone(self):
+        return (1,)
+
+
+class StubConnection:
+    """psycopg2 connection stand-in."""
+    
+    def __init__(self, error=None):
+        self.error = error
+        self.statements = []
+    
+    def cursor(self):
+        return StubCursor(self)
+    
+    def commit(self):
+        pass
+    
+    def rollback(self):
+        pass
+
+
+class StubPipelineConnection(StubConnection):
+    """psycopg 3 connection stand-in with pipeline mode."""
+    
+    def __init__(self, error=None):
+        super().__init__(error)
+        self.pipelines = 0
+    
+    @contextmanager
+    def pipeline(self):
+        self.pipelines += 1
+        yield
+    
+    def execute(self, query, params=None):
+        self.cursor().execute(query, params)
+
+
+class StubConnectionPool:
+    """SimpleConnectionPool stand-in with the same bookkeeping attributes."""
+    
+    def __init__(self, connection):
+        self.connection = connection
+        self.minconn = 1
+        self.maxconn = 5
+        self.closed = False
+        self._pool = [connection]
+        self._used = {}
+    
+    def getconn(self):
+        conn = self._pool.pop()
+        self._used[id(conn)] = conn
+        return conn
+    
+    def putconn(self, conn):
+        del self._used[id(conn)]
+        self._pool.append(conn)
+
+
+class StubBigQueryClient:
+    """BigQuery client stand-in answering get_table."""
+    
+    def __init__(self, error=None):
+        self.error = error
+        self.tables = []
+    
+    def get_table(self, table, retry=None, timeout=None):
+        if self.error is not None:
+            raise self.error
+        self.tables.append((table, timeout))
+        return Mock(table_id=table)
+
+
+class TestHealthCheck:
+    """Tests for the processor health check and dependency probes."""
+    
+    ENV = {
+        'GCP_PROJECT_ID': 'test-project',
+        'SUPABASE_DB_HOST': 'db.example.com',
+        'SUPABASE_DB_NAME': 'postgres',
+        'SUPABASE_DB_USER': 'postgres',
+        'SUPABASE_DB_PASSWORD': 'secret',
+        'HEALTH_PROBE_TIMEOUT_SECONDS': '1.5'
+    }
+    
+    @pytest.fixture
+    def dependencies(self):
+        connection = StubConnection()
+        pool = StubConnectionPool(connection)
+        bigquery = StubBigQueryClient()
+        reset_probes()
+        with patch.dict(os.environ, self.ENV), \
+                patch.object(database, '_connection_pool', pool), \
+                patch.object(bigquery_archiver, '_bigquery_client', bigquery):
+            yield connection, pool, bigquery
+        reset_probes()
+    
+    def test_shallow_reads_only_configuration(self, dependencies):
+        connection, _, bigquery = dependencies
+        
+        with patch('main.get_pool_stats') as get_pool_stats:
+            status, status_code = health_status()
+        
+        assert status_code == 200
+        assert set(status) == {'status', 'timestamp', 'checks'}
+        get_pool_stats.assert_not_called()
+        assert connection.statements == []
+        assert bigquery.tables == []
+    
+    def test_deep_reports_pool(self, dependencies):
+        with patch('main.run_probes', return_value=({}, True)):
+            status, _ = health_status(deep=True)
+        
+        assert status['database_pool'] == {
+            'initialized': True, 'closed': False, 'min_connections': 1,
+            'max_connections': 5, 'in_use': 0, 'idle': 1
+        }
+        assert 'prepared_connections' in status['prepared_statements']
+    
+    def test_pool_not_initialized(self):
+        with patch.dict(os.environ, self.ENV), patch.object(database, '_connection_pool', None), \
+                patch('main.run_probes', return_value=({}, True)):
+            status, _ = health_status(deep=True)
+        
+        assert status['database_pool'] == {'initialized': False}
+    
+    def test_deep_probes_postgres_and_bigquery(self, dependencies):
+        connection, _, bigquery = dependencies
+        
+        status, status_code = health_status(deep=True)
+        
+        assert status_code == 200
+        postgres = status['dependencies']['postgres']
+        assert postgres['status'] == 'ok'
+        assert 'latency_ms' in postgres
+        assert postgres['pool']['max_connections'] == 5
+        assert connection.statements[-1] == ("SELECT 1", None)
+        assert connection.statements[-2][1] == (1500,)
+        assert status['dependencies']['bigquery']['table'] == 'test-project.terminal49_raw_events.raw_events_archive'
+        assert bigquery.tables[0][1] == 1.5
+    
+    def test_deep_failure_is_unhealthy(self, dependencies):
+        _, _, bigquery = dependencies
+        bigquery.error = RuntimeError("dataset not found")
+        
+        status, status_code = health_status(deep=True)
+        
+        assert status_code == 503
+        assert status['dependencies']['postgres']['status'] == 'ok'
+        assert status['dependencies']['bigquery']['error'] == 'dataset not found'
+    
+    def test_probes_cached(self, dependencies):
+        connection, _, bigquery = dependencies
+        
+        for _ in range(3):
+            health_status(deep=True)
+        
+        assert len(bigquery.tables) == 1
+        assert len([q for q, _ in connection.statements if q == "SELECT 1"]) == 1
+    
+    def test_http_entry_point(self, dependencies):
+        request = Mock(args={'deep': 'true'})
+        
+        body, status_code, headers = health_check(request)
+        
+        assert status_code == 200
+        assert headers['Content-Type'] == 'application/json'
+        assert set(json.loads(body)['dependencies']) == {'postgres', 'bigquery'}
+    
+    def test_missing_config(self):
+        with patch.dict(os.environ, {}, clear=True):
+            status, status_code = health_status(deep=True)
+        
+        assert status_code == 503
+        assert status['checks']['SUPABASE_DB_HOST'] == 'missing'
+        assert 'dependencies' not in status
+
+
+
+class TestConnectionCheckout:
+    """Tests for preparing statements and discarding lost connections in get_db_connection."""
+    
+    @pytest.fixture(autouse=True)
+    def prepared(self):
+        reset_prepared_statements()
+        with patch.dict(os.environ, {'DB_PREPARED_STATEMENTS': 'true'}):
+            yield
+        reset_prepared_statements()
+    
+    def test_first_checkout_prepares_statements(self):
+        connection = StubConnection()
+        pool = StubConnectionPool(connection)
+        
+        with patch.object(database, '_connection_pool', pool):
+            for _ in range(2):
+                with database.get_db_connection():
+                    pass
+        
+        assert len(connection.statements) == 1
+        assert connection.statements[0][0].startswith('DEALLOCATE ALL;')
+        assert 'PREPARE upsert_shipments AS' in connection.statements[0][0]
+    
+    def test_closed_connection_discarded(self):
+        connection = StubConnection()
+        pool = Mock(getconn=Mock(return_value=connection))
+        
+        with patch.object(database, '_connection_pool', pool):
+            with database.get_db_connection():
+                connection.closed = 2
+        
+        pool.putconn.assert_called_once_with(connection, close=True)
+    
+    def test_psycopg_backend_pipelines_transaction(self):
+        pytest.importorskip('psycopg')
+        connection = StubPipelineConnection()
+        pool = Mock(getconn=Mock(return_value=connection))
+        
+        with patch.dict(os.environ, {'DB_BACKEND': 'psycopg'}), \
+                patch.object(database, '_connection_pool', pool):
+            with database.get_db_connection() as conn:
+                conn.cursor().execute('SELECT 1')
+        
+        # Statements are not prepared by name; psycopg 3 prepares them itself
+        assert [query for query, _ in connection.statements] == ['BEGIN', 'SELECT 1', 'COMMIT']
+        assert connection.pipelines == 1
+        pool.putconn.assert_called_once_with(connection)
+    
+    def test_psycopg_backend_stops_preparing_once_disabled(self):
+        pytest.importorskip('psycopg')
+        connection = StubPipelineConnection()
+        connection.prepare_threshold = 5
+        pool = Mock(getconn=Mock(return_value=connection))
+        
+        with patch.dict(os.environ, {'DB_BACKEND': 'psycopg', 'DB_PREPARED_STATEMENTS': 'false'}), \
+                patch.object(database, '_connection_pool', pool):
+            with database.get_db_connection():
+                pass
+        
+        assert connection.prepare_threshold is None
+    
+    def test_unknown_backend_rejected(self):
+        with patch.dict(os.environ, {'DB_BACKEND': 'asyncpg'}):
+            with pytest.raises(ValueError, match='Unsupported DB_BACKEND'):
+                database.get_db_backend()
 
 
 if __name__ == '__main__':
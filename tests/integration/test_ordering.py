@@ -0,0 +1,361 @@
+"""
+Ordering Harness: Concurrent Consumers vs. Sequential Processing
+
+Publishes a stream of container, transport and tracking request updates with
+the receiver's ordering keys, delivers it to several concurrent event
+processor consumers the way Pub/Sub does for an ordered subscription, and
+checks the final state matches processing the same stream one message at a
+time. A control run without ordering keys shows the harness detects stale
+overwrites.
+"""
+
+import json
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+functions_path = Path(__file__).parent.parent.parent / 'functions'
+sys.path.insert(0, str(functions_path / 'webhook_receiver'))
+sys.path.insert(0, str(functions_path / 'event_processor'))
+
+import transformers
+from ordering_keys import ordering_key_for_body
+
+
+CONTAINER_STATUSES = ['new', 'on_ship', 'discharged', 'available', 'picked_up', 'empty_returned']
+TRACKING_STATUSES = ['pending', 'awaiting_manifest', 'created', 'tracking_stopped']
+
+
+class Message:
+    """A published Pub/Sub message as the event processor receives it."""
+
+    def __init__(self, sequence, body, event_type, ordering_key):
+        self.sequence = sequence
+        self.body = body
+        self.event_type = event_type
+        self.ordering_key = ordering_key
+
+
+def _container_update(index, container_id, shipment_id, status):
+    return {
+        "data": {
+            "id": f"n-{index}",
+            "type": "notification",
+            "attributes": {"event": "container.updated"},
+            "relationships": {"reference_object": {"data": {"id": container_id, "type": "container"}}}
+        },
+        "included": [
+            {"id": shipment_id, "type": "shipment", "attributes": {"bill_of_lading_number": shipment_id}},
+            {"id": container_id, "type": "container",
+             "attributes": {"number": container_id, "current_status": status},
+             "relationships": {"shipment": {"data": {"id": shipment_id, "type": "shipment"}}}}
+        ]
+    }
+
+
+def _transport_event(index, container_id, shipment_id, status):
+    payload = _container_update(index, container_id, shipment_id, status)
+    event_id = f"te-{index}"
+    payload["data"]["attributes"]["event"] = "container.transport.vessel_arrived"
+    payload["data"]["relationships"]["reference_object"]["data"] = {
+        "id": event_id, "type": "transport_event"
+    }
+    payload["included"].append({
+        "id": event_id,
+        "type": "transport_event",
+        "attributes": {"event": "container.transport.vessel_arrived"},
+        "relationships": {"container": {"data": {"id": container_id, "type": "container"}}}
+    })
+    return payload
+
+
+def _tracking_request(tracking_request_id, status):
+    # No reference_object or included: exercises the tracking request fallback key
+    return {
+        "data": {
+            "id": tracking_request_id,
+            "type": "tracking_request",
+            "attributes": {"event": f"tracking_request.{status}", "status": status}
+        }
+    }
+
+
+def build_stream(containers=6, trackers=3, seed=7, ordered=True):
+    """
+    Publish interleaved update sequences for several entities.
+
+    Returns:
+        List of Message in publish order
+    """
+    rng = random.Random(seed)
+    sequences = []
+    for c in range(containers):
+        container_id = f"c-{c}"
+        shipment_id = f"s-{c}"
+        sequences.append([
+            ('transport' if step % 2 else 'update', container_id, shipment_id, status)
+            for step, status in enumerate(CONTAINER_STATUSES)
+        ])
+    for t in range(trackers):
+        sequences.append([('tracking', f"tr-{t}", None, status) for status in TRACKING_STATUSES])
+
+    messages = []
+    while any(sequences):
+        sequence = rng.choice([s for s in sequences if s])
+        kind, entity_id, shipment_id, status = sequence.pop(0)
+        index = len(messages)
+        if kind == 'update':
+            payload = _container_update(index, entity_id, shipment_id, status)
+        elif kind == 'transport':
+            payload = _transport_event(index, entity_id, shipment_id, status)
+        else:
+            payload = _tracking_request(entity_id, status)
+
+        body = json.dumps(payload).encode('utf-8')
+        messages.append(Message(
+            index,
+            body,
+            payload["data"]["attributes"]["event"],
+            ordering_key_for_body(body) if ordered else ''
+        ))
+    return messages
+
+
+class InMemoryStore:
+    """Stands in for Postgres: last write wins, like the upserts."""
+
+    def __init__(self, write_delay=None):
+        self.lock = threading.Lock()
+        self.containers = {}
+        self.tracking_requests = {}
+        self.container_events = set()
+        self.write_delay = write_delay
+
+    def _delay(self):
+        if self.write_delay:
+            time.sleep(self.write_delay())
+
+    def upsert_shipments(self, shipments, conn):
+        return {shipment_data['id']: shipment_data['id'] for shipment_data in shipments}
+
+    def upsert_containers(self, containers, conn):
+        self._delay()
+        with self.lock:
+            for container_data, db_shipment_id in containers:
+                status = container_data['attributes']['current_status']
+                self.containers[container_data['id']] = status
+        return {container_data['id']: container_data['id'] for container_data, _ in containers}
+
+    def insert_container_events(self, events, conn):
+        with self.lock:
+            for event_data, db_container_id, db_shipment_id in events:
+                self.container_events.add((db_container_id, event_data['id']))
+        return {}
+
+    def upsert_tracking_request(self, data, conn):
+        self._delay()
+        with self.lock:
+            self.tracking_requests[data['id']] = data['attributes']['status']
+
+    def record_webhook_delivery(self, **kwargs):
+        return None
+
+    def state(self):
+        return {
+            'containers': dict(self.containers),
+            'tracking_requests': dict(self.tracking_requests),
+            'container_events': set(self.container_events)
+        }
+
+
+class OrderedDelivery:
+    """
+    Pub/Sub delivery semantics for an ordered subscription.
+
+    A keyed message is handed out only after every earlier message with the
+    same key has been acknowledged. Messages without a key are handed out
+    immediately and can complete in any order.
+    """
+
+    def __init__(self, messages):
+        self.pending = list(messages)
+        self.busy_keys = set()
+
+    def deliverable(self):
+        seen = set()
+        ready = []
+        for message in self.pending:
+            key = message.ordering_key
+            if not key:
+                ready.append(message)
+            elif key not in seen:
+                seen.add(key)
+                if key not in self.busy_keys:
+                    ready.append(message)
+        return ready
+
+    def lease(self, message):
+        self.pending.remove(message)
+        if message.ordering_key:
+            self.busy_keys.add(message.ordering_key)
+
+    def ack(self, message):
+        self.busy_keys.discard(message.ordering_key)
+
+
+def process(message, store):
+    """Event processor body, with the database replaced by the store."""
+    payload = json.loads(message.body)
+    with patch.multiple(
+        transformers,
+        upsert_shipments=store.upsert_shipments,
+        upsert_containers=store.upsert_containers,
+        insert_container_events=store.insert_container_events,
+        upsert_tracking_request=store.upsert_tracking_request,
+        record_webhook_delivery=store.record_webhook_delivery
+    ):
+        transformers.transform_event(payload, message.event_type, payload['data']['id'], conn=None)
+
+
+def run_sequential(messages):
+    store = InMemoryStore()
+    for message in messages:
+        process(message, store)
+    return store.state()
+
+
+def run_interleaved(messages, consumers, seed):
+    """
+    Deterministic concurrent run.
+
+    Each step either leases a deliverable message to a free consumer or
+    completes a random in-flight one; a message's writes land when it
+    completes, so slow consumers can finish after later messages.
+    """
+    rng = random.Random(seed)
+    delivery = OrderedDelivery(messages)
+    store = InMemoryStore()
+    in_flight = []
+
+    while delivery.pending or in_flight:
+        ready = delivery.deliverable()
+        if ready and len(in_flight) < consumers and (not in_flight or rng.random() < 0.5):
+            message = rng.choice(ready)
+            delivery.lease(message)
+            in_flight.append(message)
+        else:
+            message = in_flight.pop(rng.randrange(len(in_flight)))
+            process(message, store)
+            delivery.ack(message)
+
+    return store.state()
+
+
+def run_threaded(messages, consumers, seed):
+    """Concurrent run on real threads with randomized write latency."""
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    def write_delay():
+        with rng_lock:
+            return rng.random() * 0.002
+
+    delivery = OrderedDelivery(messages)
+    store = InMemoryStore(write_delay=write_delay)
+    condition = threading.Condition()
+    outstanding = [len(messages)]
+    errors = []
+
+    # transform_event looks the database helpers up on the module, so patch
+    # once for all threads instead of per message
+    with patch.multiple(
+        transformers,
+        upsert_shipments=store.upsert_shipments,
+        upsert_containers=store.upsert_containers,
+        insert_container_events=store.insert_container_events,
+        upsert_tracking_request=store.upsert_tracking_request,
+        record_webhook_delivery=store.record_webhook_delivery
+    ):
+        def consumer():
+            while True:
+                with condition:
+                    while outstanding[0] and not delivery.deliverable():
+                        condition.wait()
+                    if not outstanding[0]:
+                        return
+                    message = delivery.deliverable()[0]
+                    delivery.lease(message)
+                try:
+                    payload = json.loads(message.body)
+                    transformers.transform_event(
+                        payload, message.event_type, payload['data']['id'], conn=None
+                    )
+                except Exception as e:  # surfaced by the test
+                    errors.append(e)
+                with condition:
+                    delivery.ack(message)
+                    outstanding[0] -= 1
+                    condition.notify_all()
+
+        threads = [threading.Thread(target=consumer) for _ in range(consumers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+
+    assert not errors
+    return store.state()
+
+
+@pytest.fixture(scope='module')
+def messages():
+    return build_stream()
+
+
+@pytest.fixture(scope='module')
+def expected(messages):
+    return run_sequential(messages)
+
+
+class TestOrderingKeysPreserveState:
+    """Concurrent consumption with ordering keys matches a sequential run."""
+
+    def test_sequential_reaches_final_statuses(self, expected):
+        assert set(expected['containers'].values()) == {CONTAINER_STATUSES[-1]}
+        assert set(expected['tracking_requests'].values()) == {TRACKING_STATUSES[-1]}
+
+    def test_every_message_is_keyed(self, messages):
+        keys = {message.ordering_key for message in messages}
+        assert '' not in keys
+        assert {key.split(':')[0] for key in keys} == {'container', 'tracking_request'}
+
+    @pytest.mark.parametrize('seed', range(20))
+    def test_interleaved_consumers_match_sequential(self, messages, expected, seed):
+        assert run_interleaved(messages, consumers=8, seed=seed) == expected
+
+    def test_threaded_consumers_match_sequential(self, messages, expected):
+        assert run_threaded(messages, consumers=8, seed=1) == expected
+
+
+class TestUnorderedControl:
+    """Without ordering keys the same harness observes stale overwrites."""
+
+    def test_unordered_delivery_regresses_state(self):
+        messages = build_stream(ordered=False)
+        expected = run_sequential(messages)
+
+        mismatches = [
+            seed for seed in range(20)
+            if run_interleaved(messages, consumers=8, seed=seed) != expected
+        ]
+
+        assert mismatches
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
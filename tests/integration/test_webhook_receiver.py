@@ -10,6 +10,7 @@ Tests cover:
 """
 
 import pytest
+import io
 import json
 import os
 from unittest.mock import patch, MagicMock, Mock
@@ -21,24 +22,59 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../functions/webh
 
 from main import webhook_receiver, extract_event_type, handle_health_check
 from webhook_validator import compute_signature
+from dedup_cache import set_dedup_backend
+from admission_control import AdmissionController, set_admission_controller
+from event_routing import parse_routing_config, set_event_router
+from health_probes import reset_probes
+from metrics import get_registry, reset_metrics
+
+
+@pytest.fixture(autouse=True)
+def reset_dedup_cache():
+    """Start every test with an empty duplicate-suppression cache."""
+    set_dedup_backend(None)
+    yield
+    set_dedup_backend(None)
+
+
+@pytest.fixture(autouse=True)
+def reset_admission_controller():
+    """Rebuild admission control from the (test) environment for every test."""
+    set_admission_controller(None, reload=True)
+    yield
+    set_admission_controller(None, reload=True)
 
 
 class MockRequest:
     """Mock Flask request object for testing."""
     
-    def __init__(self, method='POST', path='/', headers=None, body='', content_type='application/json'):
+    def __init__(self, method='POST', path='/', headers=None, body='', content_type='application/json',
+                 args=None):
         self.method = method
         self.path = path
+        self.args = args or {}
         self.headers = headers or {}
         self._body = body
         self.content_type = content_type
         self.content_length = len(body)
     
+    @property
+    def stream(self):
+        """Mock request body stream (a fresh one per access, so requests can be resent)."""
+        return io.BytesIO(self._body.encode('utf-8') if isinstance(self._body, str) else self._body)
+    
     def get_data(self, as_text=False):
         """Mock get_data method."""
         return self._body if as_text else self._body.encode('utf-8')
 
 
+def health_counters():
+    """Deep /health document with the dependency probes stubbed out."""
+    with patch('webhook_handler.run_probes', return_value=({}, True)):
+        response, _ = webhook_receiver(MockRequest(method='GET', path='/health', args={'deep': 'true'}))
+    return json.loads(response)
+
+
 class TestWebhookReceiver:
     """Integration tests for webhook_receiver function."""
     
@@ -131,6 +167,75 @@ class TestWebhookReceiver:
         # Verify Pub/Sub was NOT called
         assert not mock_pubsub.publish.called
     
+    def test_previous_secret_accepted_during_rotation(self, mock_env, sample_payload, mock_pubsub):
+        """Test that a delivery signed with the previous secret is accepted while it is listed."""
+        body = json.dumps(sample_payload)
+        signature = compute_signature(body, 'old-secret-key')
+        
+        request = MockRequest(
+            method='POST',
+            headers={'X-T49-Webhook-Signature': signature},
+            body=body
+        )
+        
+        response, status_code = webhook_receiver(request)
+        assert status_code == 401
+        
+        with patch.dict(os.environ, {'TERMINAL49_WEBHOOK_PREVIOUS_SECRETS': 'old-secret-key'}):
+            response, status_code = webhook_receiver(request)
+        
+        assert status_code == 200
+        assert mock_pubsub.publish.called
+    
+    def test_over_rate_limit_returns_429(self, mock_env, sample_payload, mock_pubsub):
+        """Test that requests beyond the token bucket get 429 with Retry-After."""
+        set_admission_controller(AdmissionController(rate_per_second=0.5, burst=2))
+        responses = []
+        for i in range(3):
+            sample_payload['data']['id'] = f"notif-{i}"
+            body = json.dumps(sample_payload)
+            request = MockRequest(
+                method='POST',
+                headers={'X-T49-Webhook-Signature': compute_signature(body, mock_env['TERMINAL49_WEBHOOK_SECRET'])},
+                body=body
+            )
+            responses.append(webhook_receiver(request))
+        
+        assert [r[1] for r in responses[:2]] == [200, 200]
+        response, status_code, headers = responses[2]
+        assert status_code == 429
+        assert headers == {'Retry-After': '2'}
+        assert mock_pubsub.publish.call_count == 2
+    
+    def test_in_flight_limit_released_after_each_request(self, mock_env, sample_payload, mock_pubsub):
+        """Test that admitted requests release their in-flight slot, including failures."""
+        controller = AdmissionController(max_in_flight=1)
+        set_admission_controller(controller)
+        body = json.dumps(sample_payload)
+        
+        bad_request = MockRequest(method='POST', headers={'X-T49-Webhook-Signature': '0' * 64}, body=body)
+        good_request = MockRequest(
+            method='POST',
+            headers={'X-T49-Webhook-Signature': compute_signature(body, mock_env['TERMINAL49_WEBHOOK_SECRET'])},
+            body=body
+        )
+        
+        assert webhook_receiver(bad_request)[1] == 401
+        assert webhook_receiver(good_request)[1] == 200
+        assert controller.stats()['in_flight'] == 0
+        assert controller.stats()['admitted'] == 2
+    
+    def test_health_check_bypasses_admission_control(self, mock_env):
+        """Test that /health answers even when no request can be admitted."""
+        set_admission_controller(AdmissionController(rate_per_second=1, burst=1))
+        
+        with patch.object(AdmissionController, 'admit', side_effect=AssertionError) as mock_admit:
+            response, status_code = webhook_receiver(MockRequest(method='GET', path='/health'))
+        
+        assert status_code == 200
+        assert not mock_admit.called
+        assert health_counters()['admission']['admitted'] == 0
+    
     def test_missing_signature_rejected(self, mock_env, sample_payload, mock_pubsub):
         """Test that missing signature is rejected."""
         body = json.dumps(sample_payload)
@@ -146,6 +251,28 @@ class TestWebhookReceiver:
         assert status_code == 401
         assert 'Unauthorized' in response
     
+    def test_oversized_body_rejected(self, mock_env, sample_payload, mock_pubsub):
+        """Test that a body over WEBHOOK_MAX_BODY_BYTES is rejected with 413."""
+        body = json.dumps(sample_payload)
+        signature = compute_signature(body, mock_env['TERMINAL49_WEBHOOK_SECRET'])
+        
+        request = MockRequest(
+            method='POST',
+            headers={'X-T49-Webhook-Signature': signature},
+            body=body
+        )
+        
+        with patch.dict(os.environ, {'WEBHOOK_MAX_BODY_BYTES': str(len(body) - 1)}):
+            response, status_code = webhook_receiver(request)
+        
+        assert status_code == 413
+        assert not mock_pubsub.publish.called
+        
+        with patch.dict(os.environ, {'WEBHOOK_MAX_BODY_BYTES': str(len(body))}):
+            response, status_code = webhook_receiver(request)
+        
+        assert status_code == 200
+    
     def test_invalid_json_rejected(self, mock_env, mock_pubsub):
         """Test that invalid JSON is rejected."""
         body = "not valid json {"
@@ -201,6 +328,44 @@ class TestWebhookReceiver:
         assert status_code == 405
         assert 'Method Not Allowed' in response
     
+    def test_stage_latencies_recorded_by_event_type(self, mock_env, sample_payload, mock_pubsub):
+        """Test that each stage's latency is recorded with the event type."""
+        reset_metrics()
+        body = json.dumps(sample_payload)
+        signature = compute_signature(body, mock_env['TERMINAL49_WEBHOOK_SECRET'])
+        
+        webhook_receiver(MockRequest(method='POST', headers={'X-T49-Webhook-Signature': signature}, body=body))
+        webhook_receiver(MockRequest(method='POST', headers={'X-T49-Webhook-Signature': 'sha256=bad'}, body=body))
+        
+        snapshot = get_registry().snapshot()
+        stages = {
+            (entry['stage'], entry['event_type']): entry['count']
+            for entry in snapshot['webhook_stage_duration_ms']
+        }
+        event_type = 'container.transport.vessel_arrived'
+        assert stages[('signature', event_type)] == 1
+        assert stages[('parse', event_type)] == 1
+        assert stages[('publish', event_type)] == 1
+        assert stages[('request', event_type)] == 1
+        assert stages[('request', 'unknown')] == 1
+        
+        requests = {(e['status'], e['event_type']): e['value'] for e in snapshot['webhook_requests_total']}
+        assert requests == {('200', event_type): 1, ('401', 'unknown'): 1}
+    
+    def test_metrics_endpoint(self, mock_env, sample_payload, mock_pubsub):
+        """Test that GET /metrics serves the Prometheus text format."""
+        reset_metrics()
+        body = json.dumps(sample_payload)
+        signature = compute_signature(body, mock_env['TERMINAL49_WEBHOOK_SECRET'])
+        webhook_receiver(MockRequest(method='POST', headers={'X-T49-Webhook-Signature': signature}, body=body))
+        
+        response, status_code, headers = webhook_receiver(MockRequest(method='GET', path='/metrics'))
+        
+        assert status_code == 200
+        assert headers['Content-Type'].startswith('text/plain; version=0.0.4')
+        assert '# TYPE webhook_stage_duration_ms histogram' in response
+        assert 'webhook_requests_total{status="200",event_type="container.transport.vessel_arrived"} 1' in response
+    
     def test_pubsub_failure_returns_500(self, mock_env, sample_payload):
         """Test that Pub/Sub failures return 500 error."""
         body = json.dumps(sample_payload)
@@ -247,6 +412,212 @@ class TestWebhookReceiver:
         attributes = call_args[1]
         assert attributes.get('request_id') == custom_request_id
     
+    def test_raw_body_forwarded_unchanged(self, mock_env, sample_payload, mock_pubsub):
+        """Test that the signed bytes are published without re-serialization."""
+        # Formatting that json.dumps would not reproduce
+        body = json.dumps(sample_payload, indent=4, sort_keys=True)
+        signature = compute_signature(body, mock_env['TERMINAL49_WEBHOOK_SECRET'])
+        
+        request = MockRequest(
+            method='POST',
+            headers={'X-T49-Webhook-Signature': signature},
+            body=body
+        )
+        
+        response, status_code = webhook_receiver(request)
+        
+        assert status_code == 200
+        published_data = mock_pubsub.publish.call_args[0][1]
+        assert published_data == body.encode('utf-8')
+        assert mock_pubsub.publish.call_args[1]['notification_id'] == 'notif_123456'
+    
+    def test_published_with_container_ordering_key(self, mock_env, sample_payload, mock_pubsub):
+        """Test that events are keyed by the container they update."""
+        body = json.dumps(sample_payload)
+        signature = compute_signature(body, mock_env['TERMINAL49_WEBHOOK_SECRET'])
+    
+        request = MockRequest(
+            method='POST',
+            headers={'X-T49-Webhook-Signature': signature},
+            body=body
+        )
+    
+        with patch.dict(os.environ, {'PUBSUB_ENABLE_MESSAGE_ORDERING': 'true'}):
+            response, status_code = webhook_receiver(request)
+    
+        assert status_code == 200
+        assert mock_pubsub.publish.call_args[1]['ordering_key'] == 'container:cont_789'
+    
+    def test_published_with_receipt_time(self, mock_env, sample_payload, mock_pubsub):
+        """Test that messages carry the time the request arrived."""
+        body = json.dumps(sample_payload)
+        signature = compute_signature(body, mock_env['TERMINAL49_WEBHOOK_SECRET'])
+        before = datetime.utcnow()
+        
+        request = MockRequest(method='POST', headers={'X-T49-Webhook-Signature': signature}, body=body)
+        response, status_code = webhook_receiver(request)
+        
+        assert status_code == 200
+        attributes = mock_pubsub.publish.call_args[1]
+        received_at = datetime.fromisoformat(attributes['received_at'])
+        assert before <= received_at <= datetime.fromisoformat(attributes['timestamp'])
+    
+    def test_non_utf8_body_rejected(self, mock_env, mock_pubsub):
+        """Test that a correctly signed but undecodable body is rejected with 400."""
+        body = b'{"data": "\xff\xfe"}'
+        signature = compute_signature(body, mock_env['TERMINAL49_WEBHOOK_SECRET'])
+        
+        request = MockRequest(
+            method='POST',
+            headers={'X-T49-Webhook-Signature': signature},
+            body=body
+        )
+        
+        response, status_code = webhook_receiver(request)
+        
+        assert status_code == 400
+        assert not mock_pubsub.publish.called
+    
+    def test_redelivery_suppressed(self, mock_env, sample_payload, mock_pubsub):
+        """Test that a repeated notification is acknowledged but not republished."""
+        body = json.dumps(sample_payload)
+        signature = compute_signature(body, mock_env['TERMINAL49_WEBHOOK_SECRET'])
+        
+        for _ in range(3):
+            request = MockRequest(
+                method='POST',
+                headers={'X-T49-Webhook-Signature': signature},
+                body=body
+            )
+            response, status_code = webhook_receiver(request)
+            assert status_code == 200
+        
+        assert mock_pubsub.publish.call_count == 1
+        
+        health_data = health_counters()
+        assert health_data['dedup_cache']['hits'] == 2
+        assert health_data['dedup_cache']['misses'] == 1
+    
+    def test_failed_publish_not_suppressed_on_retry(self, mock_env, sample_payload, mock_pubsub):
+        """Test that a delivery whose publish failed is published on redelivery."""
+        body = json.dumps(sample_payload)
+        signature = compute_signature(body, mock_env['TERMINAL49_WEBHOOK_SECRET'])
+        
+        mock_pubsub.publish.side_effect = [Exception("Pub/Sub unavailable"), mock_pubsub.publish.return_value]
+        
+        request = MockRequest(method='POST', headers={'X-T49-Webhook-Signature': signature}, body=body)
+        assert webhook_receiver(request)[1] == 500
+        
+        request = MockRequest(method='POST', headers={'X-T49-Webhook-Signature': signature}, body=body)
+        assert webhook_receiver(request)[1] == 200
+        assert mock_pubsub.publish.call_count == 2
+    
+    def test_dedup_disabled(self, mock_env, sample_payload, mock_pubsub):
+        """Test that DEDUP_CACHE_SIZE=0 publishes every delivery."""
+        body = json.dumps(sample_payload)
+        signature = compute_signature(body, mock_env['TERMINAL49_WEBHOOK_SECRET'])
+        
+        with patch.dict(os.environ, {'DEDUP_CACHE_SIZE': '0'}):
+            for _ in range(2):
+                request = MockRequest(method='POST', headers={'X-T49-Webhook-Signature': signature}, body=body)
+                assert webhook_receiver(request)[1] == 200
+        
+        assert mock_pubsub.publish.call_count == 2
+    
+    def test_publish_failure_spooled_when_enabled(self, mock_env, sample_payload, mock_pubsub, tmp_path):
+        """Test that a failed publish is spooled and acknowledged with 200."""
+        import publish_spool
+        
+        body = json.dumps(sample_payload)
+        signature = compute_signature(body, mock_env['TERMINAL49_WEBHOOK_SECRET'])
+        mock_pubsub.publish.return_value.result.side_effect = TimeoutError("publish too slow")
+        
+        spool_env = {'SPOOL_ENABLED': 'true', 'SPOOL_DIR': str(tmp_path)}
+        with patch.dict(os.environ, spool_env), \
+                patch.object(publish_spool, '_spool', None), \
+                patch.object(publish_spool.PublishSpool, 'start_drainer'):
+            request = MockRequest(method='POST', headers={'X-T49-Webhook-Signature': signature}, body=body)
+            response, status_code = webhook_receiver(request)
+            
+            assert status_code == 200
+            spool = publish_spool.get_spool()
+            assert spool.get_stats()['spooled'] == 1
+            
+            # Budget applies to the publish wait
+            assert mock_pubsub.publish.return_value.result.call_args[1]['timeout'] == 2.0
+            
+            # Spooled body is republished unchanged once Pub/Sub recovers
+            mock_pubsub.publish.return_value.result.side_effect = None
+            assert spool.drain_once() is True
+            assert mock_pubsub.publish.call_args[0][1] == body.encode('utf-8')
+    
+    def test_non_blocking_failure_spooled_when_enabled(
+        self, mock_env, sample_payload, mock_pubsub, tmp_path
+    ):
+        """Test that a non-blocking publish failing after the 200 is spooled."""
+        from concurrent.futures import Future
+        import publish_spool
+        import pubsub_publisher
+        
+        body = json.dumps(sample_payload)
+        signature = compute_signature(body, mock_env['TERMINAL49_WEBHOOK_SECRET'])
+        future = Future()
+        mock_pubsub.publish.return_value = future
+        
+        spool_env = {
+            'SPOOL_ENABLED': 'true',
+            'SPOOL_DIR': str(tmp_path),
+            'PUBSUB_PUBLISH_MODE': 'non_blocking'
+        }
+        with patch.dict(os.environ, spool_env), \
+                patch.object(publish_spool, '_spool', None), \
+                patch.object(publish_spool.PublishSpool, 'start_drainer'), \
+                patch.object(pubsub_publisher, '_in_flight_slots', None), \
+                patch.object(pubsub_publisher, '_in_flight_count', 0), \
+                patch.object(pubsub_publisher.atexit, 'register'):
+            request = MockRequest(
+                method='POST', headers={'X-T49-Webhook-Signature': signature}, body=body
+            )
+            assert webhook_receiver(request)[1] == 200
+            
+            future.set_exception(RuntimeError("Pub/Sub unavailable"))
+            
+            spool = publish_spool.get_spool()
+            assert spool.get_stats()['spooled'] == 1
+            
+            mock_pubsub.publish.return_value = MagicMock()
+            assert spool.drain_once() is True
+            assert mock_pubsub.publish.call_args[0][1] == body.encode('utf-8')
+    
+    def test_spool_drained_by_next_request(self, mock_env, sample_payload, mock_pubsub, tmp_path):
+        """Test that spooled webhooks are republished before a later request returns."""
+        import publish_spool
+        
+        # Left by a previous process on this instance
+        previous = publish_spool.PublishSpool(str(tmp_path), lambda header, body, timeout: None)
+        previous.append(b'{"spooled": true}', {
+            'event_type': 'container.updated', 'request_id': 'req-spooled',
+            'notification_id': None, 'ordering_key': None,
+            'spooled_at': '2024-01-20T09:20:06', 'received_at': '2024-01-20T09:20:05'
+        })
+        previous.stop()
+        
+        body = json.dumps(sample_payload)
+        signature = compute_signature(body, mock_env['TERMINAL49_WEBHOOK_SECRET'])
+        spool_env = {'SPOOL_ENABLED': 'true', 'SPOOL_DIR': str(tmp_path)}
+        with patch.dict(os.environ, spool_env), \
+                patch.object(publish_spool, '_spool', None), \
+                patch.object(publish_spool.PublishSpool, 'start_drainer'):
+            publish_spool.get_spool()
+            request = MockRequest(method='POST', headers={'X-T49-Webhook-Signature': signature}, body=body)
+            assert webhook_receiver(request)[1] == 200
+            
+            assert publish_spool.get_spool().pending_bytes() == 0
+        
+        republished = mock_pubsub.publish.call_args_list[-1]
+        assert republished[0][1] == b'{"spooled": true}'
+        assert republished[1]['received_at'] == '2024-01-20T09:20:05'
+    
     def test_large_payload_handling(self, mock_env, mock_pubsub):
         """Test handling of large payloads."""
         # Create a large payload (100KB)
@@ -327,6 +698,135 @@ class TestHealthCheck:
         assert 'TERMINAL49_WEBHOOK_SECRET' in checks
         assert 'GCP_PROJECT_ID' in checks
         assert 'pubsub_topic' in checks
+    
+    def test_health_check_reports_routing_lanes(self, mock_env):
+        """Test that the deep health check reports per-lane routing counters."""
+        health_data = health_counters()
+        assert 'routed' in health_data['routing']['default']
+    
+    def test_health_check_reports_signature_keys(self, mock_env):
+        """Test that the deep health check reports per-key signature counters."""
+        health_data = health_counters()
+        assert list(health_data['signature_keys']['keys']) == ['key[0]']
+        assert 'rejected' in health_data['signature_keys']
+    
+    def test_shallow_health_check_does_not_probe(self, mock_env):
+        """Test that /health without deep=true never calls Pub/Sub or reads counters."""
+        with patch('pubsub_publisher.get_publisher_client') as mock_client, \
+                patch('webhook_handler.get_dedup_stats') as mock_dedup_stats:
+            response, status_code = webhook_receiver(MockRequest(method='GET', path='/health'))
+        
+        assert status_code == 200
+        assert set(json.loads(response)) == {'status', 'timestamp', 'version', 'checks'}
+        mock_dedup_stats.assert_not_called()
+        assert '\n' not in response
+        mock_client.assert_not_called()
+
+
+class StubTopicService:
+    """Local Pub/Sub stand-in answering get_topic for known topics."""
+    
+    def __init__(self, topics, error=None):
+        self.topics = set(topics)
+        self.error = error
+        self.requests = []
+    
+    def get_topic(self, request, retry=None, timeout=None):
+        self.requests.append((request['topic'], timeout))
+        if self.error is not None:
+            raise self.error
+        if request['topic'] not in self.topics:
+            raise LookupError(f"Topic not found: {request['topic']}")
+        return {'name': request['topic']}
+
+
+class TestDeepHealthCheck:
+    """Tests for /health?deep=true dependency probes."""
+    
+    TOPIC = 'projects/test-project/topics/terminal49-webhook-events'
+    
+    @pytest.fixture
+    def mock_env(self):
+        env_vars = {
+            'TERMINAL49_WEBHOOK_SECRET': 'test-secret-key',
+            'GCP_PROJECT_ID': 'test-project',
+            'PUBSUB_TOPIC': 'terminal49-webhook-events',
+            'HEALTH_PROBE_TIMEOUT_SECONDS': '1.5'
+        }
+        reset_probes()
+        with patch.dict(os.environ, env_vars):
+            yield env_vars
+        reset_probes()
+    
+    def deep_health(self):
+        response, status_code = webhook_receiver(MockRequest(method='GET', path='/health', args={'deep': 'true'}))
+        return json.loads(response), status_code
+    
+    def test_topic_probe_reports_latency(self, mock_env):
+        service = StubTopicService([self.TOPIC])
+        
+        with patch('pubsub_publisher.get_publisher_client', return_value=service):
+            health_data, status_code = self.deep_health()
+        
+        assert status_code == 200
+        pubsub = health_data['dependencies']['pubsub']
+        assert pubsub['status'] == 'ok'
+        assert pubsub['topics']['default']['topic'] == self.TOPIC
+        assert 'latency_ms' in pubsub['topics']['default']
+        assert 'latency_ms' in pubsub
+        assert service.requests == [(self.TOPIC, 1.5)]
+    
+    def test_missing_topic_is_unhealthy(self, mock_env):
+        service = StubTopicService([])
+        
+        with patch('pubsub_publisher.get_publisher_client', return_value=service):
+            health_data, status_code = self.deep_health()
+        
+        assert status_code == 503
+        assert health_data['status'] == 'unhealthy'
+        assert health_data['dependencies']['pubsub']['error_type'] == 'LookupError'
+    
+    def test_probe_result_cached_across_requests(self, mock_env):
+        service = StubTopicService([self.TOPIC])
+        
+        with patch('pubsub_publisher.get_publisher_client', return_value=service):
+            for _ in range(5):
+                self.deep_health()
+        
+        assert len(service.requests) == 1
+    
+    def test_probe_rerun_after_ttl(self, mock_env):
+        service = StubTopicService([self.TOPIC])
+        
+        with patch.dict(os.environ, {'HEALTH_PROBE_TTL_SECONDS': '0'}), \
+                patch('pubsub_publisher.get_publisher_client', return_value=service):
+            self.deep_health()
+            self.deep_health()
+        
+        assert len(service.requests) == 2
+    
+    def test_lane_topics_probed_once_each(self, mock_env):
+        service = StubTopicService([self.TOPIC, 'projects/test-project/topics/events-priority'])
+        set_event_router(parse_routing_config({
+            'lanes': {
+                'priority': {'topic': 'events-priority'},
+                'bulk': {'topic': 'terminal49-webhook-events', 'max_messages': 500}
+            },
+            'rules': {'container.pickup_lfd.changed': 'priority', 'container.updated': 'bulk'}
+        }))
+        
+        try:
+            with patch('pubsub_publisher.get_publisher_client', return_value=service):
+                health_data, status_code = self.deep_health()
+        finally:
+            set_event_router(None)
+        
+        assert status_code == 200
+        assert sorted(topic for topic, _ in service.requests) == [
+            'projects/test-project/topics/events-priority',
+            self.TOPIC
+        ]
+        assert set(health_data['dependencies']['pubsub']['topics']) == {'default', 'priority', 'bulk'}
 
 
 class TestExtractEventType:
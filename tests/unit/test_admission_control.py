@@ -0,0 +1,194 @@
+"""
+Unit tests for webhook admission control.
+
+Tests cover:
+- Token bucket refill, burst and Retry-After
+- In-flight limit including pending non-blocking publishes
+- Accept/reject counters
+- Configuration from environment variables
+"""
+
+import pytest
+import os
+from unittest.mock import patch
+
+# Import the module under test
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../functions/webhook_receiver'))
+
+from admission_control import (
+    AdmissionController,
+    AdmissionRejectedError,
+    TokenBucket,
+    get_admission_controller,
+    get_admission_stats,
+    set_admission_controller,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture(autouse=True)
+def reset_controller():
+    set_admission_controller(None, reload=True)
+    yield
+    set_admission_controller(None, reload=True)
+
+
+class TestTokenBucket:
+    """Tests for TokenBucket."""
+
+    def test_starts_full_and_refills(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, burst=3, clock=clock)
+
+        assert [bucket.try_take() for _ in range(3)] == [0.0, 0.0, 0.0]
+        assert bucket.try_take() == pytest.approx(0.1)
+
+        clock.advance(0.1)
+        assert bucket.try_take() == 0.0
+
+    def test_refill_capped_at_burst(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, burst=2, clock=clock)
+        clock.advance(60)
+
+        assert bucket.available() == 2
+
+    def test_rate_must_be_positive(self):
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0, burst=1)
+
+
+class TestAdmissionController:
+    """Tests for AdmissionController."""
+
+    def test_rate_limit_rejects_with_retry_after(self):
+        clock = FakeClock()
+        controller = AdmissionController(rate_per_second=0.5, burst=1, clock=clock)
+
+        controller.admit()
+        controller.release()
+        with pytest.raises(AdmissionRejectedError) as exc_info:
+            controller.admit()
+
+        assert exc_info.value.reason == 'rate'
+        assert exc_info.value.retry_after == 2
+
+        clock.advance(2)
+        controller.admit()
+
+    def test_retry_after_at_least_one_second(self):
+        controller = AdmissionController(rate_per_second=100, burst=1, clock=FakeClock())
+        controller.admit()
+
+        with pytest.raises(AdmissionRejectedError) as exc_info:
+            controller.admit()
+
+        assert exc_info.value.retry_after == 1
+
+    def test_in_flight_limit(self):
+        controller = AdmissionController(max_in_flight=2, retry_after_seconds=3)
+        controller.admit()
+        controller.admit()
+
+        with pytest.raises(AdmissionRejectedError) as exc_info:
+            controller.admit()
+        assert exc_info.value.reason == 'in_flight'
+        assert exc_info.value.retry_after == 3
+
+        controller.release()
+        controller.admit()
+
+    def test_pending_publishes_count_towards_in_flight(self):
+        pending = [2]
+        controller = AdmissionController(max_in_flight=3, pending_publishes=lambda: pending[0])
+        controller.admit()
+
+        with pytest.raises(AdmissionRejectedError):
+            controller.admit()
+
+        pending[0] = 0
+        controller.admit()
+
+    def test_in_flight_rejection_does_not_consume_token(self):
+        clock = FakeClock()
+        controller = AdmissionController(rate_per_second=1, burst=2, max_in_flight=1, clock=clock)
+        controller.admit()
+
+        for _ in range(5):
+            with pytest.raises(AdmissionRejectedError):
+                controller.admit()
+
+        controller.release()
+        controller.admit()
+
+    def test_counters(self):
+        controller = AdmissionController(
+            rate_per_second=1, burst=2, max_in_flight=2, clock=FakeClock()
+        )
+        controller.admit()
+        controller.admit()
+        with pytest.raises(AdmissionRejectedError):
+            controller.admit()
+        controller.release()
+        controller.release()
+        with pytest.raises(AdmissionRejectedError):
+            controller.admit()
+
+        stats = controller.stats()
+        assert stats['admitted'] == 2
+        assert stats['rejected_in_flight'] == 1
+        assert stats['rejected_rate'] == 1
+        assert stats['in_flight'] == 0
+        assert stats['rate_per_second'] == 1
+        assert stats['burst'] == 2
+
+
+class TestGetAdmissionController:
+    """Tests for the environment-configured controller."""
+
+    def test_disabled_by_default(self):
+        with patch.dict(os.environ, {}, clear=True):
+            assert get_admission_controller() is None
+            assert get_admission_stats() is None
+
+    def test_loaded_from_environment(self):
+        env = {
+            'ADMISSION_RATE_PER_SECOND': '50',
+            'ADMISSION_BURST': '100',
+            'ADMISSION_MAX_IN_FLIGHT': '20',
+            'ADMISSION_RETRY_AFTER_SECONDS': '2'
+        }
+        with patch.dict(os.environ, env):
+            controller = get_admission_controller()
+
+        assert controller.bucket.rate == 50
+        assert controller.bucket.burst == 100
+        assert controller.max_in_flight == 20
+        assert controller.retry_after_seconds == 2
+        assert get_admission_controller() is controller
+
+    def test_burst_defaults_to_rate(self):
+        with patch.dict(os.environ, {'ADMISSION_RATE_PER_SECOND': '25'}):
+            assert get_admission_controller().bucket.burst == 25
+
+    def test_in_flight_only(self):
+        with patch.dict(os.environ, {'ADMISSION_MAX_IN_FLIGHT': '5'}, clear=True):
+            controller = get_admission_controller()
+
+        assert controller.bucket is None
+        assert controller.max_in_flight == 5
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
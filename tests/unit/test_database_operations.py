@@ -18,10 +18,18 @@ from database_operations import (
     upsert_shipment,
     upsert_container,
     insert_container_event,
+    upsert_shipments,
+    upsert_containers,
+    insert_container_events,
+    SHIPMENT_FIELDS,
+    CONTAINER_FIELDS,
+    CONTAINER_EVENT_FIELDS,
     upsert_tracking_request,
     record_webhook_delivery,
     _parse_timestamp
 )
+from db_pipeline import pipelined
+from metrics import get_registry, reset_metrics
 
 
 class TestUpsertShipment:
@@ -208,6 +216,282 @@ class TestInsertContainerEvent:
         assert result is None
 
 
+def _batch_conn(rows):
+    """Mock connection whose cursor returns rows from fetchall."""
+    mock_conn = Mock()
+    mock_cursor = Mock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = rows
+    return mock_conn, mock_cursor
+
+
+class TestBatchUpserts:
+    """Tests for the multi-row shipment, container and event writes."""
+    
+    def test_upsert_shipments_single_statement(self):
+        """Test all shipments are written by one statement."""
+        shipments = [
+            {'id': 't49-ship-1', 'attributes': {'bill_of_lading_number': 'BOL1'}},
+            {'id': 't49-ship-2', 'attributes': {'pod_eta_at': '2024-01-15T10:30:00Z'}}
+        ]
+        mock_conn, mock_cursor = _batch_conn(
+            [('t49-ship-1', 'uuid-1', True), ('t49-ship-2', 'uuid-2', True)]
+        )
+        
+        result = upsert_shipments(shipments, mock_conn)
+        
+        assert result == {'t49-ship-1': 'uuid-1', 't49-ship-2': 'uuid-2'}
+        mock_cursor.execute.assert_called_once()
+        sql, params = mock_cursor.execute.call_args[0]
+        assert 'ON CONFLICT (t49_shipment_id) DO UPDATE' in sql
+        assert 'RETURNING t49_shipment_id, id' in sql
+        assert 'unnest(' in sql
+        assert 'IS DISTINCT FROM' in sql
+        assert sorted(params) == sorted(SHIPMENT_FIELDS)
+        assert params['t49_id'] == ['t49-ship-1', 't49-ship-2']
+        assert params['bol'] == ['BOL1', None]
+        assert params['pod_eta'][1].isoformat() == '2024-01-15T10:30:00+00:00'
+    
+    def test_upsert_shipments_repeated_id_keeps_last(self):
+        """Test a shipment repeated in the batch is written once, with its last attributes."""
+        shipments = [
+            {'id': 't49-ship-1', 'attributes': {'bill_of_lading_number': 'OLD'}},
+            {'id': 't49-ship-1', 'attributes': {'bill_of_lading_number': 'NEW'}}
+        ]
+        mock_conn, mock_cursor = _batch_conn([('t49-ship-1', 'uuid-1', True)])
+        
+        upsert_shipments(shipments, mock_conn)
+        
+        params = mock_cursor.execute.call_args[0][1]
+        assert params['t49_id'] == ['t49-ship-1']
+        assert params['bol'] == ['NEW']
+    
+    def test_upsert_shipments_empty(self):
+        """Test an empty batch makes no round trip."""
+        mock_conn, mock_cursor = _batch_conn([])
+        
+        assert upsert_shipments([], mock_conn) == {}
+        mock_conn.cursor.assert_not_called()
+    
+    def test_upsert_shipments_missing_id(self):
+        """Test the batch fails before writing when a shipment has no ID."""
+        mock_conn, mock_cursor = _batch_conn([])
+        
+        with pytest.raises(ValueError, match="missing 'id' field"):
+            upsert_shipments([{'id': 't49-ship-1'}, {'attributes': {}}], mock_conn)
+        mock_cursor.execute.assert_not_called()
+    
+    def test_upsert_containers_with_shipment_ids(self):
+        """Test containers carry their resolved shipment IDs."""
+        containers = [
+            ({'id': 't49-cont-1', 'attributes': {'number': 'MSCU1'}}, 'db-ship-1'),
+            ({'id': 't49-cont-2', 'attributes': {}}, None)
+        ]
+        mock_conn, mock_cursor = _batch_conn(
+            [('t49-cont-1', 'uuid-1', True), ('t49-cont-2', 'uuid-2', True)]
+        )
+        
+        result = upsert_containers(containers, mock_conn)
+        
+        assert result == {'t49-cont-1': 'uuid-1', 't49-cont-2': 'uuid-2'}
+        sql, params = mock_cursor.execute.call_args[0]
+        assert 'ON CONFLICT (t49_container_id) DO UPDATE' in sql
+        assert 'RETURNING t49_container_id, id' in sql
+        assert sorted(params) == sorted(CONTAINER_FIELDS)
+        assert params['shipment_id'] == ['db-ship-1', None]
+        assert params['current_status'] == ['unknown', 'unknown']
+    
+    def test_insert_container_events_skips_duplicates(self):
+        """Test events already stored are absent from the result."""
+        events = [
+            ({'id': 't49-event-1', 'attributes': {'event': 'vessel_arrived'}}, 'db-cont-1', None),
+            ({'id': 't49-event-2', 'attributes': {}}, 'db-cont-1', 'db-ship-1')
+        ]
+        # Only the first is new; DO NOTHING returns no row for the duplicate
+        mock_conn, mock_cursor = _batch_conn([('t49-event-1', 'uuid-1')])
+        
+        result = insert_container_events(events, mock_conn)
+        
+        assert result == {'t49-event-1': 'uuid-1'}
+        sql, params = mock_cursor.execute.call_args[0]
+        assert 'ON CONFLICT (t49_event_id) DO NOTHING' in sql
+        assert 'RETURNING t49_event_id, id' in sql
+        assert sorted(params) == sorted(CONTAINER_EVENT_FIELDS)
+        assert params['event_type'] == ['vessel_arrived', None]
+        assert params['shipment_id'] == [None, 'db-ship-1']
+    
+    def test_batch_error_reraised(self):
+        """Test database errors propagate to the caller's transaction."""
+        mock_conn, mock_cursor = _batch_conn([])
+        mock_cursor.execute.side_effect = RuntimeError('connection lost')
+        
+        with pytest.raises(RuntimeError):
+            insert_container_events([({'id': 't49-event-1'}, 'db-cont-1', None)], mock_conn)
+
+
+def _upsert_counts():
+    return {
+        (series['table'], series['outcome']): series['value']
+        for series in get_registry().snapshot().get('db_upserts_total', [])
+    }
+
+
+class TestUnchangedUpserts:
+    """Tests for skipping upserts whose content is unchanged."""
+    
+    @pytest.fixture(autouse=True)
+    def clean_metrics(self):
+        reset_metrics()
+        yield
+        reset_metrics()
+    
+    def test_upsert_shipment_unchanged_returns_existing_id(self):
+        """Test the guard skips the update and the id is read back."""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        # The guarded upsert returns no row; the follow-up SELECT does
+        mock_cursor.fetchone.side_effect = [None, ('db-ship-uuid',)]
+        
+        result = upsert_shipment({'id': 't49-ship-1', 'attributes': {}}, mock_conn)
+        
+        assert result == 'db-ship-uuid'
+        upsert_sql = mock_cursor.execute.call_args_list[0][0][0]
+        assert 'WHERE (shipments.bill_of_lading_number' in upsert_sql
+        assert 'IS DISTINCT FROM (EXCLUDED.bill_of_lading_number' in upsert_sql
+        select_sql, params = mock_cursor.execute.call_args_list[1][0]
+        assert select_sql.startswith('SELECT id FROM shipments')
+        assert params['t49_id'] == 't49-ship-1'
+        assert _upsert_counts() == {('shipments', 'skipped'): 1}
+    
+    def test_upsert_container_written_counted(self):
+        """Test a changed container is written in one statement and counted."""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = ('db-cont-uuid',)
+        
+        upsert_container({'id': 't49-cont-1', 'attributes': {}}, 'db-ship-uuid', mock_conn)
+        
+        mock_cursor.execute.assert_called_once()
+        assert 'containers.raw_data' in mock_cursor.execute.call_args[0][0]
+        assert _upsert_counts() == {('containers', 'written'): 1}
+    
+    def test_batch_counts_written_and_skipped(self):
+        """Test unchanged rows keep their ids and are counted as skipped."""
+        containers = [
+            ({'id': 't49-cont-1', 'attributes': {}}, None),
+            ({'id': 't49-cont-2', 'attributes': {}}, None)
+        ]
+        mock_conn, mock_cursor = _batch_conn(
+            [('t49-cont-1', 'uuid-1', True), ('t49-cont-2', 'uuid-2', False)]
+        )
+        
+        result = upsert_containers(containers, mock_conn)
+        
+        assert result == {'t49-cont-1': 'uuid-1', 't49-cont-2': 'uuid-2'}
+        mock_cursor.execute.assert_called_once()
+        assert _upsert_counts() == {
+            ('containers', 'written'): 1,
+            ('containers', 'skipped'): 1
+        }
+    
+    def test_batch_rereads_rows_missing_from_snapshot(self):
+        """Test an unchanged row committed concurrently is read by a second statement."""
+        shipments = [
+            {'id': 't49-ship-1', 'attributes': {}},
+            {'id': 't49-ship-2', 'attributes': {}}
+        ]
+        mock_conn, mock_cursor = _batch_conn([])
+        mock_cursor.fetchall.side_effect = [
+            [('t49-ship-1', 'uuid-1', True)],
+            [('t49-ship-2', 'uuid-2')]
+        ]
+        
+        result = upsert_shipments(shipments, mock_conn)
+        
+        assert result == {'t49-ship-1': 'uuid-1', 't49-ship-2': 'uuid-2'}
+        sql, params = mock_cursor.execute.call_args_list[1][0]
+        assert sql.startswith('SELECT t49_shipment_id, id FROM shipments')
+        assert params == (['t49-ship-2'],)
+
+
+class TestPipelinedWrites:
+    """Tests for the batch writes inside a pipelined transaction."""
+    
+    @pytest.fixture(autouse=True)
+    def clean_metrics(self):
+        reset_metrics()
+        yield
+        reset_metrics()
+    
+    @staticmethod
+    def _pipeline_conn(rows):
+        """psycopg 3 connection mock whose cursors return rows after the commit."""
+        mock_conn = MagicMock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchall.return_value = rows
+        return mock_conn, mock_cursor
+    
+    def test_upsert_shipments_returns_references(self):
+        """Test shipments are queued and mapped to their own Terminal49 IDs."""
+        mock_conn, mock_cursor = self._pipeline_conn([('t49-ship-1', 'uuid-1', False)])
+        
+        with pipelined(mock_conn):
+            result = upsert_shipments([{'id': 't49-ship-1', 'attributes': {}}], mock_conn)
+            
+            assert result == {'t49-ship-1': 't49-ship-1'}
+            mock_cursor.fetchone.assert_not_called()
+            mock_cursor.fetchall.assert_not_called()
+            assert _upsert_counts() == {}
+        
+        assert _upsert_counts() == {('shipments', 'written'): 0, ('shipments', 'skipped'): 1}
+    
+    def test_upsert_containers_resolve_shipments_in_sql(self):
+        """Test containers send shipment references, resolved by the statement."""
+        mock_conn, mock_cursor = self._pipeline_conn([('t49-cont-1', 'uuid-1', True)])
+        
+        with pipelined(mock_conn):
+            result = upsert_containers(
+                [({'id': 't49-cont-1', 'attributes': {}}, 't49-ship-1')], mock_conn
+            )
+        
+        assert result == {'t49-cont-1': 't49-cont-1'}
+        sql, params = mock_cursor.execute.call_args[0]
+        assert 'LEFT JOIN shipments t ON t.t49_shipment_id = r.t49_id' in sql
+        assert params['shipment_id'] == ['t49-ship-1']
+        assert _upsert_counts() == {('containers', 'written'): 1, ('containers', 'skipped'): 0}
+    
+    def test_insert_container_events_resolve_containers_in_sql(self):
+        """Test events send container and shipment references and return no IDs."""
+        mock_conn, mock_cursor = self._pipeline_conn([('t49-event-1', 'uuid-1')])
+        
+        with pipelined(mock_conn):
+            result = insert_container_events(
+                [({'id': 't49-event-1', 'attributes': {}}, 't49-cont-1', 't49-ship-1')], mock_conn
+            )
+        
+        assert result == {}
+        sql, params = mock_cursor.execute.call_args[0]
+        assert 'LEFT JOIN containers t ON t.t49_container_id = r.t49_id' in sql
+        assert 'LEFT JOIN shipments t ON t.t49_shipment_id = r.t49_id' in sql
+        assert params['container_id'] == ['t49-cont-1']
+    
+    def test_record_webhook_delivery_queued(self):
+        """Test the delivery row is queued without waiting for its ID."""
+        mock_conn, mock_cursor = self._pipeline_conn([('db-delivery-uuid',)])
+        
+        with pipelined(mock_conn):
+            result = record_webhook_delivery(
+                'notif-123', 'container.updated', {}, 'completed', None, mock_conn, 12
+            )
+        
+        assert result is None
+        mock_cursor.execute.assert_called_once()
+        mock_cursor.fetchone.assert_not_called()
+
+
 class TestUpsertTrackingRequest:
     """Tests for tracking request upsert operations."""
     
@@ -314,6 +598,28 @@ class TestRecordWebhookDelivery:
         params = mock_cursor.execute.call_args[0][1]
         assert params['processing_status'] == 'failed'
         assert params['processing_error'] == 'Database connection failed'
+    
+    def test_record_webhook_delivery_duration(self):
+        """Test the final write carries the processing duration, updated on redelivery."""
+        mock_conn = Mock()
+        mock_cursor = Mock()
+        mock_conn.cursor.return_value = mock_cursor
+        mock_cursor.fetchone.return_value = ('db-delivery-uuid',)
+        
+        record_webhook_delivery(
+            notification_id='notif-456',
+            event_type='container.updated',
+            payload={'data': {'type': 'container'}},
+            processing_status='completed',
+            processing_error=None,
+            conn=mock_conn,
+            processing_duration_ms=42
+        )
+        
+        sql, params = mock_cursor.execute.call_args[0]
+        assert params['processing_duration_ms'] == 42
+        assert 'processing_duration_ms = EXCLUDED.processing_duration_ms' in sql
+        assert 'raw_payload = EXCLUDED' not in sql
 
 
 class TestParseTimestamp:
@@ -0,0 +1,120 @@
+"""
+Unit tests for pipelined transactions.
+
+Tests cover:
+- BEGIN, the block's statements and COMMIT sent in one pipeline
+- Deferred callbacks run with their statement's rows after the commit
+- Nothing committed or called back when the block fails
+"""
+
+import pytest
+import os
+from contextlib import contextmanager
+
+# Import the module under test
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../functions/event_processor'))
+
+from db_pipeline import defer, pipeline_active, pipelined
+
+
+class StubCursor:
+    def __init__(self, connection, rows=()):
+        self.connection = connection
+        self.rows = list(rows)
+
+    def execute(self, query, params=None):
+        self.connection.statements.append(query)
+
+    def fetchall(self):
+        # Results are only available once the pipeline is synced
+        assert not self.connection.in_pipeline
+        return self.rows
+
+
+class StubConnection:
+    """psycopg 3 connection stand-in recording statements and pipeline mode."""
+
+    def __init__(self):
+        self.statements = []
+        self.in_pipeline = False
+
+    def cursor(self, rows=()):
+        return StubCursor(self, rows)
+
+    def execute(self, query, params=None):
+        self.cursor().execute(query, params)
+
+    @contextmanager
+    def pipeline(self):
+        self.in_pipeline = True
+        try:
+            yield
+        finally:
+            self.in_pipeline = False
+
+
+class TestPipelined:
+    """Tests for running a transaction in pipeline mode."""
+
+    def test_statements_between_begin_and_commit(self):
+        conn = StubConnection()
+
+        with pipelined(conn):
+            assert conn.in_pipeline
+            conn.execute('INSERT 1')
+            conn.execute('INSERT 2')
+
+        assert conn.statements == ['BEGIN', 'INSERT 1', 'INSERT 2', 'COMMIT']
+        assert not conn.in_pipeline
+
+    def test_deferred_callbacks_get_rows_after_commit(self):
+        conn = StubConnection()
+        received = []
+
+        with pipelined(conn):
+            first = conn.cursor(rows=[('t49-1', 'uuid-1', True)])
+            first.execute('UPSERT')
+            defer(conn, first, received.append)
+            second = conn.cursor(rows=[])
+            second.execute('INSERT')
+            defer(conn, second, received.append)
+            assert received == []
+
+        assert received == [[('t49-1', 'uuid-1', True)], []]
+
+    def test_failure_skips_commit_and_callbacks(self):
+        conn = StubConnection()
+        received = []
+
+        with pytest.raises(ValueError):
+            with pipelined(conn):
+                cursor = conn.cursor(rows=[('row',)])
+                cursor.execute('UPSERT')
+                defer(conn, cursor, received.append)
+                raise ValueError('invalid payload')
+
+        assert 'COMMIT' not in conn.statements
+        assert received == []
+        assert not pipeline_active(conn)
+
+
+class TestPipelineActive:
+    """Tests for detecting a pipelined transaction."""
+
+    def test_active_only_inside_block(self):
+        conn = StubConnection()
+
+        assert not pipeline_active(conn)
+        with pipelined(conn):
+            assert pipeline_active(conn)
+        assert not pipeline_active(conn)
+
+    def test_other_connection_not_active(self):
+        conn = StubConnection()
+
+        with pipelined(conn):
+            assert not pipeline_active(StubConnection())
+
+    def test_unhashable_connection_not_active(self):
+        assert not pipeline_active({})
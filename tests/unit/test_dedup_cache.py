@@ -0,0 +1,159 @@
+"""
+Unit tests for duplicate notification suppression.
+
+Tests cover:
+- TTL expiry and LRU eviction of the in-memory backend
+- Hit/miss counters
+- Pluggable backends and failure handling
+- Environment configuration
+"""
+
+import pytest
+import os
+from unittest.mock import patch
+
+# Import the module under test
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../functions/webhook_receiver'))
+
+from dedup_cache import (
+    DedupBackend,
+    InMemoryDedupBackend,
+    NotificationDedupCache,
+    get_dedup_cache,
+    get_dedup_stats,
+    set_dedup_backend,
+)
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+class TestInMemoryDedupBackend:
+    """Tests for the in-memory TTL/LRU backend."""
+    
+    def test_contains_after_add(self):
+        backend = InMemoryDedupBackend(max_size=10, ttl_seconds=60)
+        backend.add('notif-1')
+        
+        assert backend.contains('notif-1') is True
+        assert backend.contains('notif-2') is False
+    
+    def test_entries_expire(self):
+        clock = FakeClock()
+        backend = InMemoryDedupBackend(max_size=10, ttl_seconds=60, clock=clock)
+        backend.add('notif-1')
+        
+        clock.now += 59
+        assert backend.contains('notif-1') is True
+        
+        clock.now += 2
+        assert backend.contains('notif-1') is False
+        assert backend.size() == 0
+    
+    def test_oldest_entry_evicted_at_capacity(self):
+        backend = InMemoryDedupBackend(max_size=2, ttl_seconds=60)
+        backend.add('notif-1')
+        backend.add('notif-2')
+        backend.add('notif-3')
+        
+        assert backend.contains('notif-1') is False
+        assert backend.contains('notif-2') is True
+        assert backend.contains('notif-3') is True
+        assert backend.size() == 2
+    
+    def test_re_adding_refreshes_entry(self):
+        backend = InMemoryDedupBackend(max_size=2, ttl_seconds=60)
+        backend.add('notif-1')
+        backend.add('notif-2')
+        backend.add('notif-1')
+        backend.add('notif-3')
+        
+        assert backend.contains('notif-1') is True
+        assert backend.contains('notif-2') is False
+
+
+class TestNotificationDedupCache:
+    """Tests for the counting front."""
+    
+    def test_counts_hits_and_misses(self):
+        cache = NotificationDedupCache(InMemoryDedupBackend())
+        
+        assert cache.is_duplicate('notif-1') is False
+        cache.mark_published('notif-1')
+        assert cache.is_duplicate('notif-1') is True
+        assert cache.is_duplicate('notif-1') is True
+        
+        stats = cache.stats()
+        assert stats['hits'] == 2
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == pytest.approx(2 / 3, abs=1e-4)
+        assert stats['size'] == 1
+        assert stats['backend'] == 'InMemoryDedupBackend'
+    
+    def test_custom_backend(self):
+        class SharedBackend(DedupBackend):
+            def __init__(self):
+                self.keys = set()
+            
+            def contains(self, key):
+                return key in self.keys
+            
+            def add(self, key):
+                self.keys.add(key)
+        
+        backend = SharedBackend()
+        cache = NotificationDedupCache(backend)
+        cache.mark_published('notif-1')
+        
+        assert backend.keys == {'notif-1'}
+        assert cache.is_duplicate('notif-1') is True
+        assert cache.stats()['size'] is None
+    
+    def test_backend_failure_is_a_miss(self):
+        class BrokenBackend(DedupBackend):
+            def contains(self, key):
+                raise ConnectionError("store unavailable")
+            
+            def add(self, key):
+                raise ConnectionError("store unavailable")
+        
+        cache = NotificationDedupCache(BrokenBackend())
+        
+        assert cache.is_duplicate('notif-1') is False
+        cache.mark_published('notif-1')
+        assert cache.stats()['errors'] == 2
+
+
+class TestDedupConfiguration:
+    """Tests for process-wide cache configuration."""
+    
+    @pytest.fixture(autouse=True)
+    def reset(self):
+        set_dedup_backend(None)
+        yield
+        set_dedup_backend(None)
+    
+    def test_configured_from_environment(self):
+        with patch.dict(os.environ, {'DEDUP_CACHE_SIZE': '5', 'DEDUP_CACHE_TTL_SECONDS': '30'}):
+            cache = get_dedup_cache()
+        
+        assert cache.backend.max_size == 5
+        assert cache.backend.ttl_seconds == 30
+        assert get_dedup_cache() is cache
+    
+    def test_disabled_with_zero_size(self):
+        with patch.dict(os.environ, {'DEDUP_CACHE_SIZE': '0'}):
+            assert get_dedup_cache() is None
+            assert get_dedup_stats() is None
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
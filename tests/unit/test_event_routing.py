@@ -0,0 +1,158 @@
+"""
+Unit tests for event-type routing to Pub/Sub lanes.
+
+Tests cover:
+- Exact and prefix rule matching and precedence
+- Per-lane routing counters
+- Parsing and validation of PUBSUB_ROUTING_CONFIG
+- Falling back to the default lane on invalid config
+"""
+
+import pytest
+import json
+import os
+from unittest.mock import patch
+
+# Import the module under test
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../functions/webhook_receiver'))
+
+from event_routing import (
+    DEFAULT_LANE,
+    EventRouter,
+    Lane,
+    get_event_router,
+    get_routing_stats,
+    parse_routing_config,
+    set_event_router,
+)
+
+
+CONFIG = {
+    "lanes": {
+        "priority": {"topic": "events-priority", "max_latency_seconds": 0.001,
+                     "publish_timeout_seconds": 2},
+        "bulk": {"topic": "events-bulk", "max_messages": 500},
+        "transport": {"topic": "events-transport"}
+    },
+    "rules": {
+        "container.pickup_lfd.changed": "priority",
+        "tracking_request.failed": "priority",
+        "tracking_request.*": "bulk",
+        "container.updated": "bulk",
+        "container.*": "transport",
+        "container.transport.*": "transport"
+    }
+}
+
+
+@pytest.fixture(autouse=True)
+def reset_router():
+    set_event_router(None)
+    yield
+    set_event_router(None)
+
+
+class TestRouting:
+    """Tests for EventRouter.route."""
+
+    @pytest.fixture
+    def router(self):
+        return parse_routing_config(CONFIG)
+
+    @pytest.mark.parametrize('event_type,lane', [
+        ('container.pickup_lfd.changed', 'priority'),
+        ('tracking_request.failed', 'priority'),
+        ('tracking_request.succeeded', 'bulk'),
+        ('container.updated', 'bulk'),
+        ('container.created', 'transport'),
+        ('container.transport.vessel_arrived', 'transport'),
+        ('shipment.estimated.arrival', DEFAULT_LANE),
+        ('', DEFAULT_LANE),
+    ])
+    def test_rule_matching(self, router, event_type, lane):
+        assert router.route(event_type).name == lane
+
+    def test_longest_prefix_wins(self):
+        router = EventRouter(
+            {'a': Lane('a', 'topic-a'), 'b': Lane('b', 'topic-b')},
+            {'container.*': 'a', 'container.transport.*': 'b'}
+        )
+
+        assert router.route('container.transport.vessel_arrived').name == 'b'
+        assert router.route('container.updated').name == 'a'
+
+    def test_routing_counted_per_lane(self, router):
+        for event_type in ('container.updated', 'container.updated', 'tracking_request.failed', 'other'):
+            router.route(event_type)
+
+        stats = router.stats()
+        assert stats['bulk']['routed'] == 2
+        assert stats['priority']['routed'] == 1
+        assert stats[DEFAULT_LANE]['routed'] == 1
+        assert stats['transport']['routed'] == 0
+        assert stats['priority']['topic'] == 'events-priority'
+        assert stats['priority']['max_latency_seconds'] == 0.001
+
+    def test_unknown_lane_in_rule(self):
+        with pytest.raises(ValueError, match='unknown lane'):
+            EventRouter({}, {'container.updated': 'missing'})
+
+
+class TestLane:
+    """Tests for lane publisher settings."""
+
+    def test_batch_settings_only_include_overrides(self):
+        lane = Lane('bulk', 'events-bulk', max_messages=500, max_latency_seconds=0.05)
+
+        assert lane.batch_settings() == {'max_messages': 500, 'max_latency': 0.05}
+
+    def test_default_settings(self):
+        assert Lane('priority', 'events-priority', publish_timeout_seconds=2).batch_settings() == {}
+
+
+class TestParseRoutingConfig:
+    """Tests for parse_routing_config."""
+
+    @pytest.mark.parametrize('config,message', [
+        ([], 'JSON object'),
+        ({"lanes": []}, 'name -> settings'),
+        ({"lanes": {"fast": "events-fast"}}, 'must be an object'),
+        ({"lanes": {"fast": {"topic": "t", "max_msgs": 1}}}, 'Unknown settings'),
+        ({"lanes": {"fast": {}}}, 'needs a topic'),
+        ({"rules": ["container.updated"]}, 'pattern -> lane'),
+        ({"rules": {"": DEFAULT_LANE}}, 'must not be empty'),
+    ])
+    def test_invalid_config(self, config, message):
+        with pytest.raises(ValueError, match=message):
+            parse_routing_config(config)
+
+    def test_default_lane_settings_override(self):
+        router = parse_routing_config({"lanes": {DEFAULT_LANE: {"publish_timeout_seconds": 1}}})
+
+        assert router.route('container.updated').publish_timeout_seconds == 1
+
+
+class TestGetEventRouter:
+    """Tests for the environment-configured router."""
+
+    def test_default_routes_everything_to_default_lane(self):
+        with patch.dict(os.environ, {}, clear=True):
+            assert get_event_router().route('container.updated').name == DEFAULT_LANE
+
+    def test_loaded_from_environment(self):
+        with patch.dict(os.environ, {'PUBSUB_ROUTING_CONFIG': json.dumps(CONFIG)}):
+            assert get_event_router().route('tracking_request.failed').topic == 'events-priority'
+            assert get_routing_stats()['priority']['routed'] == 1
+
+    @pytest.mark.parametrize('raw', ['{not json', '{"rules": {"container.updated": "missing"}}'])
+    def test_invalid_config_falls_back(self, raw):
+        with patch.dict(os.environ, {'PUBSUB_ROUTING_CONFIG': raw}):
+            router = get_event_router()
+
+        assert list(router.lanes) == [DEFAULT_LANE]
+        assert router.route('container.updated').name == DEFAULT_LANE
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
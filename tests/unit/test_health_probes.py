@@ -0,0 +1,140 @@
+"""
+Unit tests for cached dependency health probes.
+
+Tests cover:
+- Results reused until the TTL expires
+- Concurrent callers share one probe run
+- Failures reported with their error and latency
+- Aggregated results of registered probes
+"""
+
+import os
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+# Import the module under test
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../functions/webhook_receiver'))
+
+import health_probes
+from health_probes import DependencyProbe, register_probe, run_probes
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def isolated_probes():
+    """Run each test against its own probe list."""
+    with patch.object(health_probes, '_probes', []):
+        yield
+
+
+class TestDependencyProbe:
+    """Tests for DependencyProbe."""
+
+    def test_result_cached_until_ttl(self):
+        clock = FakeClock()
+        calls = []
+        probe = DependencyProbe('db', lambda timeout: calls.append(timeout), clock=clock)
+
+        first = probe.result(ttl=30, timeout=2)
+        clock.now += 10
+        second = probe.result(ttl=30, timeout=2)
+        clock.now += 20
+        probe.result(ttl=30, timeout=2)
+
+        assert calls == [2, 2]
+        assert first['status'] == 'ok'
+        assert second['age_seconds'] == 10
+        assert second['checked_at'] == first['checked_at']
+
+    def test_details_and_latency(self):
+        clock = FakeClock()
+
+        def check(timeout):
+            clock.now += 0.25
+            return {'pool': {'in_use': 1}}
+
+        result = DependencyProbe('db', check, clock=clock).result(ttl=30, timeout=2)
+
+        assert result['pool'] == {'in_use': 1}
+        assert result['latency_ms'] == 250.0
+
+    def test_failure_reported(self):
+        def check(timeout):
+            raise ConnectionError("connection refused")
+
+        result = DependencyProbe('db', check).result(ttl=30, timeout=2)
+
+        assert result['status'] == 'error'
+        assert result['error'] == 'connection refused'
+        assert result['error_type'] == 'ConnectionError'
+        assert 'latency_ms' in result
+
+    def test_concurrent_callers_share_one_probe(self):
+        calls = []
+
+        def slow_check(timeout):
+            calls.append(timeout)
+            time.sleep(0.05)
+
+        probe = DependencyProbe('topic', slow_check)
+        barrier = threading.Barrier(8)
+
+        def caller():
+            barrier.wait()
+            probe.result(ttl=30, timeout=2)
+
+        threads = [threading.Thread(target=caller) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+
+
+class TestRunProbes:
+    """Tests for run_probes."""
+
+    def test_all_ok(self):
+        register_probe('a', lambda timeout: None)
+        register_probe('b', lambda timeout: {'table': 't'})
+
+        results, healthy = run_probes()
+
+        assert healthy is True
+        assert list(results) == ['a', 'b']
+        assert results['b']['table'] == 't'
+
+    def test_one_failure_is_unhealthy(self):
+        register_probe('a', lambda timeout: None)
+        register_probe('b', lambda timeout: 1 / 0)
+
+        results, healthy = run_probes()
+
+        assert healthy is False
+        assert results['a']['status'] == 'ok'
+
+    def test_ttl_and_timeout_from_environment(self):
+        timeouts = []
+        register_probe('a', timeouts.append)
+
+        with patch.dict(os.environ, {'HEALTH_PROBE_TTL_SECONDS': '0', 'HEALTH_PROBE_TIMEOUT_SECONDS': '0.5'}):
+            run_probes()
+            run_probes()
+
+        assert timeouts == [0.5, 0.5]
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,221 @@
+"""
+Unit tests for the in-process metrics registry.
+
+Tests cover:
+- Log-linear histogram buckets and percentile accuracy
+- Counters and labeled series
+- Prometheus text exposition
+- Periodic snapshots in the log
+- Concurrent updates
+"""
+
+import logging
+import os
+import threading
+from unittest.mock import patch
+
+import pytest
+
+# Import the module under test
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../functions/webhook_receiver'))
+
+import metrics
+from metrics import SUB_BUCKETS, MetricsRegistry, maybe_flush_metrics
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+class TestHistogram:
+    """Tests for Histogram and HistogramSeries."""
+
+    def test_percentiles_within_bucket_error(self, registry):
+        series = registry.histogram('latency_ms', 'Latency', ('stage',)).labels('publish')
+
+        for value in range(1, 1001):
+            series.observe(value / 10)
+
+        for pct, exact in ((50, 50.0), (90, 90.0), (99, 99.0)):
+            estimate = series.percentile(pct)
+            assert exact <= estimate <= exact * (1 + 1 / SUB_BUCKETS)
+        assert series.percentile(100) == 100.0
+        assert series.count == 1000
+        assert series.total == pytest.approx(50050.0)
+
+    def test_bucket_upper_bounds(self, registry):
+        series = registry.histogram('latency_ms', 'Latency').labels()
+
+        for value in (1.0, 1.1, 1.2, 3.0):
+            series.observe(value)
+
+        # 1 ms falls in [1, 1.125), 1.2 ms in [1.125, 1.25)
+        assert series.upper_bound(series._index(1.0)) == 1.125
+        assert series.upper_bound(series._index(1.2)) == 1.25
+        assert series.percentile(50) == 1.125
+
+    def test_out_of_range_values_clamped(self, registry):
+        series = registry.histogram('latency_ms', 'Latency').labels()
+
+        series.observe(0)
+        series.observe(-5)
+        series.observe(1e-9)
+        series.observe(1e12)
+
+        assert series.counts[0] == 3
+        assert series.counts[-1] == 1
+        assert series.max == 1e12
+
+    def test_custom_range(self, registry):
+        series = registry.histogram('lag_ms', 'Lag', highest=7 * 24 * 3600 * 1000.0).labels()
+
+        series.observe(3 * 24 * 3600 * 1000.0)
+
+        assert series.counts[-1] == 0
+        assert series.percentile(50) == 3 * 24 * 3600 * 1000.0
+
+    def test_empty_series(self, registry):
+        series = registry.histogram('latency_ms', 'Latency').labels()
+
+        assert series.percentile(99) == 0.0
+        assert series.summary()['count'] == 0
+
+    def test_concurrent_observations(self, registry):
+        series = registry.histogram('latency_ms', 'Latency').labels()
+
+        def worker():
+            for _ in range(5000):
+                series.observe(2.5)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert series.count == 40000
+        assert sum(series.counts) == 40000
+
+
+class TestRegistry:
+    """Tests for MetricsRegistry."""
+
+    def test_labels_cached_per_combination(self, registry):
+        histogram = registry.histogram('latency_ms', 'Latency', ('stage', 'event_type'))
+
+        updated = histogram.labels('parse', 'container.updated')
+
+        assert histogram.labels('parse', 'container.updated') is updated
+        assert histogram.labels('parse', 'container.created') is not updated
+
+    def test_wrong_label_count_rejected(self, registry):
+        histogram = registry.histogram('latency_ms', 'Latency', ('stage', 'event_type'))
+
+        with pytest.raises(ValueError):
+            histogram.labels('parse')
+
+    def test_get_or_create(self, registry):
+        counter = registry.counter('requests_total', 'Requests', ('status',))
+
+        assert registry.counter('requests_total', 'Requests', ('status',)) is counter
+        with pytest.raises(ValueError):
+            registry.histogram('requests_total', 'Requests', ('status',))
+        with pytest.raises(ValueError):
+            registry.counter('requests_total', 'Requests', ('status', 'event_type'))
+
+    def test_counter(self, registry):
+        counter = registry.counter('requests_total', 'Requests', ('status',))
+
+        counter.inc('200')
+        counter.labels('200').inc(2)
+        counter.inc('500')
+
+        assert registry.snapshot()['requests_total'] == [
+            {'status': '200', 'value': 3},
+            {'status': '500', 'value': 1},
+        ]
+
+
+class TestPrometheus:
+    """Tests for the Prometheus text exposition."""
+
+    def test_render(self, registry):
+        registry.counter('requests_total', 'Requests by status', ('status',)).inc('200')
+        histogram = registry.histogram('stage_duration_ms', 'Stage latency', ('stage',))
+        histogram.observe(0.7, 'parse')
+        histogram.observe(3.0, 'parse')
+
+        text = registry.render_prometheus()
+        lines = text.splitlines()
+
+        assert '# TYPE requests_total counter' in lines
+        assert 'requests_total{status="200"} 1' in lines
+        assert '# TYPE stage_duration_ms histogram' in lines
+        assert 'stage_duration_ms_bucket{stage="parse",le="1"} 1' in lines
+        assert 'stage_duration_ms_bucket{stage="parse",le="4"} 2' in lines
+        assert 'stage_duration_ms_bucket{stage="parse",le="+Inf"} 2' in lines
+        assert 'stage_duration_ms_count{stage="parse"} 2' in lines
+        assert text.endswith('\n')
+
+    def test_buckets_cumulative(self, registry):
+        histogram = registry.histogram('stage_duration_ms', 'Stage latency')
+        for value in (0.05, 2, 2, 300):
+            histogram.observe(value)
+
+        counts = [
+            int(line.rsplit(' ', 1)[1])
+            for line in registry.render_prometheus().splitlines()
+            if line.startswith('stage_duration_ms_bucket')
+        ]
+
+        assert counts == sorted(counts)
+        assert counts[-1] == 4
+
+    def test_label_values_escaped(self, registry):
+        registry.counter('requests_total', 'Requests', ('event_type',)).inc('a"b\\c')
+
+        assert 'requests_total{event_type="a\\"b\\\\c"} 1' in registry.render_prometheus()
+
+
+class TestFlush:
+    """Tests for maybe_flush_metrics."""
+
+    @pytest.fixture(autouse=True)
+    def clean_metrics(self):
+        metrics.reset_metrics()
+        yield
+        metrics.reset_metrics()
+
+    def test_flush_after_interval(self, caplog):
+        metrics.histogram('flush_test_ms', 'Test', ('stage',)).observe(5.0, 'parse')
+        start = metrics._last_flush
+
+        with patch.dict(os.environ, {'METRICS_FLUSH_INTERVAL_SECONDS': '60'}), \
+                caplog.at_level(logging.INFO, logger='metrics'):
+            assert maybe_flush_metrics(now=start + 30) is False
+            assert maybe_flush_metrics(now=start + 61) is True
+            assert maybe_flush_metrics(now=start + 62) is False
+
+        records = [r for r in caplog.records if r.getMessage() == 'Metrics snapshot']
+        assert len(records) == 1
+        assert records[0].sample is False
+        assert records[0].metrics['flush_test_ms'][0]['count'] == 1
+
+    def test_flush_disabled(self):
+        with patch.dict(os.environ, {'METRICS_FLUSH_INTERVAL_SECONDS': '0'}):
+            assert maybe_flush_metrics(now=metrics._last_flush + 3600) is False
+
+    def test_reset_keeps_registered_metrics(self):
+        histogram = metrics.histogram('flush_test_ms', 'Test', ('stage',))
+        histogram.observe(5.0, 'parse')
+
+        metrics.reset_metrics()
+
+        assert metrics.histogram('flush_test_ms', 'Test', ('stage',)) is histogram
+        assert histogram.series() == []
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
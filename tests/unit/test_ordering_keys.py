@@ -0,0 +1,115 @@
+"""
+Unit tests for Pub/Sub ordering key derivation.
+
+Tests cover:
+- Keys from data.relationships.reference_object
+- Transport events keyed by their container
+- Fallbacks via included and for tracking requests
+- Raw-body and parsed-payload derivation agreeing
+"""
+
+import pytest
+import json
+import os
+
+# Import the module under test
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../functions/webhook_receiver'))
+
+from ordering_keys import ordering_key_for_body, ordering_key_for_payload
+
+
+def _notification(reference=None, included=None, data_type='notification', data_id='n-1'):
+    data = {
+        "id": data_id,
+        "type": data_type,
+        "attributes": {"event": "container.updated"},
+        "relationships": {"reference_object": {"data": reference}}
+    }
+    payload = {"data": data}
+    if included is not None:
+        payload["included"] = included
+    return payload
+
+
+SHIPMENT = {"id": "s-1", "type": "shipment"}
+CONTAINER_1 = {"id": "c-1", "type": "container",
+               "relationships": {"shipment": {"data": {"id": "s-1", "type": "shipment"}}}}
+CONTAINER_2 = {"id": "c-2", "type": "container",
+               "relationships": {"shipment": {"data": {"id": "s-1", "type": "shipment"}}}}
+TRANSPORT_EVENT_2 = {"id": "te-2", "type": "transport_event",
+                     "relationships": {"container": {"data": {"id": "c-2", "type": "container"}}}}
+
+
+CASES = [
+    # Referenced container or shipment is used directly
+    (_notification({"id": "c-9", "type": "container"}, [SHIPMENT, CONTAINER_1]), 'container:c-9'),
+    (_notification({"id": "s-1", "type": "shipment"}, [SHIPMENT, CONTAINER_1]), 'shipment:s-1'),
+    # Transport events are keyed by their own container, not the first one
+    (_notification({"id": "te-2", "type": "transport_event"},
+                   [SHIPMENT, CONTAINER_1, CONTAINER_2, TRANSPORT_EVENT_2]), 'container:c-2'),
+    # Unknown transport event falls back to the first container
+    (_notification({"id": "te-404", "type": "transport_event"},
+                   [SHIPMENT, CONTAINER_1, CONTAINER_2]), 'container:c-1'),
+    # No reference: first container, then first shipment
+    (_notification(None, [SHIPMENT, CONTAINER_2, CONTAINER_1]), 'container:c-2'),
+    (_notification(None, [SHIPMENT]), 'shipment:s-1'),
+    # Tracking requests are keyed by the tracking request even with a shipment included
+    (_notification({"id": "tr-1", "type": "tracking_request"},
+                   [{"id": "tr-1", "type": "tracking_request"}, SHIPMENT]), 'tracking_request:tr-1'),
+    (_notification(None, [], data_type='tracking_request', data_id='tr-2'), 'tracking_request:tr-2'),
+    # Nothing to key on: unordered
+    (_notification(None, []), ''),
+    (_notification({"id": "wh-1", "type": "webhook"}), ''),
+    ({"data": None, "included": "nope"}, ''),
+    ({}, ''),
+]
+
+
+class TestOrderingKeyForPayload:
+    """Tests for ordering_key_for_payload."""
+
+    @pytest.mark.parametrize('payload,expected', CASES)
+    def test_key_selection(self, payload, expected):
+        assert ordering_key_for_payload(payload) == expected
+
+    def test_non_dict_payload(self):
+        assert ordering_key_for_payload([]) == ''
+
+    def test_malformed_relationships_ignored(self):
+        payload = _notification(None, [{"id": "te-1", "type": "transport_event", "relationships": []},
+                                       CONTAINER_1])
+        payload['data']['relationships'] = {"reference_object": "te-1"}
+
+        assert ordering_key_for_payload(payload) == 'container:c-1'
+
+
+class TestOrderingKeyForBody:
+    """Tests for ordering_key_for_body."""
+
+    @pytest.mark.parametrize('payload,expected', CASES)
+    def test_matches_parsed_payload(self, payload, expected):
+        assert ordering_key_for_body(json.dumps(payload).encode('utf-8')) == expected
+
+    def test_stops_after_matching_transport_event(self):
+        """Entries after the referenced transport event are never parsed."""
+        body = json.dumps(_notification(
+            {"id": "te-2", "type": "transport_event"}, [CONTAINER_1, TRANSPORT_EVENT_2]
+        ))[:-2] + ', not json]}'
+
+        assert ordering_key_for_body(body.encode('utf-8')) == 'container:c-2'
+
+    def test_direct_reference_skips_included(self):
+        body = (b'{"data": {"relationships": {"reference_object": '
+                b'{"data": {"id": "c-9", "type": "container"}}}}, "included": [not json]}')
+
+        assert ordering_key_for_body(body) == 'container:c-9'
+
+    def test_malformed_body_is_unordered(self):
+        body = b'{"data": {"relationships": {}}, "included": [{"id": "c-1", "type": "container"}, ]}'
+
+        assert ordering_key_for_body(body) == ''
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
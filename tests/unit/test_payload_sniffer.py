@@ -0,0 +1,187 @@
+"""
+Unit tests for the event metadata sniffer.
+
+Tests cover:
+- Agreement with a full json.loads on well-formed payloads
+- Rejecting documents that are malformed after the data object
+- Fallback to the full parser for malformed and unusual documents
+- Lazy iteration over the included array
+"""
+
+import pytest
+import json
+import os
+from unittest.mock import patch
+
+# Import the module under test
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../functions/webhook_receiver'))
+
+import payload_sniffer
+from payload_sniffer import sniff_document, sniff_event_metadata
+
+
+def _reference(body):
+    """Fields as read by a full parse."""
+    payload = json.loads(body)
+    data = payload.get('data') if isinstance(payload, dict) else None
+    if not isinstance(data, dict):
+        return '', None
+    attributes = data.get('attributes')
+    event = attributes.get('event', '') if isinstance(attributes, dict) else ''
+    notification_id = data.get('id')
+    return event, str(notification_id) if notification_id is not None else None
+
+
+class TestSniffEventMetadata:
+    """Tests for sniff_event_metadata."""
+    
+    @pytest.mark.parametrize('payload', [
+        {"data": {"id": "n-1", "type": "notification",
+                  "attributes": {"event": "container.updated"}}, "included": []},
+        {"data": {"attributes": {"created_at": "2024-01-01", "event": "tracking_request.failed"},
+                  "id": "n-2"}},
+        {"included": [{"id": "c-1", "type": "container"}],
+         "data": {"id": "n-3", "attributes": {"event": "container.created"}}},
+        {"data": {"id": 42, "attributes": {"event": "container.transport.loaded"}}},
+        {"data": {"id": "n-4", "attributes": {}}},
+        {"data": {"attributes": {"event": "shipment.estimated.arrival"}}},
+        {"data": {"id": "n-5", "attributes": None}},
+        {"data": None},
+        {"data": {"id": "n-6", "relationships": {"reference_object": {"data": None}},
+                  "attributes": {"event": "container.pickup_lfd.changed", "nested": [1, {"a": "}"}]}}},
+        {"meta": {"event": "not-this-one"}},
+        {},
+    ])
+    def test_matches_full_parse(self, payload):
+        with patch.object(payload_sniffer, 'SNIFF_MIN_BYTES', 0):
+            for body in (json.dumps(payload), json.dumps(payload, indent=2)):
+                assert sniff_event_metadata(body.encode('utf-8')) == _reference(body)
+    
+    def test_small_body_parsed_directly(self):
+        body = b'{"data": {"id": "n-1", "attributes": {"event": "container.updated"}}}'
+        
+        with patch.object(payload_sniffer, 'SNIFF_MIN_BYTES', 4096), \
+                patch.object(payload_sniffer, '_try_sniff') as mock_sniff:
+            assert sniff_event_metadata(body) == ('container.updated', 'n-1')
+        mock_sniff.assert_not_called()
+    
+    @pytest.fixture(autouse=True)
+    def sniff_everything(self):
+        """Exercise the sniffer even on the small bodies used here."""
+        with patch.object(payload_sniffer, 'SNIFF_MIN_BYTES', 0):
+            yield
+    
+    def test_unicode_and_escapes(self):
+        body = json.dumps({
+            "data": {"id": "n-é", "attributes": {"event": "container.updated", "note": "a\"b\\\\c"}}
+        }, ensure_ascii=False).encode('utf-8')
+        
+        assert sniff_event_metadata(body) == ('container.updated', 'n-é')
+    
+    def test_malformed_tail_raises(self):
+        body = (b'{"data": {"id": "n-1", "attributes": {"event": "container.updated"}}, '
+                b'"included": [not json]}')
+        
+        with pytest.raises(json.JSONDecodeError):
+            sniff_event_metadata(body)
+    
+    def test_large_body_malformed_after_data_raises(self):
+        included = [{"id": f"te-{i}", "type": "transport_event", "attributes": {"event": "x" * 50}}
+                    for i in range(200)]
+        body = json.dumps({
+            "data": {"id": "n1", "attributes": {"event": "container.updated"}},
+            "included": included
+        }).encode('utf-8')
+        body = body.replace(b'"included": [', b'"included": [,,,garbage')
+        
+        with patch.object(payload_sniffer, 'SNIFF_MIN_BYTES', 4096):
+            assert len(body) >= payload_sniffer.SNIFF_MIN_BYTES
+            with pytest.raises(json.JSONDecodeError):
+                sniff_event_metadata(body)
+    
+    def test_large_body_sniffed(self):
+        included = [{"id": f"te-{i}", "type": "transport_event", "attributes": {"event": "x" * 50}}
+                    for i in range(2000)]
+        body = json.dumps({
+            "data": {"id": "n-1", "attributes": {"event": "container.transport.vessel_arrived"}},
+            "included": included
+        }).encode('utf-8')
+        
+        with patch.object(payload_sniffer.json, 'loads') as mock_loads:
+            assert sniff_event_metadata(body) == ('container.transport.vessel_arrived', 'n-1')
+        mock_loads.assert_not_called()
+    
+    def test_multibyte_characters(self):
+        filler = "€" * 6000
+        body = json.dumps({
+            "data": {"attributes": {"note": filler, "event": "container.updated"}, "id": "n-1"}
+        }, ensure_ascii=False).encode('utf-8')
+        
+        assert sniff_event_metadata(body) == ('container.updated', 'n-1')
+    
+    @pytest.mark.parametrize('body', [
+        b'not valid json {',
+        b'{"data": {"id": "n-1", "attributes": {"event": "container.updated"',
+        b'{"data": {"id": "n-1" "attributes": {}}}',
+        b'{"data": {"id": "n-1", "attributes": {"event": container}}}',
+        b'',
+    ])
+    def test_malformed_json_raises(self, body):
+        with pytest.raises(json.JSONDecodeError):
+            sniff_event_metadata(body)
+    
+    def test_invalid_utf8_raises(self):
+        with pytest.raises(ValueError):
+            sniff_event_metadata(b'{"data": {"id": "\xff", "attributes": {}}}')
+    
+    def test_non_object_document_falls_back(self):
+        assert sniff_event_metadata(b'[{"data": {}}]') == ('', None)
+
+
+class TestSniffDocument:
+    """Tests for sniff_document."""
+    
+    def test_data_and_included(self):
+        payload = {
+            "data": {"id": "n-1", "attributes": {"event": "container.updated"}},
+            "included": [{"id": "s-1", "type": "shipment"}, {"id": "c-1", "type": "container"}]
+        }
+        
+        data, included = sniff_document(json.dumps(payload, indent=2).encode('utf-8'))
+        
+        assert data == payload['data']
+        assert list(included) == payload['included']
+    
+    def test_included_before_data(self):
+        payload = {"included": [{"id": "c-1"}], "data": {"id": "n-1"}}
+        
+        data, included = sniff_document(json.dumps(payload))
+        
+        assert data == {"id": "n-1"}
+        assert list(included) == [{"id": "c-1"}]
+    
+    def test_included_parsed_lazily(self):
+        body = b'{"data": {"id": "n-1"}, "included": [{"id": "c-1"}, not json]}'
+        
+        _, included = sniff_document(body)
+        
+        assert next(included) == {"id": "c-1"}
+        with pytest.raises(ValueError):
+            next(included)
+    
+    @pytest.mark.parametrize('body', [b'{}', b'{"data": [], "included": {}}', b'{"included": []}'])
+    def test_missing_parts(self, body):
+        data, included = sniff_document(body)
+        
+        assert data == {}
+        assert list(included) == []
+    
+    @pytest.mark.parametrize('body', [b'[]', b'{"data": {"id": }}', b'{"data"'])
+    def test_malformed_raises(self, body):
+        with pytest.raises(ValueError):
+            sniff_document(body)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
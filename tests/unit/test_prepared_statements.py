@@ -0,0 +1,249 @@
+"""
+Unit tests for the prepared statement registry.
+
+Tests cover:
+- PREPARE and EXECUTE text built from psycopg2 placeholders
+- Preparing once per connection, at checkout
+- Fallback to unprepared execution (rejected PREPARE, missing statement)
+- Recognizing a transaction to retry unprepared (psycopg2 and psycopg 3)
+- DB_PREPARED_STATEMENTS and transaction pooler detection
+"""
+
+import pytest
+import os
+from unittest.mock import patch
+
+# Import the module under test
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../functions/event_processor'))
+
+import prepared_statements
+from prepared_statements import (
+    Statement,
+    execute,
+    get_prepared_stats,
+    is_missing_statement,
+    prepare_connection,
+    prepared_statements_enabled,
+    reset_prepared_statements,
+)
+
+UPSERT = Statement('upsert_things', """
+    INSERT INTO things (t49_id, name, created_at)
+    SELECT *, NOW() FROM unnest(%(t49_id)s::uuid[], %(name)s::text[])
+    ON CONFLICT (t49_id) DO NOTHING
+    RETURNING t49_id = ANY(%(t49_id)s::uuid[])
+""")
+
+
+class DatabaseError(Exception):
+    """psycopg2.Error stand-in carrying a SQLSTATE."""
+
+    def __init__(self, message, pgcode=None):
+        super().__init__(message)
+        self.pgcode = pgcode
+
+
+class StubCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params=None):
+        self.connection.statements.append((query, params))
+        if self.connection.errors:
+            raise self.connection.errors.pop(0)
+
+
+class StubConnection:
+    """psycopg2 connection stand-in recording statements."""
+
+    def __init__(self, errors=()):
+        self.statements = []
+        self.errors = list(errors)
+        self.rollbacks = 0
+
+    def cursor(self):
+        return StubCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    """Only UPSERT registered; preparation on."""
+    monkeypatch.setenv('DB_PREPARED_STATEMENTS', 'true')
+    reset_prepared_statements()
+    with patch.dict(prepared_statements._statements, {UPSERT.name: UPSERT}, clear=True):
+        yield
+    reset_prepared_statements()
+
+
+class TestStatement:
+    """Tests for the PREPARE and EXECUTE text."""
+
+    def test_named_placeholders_numbered_once(self):
+        assert 'unnest($1::uuid[], $2::text[])' in UPSERT.prepare_sql
+        assert 'ANY($1::uuid[])' in UPSERT.prepare_sql
+        assert UPSERT.prepare_sql.startswith('PREPARE upsert_things AS')
+        assert '%(' not in UPSERT.prepare_sql
+
+    def test_execute_passes_each_parameter_with_its_cast(self):
+        assert UPSERT.execute_sql == (
+            'EXECUTE upsert_things (%(t49_id)s::uuid[], %(name)s::text[])'
+        )
+
+    def test_positional_placeholders(self):
+        statement = Statement('find', 'SELECT id FROM things WHERE a = %s AND b = %s::int')
+
+        assert statement.prepare_sql == (
+            'PREPARE find AS SELECT id FROM things WHERE a = $1 AND b = $2::int'
+        )
+        assert statement.execute_sql == 'EXECUTE find (%s, %s::int)'
+
+
+class TestPrepareConnection:
+    """Tests for preparing the registered statements at checkout."""
+
+    def test_prepares_all_statements_in_one_round_trip(self):
+        conn = StubConnection()
+
+        assert prepare_connection(conn) is True
+
+        assert len(conn.statements) == 1
+        sql, params = conn.statements[0]
+        assert sql.startswith('DEALLOCATE ALL;')
+        assert UPSERT.prepare_sql in sql
+        assert params is None
+
+    def test_prepared_once_per_connection(self):
+        conn = StubConnection()
+
+        prepare_connection(conn)
+        prepare_connection(conn)
+
+        assert len(conn.statements) == 1
+        assert get_prepared_stats()['prepared_connections'] == 1
+
+    def test_new_connection_prepared_again(self):
+        prepare_connection(StubConnection())
+        reconnected = StubConnection()
+
+        assert prepare_connection(reconnected) is True
+        assert len(reconnected.statements) == 1
+
+    def test_rejected_prepare_disables_preparation(self):
+        conn = StubConnection(errors=[DatabaseError('syntax error', pgcode='42601')])
+
+        assert prepare_connection(conn) is False
+
+        assert conn.rollbacks == 1
+        assert prepared_statements_enabled() is False
+        assert 'syntax error' in get_prepared_stats()['disabled_reason']
+        assert prepare_connection(StubConnection()) is False
+
+    def test_connection_failure_raised(self):
+        conn = StubConnection(errors=[DatabaseError('server closed the connection')])
+
+        with pytest.raises(DatabaseError):
+            prepare_connection(conn)
+
+        assert prepared_statements_enabled() is True
+
+    def test_disabled_by_env(self, monkeypatch):
+        monkeypatch.setenv('DB_PREPARED_STATEMENTS', 'false')
+        conn = StubConnection()
+
+        assert prepare_connection(conn) is False
+        assert conn.statements == []
+
+
+class TestExecute:
+    """Tests for executing by name or falling back to the SQL."""
+
+    PARAMS = {'t49_id': ['t49-1'], 'name': ['one']}
+
+    def test_prepared_connection_executes_by_name(self):
+        conn = StubConnection()
+        prepare_connection(conn)
+
+        execute(conn.cursor(), UPSERT, self.PARAMS)
+
+        assert conn.statements[-1] == (UPSERT.execute_sql, self.PARAMS)
+
+    def test_unprepared_connection_sends_sql(self):
+        conn = StubConnection()
+
+        execute(conn.cursor(), UPSERT, self.PARAMS)
+
+        assert conn.statements == [(UPSERT.sql, self.PARAMS)]
+
+    def test_missing_statement_disables_and_raises(self):
+        conn = StubConnection()
+        prepare_connection(conn)
+        conn.errors.append(DatabaseError('prepared statement does not exist', pgcode='26000'))
+
+        with pytest.raises(DatabaseError):
+            execute(conn.cursor(), UPSERT, self.PARAMS)
+
+        assert prepared_statements_enabled() is False
+        execute(conn.cursor(), UPSERT, self.PARAMS)
+        assert conn.statements[-1] == (UPSERT.sql, self.PARAMS)
+
+    def test_other_errors_keep_preparation(self):
+        conn = StubConnection()
+        prepare_connection(conn)
+        conn.errors.append(DatabaseError('duplicate key', pgcode='23505'))
+
+        with pytest.raises(DatabaseError):
+            execute(conn.cursor(), UPSERT, self.PARAMS)
+
+        assert prepared_statements_enabled() is True
+
+
+class TestIsMissingStatement:
+    """Tests for recognizing a transaction that failed on a missing statement."""
+
+    def test_psycopg2_error_disables_preparation(self):
+        assert is_missing_statement(DatabaseError('does not exist', pgcode='26000')) is True
+        assert prepared_statements_enabled() is False
+
+    def test_psycopg3_error_by_sqlstate(self):
+        error = Exception('does not exist')
+        error.sqlstate = '26000'
+
+        assert is_missing_statement(error) is True
+        assert get_prepared_stats()['disabled_reason'].startswith('Prepared statement missing')
+
+    def test_other_errors_not_retried(self):
+        assert is_missing_statement(DatabaseError('duplicate key', pgcode='23505')) is False
+        assert is_missing_statement(ValueError('invalid payload')) is False
+        assert prepared_statements_enabled() is True
+
+
+class TestConfiguration:
+    """Tests for DB_PREPARED_STATEMENTS."""
+
+    @pytest.mark.parametrize('mode,port,expected', [
+        ('auto', '5432', True),
+        ('auto', '6543', False),
+        ('true', '6543', True),
+        ('false', '5432', False),
+    ])
+    def test_mode(self, monkeypatch, mode, port, expected):
+        monkeypatch.setenv('DB_PREPARED_STATEMENTS', mode)
+        monkeypatch.setenv('SUPABASE_DB_PORT', port)
+
+        assert prepared_statements_enabled() is expected
+
+    def test_auto_by_default(self, monkeypatch):
+        monkeypatch.delenv('DB_PREPARED_STATEMENTS')
+        monkeypatch.delenv('SUPABASE_DB_PORT', raising=False)
+
+        assert prepared_statements_enabled() is True
@@ -0,0 +1,364 @@
+"""
+Unit tests for the local webhook spool.
+
+Tests cover:
+- Durable append and segment rotation
+- Size cap enforcement
+- Draining with an intermittently failing publisher
+- Replay of segments left by a previous process
+- Torn record handling and quarantine of corrupt segments
+- Inline draining on the request path
+- Receipt time kept through the spool
+"""
+
+import pytest
+import os
+import threading
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+# Import the module under test
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../functions/webhook_receiver'))
+
+import publish_spool
+from publish_spool import PublishSpool, SpoolFullError
+
+
+class FlakyPublisher:
+    """Publisher stand-in that fails every `fail_every`-th call."""
+    
+    def __init__(self, fail_every=0):
+        self.fail_every = fail_every
+        self.calls = 0
+        self.published = []
+        self._lock = threading.Lock()
+    
+    def __call__(self, header, body, timeout=None):
+        with self._lock:
+            self.calls += 1
+            if self.fail_every and self.calls % self.fail_every == 0:
+                raise ConnectionError("Pub/Sub unavailable")
+            self.published.append((header['request_id'], body))
+
+
+class HangingPublisher:
+    """Publisher stand-in that blocks for its whole timeout, like a hung Pub/Sub."""
+    
+    def __init__(self):
+        self.timeouts = []
+        self._release = threading.Event()
+    
+    def __call__(self, header, body, timeout=None):
+        self.timeouts.append(timeout)
+        self._release.wait(timeout if timeout is not None else 5)
+        raise TimeoutError("Publish timed out")
+    
+    def release(self):
+        self._release.set()
+
+
+def _header(i):
+    return {'event_type': 'container.updated', 'request_id': f'req-{i}', 'notification_id': f'n-{i}'}
+
+
+def _segments(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith('segment-'))
+
+
+class TestSpoolWrites:
+    """Tests for appending records."""
+    
+    def test_append_and_drain(self, tmp_path):
+        publisher = FlakyPublisher()
+        spool = PublishSpool(str(tmp_path), publisher)
+        
+        for i in range(3):
+            spool.append(f'{{"i": {i}}}'.encode(), _header(i))
+        
+        assert spool.pending_bytes() > 0
+        assert spool.drain_once() is True
+        assert sorted(publisher.published) == [
+            ('req-0', b'{"i": 0}'), ('req-1', b'{"i": 1}'), ('req-2', b'{"i": 2}')
+        ]
+        assert spool.pending_bytes() == 0
+        assert _segments(tmp_path) == []
+    
+    def test_append_is_fsynced(self, tmp_path):
+        spool = PublishSpool(str(tmp_path), FlakyPublisher())
+        
+        with patch.object(publish_spool.os, 'fsync', wraps=os.fsync) as mock_fsync:
+            spool.append(b'{}', _header(0))
+        
+        mock_fsync.assert_called_once()
+    
+    def test_segments_rotate(self, tmp_path):
+        spool = PublishSpool(str(tmp_path), FlakyPublisher(), segment_max_bytes=200)
+        
+        for i in range(5):
+            spool.append(b'x' * 100, _header(i))
+        
+        assert len(_segments(tmp_path)) == 5
+    
+    def test_size_cap_rejects(self, tmp_path):
+        spool = PublishSpool(str(tmp_path), FlakyPublisher(), max_bytes=300)
+        spool.append(b'x' * 100, _header(0))
+        
+        with pytest.raises(SpoolFullError):
+            spool.append(b'x' * 200, _header(1))
+        
+        assert spool.get_stats()['rejected'] == 1
+    
+    def test_drain_frees_capacity(self, tmp_path):
+        spool = PublishSpool(str(tmp_path), FlakyPublisher(), max_bytes=300)
+        spool.append(b'x' * 150, _header(0))
+        spool.drain_once()
+        
+        spool.append(b'x' * 150, _header(1))
+
+
+class TestSpoolDrain:
+    """Tests for draining with failures."""
+    
+    def test_intermittent_failures_eventually_drain_without_republishing(self, tmp_path):
+        publisher = FlakyPublisher(fail_every=3)
+        spool = PublishSpool(str(tmp_path), publisher, segment_max_bytes=400, drain_concurrency=4)
+        
+        for i in range(20):
+            spool.append(f'{{"i": {i}}}'.encode(), _header(i))
+        
+        for _ in range(20):
+            if spool.drain_once():
+                break
+        
+        request_ids = [request_id for request_id, _ in publisher.published]
+        assert sorted(request_ids) == sorted(f'req-{i}' for i in range(20))
+        assert len(request_ids) == len(set(request_ids))
+        assert spool.get_stats()['drain_failures'] > 0
+        assert _segments(tmp_path) == []
+    
+    def test_background_drainer(self, tmp_path):
+        publisher = FlakyPublisher()
+        spool = PublishSpool(str(tmp_path), publisher)
+        spool.start_drainer()
+        try:
+            spool.append(b'{}', _header(0))
+            
+            deadline = time.monotonic() + 5
+            while not publisher.published and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            spool.stop(timeout=5)
+        
+        assert publisher.published == [('req-0', b'{}')]
+
+
+class TestSpoolReplay:
+    """Tests for recovery after a restart."""
+    
+    def test_replay_segments_from_previous_process(self, tmp_path):
+        first = PublishSpool(str(tmp_path), FlakyPublisher(fail_every=1), segment_max_bytes=200)
+        for i in range(4):
+            first.append(b'x' * 100, _header(i))
+        first.drain_once()
+        first.stop()
+        
+        publisher = FlakyPublisher()
+        second = PublishSpool(str(tmp_path), publisher, segment_max_bytes=200)
+        
+        assert second.pending_bytes() > 0
+        assert second.drain_once() is True
+        assert len(publisher.published) == 4
+        
+        second.append(b'{}', _header(9))
+        assert int(_segments(tmp_path)[-1][8:18]) > 4
+    
+    def test_torn_record_is_skipped(self, tmp_path):
+        spool = PublishSpool(str(tmp_path), FlakyPublisher())
+        spool.append(b'{"ok": 1}', _header(0))
+        spool.append(b'{"ok": 2}', _header(1))
+        spool.stop()
+        
+        segment = os.path.join(tmp_path, _segments(tmp_path)[0])
+        with open(segment, 'r+b') as f:
+            f.truncate(os.path.getsize(segment) - 3)
+        
+        publisher = FlakyPublisher()
+        recovered = PublishSpool(str(tmp_path), publisher)
+        recovered.drain_once()
+        
+        assert publisher.published == [('req-0', b'{"ok": 1}')]
+        assert recovered.get_stats()['corrupt_records'] == 1
+    
+    def test_corrupt_middle_record_keeps_later_records(self, tmp_path):
+        spool = PublishSpool(str(tmp_path), FlakyPublisher())
+        for i in range(4):
+            spool.append(f'{{"ok": {i}}}'.encode(), _header(i))
+        spool.stop()
+        
+        segment = os.path.join(tmp_path, _segments(tmp_path)[0])
+        with open(segment, 'r+b') as f:
+            data = bytearray(f.read())
+            # Flip a byte in the second record's body
+            second = data.index(b'{"ok": 1}')
+            data[second + 2] ^= 0xFF
+            f.seek(0)
+            f.write(data)
+        
+        publisher = FlakyPublisher()
+        recovered = PublishSpool(str(tmp_path), publisher)
+        
+        assert recovered.drain_once() is True
+        assert sorted(publisher.published) == [
+            ('req-0', b'{"ok": 0}'), ('req-2', b'{"ok": 2}'), ('req-3', b'{"ok": 3}')
+        ]
+        assert recovered.get_stats()['corrupt_records'] == 1
+        assert recovered.get_stats()['quarantined_segments'] == 1
+        assert recovered.pending_bytes() == 0
+        assert os.listdir(tmp_path) == [os.path.basename(segment) + '.corrupt']
+    
+    def test_replay_on_startup_starts_drainer(self, tmp_path):
+        PublishSpool(str(tmp_path), FlakyPublisher()).append(b'{}', _header(0))
+        
+        with patch.dict(os.environ, {'SPOOL_ENABLED': 'true', 'SPOOL_DIR': str(tmp_path)}), \
+                patch.object(publish_spool, '_spool', None), \
+                patch.object(publish_spool, 'get_spool') as mock_get_spool:
+            publish_spool.replay_spool_on_startup()
+        
+        mock_get_spool.assert_called_once()
+    
+    def test_replay_on_startup_noop_when_disabled(self, tmp_path):
+        with patch.dict(os.environ, {'SPOOL_ENABLED': 'false'}), \
+                patch.object(publish_spool, 'get_spool') as mock_get_spool:
+            publish_spool.replay_spool_on_startup()
+        
+        mock_get_spool.assert_not_called()
+
+
+class TestInlineDrain:
+    """Tests for draining at the end of a request."""
+    
+    @staticmethod
+    def _spooled_earlier(directory, count):
+        """Records spooled by a previous process, so no retry backoff is pending."""
+        first = PublishSpool(str(directory), FlakyPublisher())
+        for i in range(count):
+            first.append(b'{}', _header(i))
+        first.stop()
+    
+    def test_bounded_by_max_records(self, tmp_path):
+        self._spooled_earlier(tmp_path, 5)
+        publisher = FlakyPublisher()
+        spool = PublishSpool(str(tmp_path), publisher)
+        
+        assert spool.drain_inline(max_records=3, budget_seconds=5) is False
+        assert len(publisher.published) == 3
+        assert spool.drain_inline(max_records=3, budget_seconds=5) is True
+        assert sorted(request_id for request_id, _ in publisher.published) == [
+            f'req-{i}' for i in range(5)
+        ]
+    
+    def test_resumes_from_cursor(self, tmp_path):
+        self._spooled_earlier(tmp_path, 5)
+        spool = PublishSpool(str(tmp_path), FlakyPublisher())
+        
+        assert spool.drain_inline(max_records=2, budget_seconds=5) is False
+        with patch.object(
+            publish_spool, '_parse_record', wraps=publish_spool._parse_record
+        ) as mock_parse:
+            assert spool.drain_inline(max_records=2, budget_seconds=5) is False
+        
+        # Only the two records published by this drain are read
+        assert mock_parse.call_count == 2
+    
+    def test_failure_backs_off(self, tmp_path):
+        self._spooled_earlier(tmp_path, 1)
+        publisher = FlakyPublisher(fail_every=1)
+        spool = PublishSpool(str(tmp_path), publisher)
+        
+        assert spool.drain_inline(max_records=10, budget_seconds=5) is False
+        assert spool.drain_inline(max_records=10, budget_seconds=5) is False
+        
+        assert publisher.calls == 1
+    
+    def test_stops_at_first_failure(self, tmp_path):
+        self._spooled_earlier(tmp_path, 20)
+        publisher = FlakyPublisher(fail_every=1)
+        spool = PublishSpool(str(tmp_path), publisher, drain_concurrency=1)
+        
+        assert spool.drain_inline(max_records=20, budget_seconds=5) is False
+        assert publisher.calls == 1
+    
+    def test_hung_publisher_bounded_by_budget(self, tmp_path):
+        self._spooled_earlier(tmp_path, 50)
+        publisher = HangingPublisher()
+        spool = PublishSpool(str(tmp_path), publisher)
+        
+        start = time.monotonic()
+        try:
+            assert spool.drain_inline(max_records=50, budget_seconds=0.2) is False
+            elapsed = time.monotonic() - start
+        finally:
+            publisher.release()
+        
+        assert elapsed < 0.5
+        assert all(timeout is not None and timeout <= 0.2 for timeout in publisher.timeouts)
+        assert len(publisher.timeouts) <= spool.drain_concurrency
+        assert spool.get_stats()['drained'] == 0
+        assert spool.get_stats()['drain_failures'] > 0
+        
+        # The failed drain backs off instead of hanging the next request too
+        start = time.monotonic()
+        assert spool.drain_inline(max_records=50, budget_seconds=0.2) is False
+        assert time.monotonic() - start < 0.05
+    
+    def test_module_drain_noop_when_unused(self):
+        with patch.object(publish_spool, '_spool', None):
+            publish_spool.drain_spool_inline()
+    
+    def test_not_retried_right_after_spooling(self, tmp_path):
+        publisher = FlakyPublisher()
+        spool = PublishSpool(str(tmp_path), publisher)
+        spool.append(b'{}', _header(0))
+        
+        assert spool.drain_inline(max_records=10, budget_seconds=5) is False
+        assert publisher.calls == 0
+    
+    def test_module_drain_publishes(self, tmp_path):
+        self._spooled_earlier(tmp_path, 1)
+        publisher = FlakyPublisher()
+        spool = PublishSpool(str(tmp_path), publisher)
+        
+        with patch.dict(os.environ, {'SPOOL_ENABLED': 'true'}), \
+                patch.object(publish_spool, '_spool', spool):
+            assert publish_spool.spool_has_records() is True
+            publish_spool.drain_spool_inline()
+        
+        assert publisher.published == [('req-0', b'{}')]
+        assert spool.pending_bytes() == 0
+
+
+class TestReceiptTime:
+    """Tests for keeping the receipt time of spooled webhooks."""
+    
+    def test_received_at_republished_unchanged(self, tmp_path):
+        received_at = datetime(2024, 1, 20, 9, 20, 5)
+        with patch.dict(os.environ, {'SPOOL_ENABLED': 'true', 'SPOOL_DIR': str(tmp_path)}), \
+                patch.object(publish_spool, '_spool', None), \
+                patch.object(PublishSpool, 'start_drainer'):
+            publish_spool.spool_event(
+                b'{}', 'container.updated', 'req-0', 'n-0', received_at=received_at
+            )
+            spool = publish_spool._spool
+            
+            with patch('pubsub_publisher.publish_raw_event') as mock_publish:
+                assert spool.drain_once() is True
+        
+        attributes = mock_publish.call_args.kwargs['extra_attributes']
+        assert attributes['received_at'] == '2024-01-20T09:20:05'
+        assert attributes['spooled_at'] >= attributes['received_at']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
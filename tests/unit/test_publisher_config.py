@@ -0,0 +1,184 @@
+"""
+Unit tests for the publisher configuration.
+
+Tests cover:
+- Explicit defaults and environment overrides
+- Configuration and topic paths resolved once per instance
+- Client batch settings, flow control and retry policy
+- Configuration reported by /health
+"""
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+# Import the module under test
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../functions/webhook_receiver'))
+
+from event_routing import Lane
+from publisher_config import (
+    PublisherConfig,
+    get_publisher_config,
+    set_publisher_config,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_config():
+    set_publisher_config(None)
+    yield
+    set_publisher_config(None)
+
+
+class TestLoadConfig:
+    """Tests for resolving the configuration from the environment."""
+
+    def test_defaults(self):
+        with patch.dict(os.environ, {}, clear=True):
+            config = get_publisher_config()
+
+        assert config.topic == 'terminal49-webhook-events'
+        assert config.batch_settings == {'max_messages': 100, 'max_bytes': 1000 * 1000, 'max_latency': 0.01}
+        assert config.flow_control == {'max_messages': 1000, 'max_bytes': 32 * 1024 * 1024, 'behavior': 'error'}
+        assert config.retry == {'initial': 0.1, 'maximum': 2.0, 'multiplier': 2.0, 'deadline': 30.0}
+        assert config.rpc_timeout_seconds == 10.0
+
+    def test_environment_overrides(self):
+        env = {
+            'GCP_PROJECT_ID': 'test-project',
+            'PUBSUB_PUBLISH_MAX_MESSAGES': '10',
+            'PUBSUB_PUBLISH_MAX_LATENCY_SECONDS': '0.002',
+            'PUBSUB_BATCH_MAX_BYTES': '4096',
+            'PUBSUB_FLOW_CONTROL_MAX_MESSAGES': '50',
+            'PUBSUB_FLOW_CONTROL_BEHAVIOR': 'Block',
+            'PUBSUB_RETRY_DEADLINE_SECONDS': '5',
+            'PUBSUB_RPC_TIMEOUT_SECONDS': '2.5',
+            'PUBSUB_ENABLE_MESSAGE_ORDERING': 'false',
+        }
+        with patch.dict(os.environ, env, clear=True):
+            config = get_publisher_config()
+
+        assert config.project_id == 'test-project'
+        assert config.batch_settings['max_messages'] == 10
+        assert config.batch_settings['max_latency'] == 0.002
+        assert config.replay_batch_settings['max_bytes'] == 4096
+        assert config.flow_control['max_messages'] == 50
+        assert config.flow_control['behavior'] == 'block'
+        assert config.retry['deadline'] == 5.0
+        assert config.rpc_timeout_seconds == 2.5
+        assert config.message_ordering is False
+
+    def test_unknown_flow_control_behavior_uses_default(self):
+        with patch.dict(os.environ, {'PUBSUB_FLOW_CONTROL_BEHAVIOR': 'drop'}, clear=True):
+            assert get_publisher_config().flow_control['behavior'] == 'error'
+
+    def test_unknown_behavior_rejected_by_constructor(self):
+        with pytest.raises(ValueError):
+            PublisherConfig(flow_control={'behavior': 'drop'})
+
+    def test_resolved_once(self):
+        with patch.dict(os.environ, {'PUBSUB_TOPIC': 'first'}):
+            config = get_publisher_config()
+        with patch.dict(os.environ, {'PUBSUB_TOPIC': 'second'}):
+            assert get_publisher_config() is config
+            assert config.topic == 'first'
+
+            set_publisher_config(None)
+            assert get_publisher_config().topic == 'second'
+
+
+class TestTopicPath:
+    """Tests for PublisherConfig.topic_path."""
+
+    def test_default_lane(self):
+        config = PublisherConfig(project_id='test-project')
+
+        assert config.topic_path() == 'projects/test-project/topics/terminal49-webhook-events'
+        assert config.topic_path(Lane('default')) == config.topic_path()
+
+    def test_lane_topic_name_and_full_path(self):
+        config = PublisherConfig(project_id='test-project')
+
+        assert config.topic_path(Lane('priority', topic='events-priority')) == \
+            'projects/test-project/topics/events-priority'
+        assert config.topic_path(Lane('bulk', topic='projects/other/topics/events-bulk')) == \
+            'projects/other/topics/events-bulk'
+
+    def test_cached_per_lane(self):
+        config = PublisherConfig(project_id='test-project')
+        lane = Lane('priority', topic='events-priority')
+
+        with patch.object(config, '_resolve_topic_path', wraps=config._resolve_topic_path) as resolve:
+            for _ in range(3):
+                config.topic_path(lane)
+                config.topic_path()
+
+        assert resolve.call_count == 2
+        assert set(config.describe()['topic_paths']) == {'default', 'priority'}
+
+    def test_missing_project(self):
+        with pytest.raises(ValueError):
+            PublisherConfig(project_id=None).topic_path()
+
+
+class TestClientKwargs:
+    """Tests for the options passed to the publisher client."""
+
+    def test_flow_control_and_retry(self):
+        from google.cloud import pubsub_v1
+
+        config = PublisherConfig(
+            flow_control={'max_messages': 5, 'max_bytes': 1024, 'behavior': 'block'},
+            retry={'deadline': 7.0},
+            rpc_timeout_seconds=3.0
+        )
+
+        options = config.client_kwargs()['publisher_options']
+
+        assert options.flow_control.message_limit == 5
+        assert options.flow_control.byte_limit == 1024
+        assert options.flow_control.limit_exceeded_behavior == pubsub_v1.types.LimitExceededBehavior.BLOCK
+        assert options.retry.timeout == 7.0
+        assert options.timeout == 3.0
+        assert options.enable_message_ordering is False
+
+    def test_lane_batch_settings_override_defaults(self):
+        config = PublisherConfig(batch_settings={'max_messages': 100, 'max_bytes': 2048, 'max_latency': 0.01})
+
+        settings = config.client_kwargs({'max_messages': 500})['batch_settings']
+
+        assert (settings.max_messages, settings.max_bytes, settings.max_latency) == (500, 2048, 0.01)
+
+    def test_flow_control_disabled(self):
+        from google.cloud import pubsub_v1
+
+        options = PublisherConfig().client_kwargs(flow_control=False)['publisher_options']
+
+        assert options.flow_control.limit_exceeded_behavior == pubsub_v1.types.LimitExceededBehavior.IGNORE
+
+
+class TestHealth:
+    """Tests for the configuration in /health."""
+
+    def test_health_reports_publisher_config(self):
+        from webhook_handler import health_status
+
+        env = {
+            'TERMINAL49_WEBHOOK_SECRET': 'test-secret-key',
+            'GCP_PROJECT_ID': 'test-project',
+            'PUBSUB_FLOW_CONTROL_BEHAVIOR': 'block',
+        }
+        with patch.dict(os.environ, env), \
+                patch('webhook_handler.run_probes', return_value=({}, True)):
+            status, _ = health_status(deep=True)
+
+        publisher = status['publisher']
+        assert publisher['project_id'] == 'test-project'
+        assert publisher['flow_control']['behavior'] == 'block'
+        assert set(publisher) >= {'batch_settings', 'replay_batch_settings', 'retry', 'rpc_timeout_seconds'}
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,622 @@
+"""
+Unit tests for the Pub/Sub event publisher.
+
+Tests cover:
+- Blocking publish (default mode)
+- Non-blocking publish with bounded in-flight window
+- Completion callbacks recording failures and passing them to on_failure
+- Flushing in-flight publishes
+- Ordering keys and resuming a key after a failed publish
+- Routing events to lane topics and lane publisher clients
+- Batch publishing: per-message results, in-flight bound, deadline and rate limit
+"""
+
+import pytest
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from unittest.mock import patch
+
+# Import the module under test
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../functions/webhook_receiver'))
+
+import pubsub_publisher
+from pubsub_publisher import (
+    encode_message_data,
+    publish_event,
+    publish_raw_event,
+    publish_raw_event_async,
+    publish_batch,
+    flush_pending_publishes,
+    get_publish_mode,
+    get_publish_stats,
+    PublishBackpressureError,
+    BatchDeadlineExceededError,
+)
+from event_routing import parse_routing_config, set_event_router
+
+
+class StubPublisher:
+    """Publisher stand-in whose futures are resolved manually by the test."""
+    
+    def __init__(self):
+        self.futures = []
+        self.published = []
+        self.ordering_keys = []
+        self.resumed = []
+    
+    def topic_path(self, project, topic):
+        return f"projects/{project}/topics/{topic}"
+    
+    def publish(self, topic_path, data, ordering_key='', **attributes):
+        future = Future()
+        self.futures.append(future)
+        self.published.append((topic_path, data, attributes))
+        self.ordering_keys.append(ordering_key)
+        return future
+    
+    def resume_publish(self, topic_path, ordering_key):
+        self.resumed.append((topic_path, ordering_key))
+
+
+@pytest.fixture
+def stub_publisher():
+    """Install a stub publisher and reset non-blocking state."""
+    stub = StubPublisher()
+    with patch.object(pubsub_publisher, '_publisher_client', stub), \
+            patch.object(pubsub_publisher, '_in_flight_slots', None), \
+            patch.object(pubsub_publisher, '_in_flight_count', 0), \
+            patch.dict(pubsub_publisher._publish_stats,
+                       {'submitted': 0, 'succeeded': 0, 'failed': 0, 'rejected': 0}), \
+            patch.object(pubsub_publisher.atexit, 'register'):
+        yield stub
+
+
+@pytest.fixture
+def base_env():
+    env_vars = {
+        'GCP_PROJECT_ID': 'test-project',
+        'PUBSUB_TOPIC': 'terminal49-webhook-events'
+    }
+    with patch.dict(os.environ, env_vars):
+        yield env_vars
+
+
+PAYLOAD = {"data": {"id": "notif-1", "attributes": {"event": "container.updated"}}}
+
+
+class TestPublishMode:
+    """Tests for publish mode selection."""
+    
+    def test_default_is_blocking(self):
+        with patch.dict(os.environ, {}, clear=True):
+            assert get_publish_mode() == 'blocking'
+    
+    def test_non_blocking_opt_in(self):
+        with patch.dict(os.environ, {'PUBSUB_PUBLISH_MODE': 'non_blocking'}):
+            assert get_publish_mode() == 'non_blocking'
+    
+    def test_unknown_mode_falls_back_to_blocking(self):
+        with patch.dict(os.environ, {'PUBSUB_PUBLISH_MODE': 'fire-and-forget'}):
+            assert get_publish_mode() == 'blocking'
+
+
+class TestBlockingPublish:
+    """Tests for the default blocking publish path."""
+    
+    def test_waits_for_message_id(self, base_env, stub_publisher):
+        def publish_and_resolve(topic_path, data, **attributes):
+            future = Future()
+            future.set_result('msg-1')
+            return future
+        
+        with patch.object(stub_publisher, 'publish', side_effect=publish_and_resolve):
+            assert publish_event(PAYLOAD, 'container.updated', 'req-1') == 'msg-1'
+
+
+class TestRawPublish:
+    """Tests for forwarding raw request bytes."""
+    
+    @pytest.fixture
+    def resolving_publisher(self, stub_publisher):
+        def publish_and_resolve(topic_path, data, **attributes):
+            stub_publisher.published.append((topic_path, data, attributes))
+            future = Future()
+            future.set_result('msg-1')
+            return future
+        
+        with patch.object(stub_publisher, 'publish', side_effect=publish_and_resolve):
+            yield stub_publisher
+    
+    def test_body_published_verbatim(self, base_env, resolving_publisher):
+        body = b'{ "data" : {"id": "notif-1", "attributes": {"event": "container.updated"}} }'
+        
+        publish_raw_event(body, 'container.updated', 'req-1', notification_id='notif-1')
+        
+        _, data, attributes = resolving_publisher.published[0]
+        assert data is body
+        assert attributes['notification_id'] == 'notif-1'
+    
+    def test_notification_id_optional(self, base_env, resolving_publisher):
+        publish_raw_event(b'{}', 'container.updated', 'req-1')
+        
+        _, _, attributes = resolving_publisher.published[0]
+        assert 'notification_id' not in attributes
+    
+    def test_publish_event_serializes_payload(self, base_env, resolving_publisher):
+        publish_event(PAYLOAD, 'container.updated', 'req-1')
+        
+        _, data, attributes = resolving_publisher.published[0]
+        assert json.loads(data) == PAYLOAD
+        assert attributes['notification_id'] == 'notif-1'
+
+
+class TestCompression:
+    """Tests for optional message body compression."""
+    
+    BODY = json.dumps({"included": [{"type": "container", "attributes": {"number": "X"}}] * 100}).encode()
+    
+    def test_disabled_by_default(self):
+        with patch.dict(os.environ, {}, clear=True):
+            assert encode_message_data(self.BODY) == (self.BODY, None)
+    
+    def test_gzip(self):
+        import gzip
+        
+        with patch.dict(os.environ, {'PUBSUB_COMPRESSION': 'gzip'}):
+            data, encoding = encode_message_data(self.BODY)
+        
+        assert encoding == 'gzip'
+        assert len(data) < len(self.BODY)
+        assert gzip.decompress(data) == self.BODY
+    
+    def test_zstd(self):
+        import zstandard
+        
+        with patch.dict(os.environ, {'PUBSUB_COMPRESSION': 'zstd', 'PUBSUB_COMPRESSION_LEVEL': '5'}):
+            data, encoding = encode_message_data(self.BODY)
+        
+        assert encoding == 'zstd'
+        assert zstandard.ZstdDecompressor().decompress(data) == self.BODY
+    
+    def test_zstd_falls_back_to_gzip_without_package(self):
+        with patch.dict(os.environ, {'PUBSUB_COMPRESSION': 'zstd'}), \
+                patch.dict(sys.modules, {'zstandard': None}):
+            _, encoding = encode_message_data(self.BODY)
+        
+        assert encoding == 'gzip'
+    
+    def test_small_bodies_not_compressed(self):
+        with patch.dict(os.environ, {'PUBSUB_COMPRESSION': 'gzip', 'PUBSUB_COMPRESSION_MIN_BYTES': '100000'}):
+            assert encode_message_data(self.BODY) == (self.BODY, None)
+    
+    def test_content_encoding_attribute(self, base_env, stub_publisher):
+        def publish_and_resolve(topic_path, data, **attributes):
+            stub_publisher.published.append((topic_path, data, attributes))
+            future = Future()
+            future.set_result('msg-1')
+            return future
+        
+        with patch.dict(os.environ, {'PUBSUB_COMPRESSION': 'gzip'}), \
+                patch.object(stub_publisher, 'publish', side_effect=publish_and_resolve):
+            publish_raw_event(self.BODY, 'container.updated', 'req-1')
+        
+        _, data, attributes = stub_publisher.published[0]
+        assert attributes['content_encoding'] == 'gzip'
+        assert data != self.BODY
+
+
+class TestNonBlockingPublish:
+    """Tests for the non-blocking publish path."""
+    
+    @pytest.fixture
+    def non_blocking_env(self, base_env):
+        with patch.dict(os.environ, {
+            'PUBSUB_PUBLISH_MODE': 'non_blocking',
+            'PUBSUB_MAX_IN_FLIGHT': '2'
+        }):
+            yield
+    
+    def test_returns_before_ack(self, non_blocking_env, stub_publisher):
+        result = publish_event(PAYLOAD, 'container.updated', 'req-1')
+        
+        assert result is None
+        assert len(stub_publisher.published) == 1
+        assert get_publish_stats()['in_flight'] == 1
+    
+    def test_completion_records_success_and_failure(self, non_blocking_env, stub_publisher):
+        publish_event(PAYLOAD, 'container.updated', 'req-1')
+        publish_event(PAYLOAD, 'container.updated', 'req-2')
+        
+        stub_publisher.futures[0].set_result('msg-1')
+        stub_publisher.futures[1].set_exception(RuntimeError("Pub/Sub unavailable"))
+        
+        stats = get_publish_stats()
+        assert stats['submitted'] == 2
+        assert stats['succeeded'] == 1
+        assert stats['failed'] == 1
+        assert stats['in_flight'] == 0
+    
+    def test_full_window_rejects(self, non_blocking_env, stub_publisher):
+        publish_event(PAYLOAD, 'container.updated', 'req-1')
+        publish_event(PAYLOAD, 'container.updated', 'req-2')
+        
+        with patch.object(pubsub_publisher, 'PUBLISH_TIMEOUT_SECONDS', 0.01):
+            with pytest.raises(PublishBackpressureError):
+                publish_event(PAYLOAD, 'container.updated', 'req-3')
+        
+        assert get_publish_stats()['rejected'] == 1
+    
+    def test_completion_frees_window_slot(self, non_blocking_env, stub_publisher):
+        publish_event(PAYLOAD, 'container.updated', 'req-1')
+        publish_event(PAYLOAD, 'container.updated', 'req-2')
+        stub_publisher.futures[0].set_result('msg-1')
+        
+        publish_event(PAYLOAD, 'container.updated', 'req-3')
+        
+        assert len(stub_publisher.published) == 3
+    
+    def test_flush_waits_for_in_flight(self, non_blocking_env, stub_publisher):
+        publish_event(PAYLOAD, 'container.updated', 'req-1')
+        
+        timer = threading.Timer(0.05, stub_publisher.futures[0].set_result, args=('msg-1',))
+        timer.start()
+        
+        assert flush_pending_publishes(timeout=2.0) is True
+        assert get_publish_stats()['in_flight'] == 0
+    
+    def test_flush_times_out(self, non_blocking_env, stub_publisher):
+        publish_event(PAYLOAD, 'container.updated', 'req-1')
+        
+        assert flush_pending_publishes(timeout=0.01) is False
+        
+        stub_publisher.futures[0].set_result('msg-1')
+    
+    def test_failure_passed_to_on_failure(self, non_blocking_env, stub_publisher):
+        failures = []
+        publish_raw_event(b'{}', 'container.updated', 'req-1', on_failure=failures.append)
+        publish_raw_event(b'{}', 'container.updated', 'req-2', on_failure=failures.append)
+        
+        error = RuntimeError("Pub/Sub unavailable")
+        stub_publisher.futures[0].set_result('msg-1')
+        stub_publisher.futures[1].set_exception(error)
+        
+        assert failures == [error]
+    
+    def test_failing_on_failure_does_not_raise(self, non_blocking_env, stub_publisher):
+        def on_failure(error):
+            raise OSError("spool full")
+        
+        publish_raw_event(b'{}', 'container.updated', 'req-1', on_failure=on_failure)
+        stub_publisher.futures[0].set_exception(RuntimeError("Pub/Sub unavailable"))
+        
+        assert get_publish_stats()['in_flight'] == 0
+    
+    def test_slot_wait_uses_timeout(self, non_blocking_env, stub_publisher):
+        publish_event(PAYLOAD, 'container.updated', 'req-1')
+        publish_event(PAYLOAD, 'container.updated', 'req-2')
+        
+        start = time.monotonic()
+        with patch.object(pubsub_publisher, 'PUBLISH_TIMEOUT_SECONDS', 30):
+            with pytest.raises(PublishBackpressureError):
+                publish_raw_event(b'{}', 'container.updated', 'req-3', timeout=0.01)
+        
+        assert time.monotonic() - start < 1
+
+
+ORDERED_PAYLOAD = {
+    "data": {
+        "id": "notif-2",
+        "attributes": {"event": "container.updated"},
+        "relationships": {"reference_object": {"data": {"id": "c-1", "type": "container"}}}
+    }
+}
+
+
+class TestOrderingKeys:
+    """Tests for publishing with ordering keys."""
+    
+    @pytest.fixture(autouse=True)
+    def ordering_enabled(self):
+        with patch.dict(os.environ, {'PUBSUB_ENABLE_MESSAGE_ORDERING': 'true'}):
+            yield
+    
+    def test_publish_event_derives_key(self, base_env, stub_publisher):
+        with patch.dict(os.environ, {'PUBSUB_PUBLISH_MODE': 'non_blocking'}):
+            publish_event(ORDERED_PAYLOAD, 'container.updated', 'req-1')
+        
+        assert stub_publisher.ordering_keys == ['container:c-1']
+        assert 'ordering_key' not in stub_publisher.published[0][2]
+    
+    def test_disabled_publishes_unordered(self, base_env, stub_publisher):
+        with patch.dict(os.environ, {
+            'PUBSUB_PUBLISH_MODE': 'non_blocking',
+            'PUBSUB_ENABLE_MESSAGE_ORDERING': 'false'
+        }):
+            publish_raw_event(b'{}', 'container.updated', 'req-1', ordering_key='container:c-1')
+        
+        assert stub_publisher.ordering_keys == ['']
+    
+    def test_unordered_by_default(self, base_env, stub_publisher):
+        with patch.dict(os.environ, {'PUBSUB_PUBLISH_MODE': 'non_blocking'}):
+            os.environ.pop('PUBSUB_ENABLE_MESSAGE_ORDERING')
+            publish_raw_event(b'{}', 'container.updated', 'req-1', ordering_key='container:c-1')
+        
+        assert stub_publisher.ordering_keys == ['']
+    
+    def test_blocking_failure_resumes_key(self, base_env, stub_publisher):
+        def publish_and_fail(topic_path, data, ordering_key='', **attributes):
+            future = Future()
+            future.set_exception(RuntimeError("Pub/Sub unavailable"))
+            return future
+        
+        with patch.object(stub_publisher, 'publish', side_effect=publish_and_fail):
+            with pytest.raises(RuntimeError):
+                publish_raw_event(b'{}', 'container.updated', 'req-1', ordering_key='container:c-1')
+        
+        assert stub_publisher.resumed == [
+            ('projects/test-project/topics/terminal49-webhook-events', 'container:c-1')
+        ]
+    
+    def test_unpaused_key_resume_is_ignored(self, base_env, stub_publisher):
+        def publish_and_fail(topic_path, data, ordering_key='', **attributes):
+            raise TimeoutError("ack timed out")
+        
+        with patch.object(stub_publisher, 'publish', side_effect=publish_and_fail), \
+                patch.object(stub_publisher, 'resume_publish',
+                             side_effect=RuntimeError("Ordering key is not paused.")):
+            with pytest.raises(TimeoutError):
+                publish_raw_event(b'{}', 'container.updated', 'req-1', ordering_key='container:c-1')
+    
+    def test_non_blocking_failure_resumes_key(self, base_env, stub_publisher):
+        with patch.dict(os.environ, {'PUBSUB_PUBLISH_MODE': 'non_blocking'}):
+            publish_raw_event(b'{}', 'container.updated', 'req-1', ordering_key='container:c-1')
+            publish_raw_event(b'{}', 'container.updated', 'req-2', ordering_key='container:c-2')
+        
+        stub_publisher.futures[0].set_exception(RuntimeError("Pub/Sub unavailable"))
+        stub_publisher.futures[1].set_result('msg-2')
+        
+        assert [key for _, key in stub_publisher.resumed] == ['container:c-1']
+
+
+class TestLaneRouting:
+    """Tests for publishing to routing lanes."""
+    
+    @pytest.fixture
+    def router(self):
+        set_event_router(parse_routing_config({
+            "lanes": {
+                "priority": {"topic": "events-priority", "publish_timeout_seconds": 2},
+                "bulk": {"topic": "projects/other/topics/events-bulk", "max_messages": 500}
+            },
+            "rules": {"container.pickup_lfd.changed": "priority", "container.updated": "bulk"}
+        }))
+        yield
+        set_event_router(None)
+    
+    def test_unrouted_event_uses_default_topic(self, base_env, stub_publisher, router):
+        with patch.dict(os.environ, {'PUBSUB_PUBLISH_MODE': 'non_blocking'}):
+            publish_raw_event(b'{}', 'shipment.estimated.arrival', 'req-1')
+        
+        topic_path, _, attributes = stub_publisher.published[0]
+        assert topic_path == 'projects/test-project/topics/terminal49-webhook-events'
+        assert attributes['lane'] == 'default'
+    
+    def test_lane_topic_and_timeout(self, base_env, stub_publisher, router):
+        future = Future()
+        future.set_result('msg-1')
+        
+        with patch.object(stub_publisher, 'publish', return_value=future) as mock_publish, \
+                patch.object(future, 'result', wraps=future.result) as mock_result:
+            publish_raw_event(b'{}', 'container.pickup_lfd.changed', 'req-1')
+        
+        assert mock_publish.call_args[0][0] == 'projects/test-project/topics/events-priority'
+        assert mock_publish.call_args[1]['lane'] == 'priority'
+        assert mock_result.call_args[1]['timeout'] == 2
+    
+    def test_lane_with_batch_settings_gets_own_client(self, base_env, stub_publisher, router):
+        lane_client = StubPublisher()
+        
+        with patch.dict(os.environ, {'PUBSUB_PUBLISH_MODE': 'non_blocking'}), \
+                patch.dict(pubsub_publisher._lane_publisher_clients, {'bulk': lane_client}):
+            publish_raw_event(b'{}', 'container.updated', 'req-1')
+        
+        assert stub_publisher.published == []
+        assert lane_client.published[0][0] == 'projects/other/topics/events-bulk'
+
+
+class TestAsyncPublish:
+    """Tests for publish_raw_event_async."""
+    
+    def test_awaits_ack_from_client_thread(self, base_env, stub_publisher):
+        async def publish():
+            task = asyncio.ensure_future(publish_raw_event_async(b'{}', 'container.updated', 'req-1'))
+            await asyncio.sleep(0)
+            threading.Timer(0.01, stub_publisher.futures[0].set_result, args=('msg-1',)).start()
+            return await task
+        
+        assert asyncio.run(publish()) == 'msg-1'
+        assert stub_publisher.published[0][2]['event_type'] == 'container.updated'
+    
+    def test_failure_resumes_key_and_raises(self, base_env, stub_publisher):
+        async def publish():
+            task = asyncio.ensure_future(publish_raw_event_async(
+                b'{}', 'container.updated', 'req-1', ordering_key='container:c-1'
+            ))
+            await asyncio.sleep(0)
+            stub_publisher.futures[0].set_exception(RuntimeError("unavailable"))
+            return await task
+        
+        with patch.dict(os.environ, {'PUBSUB_ENABLE_MESSAGE_ORDERING': 'true'}), \
+                pytest.raises(RuntimeError):
+            asyncio.run(publish())
+        assert stub_publisher.resumed == [
+            ('projects/test-project/topics/terminal49-webhook-events', 'container:c-1')
+        ]
+    
+    def test_timeout(self, base_env, stub_publisher):
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(publish_raw_event_async(b'{}', 'container.updated', 'req-1', timeout=0.01))
+
+
+class TestPublishBatch:
+    """Tests for publish_batch."""
+    
+    @pytest.fixture
+    def batch_client(self, base_env, stub_publisher):
+        stub = StubPublisher()
+        with patch.object(pubsub_publisher, '_batch_publisher_client', stub), \
+                patch.dict(os.environ, {'PUBSUB_ENABLE_MESSAGE_ORDERING': 'true'}):
+            yield stub
+    
+    @staticmethod
+    def payload(notification_id, container_id='c-1'):
+        return {
+            "data": {
+                "id": notification_id,
+                "type": "notification",
+                "attributes": {"event": "container.updated"},
+                "relationships": {"reference_object": {"data": {"id": container_id, "type": "container"}}}
+            }
+        }
+    
+    def run_in_thread(self, *args, **kwargs):
+        """Run publish_batch on a thread so the test can resolve futures meanwhile."""
+        outcome = {}
+        thread = threading.Thread(target=lambda: outcome.update(results=publish_batch(*args, **kwargs)))
+        thread.start()
+        return thread, outcome
+    
+    @staticmethod
+    def wait_for_futures(stub, count, timeout=5):
+        deadline = time.monotonic() + timeout
+        while len(stub.futures) < count:
+            assert time.monotonic() < deadline, f"{len(stub.futures)} of {count} messages submitted"
+            time.sleep(0.001)
+    
+    def test_submits_all_before_waiting_for_acks(self, batch_client):
+        events = [(self.payload(f'notif_{i}'), 'container.updated') for i in range(5)]
+        
+        thread, outcome = self.run_in_thread(events, 'replay-1', deadline_seconds=5)
+        self.wait_for_futures(batch_client, 5)
+        for i, future in enumerate(batch_client.futures):
+            future.set_result(f'msg-{i}')
+        thread.join(timeout=5)
+        
+        results = outcome['results']
+        assert [r.message_id for r in results] == [f'msg-{i}' for i in range(5)]
+        assert all(r.succeeded for r in results)
+        _, data, attributes = batch_client.published[0]
+        assert json.loads(data)['data']['id'] == 'notif_0'
+        assert attributes['notification_id'] == 'notif_0'
+        assert attributes['request_id'] == 'replay-1'
+    
+    def test_failure_recorded_without_aborting_batch(self, batch_client):
+        events = [(self.payload(f'notif_{i}', f'c-{i}'), 'container.updated') for i in range(3)]
+        
+        thread, outcome = self.run_in_thread(events, 'replay-1', deadline_seconds=5)
+        self.wait_for_futures(batch_client, 3)
+        batch_client.futures[0].set_result('msg-0')
+        batch_client.futures[1].set_exception(RuntimeError("Pub/Sub unavailable"))
+        batch_client.futures[2].set_result('msg-2')
+        thread.join(timeout=5)
+        
+        results = outcome['results']
+        assert [r.succeeded for r in results] == [True, False, True]
+        assert isinstance(results[1].error, RuntimeError)
+        # The failed message's ordering key is resumed once the batch finishes
+        assert [key for _, key in batch_client.resumed] == [batch_client.ordering_keys[1]]
+        assert batch_client.ordering_keys[1] != ''
+    
+    def test_unacked_messages_fail_at_deadline(self, batch_client):
+        events = [(b'{"data": {"id": "notif_1"}}', 'container.updated'), (b'{}', 'container.updated')]
+        
+        def publish(topic_path, data, ordering_key='', **attributes):
+            future = Future()
+            if attributes.get('notification_id') == 'notif_1':
+                future.set_result('msg-1')
+            batch_client.futures.append(future)
+            return future
+        
+        with patch.object(batch_client, 'publish', side_effect=publish):
+            results = publish_batch(events, 'replay-1', deadline_seconds=0.05)
+        
+        assert results[0].message_id == 'msg-1'
+        assert isinstance(results[1].error, BatchDeadlineExceededError)
+        # A late ack does not overwrite the recorded deadline failure
+        batch_client.futures[1].set_result('msg-late')
+        assert results[1].message_id is None
+    
+    def test_in_flight_bound(self, batch_client):
+        events = [(b'{}', 'container.updated')] * 6
+        
+        thread, outcome = self.run_in_thread(events, 'replay-1', deadline_seconds=5, max_in_flight=2)
+        time.sleep(0.05)
+        assert len(batch_client.futures) == 2
+        
+        for acked in range(6):
+            self.wait_for_futures(batch_client, acked + 1)
+            assert len(batch_client.futures) - acked <= 2
+            batch_client.futures[acked].set_result(f'msg-{acked}')
+        thread.join(timeout=5)
+        
+        assert all(r.succeeded for r in outcome['results'])
+    
+    def test_submission_error_recorded(self, batch_client):
+        with patch.object(batch_client, 'publish', side_effect=ValueError("message too large")):
+            results = publish_batch([(b'{}', 'container.updated')], 'replay-1', deadline_seconds=1)
+        
+        assert isinstance(results[0].error, ValueError)
+    
+    def test_rate_limit(self, batch_client):
+        def publish(topic_path, data, ordering_key='', **attributes):
+            future = Future()
+            future.set_result('msg')
+            return future
+        
+        start = time.monotonic()
+        with patch.object(batch_client, 'publish', side_effect=publish):
+            results = publish_batch([(b'{}', 'container.updated')] * 5, 'replay-1', rate_per_second=100)
+        
+        # Four waits of 10 ms after the first token
+        assert time.monotonic() - start >= 0.035
+        assert all(r.succeeded for r in results)
+    
+    def test_raw_body_published_verbatim(self, batch_client):
+        body = json.dumps(self.payload('notif_9')).encode('utf-8')
+        
+        thread, outcome = self.run_in_thread([(body, 'container.updated')], 'replay-1', deadline_seconds=5)
+        self.wait_for_futures(batch_client, 1)
+        batch_client.futures[0].set_result('msg-9')
+        thread.join(timeout=5)
+        
+        _, data, attributes = batch_client.published[0]
+        assert data == body
+        assert attributes['notification_id'] == 'notif_9'
+        assert batch_client.ordering_keys[0] != ''
+    
+    def test_routes_to_lane_topics(self, batch_client):
+        set_event_router(parse_routing_config({
+            "lanes": {"bulk": {"topic": "events-bulk"}},
+            "rules": {"container.updated": "bulk"}
+        }))
+        try:
+            with patch.object(batch_client, 'publish', side_effect=lambda *a, **k: Future()) as mock_publish:
+                publish_batch([(b'{}', 'container.updated'), (b'{}', 'shipment.estimated.arrival')],
+                              'replay-1', deadline_seconds=0.01)
+        finally:
+            set_event_router(None)
+        
+        topics = [call.args[0] for call in mock_publish.call_args_list]
+        assert topics == [
+            'projects/test-project/topics/events-bulk',
+            'projects/test-project/topics/terminal49-webhook-events'
+        ]
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
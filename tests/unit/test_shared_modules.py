@@ -0,0 +1,31 @@
+"""
+Unit tests for modules shared between the Cloud Functions.
+
+Each function is deployed from its own source directory, so modules both
+need are kept as identical copies in each directory.
+
+Tests cover:
+- The copies in webhook_receiver and event_processor have not diverged
+"""
+
+import os
+
+import pytest
+
+FUNCTIONS_DIR = os.path.join(os.path.dirname(__file__), '../../functions')
+
+SHARED_MODULES = ['health_probes.py', 'metrics.py', 'structured_logging.py']
+
+COPIES = ['webhook_receiver', 'event_processor']
+
+
+@pytest.mark.parametrize('module', SHARED_MODULES)
+def test_copies_are_identical(module):
+    contents = {}
+    for function in COPIES:
+        with open(os.path.join(FUNCTIONS_DIR, function, module), 'rb') as f:
+            contents[function] = f.read()
+
+    assert contents[COPIES[0]] == contents[COPIES[1]], (
+        f"{module} differs between {' and '.join(COPIES)}; apply the change to both copies"
+    )
@@ -0,0 +1,185 @@
+"""
+Unit tests for structured JSON logging.
+
+Tests cover:
+- Extra fields emitted as JSON, with Cloud Logging severity
+- Lazy fields built only for emitted records
+- Request-consistent sampling of DEBUG/INFO records
+- Handler installation from the environment
+"""
+
+import io
+import json
+import logging
+import os
+from unittest.mock import patch
+
+import pytest
+
+# Import the module under test
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../functions/webhook_receiver'))
+
+from structured_logging import (
+    JsonFormatter,
+    RequestSampler,
+    configure_logging,
+    lazy,
+)
+
+
+def _record(level=logging.INFO, msg='Webhook received', **extra):
+    record = logging.LogRecord('test', level, __file__, 1, msg, None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+@pytest.fixture
+def test_logger():
+    """Logger writing JSON to a buffer, isolated from the root logger."""
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter())
+    logger = logging.getLogger('test_structured_logging')
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    yield logger, handler, stream
+    logger.removeHandler(handler)
+
+
+class TestJsonFormatter:
+    """Tests for JsonFormatter."""
+
+    def test_extra_fields_emitted(self):
+        line = JsonFormatter().format(_record(request_id='req-1', duration_ms=12.5))
+        entry = json.loads(line)
+
+        assert entry['severity'] == 'INFO'
+        assert entry['message'] == 'Webhook received'
+        assert entry['request_id'] == 'req-1'
+        assert entry['duration_ms'] == 12.5
+        assert 'levelno' not in entry and 'args' not in entry
+        assert '\n' not in line
+
+    def test_unserializable_values_stringified(self):
+        entry = json.loads(JsonFormatter().format(_record(error=ValueError('bad'))))
+
+        assert entry['error'] == 'bad'
+
+    def test_exception_included(self):
+        try:
+            raise RuntimeError('boom')
+        except RuntimeError:
+            record = logging.LogRecord('test', logging.ERROR, __file__, 1, 'Failed', None, sys.exc_info())
+
+        entry = json.loads(JsonFormatter().format(record))
+
+        assert entry['severity'] == 'ERROR'
+        assert 'RuntimeError: boom' in entry['exception']
+
+
+class TestLazyFields:
+    """Tests for lazy()."""
+
+    def test_resolved_when_emitted(self, test_logger):
+        logger, _, stream = test_logger
+
+        logger.info("Preview", extra={'payload_keys': lazy(list, {'data': 1, 'included': 2})})
+
+        assert json.loads(stream.getvalue())['payload_keys'] == ['data', 'included']
+
+    def test_not_built_below_level(self, test_logger):
+        logger, _, stream = test_logger
+        calls = []
+
+        logger.debug("Preview", extra={'row_keys': lazy(calls.append, 'built')})
+
+        assert calls == []
+        assert stream.getvalue() == ''
+
+    def test_not_built_when_sampled_out(self, test_logger):
+        logger, handler, _ = test_logger
+        handler.addFilter(RequestSampler(0.0))
+        calls = []
+
+        logger.info("Preview", extra={'request_id': 'req-1', 'keys': lazy(calls.append, 'built')})
+
+        assert calls == []
+
+    def test_failure_does_not_break_logging(self):
+        entry = json.loads(JsonFormatter().format(_record(keys=lazy(lambda: 1 / 0))))
+
+        assert entry['keys'] == '<unavailable: ZeroDivisionError>'
+
+
+class TestRequestSampler:
+    """Tests for RequestSampler."""
+
+    def test_warnings_always_kept(self):
+        sampler = RequestSampler(0.0)
+
+        assert sampler.filter(_record(logging.WARNING, request_id='req-1'))
+        assert sampler.filter(_record(logging.ERROR))
+        assert not sampler.filter(_record(logging.INFO, request_id='req-1'))
+        assert sampler.dropped == 1
+
+    def test_unsampled_records_kept(self):
+        sampler = RequestSampler(0.0)
+
+        assert sampler.filter(_record(msg='Metrics snapshot', sample=False))
+
+    def test_request_records_sampled_together(self):
+        sampler = RequestSampler(0.5)
+
+        for i in range(50):
+            decisions = {sampler.filter(_record(request_id=f'req-{i}', msg=msg)) for msg in ('a', 'b', 'c')}
+            assert len(decisions) == 1
+
+    def test_rate_approximated(self):
+        sampler = RequestSampler(0.1)
+
+        kept = sum(sampler.filter(_record(request_id=f'req-{i}')) for i in range(10000))
+
+        assert 800 < kept < 1200
+
+
+class TestConfigureLogging:
+    """Tests for configure_logging."""
+
+    @pytest.fixture(autouse=True)
+    def restore_root(self):
+        root = logging.getLogger()
+        handlers, level = list(root.handlers), root.level
+        yield
+        root.handlers[:] = handlers
+        root.setLevel(level)
+
+    def test_json_handler_with_sampling(self):
+        stream = io.StringIO()
+        env = {'LOG_SAMPLE_RATE': '0.25', 'LOG_LEVEL': 'warning'}
+        with patch.dict(os.environ, env):
+            handler = configure_logging(stream, force=True)
+
+        assert isinstance(handler.formatter, JsonFormatter)
+        assert handler.filters[0].rate == 0.25
+        assert logging.getLogger().level == logging.WARNING
+
+    def test_text_format_and_invalid_level(self):
+        env = {'LOG_FORMAT': 'text', 'LOG_LEVEL': 'verbose'}
+        with patch.dict(os.environ, env):
+            handler = configure_logging(io.StringIO(), force=True)
+
+        assert not isinstance(handler.formatter, JsonFormatter)
+        assert handler.filters == []
+        assert logging.getLogger().level == logging.INFO
+
+    def test_installed_once(self):
+        handler = configure_logging(io.StringIO(), force=True)
+
+        assert configure_logging() is handler
+        assert sum(h is handler for h in logging.getLogger().handlers) == 1
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -7,7 +7,7 @@ Tests transformation logic for all Terminal49 event types.
 import pytest
 import sys
 from pathlib import Path
-from unittest.mock import Mock, MagicMock, patch, call
+from unittest.mock import Mock, MagicMock, patch
 
 # Add functions directory to path
 functions_path = Path(__file__).parent.parent.parent / 'functions' / 'event_processor'
@@ -23,6 +23,7 @@ from transformers import (
     _handle_shipment_estimated_arrival_event,
     _handle_container_pickup_lfd_changed_event
 )
+from metrics import get_registry, reset_metrics
 
 
 class TestTransformEvent:
@@ -43,8 +44,12 @@ class TestTransformEvent:
         
         transform_event(payload, event_type, notification_id, conn)
         
-        # Should record delivery twice (processing and completed)
-        assert mock_record_delivery.call_count == 2
+        # Should record delivery once, with its final status and timing
+        mock_record_delivery.assert_called_once()
+        kwargs = mock_record_delivery.call_args[1]
+        assert kwargs['processing_status'] == 'completed'
+        assert kwargs['processing_error'] is None
+        assert kwargs['processing_duration_ms'] >= 0
         mock_handle_transport.assert_called_once_with(payload, conn)
     
     @patch('transformers.record_webhook_delivery')
@@ -81,6 +86,24 @@ class TestTransformEvent:
         
         mock_handle_tracking.assert_called_once_with(payload, conn)
     
+    @patch('transformers.record_webhook_delivery')
+    @patch('transformers._handle_container_updated_event')
+    def test_handler_latency_recorded(
+        self,
+        mock_handle_updated,
+        mock_record_delivery
+    ):
+        """Test that the handler's latency is recorded with its name and the event type."""
+        reset_metrics()
+        
+        transform_event({'data': {'type': 'container'}}, 'container.updated', 'notif-456', Mock())
+        transform_event({'data': {'type': 'unknown'}}, 'unknown.event.type', 'notif-999', Mock())
+        
+        series = get_registry().snapshot()['event_handler_duration_ms']
+        assert [(s['handler'], s['event_type'], s['count']) for s in series] == [
+            ('container_updated', 'container.updated', 1)
+        ]
+    
     @patch('transformers.record_webhook_delivery')
     def test_transform_unknown_event_type(self, mock_record_delivery):
         """Test handling of unknown event types."""
@@ -93,7 +116,8 @@ class TestTransformEvent:
         transform_event(payload, event_type, notification_id, conn)
         
         # Should still record as completed
-        assert mock_record_delivery.call_count == 2
+        mock_record_delivery.assert_called_once()
+        assert mock_record_delivery.call_args[1]['processing_status'] == 'completed'
     
     @patch('transformers.record_webhook_delivery')
     @patch('transformers._handle_container_transport_event')
@@ -114,22 +138,21 @@ class TestTransformEvent:
         with pytest.raises(ValueError):
             transform_event(payload, event_type, notification_id, conn)
         
-        # Should record failure
-        calls = mock_record_delivery.call_args_list
-        assert any('failed' in str(call) for call in calls)
+        # The failure is recorded by the caller after rollback, not in this transaction
+        mock_record_delivery.assert_not_called()
 
 
 class TestContainerTransportEventHandler:
     """Tests for container transport event handling."""
     
-    @patch('transformers.upsert_shipment')
-    @patch('transformers.upsert_container')
-    @patch('transformers.insert_container_event')
+    @patch('transformers.upsert_shipments')
+    @patch('transformers.upsert_containers')
+    @patch('transformers.insert_container_events')
     def test_handle_container_transport_event_complete(
         self,
-        mock_insert_event,
-        mock_upsert_container,
-        mock_upsert_shipment
+        mock_insert_events,
+        mock_upsert_containers,
+        mock_upsert_shipments
     ):
         """Test handling complete container transport event."""
         payload = {
@@ -160,24 +183,30 @@ class TestContainerTransportEventHandler:
         }
         conn = Mock()
         
-        mock_upsert_shipment.return_value = 'db-ship-123'
-        mock_upsert_container.return_value = 'db-cont-456'
+        mock_upsert_shipments.return_value = {'ship-123': 'db-ship-123'}
+        mock_upsert_containers.return_value = {'cont-456': 'db-cont-456'}
         
         _handle_container_transport_event(payload, conn)
         
-        # Verify all operations called
-        mock_upsert_shipment.assert_called_once()
-        mock_upsert_container.assert_called_once()
-        mock_insert_event.assert_called_once()
+        # Verify all operations called, foreign keys resolved from the returned ids
+        mock_upsert_shipments.assert_called_once()
+        mock_upsert_containers.assert_called_once()
+        mock_insert_events.assert_called_once()
+        containers = mock_upsert_containers.call_args[0][0]
+        assert [shipment_id for _, shipment_id in containers] == ['db-ship-123']
+        events = mock_insert_events.call_args[0][0]
+        assert [(e['id'], c, s) for e, c, s in events] == [
+            ('event-789', 'db-cont-456', 'db-ship-123')
+        ]
     
-    @patch('transformers.upsert_shipment')
-    @patch('transformers.upsert_container')
-    @patch('transformers.insert_container_event')
+    @patch('transformers.upsert_shipments')
+    @patch('transformers.upsert_containers')
+    @patch('transformers.insert_container_events')
     def test_handle_container_transport_event_multiple_entities(
         self,
-        mock_insert_event,
-        mock_upsert_container,
-        mock_upsert_shipment
+        mock_insert_events,
+        mock_upsert_containers,
+        mock_upsert_shipments
     ):
         """Test handling event with multiple containers and shipments."""
         payload = {
@@ -212,26 +241,64 @@ class TestContainerTransportEventHandler:
         }
         conn = Mock()
         
-        mock_upsert_shipment.side_effect = ['db-ship-1', 'db-ship-2']
-        mock_upsert_container.side_effect = ['db-cont-1', 'db-cont-2']
+        mock_upsert_shipments.return_value = {'ship-1': 'db-ship-1', 'ship-2': 'db-ship-2'}
+        mock_upsert_containers.return_value = {'cont-1': 'db-cont-1', 'cont-2': 'db-cont-2'}
         
         _handle_container_transport_event(payload, conn)
         
-        # Verify counts
-        assert mock_upsert_shipment.call_count == 2
-        assert mock_upsert_container.call_count == 2
-        assert mock_insert_event.call_count == 2
+        # One batched statement per table, carrying every entity
+        assert mock_upsert_shipments.call_count == 1
+        assert mock_upsert_containers.call_count == 1
+        assert mock_insert_events.call_count == 1
+        assert len(mock_upsert_shipments.call_args[0][0]) == 2
+        containers = mock_upsert_containers.call_args[0][0]
+        assert [shipment_id for _, shipment_id in containers] == ['db-ship-1', 'db-ship-2']
+        events = mock_insert_events.call_args[0][0]
+        assert [container_id for _, container_id, _ in events] == ['db-cont-1', 'db-cont-2']
+    
+    @patch('transformers.upsert_shipments')
+    @patch('transformers.upsert_containers')
+    @patch('transformers.insert_container_events')
+    def test_handle_container_transport_event_unresolved_container(
+        self,
+        mock_insert_events,
+        mock_upsert_containers,
+        mock_upsert_shipments,
+        caplog
+    ):
+        """Test events whose container is not in the payload are skipped."""
+        payload = {
+            'included': [
+                {
+                    'type': 'transport_event',
+                    'id': 'event-1',
+                    'attributes': {},
+                    'relationships': {'container': {'data': {'id': 'cont-missing'}}}
+                }
+            ]
+        }
+        mock_upsert_shipments.return_value = {}
+        mock_upsert_containers.return_value = {}
+        
+        with caplog.at_level('WARNING', logger='transformers'):
+            _handle_container_transport_event(payload, Mock())
+        
+        mock_insert_events.assert_called_once()
+        assert mock_insert_events.call_args[0][0] == []
+        assert any(
+            r.getMessage() == "Transport event missing container reference" for r in caplog.records
+        )
 
 
 class TestContainerUpdatedEventHandler:
     """Tests for container updated event handling."""
     
-    @patch('transformers.upsert_shipment')
-    @patch('transformers.upsert_container')
+    @patch('transformers.upsert_shipments')
+    @patch('transformers.upsert_containers')
     def test_handle_container_updated_event(
         self,
-        mock_upsert_container,
-        mock_upsert_shipment
+        mock_upsert_containers,
+        mock_upsert_shipments
     ):
         """Test handling container.updated event."""
         payload = {
@@ -253,12 +320,16 @@ class TestContainerUpdatedEventHandler:
         }
         conn = Mock()
         
-        mock_upsert_shipment.return_value = 'db-ship-123'
+        mock_upsert_shipments.return_value = {'ship-123': 'db-ship-123'}
         
         _handle_container_updated_event(payload, conn)
         
-        mock_upsert_shipment.assert_called_once()
-        mock_upsert_container.assert_called_once()
+        mock_upsert_shipments.assert_called_once()
+        mock_upsert_containers.assert_called_once()
+        containers = mock_upsert_containers.call_args[0][0]
+        assert [(c['id'], shipment_id) for c, shipment_id in containers] == [
+            ('cont-456', 'db-ship-123')
+        ]
 
 
 class TestTrackingRequestEventHandler:
@@ -316,10 +387,10 @@ class TestTrackingRequestEventHandler:
 class TestShipmentEstimatedArrivalEventHandler:
     """Tests for shipment estimated arrival event handling."""
     
-    @patch('transformers.upsert_shipment')
+    @patch('transformers.upsert_shipments')
     def test_handle_shipment_estimated_arrival(
         self,
-        mock_upsert_shipment
+        mock_upsert_shipments
     ):
         """Test handling shipment.estimated.arrival event."""
         payload = {
@@ -337,18 +408,18 @@ class TestShipmentEstimatedArrivalEventHandler:
         
         _handle_shipment_estimated_arrival_event(payload, conn)
         
-        mock_upsert_shipment.assert_called_once()
+        mock_upsert_shipments.assert_called_once()
 
 
 class TestContainerPickupLfdChangedEventHandler:
     """Tests for container pickup LFD changed event handling."""
     
-    @patch('transformers.upsert_shipment')
-    @patch('transformers.upsert_container')
+    @patch('transformers.upsert_shipments')
+    @patch('transformers.upsert_containers')
     def test_handle_container_pickup_lfd_changed(
         self,
-        mock_upsert_container,
-        mock_upsert_shipment
+        mock_upsert_containers,
+        mock_upsert_shipments
     ):
         """Test handling container.pickup_lfd.changed event."""
         payload = {
@@ -372,12 +443,12 @@ class TestContainerPickupLfdChangedEventHandler:
         }
         conn = Mock()
         
-        mock_upsert_shipment.return_value = 'db-ship-123'
+        mock_upsert_shipments.return_value = {'ship-123': 'db-ship-123'}
         
         _handle_container_pickup_lfd_changed_event(payload, conn)
         
-        mock_upsert_shipment.assert_called_once()
-        mock_upsert_container.assert_called_once()
+        mock_upsert_shipments.assert_called_once()
+        mock_upsert_containers.assert_called_once()
 
 
 class TestHelperFunctions:
@@ -0,0 +1,117 @@
+"""
+Unit tests for post-first-request warm-up.
+
+Tests cover:
+- Disabled by default
+- Runs registered tasks once, on a background thread
+- Task failures are recorded and do not stop later tasks
+- Publisher warm-up covers every routing lane
+"""
+
+import pytest
+import os
+import threading
+from unittest.mock import MagicMock, patch
+
+# Import the module under test
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../functions/webhook_receiver'))
+
+import warmup
+import pubsub_publisher
+from event_routing import parse_routing_config, set_event_router
+from warmup import get_warm_up_stats, register_warm_up, reset_warm_up, start_warm_up
+
+
+@pytest.fixture(autouse=True)
+def isolated_tasks():
+    """Run each test against its own task list."""
+    reset_warm_up()
+    with patch.object(warmup, '_tasks', []):
+        yield
+    reset_warm_up()
+
+
+@pytest.fixture
+def enabled():
+    with patch.dict(os.environ, {'WARMUP_AFTER_FIRST_REQUEST': 'true'}):
+        yield
+
+
+class TestStartWarmUp:
+    """Tests for start_warm_up."""
+
+    def test_disabled_by_default(self):
+        task = MagicMock()
+        register_warm_up('task', task)
+
+        with patch.dict(os.environ, {}, clear=True):
+            assert start_warm_up() is None
+
+        task.assert_not_called()
+        assert get_warm_up_stats()['started'] is False
+
+    def test_runs_tasks_once_on_background_thread(self, enabled):
+        threads = []
+        register_warm_up('task', lambda: threads.append(threading.current_thread()))
+
+        thread = start_warm_up()
+        thread.join(timeout=5)
+
+        assert start_warm_up() is None
+        assert threads == [thread]
+        assert thread.daemon
+        stats = get_warm_up_stats()
+        assert stats['started'] is True
+        assert stats['tasks']['task']['error'] is None
+
+    def test_failed_task_recorded_and_later_tasks_run(self, enabled):
+        later = MagicMock()
+        register_warm_up('broken', MagicMock(side_effect=RuntimeError("no credentials")))
+        register_warm_up('later', later)
+
+        start_warm_up().join(timeout=5)
+
+        later.assert_called_once()
+        assert get_warm_up_stats()['tasks']['broken']['error'] == 'no credentials'
+
+    def test_concurrent_first_requests_start_one_thread(self, enabled):
+        started = []
+        barrier = threading.Barrier(8)
+
+        def first_request():
+            barrier.wait()
+            started.append(start_warm_up())
+
+        threads = [threading.Thread(target=first_request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len([t for t in started if t is not None]) == 1
+
+
+class TestWarmUpPublishers:
+    """Tests for pubsub_publisher.warm_up_publishers."""
+
+    def test_creates_client_and_topic_path_for_each_lane(self):
+        set_event_router(parse_routing_config({
+            'lanes': {'tracking': {'topic': 'tracking-events', 'max_messages': 10}},
+            'rules': {'tracking_request.*': 'tracking'}
+        }))
+
+        try:
+            with patch.dict(os.environ, {'GCP_PROJECT_ID': 'test-project'}), \
+                    patch.object(pubsub_publisher, 'get_publisher_client') as mock_client:
+                mock_client.return_value.topic_path.side_effect = lambda p, t: f"projects/{p}/topics/{t}"
+                pubsub_publisher.warm_up_publishers()
+        finally:
+            set_event_router(None)
+
+        lanes = sorted(call.args[0].name for call in mock_client.call_args_list if call.args)
+        assert lanes == ['default', 'tracking']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,168 @@
+"""
+Unit tests for streaming webhook body reads.
+
+Tests cover:
+- Size cap from Content-Length and while reading, at and around the limit
+- Chunked bodies hashed incrementally, independent of chunk boundaries
+- Early 401 for missing or malformed signatures
+- Empty bodies and signature mismatches at the end of the read
+"""
+
+import io
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+# Import the module under test
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../functions/webhook_receiver'))
+
+from webhook_handler import (
+    SignedBodyReader,
+    WebhookRejected,
+    get_max_body_bytes,
+    read_signed_body,
+)
+from webhook_validator import compute_signature
+
+
+SECRET = 'test-secret-key'
+BODY = json.dumps({
+    "data": {"id": "notif_1", "type": "notification", "attributes": {"event": "container.updated"}}
+}).encode('utf-8')
+
+
+@pytest.fixture(autouse=True)
+def mock_secret():
+    with patch.dict(os.environ, {'TERMINAL49_WEBHOOK_SECRET': SECRET}):
+        yield
+
+
+class CountingStream(io.BytesIO):
+    """BytesIO that records how many bytes were read from it."""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def read_chunks(chunks, signature, content_length=None, max_bytes=None):
+    reader = SignedBodyReader(signature, content_length, 'req-1', max_bytes=max_bytes)
+    for chunk in chunks:
+        reader.feed(chunk)
+    return reader.finish()
+
+
+class TestSizeCap:
+    """Tests for the body size cap."""
+
+    @pytest.mark.parametrize('size,accepted', [(99, True), (100, True), (101, False)])
+    def test_sizes_around_limit(self, size, accepted):
+        body = b'x' * size
+        signature = compute_signature(body, SECRET)
+        chunks = [body[i:i + 16] for i in range(0, size, 16)]
+
+        if accepted:
+            assert read_chunks(chunks, signature, max_bytes=100)[0] == body
+        else:
+            with pytest.raises(WebhookRejected) as exc_info:
+                read_chunks(chunks, signature, max_bytes=100)
+            assert exc_info.value.status_code == 413
+
+    @pytest.mark.parametrize('content_length,accepted', [(100, True), (101, False)])
+    def test_content_length_around_limit(self, content_length, accepted):
+        if accepted:
+            SignedBodyReader(compute_signature(BODY, SECRET), content_length, 'req-1', max_bytes=100)
+        else:
+            with pytest.raises(WebhookRejected) as exc_info:
+                SignedBodyReader(compute_signature(BODY, SECRET), content_length, 'req-1', max_bytes=100)
+            assert exc_info.value.status_code == 413
+
+    def test_declared_oversize_rejected_before_reading(self):
+        stream = CountingStream(b'x' * 1000)
+
+        with patch.dict(os.environ, {'WEBHOOK_MAX_BODY_BYTES': '100'}), \
+                pytest.raises(WebhookRejected) as exc_info:
+            read_signed_body(stream, '0' * 64, 1000, 'req-1')
+
+        assert exc_info.value.status_code == 413
+        assert stream.bytes_read == 0
+
+    def test_undeclared_oversize_rejected_while_reading(self):
+        # Chunked upload: no Content-Length, rejected at the first chunk past the cap
+        stream = CountingStream(b'x' * (1024 * 1024))
+
+        with patch.dict(os.environ, {'WEBHOOK_MAX_BODY_BYTES': str(100 * 1024)}), \
+                pytest.raises(WebhookRejected) as exc_info:
+            read_signed_body(stream, compute_signature(b'', SECRET), None, 'req-1')
+
+        assert exc_info.value.status_code == 413
+        assert stream.bytes_read < 200 * 1024
+
+    def test_understated_content_length_still_capped(self):
+        with pytest.raises(WebhookRejected) as exc_info:
+            read_chunks([b'x' * 60, b'x' * 60], compute_signature(b'x' * 120, SECRET),
+                        content_length=10, max_bytes=100)
+
+        assert exc_info.value.status_code == 413
+
+    def test_default_limit(self):
+        with patch.dict(os.environ, {}, clear=True):
+            assert get_max_body_bytes() == 5 * 1024 * 1024
+
+
+class TestStreamingSignature:
+    """Tests for signature checking while the body is read."""
+
+    @pytest.mark.parametrize('chunk_size', [1, 7, 64, len(BODY)])
+    def test_chunk_boundaries_do_not_matter(self, chunk_size):
+        chunks = [BODY[i:i + chunk_size] for i in range(0, len(BODY), chunk_size)]
+
+        body, signature_key = read_chunks(chunks, compute_signature(BODY, SECRET))
+
+        assert body == BODY
+        assert signature_key == 'key[0]'
+
+    def test_empty_chunks_ignored(self):
+        body, _ = read_chunks([b'', BODY[:10], b'', BODY[10:], b''], compute_signature(BODY, SECRET))
+
+        assert body == BODY
+
+    @pytest.mark.parametrize('signature', [None, '', 'not-hex', '0' * 63])
+    def test_unusable_signature_rejected_at_first_chunk(self, signature):
+        stream = CountingStream(BODY * 100)
+
+        with pytest.raises(WebhookRejected) as exc_info:
+            read_signed_body(stream, signature, None, 'req-1')
+
+        assert exc_info.value.status_code == 401
+        assert stream.bytes_read <= 64 * 1024
+
+    def test_mismatch_rejected_at_end(self):
+        with pytest.raises(WebhookRejected) as exc_info:
+            read_chunks([BODY[:10], BODY[10:]], compute_signature(BODY + b' ', SECRET))
+
+        assert exc_info.value.status_code == 401
+
+    def test_empty_body(self):
+        with pytest.raises(WebhookRejected) as exc_info:
+            read_chunks([], None)
+
+        assert (exc_info.value.status_code, exc_info.value.message) == (400, 'Bad Request: Empty body')
+
+    def test_previous_secret_during_rotation(self):
+        with patch.dict(os.environ, {'TERMINAL49_WEBHOOK_PREVIOUS_SECRETS': 'old-secret'}):
+            _, signature_key = read_chunks([BODY[:5], BODY[5:]], compute_signature(BODY, 'old-secret'))
+
+        assert signature_key == 'key[1]'
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
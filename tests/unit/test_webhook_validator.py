@@ -8,17 +8,27 @@ Tests cover:
 - Malformed signature handling
 - Constant-time comparison
 - Environment variable configuration
+- Multiple active secrets and the rotation window
 """
 
 import pytest
 import os
+import hashlib
 from unittest.mock import patch
 
 # Import the module under test
 import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../functions/webhook_receiver'))
 
-from webhook_validator import validate_signature, compute_signature, _is_valid_hex
+import webhook_validator
+from webhook_validator import (
+    validate_signature,
+    compute_signature,
+    get_signature_validator,
+    match_signature,
+    WebhookSignatureValidator,
+    _is_valid_hex,
+)
 
 
 class TestValidateSignature:
@@ -38,6 +48,14 @@ class TestValidateSignature:
         
         assert validate_signature(body, signature) is True
     
+    def test_valid_signature_over_bytes(self, mock_secret):
+        """Test that a raw bytes body validates against the same signature."""
+        body = '{"data": {"type": "notification", "id": "123"}}'
+        signature = compute_signature(body, mock_secret)
+        
+        assert validate_signature(body.encode('utf-8'), signature) is True
+        assert compute_signature(body.encode('utf-8'), mock_secret) == signature
+    
     def test_invalid_signature(self, mock_secret):
         """Test that an invalid signature is rejected."""
         body = '{"data": {"type": "notification"}}'
@@ -147,6 +165,12 @@ class TestIsValidHex:
     def test_mixed_case_hex(self):
         """Test that mixed case hex strings are valid."""
         assert _is_valid_hex("AbCdEf123") is True
+    
+    def test_no_integer_prefixes_or_padding(self):
+        """Test that int()-style prefixes, separators and whitespace are rejected."""
+        assert _is_valid_hex("0x" + "a" * 62) is False
+        assert _is_valid_hex("ab_cd") is False
+        assert _is_valid_hex(" " + "a" * 63) is False
 
 
 class TestComputeSignature:
@@ -246,5 +270,143 @@ class TestSecurityProperties:
             assert mock_secret not in str(e)
 
 
+class TestWebhookSignatureValidator:
+    """Test cases for the multi-key validator object."""
+    
+    BODY = b'{"data": {"type": "notification", "id": "123"}}'
+    
+    def test_reports_matching_key(self):
+        validator = WebhookSignatureValidator(['new-secret', 'old-secret'])
+        
+        assert validator.match(self.BODY, compute_signature(self.BODY, 'new-secret')) == 'key[0]'
+        assert validator.match(self.BODY, compute_signature(self.BODY, 'old-secret')) == 'key[1]'
+        assert validator.match(self.BODY, compute_signature(self.BODY, 'other-secret')) is None
+    
+    def test_key_state_reused_across_validations(self):
+        validator = WebhookSignatureValidator(['secret'])
+        signature = compute_signature(self.BODY, 'secret')
+        
+        for _ in range(3):
+            assert validator.validate(self.BODY, signature) is True
+        assert validator.validate(self.BODY + b' ', signature) is False
+    
+    def test_wrong_length_rejected_before_hashing(self):
+        validator = WebhookSignatureValidator(['secret'])
+        signature = compute_signature(self.BODY, 'secret')
+        
+        with patch.object(webhook_validator.hmac, 'compare_digest') as mock_compare:
+            assert validator.match(self.BODY, signature + '0') is None
+            assert validator.match(self.BODY, signature[:-1]) is None
+        mock_compare.assert_not_called()
+    
+    def test_duplicate_secrets_collapsed(self):
+        assert WebhookSignatureValidator(['a', 'b', 'a']).key_ids == ['key[0]', 'key[1]']
+    
+    def test_requires_a_secret(self):
+        with pytest.raises(ValueError):
+            WebhookSignatureValidator([])
+    
+    def test_stats_count_matches_per_key(self):
+        validator = WebhookSignatureValidator(['new-secret', 'old-secret'])
+        validator.match(self.BODY, compute_signature(self.BODY, 'old-secret'))
+        validator.match(self.BODY, compute_signature(self.BODY, 'old-secret'))
+        validator.match(self.BODY, compute_signature(self.BODY, 'new-secret'))
+        validator.match(self.BODY, 'f' * 64)
+        
+        assert validator.stats() == {
+            'keys': {'key[0]': 1, 'key[1]': 2},
+            'rejected': 1
+        }
+    
+    def test_incremental_check_matches_one_shot(self):
+        validator = WebhookSignatureValidator(['new-secret', 'old-secret'])
+        
+        for secret in ('new-secret', 'old-secret', 'other-secret'):
+            check = validator.begin(compute_signature(self.BODY, secret))
+            for i in range(0, len(self.BODY), 5):
+                check.update(self.BODY[i:i + 5])
+            assert check.finish(self.BODY) == validator.match(self.BODY, compute_signature(self.BODY, secret))
+    
+    def test_incremental_check_hashes_chunks_with_current_key_only(self):
+        validator = WebhookSignatureValidator(['new-secret', 'old-secret'])
+        check = validator.begin(compute_signature(self.BODY, 'new-secret'))
+        check.update(self.BODY)
+        
+        # The body passed to finish() is only hashed for the other keys
+        assert check.finish(b'ignored') == 'key[0]'
+    
+    def test_malformed_signature_not_well_formed(self):
+        validator = WebhookSignatureValidator(['secret'])
+        
+        assert validator.begin('0' * 64).well_formed is True
+        assert validator.begin('z' * 64).well_formed is False
+        assert validator.begin(None).well_formed is False
+    
+    def test_keys_labelled_by_position(self):
+        secret = 'current-secret'
+        validator = WebhookSignatureValidator([secret, 'old-secret'])
+        validator.match(self.BODY, compute_signature(self.BODY, secret))
+        
+        stats = str(validator.stats())
+        assert validator.key_ids == ['key[0]', 'key[1]']
+        assert secret not in stats
+        assert hashlib.sha256(secret.encode('utf-8')).hexdigest()[:8] not in stats
+
+
+class TestSecretRotation:
+    """Test cases for rotating the webhook secret without rejecting traffic."""
+    
+    BODY = '{"data": {"type": "notification", "id": "123"}}'
+    
+    def _signed_by(self, secret):
+        return compute_signature(self.BODY, secret)
+    
+    def test_rotation_window(self):
+        """Both secrets are accepted while the old one is listed as previous."""
+        old_signature = self._signed_by('old-secret')
+        new_signature = self._signed_by('new-secret')
+        
+        # Before: only the old secret is configured
+        with patch.dict(os.environ, {'TERMINAL49_WEBHOOK_SECRET': 'old-secret'}):
+            assert validate_signature(self.BODY, old_signature) is True
+            assert validate_signature(self.BODY, new_signature) is False
+        
+        # During: new secret deployed, old one still accepted
+        with patch.dict(os.environ, {
+            'TERMINAL49_WEBHOOK_SECRET': 'new-secret',
+            'TERMINAL49_WEBHOOK_PREVIOUS_SECRETS': 'old-secret'
+        }):
+            assert match_signature(self.BODY, old_signature) == 'key[1]'
+            assert match_signature(self.BODY, new_signature) == 'key[0]'
+        
+        # After: old secret removed
+        with patch.dict(os.environ, {'TERMINAL49_WEBHOOK_SECRET': 'new-secret'}):
+            os.environ.pop('TERMINAL49_WEBHOOK_PREVIOUS_SECRETS', None)
+            assert validate_signature(self.BODY, old_signature) is False
+            assert validate_signature(self.BODY, new_signature) is True
+    
+    def test_multiple_previous_secrets(self):
+        with patch.dict(os.environ, {
+            'TERMINAL49_WEBHOOK_SECRET': 'current',
+            'TERMINAL49_WEBHOOK_PREVIOUS_SECRETS': ' first , second,,'
+        }):
+            assert get_signature_validator().key_ids == [
+                'key[0]', 'key[1]', 'key[2]'
+            ]
+            assert validate_signature(self.BODY, self._signed_by('second')) is True
+    
+    def test_validator_cached_until_config_changes(self):
+        with patch.dict(os.environ, {'TERMINAL49_WEBHOOK_SECRET': 'secret-a'}):
+            first = get_signature_validator()
+            assert get_signature_validator() is first
+        
+        with patch.dict(os.environ, {'TERMINAL49_WEBHOOK_SECRET': 'secret-b'}):
+            assert get_signature_validator() is not first
+    
+    def test_missing_signature_does_not_need_secret(self):
+        with patch.dict(os.environ, {}, clear=True):
+            assert match_signature(self.BODY, None) is None
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])